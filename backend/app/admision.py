@@ -0,0 +1,191 @@
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.db.database import DB_POOL_MAX_SIZE, get_pool
+
+# --- Control de admisión ---
+# Antes de llegar a los endpoints, cada petición a /api pasa dos filtros:
+#
+#  1. Límite de tasa: un token bucket por cliente y clase de ruta. El cliente
+#     es la clave de X-API-Key si está en ADMISION_CLAVES y, si no, la IP.
+#     Sin tokens se responde 429 con Retry-After.
+#  2. Saturación del pool: si la cola estimada de peticiones esperando una
+#     conexión a Postgres es demasiado larga, se responde 503 con Retry-After
+#     en lugar de encolar otra que acabaría fallando tras DB_POOL_TIMEOUT.
+#     La cola se estima con las peticiones admitidas en curso que exceden el
+#     tamaño del pool (aún no han pedido conexión, pero la pedirán) y con las
+#     que el pool ya tiene esperando. Las clases de menor prioridad se
+#     descartan antes: masivas, luego lecturas, luego escrituras.
+#
+# Los buckets y contadores son por proceso worker: con N workers un cliente
+# puede llegar a N veces su tasa si sus conexiones se reparten entre ellos.
+# Las rutas fuera de /api (documentación) y las métricas no se limitan.
+#
+# Una clave que no está en la lista no identifica a nadie (cualquiera puede
+# inventarse una por petición): cuenta como la IP. La IP es la de scope
+# ['client'], que uvicorn toma de X-Forwarded-For solo si la conexión viene
+# de un proxy de confianza (FORWARDED_ALLOW_IPS, ver gunicorn.conf.py); sin
+# eso, detrás del proxy todos los clientes compartirían su IP.
+
+ADMISION = os.getenv("ADMISION", "1") != "0"
+
+def _tasa(variable: str, por_defecto: str) -> tuple:
+    """Lee 'tokens por segundo:ráfaga' de una variable de entorno."""
+    tasa, _, rafaga = os.getenv(variable, por_defecto).partition(":")
+    return float(tasa), float(rafaga or tasa)
+
+LIMITES = {
+    "lecturas": _tasa("ADMISION_LECTURAS", "20:40"),
+    "escrituras": _tasa("ADMISION_ESCRITURAS", "5:10"),
+    "masivas": _tasa("ADMISION_MASIVAS", "0.1:2"),
+}
+# Peticiones esperando conexión del pool a partir de las cuales se descarta
+# cada clase (por defecto, una cola del tamaño del pool para las lecturas)
+ADMISION_COLA_MAXIMA = int(os.getenv("ADMISION_COLA_MAXIMA", str(DB_POOL_MAX_SIZE)))
+UMBRAL_COLA = {
+    "masivas": 1,
+    "lecturas": ADMISION_COLA_MAXIMA,
+    "escrituras": 2 * ADMISION_COLA_MAXIMA,
+}
+# Rutas de operaciones masivas. GET /api/sync solo lo es sin 'since' (copia
+# completa); la sincronización incremental es una lectura más.
+RUTAS_MASIVAS = {
+    "/api/clientes/importar", "/api/productos/ajuste-masivo", "/api/productos/borrado-masivo",
+    "/api/clientes/borrado-masivo", "/api/proveedores/borrado-masivo",
+}
+RUTAS_EXENTAS = ("/api/metricas",)
+# Flujos de larga duración que no retienen conexiones: no cuentan como en curso
+RUTAS_SIN_CONEXION = ("/api/eventos",)
+METODOS_LECTURA = {"GET", "HEAD"}
+# Claves de API reconocidas (separadas por comas); cada una tiene sus buckets
+ADMISION_CLAVES = frozenset(filter(None, (c.strip() for c in os.getenv("ADMISION_CLAVES", "").split(","))))
+# Buckets guardados como máximo; al superarlo se olvida el usado hace más tiempo
+MAX_BUCKETS = 10000
+
+def clase_de_ruta(metodo: str, ruta: str, consulta: str = "") -> str:
+    if ruta in RUTAS_MASIVAS or (ruta == "/api/sync" and "since" not in parse_qs(consulta)):
+        return "masivas"
+    return "lecturas" if metodo in METODOS_LECTURA else "escrituras"
+
+class TokenBucket:
+    """Bucket de 'rafaga' tokens que se rellena a 'tasa' tokens por segundo."""
+
+    __slots__ = ("tasa", "rafaga", "tokens", "instante")
+
+    def __init__(self, tasa: float, rafaga: float, ahora: float):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.tokens = rafaga
+        self.instante = ahora
+
+    def _rellenar(self, ahora: float):
+        self.tokens = min(self.rafaga, self.tokens + (ahora - self.instante) * self.tasa)
+        self.instante = ahora
+
+    def tomar(self, ahora: float) -> float:
+        """Consume un token. Retorna 0 si lo había o los segundos hasta el siguiente."""
+        self._rellenar(ahora)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.tasa if self.tasa > 0 else math.inf
+
+class ControlAdmision:
+    """Estado del control de admisión del proceso (solo se usa desde el event loop)."""
+
+    def __init__(self):
+        self._buckets = OrderedDict() # (cliente, clase) -> TokenBucket, del menos al más reciente
+        self.en_curso = 0 # Peticiones admitidas que aún no han terminado
+        self.contadores = {
+            clase: {"admitidas": 0, "limitadas": 0, "descartadas": 0} for clase in LIMITES
+        }
+
+    def _bucket(self, cliente: str, clase: str, ahora: float) -> TokenBucket:
+        bucket = self._buckets.get((cliente, clase))
+        if bucket is not None:
+            self._buckets.move_to_end((cliente, clase))
+            return bucket
+        if len(self._buckets) >= MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        bucket = self._buckets[(cliente, clase)] = TokenBucket(*LIMITES[clase], ahora)
+        return bucket
+
+    def admitir(self, cliente: str, clase: str):
+        """
+        Decide si se admite una petición.
+
+        Returns:
+            None si se admite, o (status HTTP, segundos de Retry-After, motivo).
+        """
+        ahora = time.monotonic()
+        espera = self._bucket(cliente, clase, ahora).tomar(ahora)
+        if espera > 0:
+            self.contadores[clase]["limitadas"] += 1
+            return 429, espera, "Demasiadas peticiones: límite de tasa superado"
+        if self.cola_estimada() >= UMBRAL_COLA[clase]:
+            self.contadores[clase]["descartadas"] += 1
+            return 503, 1, "Servicio saturado: la base de datos no admite más peticiones ahora"
+        self.contadores[clase]["admitidas"] += 1
+        return None
+
+    def cola_estimada(self) -> int:
+        esperando = get_pool().get_stats().get("requests_waiting", 0)
+        return max(esperando, self.en_curso - DB_POOL_MAX_SIZE)
+
+    def estadisticas(self) -> list:
+        return [
+            {"clase": clase, "tasa": LIMITES[clase][0], "rafaga": LIMITES[clase][1],
+             "umbral_cola": UMBRAL_COLA[clase], **contadores}
+            for clase, contadores in self.contadores.items()
+        ]
+
+control = ControlAdmision()
+
+def huella_clave(clave: str) -> str:
+    """Identificador corto de una clave de API, para anotarla sin revelarla."""
+    return hashlib.sha256(clave.encode()).hexdigest()[:12]
+
+def _cliente(scope, cabeceras: Headers) -> str:
+    clave = cabeceras.get("x-api-key")
+    if clave and clave in ADMISION_CLAVES:
+        return f"clave:{clave}"
+    return f"ip:{scope['client'][0]}" if scope.get("client") else "ip:desconocida"
+
+class AdmisionMiddleware:
+    """Middleware ASGI que aplica el control de admisión a las rutas /api."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        ruta = scope.get("path", "")
+        if (scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or not ruta.startswith("/api/") or ruta.startswith(RUTAS_EXENTAS)):
+            await self.app(scope, receive, send)
+            return
+        cabeceras = Headers(scope=scope)
+        clase = clase_de_ruta(scope["method"], ruta, scope.get("query_string", b"").decode("latin-1"))
+        rechazo = control.admitir(_cliente(scope, cabeceras), clase)
+        if rechazo is None:
+            if ruta.startswith(RUTAS_SIN_CONEXION):
+                await self.app(scope, receive, send)
+                return
+            control.en_curso += 1
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                control.en_curso -= 1
+            return
+        estado, espera, motivo = rechazo
+        respuesta = JSONResponse(
+            {"detail": motivo}, status_code=estado,
+            headers={"Retry-After": str(max(1, math.ceil(min(espera, 3600))))},
+        )
+        await respuesta(scope, receive, send)
@@ -0,0 +1,175 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import zstandard
+
+# --- Archivo histórico de ventas ---
+# Los meses cerrados y antiguos de 'venta'/'detalle_venta' se sacan de Postgres
+# (ver app/jobs/archivar_ventas.py) y se guardan en ARCHIVO_VENTAS_DIR, un
+# fichero por mes: ventas_AAAA_MM.ndjson.zst (NDJSON comprimido con zstd, una
+# venta por línea con sus detalles). Los importes se guardan como texto para
+# conservar el valor NUMERIC exacto.
+# 'manifiesto.json' indexa los meses archivados. Un mes está o en Postgres o en
+# el archivo: en cuanto aparece en el manifiesto, las lecturas lo sirven desde
+# su fichero.
+
+ARCHIVO_VENTAS_DIR = os.getenv("ARCHIVO_VENTAS_DIR", "archivo_ventas")
+MANIFIESTO = "manifiesto.json"
+NIVEL_ZSTD = 9 # Buena compresión sin que el job tarde demasiado por mes
+
+def clave_mes(mes: date) -> str:
+    """'AAAA-MM' del mes al que pertenece la fecha."""
+    return mes.strftime("%Y-%m")
+
+def _ruta(nombre: str) -> str:
+    return os.path.join(ARCHIVO_VENTAS_DIR, nombre)
+
+def _escribir_atomico(ruta: str, datos: bytes):
+    """Escribe en un temporal, lo sincroniza y lo renombra: nunca queda un fichero a medias."""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as destino:
+        destino.write(datos)
+        destino.flush()
+        os.fsync(destino.fileno())
+    os.replace(temporal, ruta)
+
+# --- Manifiesto ---
+
+_manifiesto_cache = {"mtime": None, "meses": {}}
+_manifiesto_lock = threading.Lock()
+
+def meses_archivados() -> dict:
+    """
+    Retorna el índice de meses archivados: 'AAAA-MM' -> entrada del manifiesto
+    (archivo, ventas, detalles, id_venta_min, id_venta_max, bytes, sha256, archivado).
+    El manifiesto se vuelve a leer solo si cambió en disco.
+    """
+    try:
+        mtime = os.stat(_ruta(MANIFIESTO)).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _manifiesto_lock:
+        if _manifiesto_cache["mtime"] != mtime:
+            with open(_ruta(MANIFIESTO), encoding="utf-8") as origen:
+                _manifiesto_cache["meses"] = json.load(origen)["meses"]
+            _manifiesto_cache["mtime"] = mtime
+        return _manifiesto_cache["meses"]
+
+def registrar_mes(mes: date, entrada: dict):
+    """Añade (o reemplaza) un mes en el manifiesto. Solo lo escribe el job de archivado."""
+    meses = dict(meses_archivados())
+    meses[clave_mes(mes)] = entrada
+    contenido = {"version": 1, "meses": dict(sorted(meses.items()))}
+    _escribir_atomico(_ruta(MANIFIESTO), json.dumps(contenido, indent=2).encode("utf-8"))
+
+# --- Escritura ---
+
+def escribir_mes(mes: date, ventas) -> dict:
+    """
+    Escribe el fichero de un mes a partir de un iterable de ventas (dict con
+    id_venta, id_cliente, fecha, monto_total y detalles) y lo verifica leyéndolo
+    de nuevo. No toca el manifiesto.
+
+    Returns:
+        dict: Entrada para el manifiesto (sin 'archivado').
+    """
+    os.makedirs(ARCHIVO_VENTAS_DIR, exist_ok=True)
+    nombre = f"ventas_{mes.strftime('%Y_%m')}.ndjson.zst"
+    temporal = _ruta(f"{nombre}.tmp")
+    resumen = {"archivo": nombre, "ventas": 0, "detalles": 0, "id_venta_min": None, "id_venta_max": None}
+
+    with open(temporal, "wb") as destino:
+        with zstandard.ZstdCompressor(level=NIVEL_ZSTD).stream_writer(destino, closefd=False) as comprimido:
+            for venta in ventas:
+                linea = {
+                    "id_venta": venta["id_venta"],
+                    "id_cliente": venta["id_cliente"],
+                    "fecha": venta["fecha"].isoformat(),
+                    "monto_total": str(venta["monto_total"]),
+                    "detalles": [
+                        {"id_producto": d["id_producto"], "cantidad": d["cantidad"],
+                         "precio_unitario": str(d["precio_unitario"])}
+                        for d in venta["detalles"]
+                    ],
+                }
+                comprimido.write(json.dumps(linea, separators=(",", ":")).encode("utf-8") + b"\n")
+                resumen["ventas"] += 1
+                resumen["detalles"] += len(linea["detalles"])
+                resumen["id_venta_min"] = min(venta["id_venta"], resumen["id_venta_min"] or venta["id_venta"])
+                resumen["id_venta_max"] = max(venta["id_venta"], resumen["id_venta_max"] or venta["id_venta"])
+        destino.flush()
+        os.fsync(destino.fileno())
+
+    # Verificación: el fichero se descomprime entero y contiene lo que se escribió
+    sha256 = hashlib.sha256()
+    with open(temporal, "rb") as origen:
+        for bloque in iter(lambda: origen.read(1 << 20), b""):
+            sha256.update(bloque)
+    leidas = sum(1 for _ in _leer_lineas(temporal))
+    if leidas != resumen["ventas"]:
+        os.remove(temporal)
+        raise IOError(f"{nombre}: se escribieron {resumen['ventas']} ventas pero se leen {leidas}")
+
+    os.replace(temporal, _ruta(nombre))
+    resumen["bytes"] = os.path.getsize(_ruta(nombre))
+    resumen["sha256"] = sha256.hexdigest()
+    return resumen
+
+def marca_de_tiempo() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+# --- Lectura ---
+
+def _leer_lineas(ruta: str):
+    """Genera las ventas de un fichero descomprimiendo en streaming (sin cargarlo entero)."""
+    with open(ruta, "rb") as origen:
+        lector = zstandard.ZstdDecompressor().stream_reader(origen)
+        for linea in io.TextIOWrapper(lector, encoding="utf-8"):
+            yield json.loads(linea)
+
+def _a_venta(linea: dict, con_detalles: bool) -> dict:
+    """Convierte una línea del archivo al mismo formato que las filas de Postgres."""
+    venta = {
+        "id_venta": linea["id_venta"],
+        "id_cliente": linea["id_cliente"],
+        "fecha": date.fromisoformat(linea["fecha"]),
+        "monto_total": Decimal(linea["monto_total"]),
+    }
+    if con_detalles:
+        venta["detalles"] = [
+            {"id_venta": linea["id_venta"], "id_producto": d["id_producto"],
+             "cantidad": d["cantidad"], "precio_unitario": Decimal(d["precio_unitario"])}
+            for d in linea["detalles"]
+        ]
+    return venta
+
+def leer_ventas(desde: date, hasta: date, id_cliente: int = None) -> list:
+    """
+    Ventas archivadas con fecha entre 'desde' y 'hasta' (ambas incluidas),
+    opcionalmente de un cliente. Solo se abren los ficheros de los meses del rango.
+    """
+    ventas = []
+    for clave, entrada in meses_archivados().items():
+        if not clave_mes(desde) <= clave <= clave_mes(hasta):
+            continue
+        for linea in _leer_lineas(_ruta(entrada["archivo"])):
+            if id_cliente is not None and linea["id_cliente"] != id_cliente:
+                continue
+            if desde.isoformat() <= linea["fecha"] <= hasta.isoformat():
+                ventas.append(_a_venta(linea, con_detalles=False))
+    return ventas
+
+def buscar_venta(venta_id: int):
+    """Busca una venta archivada por su id (con detalles) o retorna None."""
+    for entrada in meses_archivados().values():
+        if not entrada["ventas"] or not entrada["id_venta_min"] <= venta_id <= entrada["id_venta_max"]:
+            continue
+        for linea in _leer_lineas(_ruta(entrada["archivo"])):
+            if linea["id_venta"] == venta_id:
+                return _a_venta(linea, con_detalles=True)
+    return None
@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+
+# --- Fases del arranque del worker ---
+# En un despliegue que escala a cero, la primera petición tras un periodo de
+# inactividad paga el arranque completo del worker. Aquí se anota cuánto tarda
+# cada fase (importar la app, abrir el pool, precalentar...) para vigilar ese
+# presupuesto desde /api/metricas/arranque y benchmarks/bench_arranque.py.
+
+# Instante en que empieza a importarse app.main (lo primero que hace el worker)
+INICIO = time.perf_counter()
+
+_fases = {}
+_listo = None
+
+def anotar(nombre: str, desde: float):
+    """Anota como fase 'nombre' el tiempo transcurrido desde el instante 'desde'."""
+    _fases[nombre] = round((time.perf_counter() - desde) * 1000, 1)
+
+@contextmanager
+def fase(nombre: str):
+    """Mide el bloque como una fase del arranque."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        anotar(nombre, inicio)
+
+def marcar_listo():
+    """Anota el momento en que el worker empieza a aceptar peticiones."""
+    global _listo
+    _listo = round((time.perf_counter() - INICIO) * 1000, 1)
+
+def estado() -> dict:
+    return {"fases": dict(_fases), "listo_ms": _listo}
@@ -0,0 +1,390 @@
+import glob
+import ipaddress
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import psycopg
+from starlette.datastructures import Headers
+
+from app.admision import ADMISION_CLAVES, huella_clave
+from app.db.database import DATABASE_URL, get_db_connection, release_db_connection
+
+# --- Auditoría de cambios (quién, qué, antes y después) ---
+# Cada alta, modificación o borrado de los módulos CRUD, una vez confirmado,
+# se anota aquí como un evento. Insertarlo en la misma transacción añadiría
+# una escritura a cada petición, así que los eventos se encolan en memoria y
+# un hilo por worker los copia a la tabla 'auditoria' (migración 0007) cada
+# AUDITORIA_INTERVALO segundos con un solo COPY.
+#
+# Sin AUDITORIA_SPOOL, si la cola llega a AUDITORIA_MAX_PENDIENTES (la base
+# no responde) los eventos nuevos se descartan y se cuentan, y los eventos en
+# cola se pierden si el worker se cae. Con AUDITORIA_SPOOL (un directorio),
+# cada evento se escribe además en un fichero local con fsync antes de volver
+# a la petición; las peticiones simultáneas comparten fsync. Con la cola llena
+# el evento queda solo en el fichero, que se vuelve a leer al guardar. Al
+# arrancar se reenvían los ficheros que no llegaron a la base, y como
+# 'id_evento' es la clave primaria, un evento reenviado dos veces solo se
+# guarda una.
+#
+# registrar() se llama con el cambio ya confirmado y nunca lanza: si falla el
+# fichero local (p. ej. disco lleno), el error se cuenta y el worker sigue
+# solo en memoria, en lugar de presentar como fallida una escritura hecha.
+#
+# 'usuario' es la cabecera X-Bazar-Usuario de la petición, que nadie comprueba:
+# solo la respalda una clave de API reconocida por el control de admisión
+# (ADMISION_CLAVES), cuya huella se guarda en 'clave_api'; sin ella el nombre
+# se guarda con la marca "(sin verificar)". Sin cabecera, 'usuario' es la
+# clave o la IP. 'direccion' es siempre la IP del cliente (la de confianza
+# que deja uvicorn, ver app/admision.py). Fuera de una petición, 'sistema'.
+
+AUDITORIA = os.getenv("AUDITORIA", "1") != "0"
+AUDITORIA_INTERVALO = float(os.getenv("AUDITORIA_INTERVALO", "1"))
+AUDITORIA_MAX_PENDIENTES = int(os.getenv("AUDITORIA_MAX_PENDIENTES", "100000"))
+AUDITORIA_SPOOL = os.getenv("AUDITORIA_SPOOL", "")
+CABECERA_USUARIO = "X-Bazar-Usuario"
+
+COLUMNAS = (
+    "id_evento", "fecha", "usuario", "origen", "entidad", "id_registro", "operacion", "antes", "despues",
+    "direccion", "clave_api",
+)
+MARCA_SIN_VERIFICAR = " (sin verificar)"
+
+_usuario = ContextVar("auditoria_usuario", default="sistema")
+# (petición, IP del cliente, huella de la clave de API)
+_contexto = ContextVar("auditoria_contexto", default=(None, None, None))
+
+@contextmanager
+def actor(usuario: str, origen: str = None, direccion: str = None, clave_api: str = None):
+    """
+    Atribuye a 'usuario' (y a la petición 'origen', hecha desde 'direccion'
+    con la clave 'clave_api') los cambios del bloque y de los hilos que copian su contexto.
+    """
+    token_usuario = _usuario.set(usuario)
+    token_contexto = _contexto.set((origen, direccion, clave_api))
+    try:
+        yield
+    finally:
+        _usuario.reset(token_usuario)
+        _contexto.reset(token_contexto)
+
+def _direccion(scope) -> str:
+    """IP del cliente de la petición, o None si no es una IP (p. ej. un socket Unix)."""
+    try:
+        return str(ipaddress.ip_address(scope["client"][0]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class AuditoriaMiddleware:
+    """Middleware ASGI que identifica al autor de los cambios de cada petición de escritura."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+        cabeceras = Headers(scope=scope)
+        direccion = _direccion(scope)
+        clave = cabeceras.get("x-api-key")
+        clave_api = huella_clave(clave) if clave and clave in ADMISION_CLAVES else None
+        usuario = cabeceras.get(CABECERA_USUARIO, "").strip()
+        if not usuario:
+            usuario = f"clave:{clave_api}" if clave_api else f"ip:{direccion or 'desconocida'}"
+        elif clave_api is None:
+            usuario = usuario[:100 - len(MARCA_SIN_VERIFICAR)] + MARCA_SIN_VERIFICAR
+        origen = f"{scope['method']} {scope['path']}"[:200]
+        with actor(usuario[:100], origen, direccion, clave_api):
+            await self.app(scope, receive, send)
+
+def _serializar(valor):
+    # Los NUMERIC como número, igual que los que vienen de to_jsonb(); fechas y demás como texto
+    return float(valor) if isinstance(valor, Decimal) else str(valor)
+
+def _json(valor):
+    if valor is None or isinstance(valor, str):
+        return valor
+    return json.dumps(valor, default=_serializar, ensure_ascii=False)
+
+def _leer_fichero(ruta: str) -> list:
+    """Eventos completos de un fichero local (la última línea puede estar a medio escribir)."""
+    eventos = []
+    with open(ruta, encoding="utf-8") as fichero:
+        for linea in fichero:
+            try:
+                id_evento, fecha, *resto = json.loads(linea)
+            except ValueError:
+                continue
+            # Los ficheros anteriores a 'direccion' y 'clave_api' no las tienen
+            resto += [None] * (len(COLUMNAS) - 2 - len(resto))
+            eventos.append((uuid.UUID(id_evento), datetime.fromisoformat(fecha), *resto))
+    return eventos
+
+class RegistroAuditoria:
+    """Cola de eventos de auditoría pendientes, su fichero local (opcional) y el hilo que los guarda."""
+
+    def __init__(self, activo: bool, spool: str, intervalo: float, max_pendientes: int):
+        self.activo = activo
+        self.spool = spool or None
+        self._intervalo = intervalo
+        self._max_pendientes = max_pendientes
+        self._eventos = []
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        # Fichero local: los eventos escritos y los ya sincronizados a disco (fsync)
+        self._fichero = None
+        self._numero_fichero = 0
+        self._escritos = 0
+        self._sincronizados = 0
+        self._lock_fsync = threading.Lock()
+        # Ficheros cuyos eventos están en cola: se borran cuando llegan a la base
+        self._ficheros_pendientes = []
+        # Ficheros con eventos que no cupieron en la cola: se leen al guardar.
+        # '_desbordado' indica que el fichero en curso tiene alguno.
+        self._ficheros_desbordados = []
+        self._desbordado = False
+        self._degradado = False # Tras un error del fichero local: solo memoria
+        self._estadisticas = {
+            "registrados": 0, "guardados": 0, "descartados": 0, "desbordados": 0,
+            "errores": 0, "fsync": 0, "errores_spool": 0,
+        }
+
+    def registrar(self, entidad: str, operacion: str, id_registro=None, antes=None, despues=None):
+        """
+        Encola un evento ya confirmado en la base. 'antes' y 'despues' son la
+        fila (dict) o su JSON (texto), o None en altas y bajas respectivamente.
+        """
+        if not self.activo:
+            return
+        origen, direccion, clave_api = _contexto.get()
+        evento = (
+            uuid.uuid4(), datetime.now(timezone.utc), _usuario.get(), origen,
+            entidad, id_registro, operacion, _json(antes), _json(despues), direccion, clave_api,
+        )
+        with self._lock:
+            en_cola = len(self._eventos) < self._max_pendientes
+            if not en_cola and self._fichero is None:
+                self._estadisticas["descartados"] += 1
+                return
+            self._estadisticas["registrados"] += 1
+            if en_cola:
+                self._eventos.append(evento)
+            else:
+                # Con fichero local no se descarta: queda solo en el fichero
+                self._estadisticas["desbordados"] += 1
+                self._desbordado = True
+            if self._fichero is None:
+                return
+            try:
+                self._fichero.write(json.dumps([str(evento[0]), evento[1].isoformat(), *evento[2:]], ensure_ascii=False) + "\n")
+            except OSError as error:
+                if not en_cola:
+                    self._estadisticas["descartados"] += 1
+                self._degradar(error)
+                return
+            self._escritos += 1
+            numero = self._escritos
+        try:
+            self._sincronizar(numero)
+        except OSError as error:
+            with self._lock:
+                self._degradar(error)
+
+    def _sincronizar(self, numero: int):
+        """
+        Espera a que el evento 'numero' del fichero esté en disco. Un solo
+        fsync cubre todos los escritos hasta entonces (commit en grupo): las
+        peticiones que llegan mientras otra hace fsync esperan a la siguiente.
+        """
+        with self._lock_fsync:
+            if self._sincronizados >= numero:
+                return
+            with self._lock:
+                fichero, hasta = self._fichero, self._escritos
+                if fichero is None: # Sin fichero local tras un error: solo memoria
+                    return
+                fichero.flush()
+            os.fsync(fichero.fileno())
+            self._sincronizados = hasta
+            self._estadisticas["fsync"] += 1
+
+    def _degradar(self, error: OSError):
+        """
+        Deja de usar el fichero local tras un error de E/S (con el lock tomado).
+        Sus eventos siguen en la cola (o, los que no cupieron, se leerán de él
+        al guardar); el fichero se borra cuando se guarden.
+        """
+        self._estadisticas["errores_spool"] += 1
+        if not self._degradado:
+            print(f"Error en el fichero local de auditoría ({error}): se continúa solo en memoria")
+            self._degradado = True
+        if self._fichero is None:
+            return
+        try:
+            self._fichero.close()
+        except OSError:
+            pass
+        self._cerrado(self._fichero.name)
+
+    def _cerrado(self, ruta: str):
+        """Anota el fichero en curso ya cerrado como pendiente de guardar (con el lock tomado)."""
+        (self._ficheros_desbordados if self._desbordado else self._ficheros_pendientes).append(ruta)
+        self._fichero = None
+        self._desbordado = False
+
+    def iniciar(self):
+        if self._hilo is not None or not self.activo or not DATABASE_URL:
+            return
+        if self.spool:
+            self._recuperar()
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="auditoria", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo guardando antes los eventos pendientes."""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+        with self._lock_fsync, self._lock:
+            if self._fichero is not None:
+                self._fichero.close()
+                self._cerrado(self._fichero.name)
+            if not self._eventos and not self._ficheros_desbordados: # Todo guardado: los ficheros ya no hacen falta
+                self._borrar_ficheros(self._ficheros_pendientes)
+            # Si no, se reenvían al volver a arrancar (ver _recuperar)
+            self._ficheros_pendientes, self._ficheros_desbordados = [], []
+
+    def _ejecutar(self):
+        while not self._detener.wait(self._intervalo):
+            self.guardar()
+        self.guardar()
+
+    def _recuperar(self):
+        """Encola los eventos de los ficheros de una ejecución anterior y abre uno nuevo."""
+        os.makedirs(self.spool, exist_ok=True)
+        recuperados = 0
+        for ruta in sorted(glob.glob(os.path.join(self.spool, "auditoria-*.jsonl"))):
+            # Cada worker escribe los suyos: solo se recuperan los de procesos que ya no existen
+            if not self._abandonado(ruta):
+                continue
+            eventos = _leer_fichero(ruta)
+            self._eventos.extend(eventos)
+            recuperados += len(eventos)
+            self._ficheros_pendientes.append(ruta)
+        if recuperados:
+            print(f"Auditoría: {recuperados} eventos recuperados de {self.spool}")
+        self._abrir_fichero()
+
+    def _abandonado(self, ruta: str) -> bool:
+        """Indica si el proceso que escribía el fichero (su PID va en el nombre) ya terminó."""
+        pid = int(os.path.basename(ruta).split("-")[1])
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def _abrir_fichero(self):
+        """Abre el siguiente fichero local de este worker (con el lock tomado o antes de arrancar el hilo)."""
+        self._numero_fichero += 1
+        ruta = os.path.join(self.spool, f"auditoria-{os.getpid()}-{time.time_ns()}-{self._numero_fichero}.jsonl")
+        self._fichero = open(ruta, "a", encoding="utf-8")
+
+    def guardar(self):
+        """
+        Copia a 'auditoria' todos los eventos en cola, y los que no cupieron
+        en ella desde sus ficheros, en una transacción. El fichero local en
+        curso se cierra y se abre otro, y los cerrados se borran cuando sus
+        eventos están guardados. Si falla, los eventos vuelven a la cola (y sus
+        ficheros se conservan) para el siguiente intento.
+        """
+        with self._lock_fsync, self._lock:
+            eventos, self._eventos = self._eventos, []
+            ficheros, self._ficheros_pendientes = self._ficheros_pendientes, []
+            if self._fichero is not None and (eventos or self._desbordado):
+                try:
+                    self._fichero.flush()
+                    os.fsync(self._fichero.fileno())
+                    self._sincronizados = self._escritos
+                    self._fichero.close()
+                    self._cerrado(self._fichero.name)
+                    self._abrir_fichero()
+                except OSError as error:
+                    self._degradar(error)
+            desbordados, self._ficheros_desbordados = self._ficheros_desbordados, []
+        try:
+            # Esos ficheros tienen también eventos que sí están en la cola
+            en_cola = {evento[0] for evento in eventos}
+            leidos = [
+                evento for ruta in desbordados for evento in _leer_fichero(ruta) if evento[0] not in en_cola
+            ]
+        except OSError as error:
+            print(f"Error al leer los ficheros locales de auditoría: {error}")
+            self._devolver(eventos, ficheros, desbordados)
+            return
+        if not eventos and not leidos:
+            self._borrar_ficheros(ficheros + desbordados) # Recuperados sin ningún evento completo
+            return
+        conn = get_db_connection()
+        if conn is None:
+            self._devolver(eventos, ficheros, desbordados)
+            return
+        try:
+            with conn.transaction(), conn.cursor() as cur:
+                # Por la tabla temporal: ON CONFLICT ignora los eventos reenviados tras una caída
+                cur.execute("CREATE TEMP TABLE auditoria_carga (LIKE auditoria) ON COMMIT DROP")
+                with cur.copy(f"COPY auditoria_carga ({', '.join(COLUMNAS)}) FROM STDIN") as copy:
+                    for numero, evento in enumerate(eventos + leidos, 1):
+                        copy.write_row(evento)
+                        if numero % 100 == 0:
+                            time.sleep(0) # Cede el GIL a los hilos de las peticiones
+                cur.execute(f"""
+                    INSERT INTO auditoria ({', '.join(COLUMNAS)}) SELECT {', '.join(COLUMNAS)} FROM auditoria_carga
+                    ON CONFLICT (id_evento) DO NOTHING
+                """)
+            with self._lock:
+                self._estadisticas["guardados"] += len(eventos) + len(leidos)
+            self._borrar_ficheros(ficheros + desbordados)
+        except (Exception, psycopg.Error) as error:
+            print(f"Error al guardar {len(eventos) + len(leidos)} eventos de auditoría: {error}")
+            self._devolver(eventos, ficheros, desbordados)
+        finally:
+            release_db_connection(conn)
+
+    def _devolver(self, eventos: list, ficheros: list, desbordados: list = ()):
+        with self._lock:
+            self._estadisticas["errores"] += 1
+            self._eventos[:0] = eventos
+            self._ficheros_pendientes[:0] = ficheros
+            self._ficheros_desbordados[:0] = desbordados
+
+    def _borrar_ficheros(self, ficheros: list):
+        for ruta in ficheros:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "activo": self.activo, "durable": self.spool is not None and not self._degradado,
+                "pendientes": len(self._eventos), **self._estadisticas,
+            }
+
+# Instancia única por proceso
+auditoria = RegistroAuditoria(AUDITORIA, AUDITORIA_SPOOL, AUDITORIA_INTERVALO, AUDITORIA_MAX_PENDIENTES)
@@ -0,0 +1,215 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import threading
+import time
+
+# --- Backends de almacenamiento para la caché ---
+# Un backend guarda valores ya serializados (bytes) por clave y mantiene un
+# contador de versión por espacio de nombres ('catalogo', 'proveedores', ...).
+# Las claves que usa CacheVersionada incluyen esa versión, así que invalidar un
+# espacio completo es solo incrementar su contador.
+
+class BackendCache:
+    """Interfaz común de los backends de caché."""
+
+    def leer(self, espacio: str, version: int, clave: str):
+        """Retorna los bytes guardados o None si no existen o expiraron."""
+        raise NotImplementedError
+
+    def escribir(self, espacio: str, version: int, clave: str, datos: bytes, ttl: float):
+        raise NotImplementedError
+
+    def version(self, espacio: str) -> int:
+        raise NotImplementedError
+
+    def incrementar_version(self, espacio: str) -> int:
+        raise NotImplementedError
+
+    def marcar_evento(self, evento: str) -> bool:
+        """
+        Registra un evento de invalidación ya aplicado. Retorna True solo para
+        el primer proceso que lo marca, de modo que una misma notificación
+        recibida por varios workers incrementa la versión una sola vez.
+        """
+        raise NotImplementedError
+
+    def purgar(self):
+        """Elimina entradas expiradas o de versiones anteriores."""
+
+class BackendMemoriaLocal(BackendCache):
+    """
+    Backend en la memoria del propio proceso. Sirve como sustituto local
+    (desarrollo, un solo worker): no se comparte entre procesos.
+    """
+
+    def __init__(self):
+        self._datos = {} # (espacio, version, clave) -> (expira, bytes)
+        self._versiones = {}
+        self._eventos = {} # evento -> instante en que se marcó
+        self._lock = threading.Lock()
+
+    def leer(self, espacio, version, clave):
+        entrada = self._datos.get((espacio, version, clave))
+        if entrada is None or entrada[0] < time.time():
+            return None
+        return entrada[1]
+
+    def escribir(self, espacio, version, clave, datos, ttl):
+        self._datos[(espacio, version, clave)] = (time.time() + ttl, datos)
+
+    def version(self, espacio):
+        return self._versiones.get(espacio, 0)
+
+    def incrementar_version(self, espacio):
+        with self._lock:
+            self._versiones[espacio] = self._versiones.get(espacio, 0) + 1
+            return self._versiones[espacio]
+
+    def marcar_evento(self, evento):
+        with self._lock:
+            if evento in self._eventos:
+                return False
+            self._eventos[evento] = time.time()
+            return True
+
+    def purgar(self):
+        ahora = time.time()
+        with self._lock:
+            self._datos = {
+                k: v for k, v in self._datos.items()
+                if v[0] >= ahora and k[1] == self._versiones.get(k[0], 0)
+            }
+            self._eventos = {e: t for e, t in self._eventos.items() if ahora - t < 600}
+
+def _comprobar_directorio(directorio: str):
+    """
+    Exige que el directorio de la caché sea un directorio real (no un enlace)
+    del usuario de la app con permisos 0o700. Los valores se guardan con
+    pickle, así que un directorio que otro usuario local haya creado antes
+    (p. ej. en /dev/shm) le permitiría ejecutar código en cada worker.
+    """
+    info = os.lstat(directorio)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError(f"{directorio} no es un directorio")
+    if info.st_uid != os.getuid():
+        raise RuntimeError(f"{directorio} no pertenece al usuario de la app (uid {info.st_uid})")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        raise RuntimeError(f"{directorio} tiene permisos {stat.S_IMODE(info.st_mode):o}; se exige 700")
+
+class BackendMemoriaCompartida(BackendCache):
+    """
+    Backend compartido entre los procesos de una misma máquina.
+
+    Cada entrada es un archivo en un directorio de memoria compartida
+    (/dev/shm, tmpfs) con el formato: [expira: double][valor serializado].
+    Se escribe en un archivo temporal y se publica con os.replace (atómico),
+    y se lee mapeándolo en memoria con mmap. Los contadores de versión son
+    archivos de 8 bytes mapeados con MAP_SHARED, así que todos los procesos
+    ven el mismo valor; los incrementos se serializan con flock.
+    """
+
+    _CABECERA = struct.Struct("<d")
+    _VERSION = struct.Struct("<Q")
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        # 0o700: solo el usuario de la app puede leer o escribir la caché
+        os.makedirs(directorio, mode=0o700, exist_ok=True)
+        _comprobar_directorio(directorio)
+        self._mapas_version = {} # espacio -> (fd, mmap)
+        self._lock = threading.Lock()
+
+    def _ruta(self, espacio, version, clave):
+        resumen = hashlib.sha1(clave.encode()).hexdigest()
+        return os.path.join(self.directorio, f"{espacio}.{version}.{resumen}")
+
+    def _mapa_version(self, espacio):
+        mapa = self._mapas_version.get(espacio)
+        if mapa is None:
+            with self._lock:
+                mapa = self._mapas_version.get(espacio)
+                if mapa is None:
+                    fd = os.open(os.path.join(self.directorio, f"{espacio}.version"),
+                                 os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+                    if os.fstat(fd).st_uid != os.getuid():
+                        os.close(fd)
+                        raise RuntimeError(f"{self.directorio}/{espacio}.version no pertenece al usuario de la app")
+                    if os.fstat(fd).st_size < self._VERSION.size:
+                        os.ftruncate(fd, self._VERSION.size)
+                    mapa = (fd, mmap.mmap(fd, self._VERSION.size))
+                    self._mapas_version[espacio] = mapa
+        return mapa
+
+    def leer(self, espacio, version, clave):
+        try:
+            with open(self._ruta(espacio, version, clave), "rb") as archivo:
+                # Los valores se deserializan con pickle: un archivo de otro
+                # usuario no se lee nunca (cuenta como fallo de caché)
+                if os.fstat(archivo.fileno()).st_uid != os.getuid():
+                    return None
+                with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    (expira,) = self._CABECERA.unpack_from(mm, 0)
+                    if expira < time.time():
+                        return None
+                    return mm[self._CABECERA.size:]
+        except (FileNotFoundError, ValueError):
+            # ValueError: archivo vacío (no se puede mapear)
+            return None
+
+    def escribir(self, espacio, version, clave, datos, ttl):
+        ruta = self._ruta(espacio, version, clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(self._CABECERA.pack(time.time() + ttl))
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+
+    def version(self, espacio):
+        _, mm = self._mapa_version(espacio)
+        return self._VERSION.unpack_from(mm, 0)[0]
+
+    def incrementar_version(self, espacio):
+        fd, mm = self._mapa_version(espacio)
+        with self._lock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                nueva = self._VERSION.unpack_from(mm, 0)[0] + 1
+                self._VERSION.pack_into(mm, 0, nueva)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return nueva
+
+    def marcar_evento(self, evento):
+        try:
+            # O_EXCL: solo el primer proceso en crear el marcador gana
+            os.close(os.open(os.path.join(self.directorio, f"evento.{evento}"), os.O_CREAT | os.O_EXCL, 0o600))
+            return True
+        except FileExistsError:
+            return False
+
+    def purgar(self):
+        ahora = time.time()
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if nombre.startswith("evento."):
+                    if ahora - os.stat(ruta).st_mtime > 600:
+                        os.remove(ruta)
+                    continue
+                partes = nombre.split(".")
+                if len(partes) != 3 or not partes[1].isdigit():
+                    continue # archivos de versión y temporales
+                if int(partes[1]) < self.version(partes[0]):
+                    os.remove(ruta)
+            except FileNotFoundError:
+                pass # otro proceso ya lo eliminó
+
+def crear_backend(tipo: str, directorio: str) -> BackendCache:
+    """Crea el backend indicado por la configuración ('memoria' o 'compartida')."""
+    if tipo == "compartida":
+        return BackendMemoriaCompartida(directorio)
+    return BackendMemoriaLocal()
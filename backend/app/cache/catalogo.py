@@ -0,0 +1,141 @@
+import os
+import pickle
+
+from starlette.concurrency import run_in_threadpool
+
+from app.cache.backends import crear_backend
+from app.cache.coalescencia import VueloUnico
+from app.db.database import lecturas_para_cache, notificar_escritura
+from app.db.notificaciones import escucha
+from app.recomendaciones import RELACIONADOS_GRUPOS
+
+# --- Caché versionada del catálogo ---
+# CACHE_BACKEND: 'memoria' (por proceso, por defecto) o 'compartida' (entre
+# todos los workers de la máquina; la activa gunicorn.conf.py).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+CACHE_DIR = os.getenv("CACHE_DIR", "/dev/shm/bazar_cache")
+# Tiempo de vida máximo de una entrada: acota lo que se puede servir
+# desactualizado si se pierde una notificación de invalidación.
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+# Canal de Postgres por el que los triggers anuncian escrituras (ver database/schema.sql);
+# los productos relacionados los anuncian app/recomendaciones.py y su job.
+CANAL_INVALIDACION = "cache_invalidacion"
+ESPACIOS = ("catalogo", "proveedores", "relacionados")
+
+# El top-K de productos relacionados se reparte en RELACIONADOS_GRUPOS espacios
+# ('relacionados_<id_producto % RELACIONADOS_GRUPOS>'): las sumas periódicas de
+# las ventas solo invalidan los grupos de los productos que cambian, no todos
+# los relacionados en caché. Un aviso sin grupos (el job) los invalida todos.
+
+def espacio_relacionados(producto_id: int) -> str:
+    """Espacio de la caché con el top-K de relacionados de un producto."""
+    return f"relacionados_{producto_id % RELACIONADOS_GRUPOS}"
+
+def _espacios(espacio: str, grupos: str = "") -> list:
+    """Espacios reales de la caché que invalida un aviso de 'espacio'."""
+    if espacio != "relacionados":
+        return [espacio]
+    if grupos:
+        return [f"relacionados_{grupo}" for grupo in grupos.split(",")]
+    return [f"relacionados_{grupo}" for grupo in range(RELACIONADOS_GRUPOS)]
+
+class CacheVersionada:
+    """
+    Caché de lectura con claves versionadas por espacio de nombres.
+    La clave efectiva es (espacio, versión actual, clave), de modo que
+    invalidar un espacio consiste en incrementar su versión: las entradas
+    anteriores dejan de ser alcanzables y se purgan más tarde.
+    """
+
+    def __init__(self, backend, ttl: float, nombre: str):
+        self.backend = backend
+        self.ttl = ttl
+        # Fallos de caché simultáneos de la misma clave comparten una sola carga
+        self.vuelos = VueloUnico(nombre)
+
+    def obtener(self, espacio: str, clave: str, cargar):
+        """
+        Retorna el valor en caché o lo carga con 'cargar()' y lo guarda.
+        Los resultados None (no encontrado o error) no se guardan.
+        Cada llamada recibe su propia copia del valor.
+        """
+        # La versión se lee ANTES de cargar: si una escritura invalida el espacio
+        # mientras se consulta la base, el valor se guarda bajo la versión vieja
+        # y nadie lo volverá a leer. También forma parte de la clave del vuelo:
+        # tras una invalidación no se espera a una carga anterior a la escritura.
+        version = self.backend.version(espacio)
+        datos = self.backend.leer(espacio, version, clave)
+        if datos is None:
+            datos = self.vuelos.ejecutar(
+                (espacio, version, clave), lambda: self._cargar(espacio, version, clave, cargar)
+            )
+        return pickle.loads(datos) if datos is not None else None
+
+    async def obtener_async(self, espacio: str, clave: str, cargar):
+        """
+        Como obtener(), para endpoints async: la carga (síncrona) corre en el
+        threadpool y las peticiones que esperan a otra carga no ocupan hilos.
+        """
+        version = self.backend.version(espacio)
+        datos = self.backend.leer(espacio, version, clave)
+        if datos is None:
+            datos = await self.vuelos.ejecutar_async(
+                (espacio, version, clave),
+                lambda: run_in_threadpool(self._cargar, espacio, version, clave, cargar),
+            )
+        return pickle.loads(datos) if datos is not None else None
+
+    def _cargar(self, espacio: str, version: int, clave: str, cargar):
+        """Carga el valor, lo guarda bajo 'version' y lo retorna serializado (o None)."""
+        with lecturas_para_cache():
+            valor = cargar()
+        if valor is None:
+            return None
+        datos = pickle.dumps(valor)
+        self.backend.escribir(espacio, version, clave, datos, self.ttl)
+        return datos
+
+    def invalidar(self, espacio: str):
+        """Invalida todas las entradas de un espacio (p. ej. tras una escritura local)."""
+        self.backend.incrementar_version(espacio)
+
+    def invalidar_por_evento(self, espacio: str, evento: str, grupos: str = ""):
+        """
+        Invalida un espacio (o solo los 'grupos' indicados, ver _espacios) a
+        partir de una notificación de Postgres. Todos los workers reciben la
+        misma notificación; solo el primero incrementa las versiones.
+        """
+        if self.backend.marcar_evento(f"{espacio}.{evento}"):
+            for nombre in _espacios(espacio, grupos):
+                self.backend.incrementar_version(nombre)
+            self.backend.purgar()
+
+    def invalidar_todo(self):
+        for espacio in ESPACIOS:
+            for nombre in _espacios(espacio):
+                self.backend.incrementar_version(nombre)
+
+cache_catalogo = CacheVersionada(crear_backend(CACHE_BACKEND, CACHE_DIR), CACHE_TTL, "catalogo")
+
+# --- Caché del stock vigente ---
+# Las ventas no invalidan el catálogo (sería una invalidación por venta): el
+# trigger de 'producto' no avisa de los cambios que solo tocan el stock, y el
+# catálogo toma el stock de esta caché aparte, que se recalcula al caducar,
+# cada STOCK_CACHE_TTL segundos como máximo.
+STOCK_CACHE_TTL = float(os.getenv("STOCK_CACHE_TTL", "2"))
+cache_stock = CacheVersionada(crear_backend(CACHE_BACKEND, CACHE_DIR), STOCK_CACHE_TTL, "stock")
+
+def _al_notificar(payload: str):
+    # Formato del payload: '<espacio>:<id de transacción>[:<grupos separados por comas>]'
+    espacio, _, evento = payload.partition(":")
+    evento, _, grupos = evento.partition(":")
+    if espacio in ESPACIOS:
+        # Hasta que las réplicas reproduzcan la escritura, la caché se carga de la primaria
+        notificar_escritura()
+        cache_catalogo.invalidar_por_evento(espacio, evento, grupos)
+
+escucha.suscribir(CANAL_INVALIDACION, _al_notificar)
+# Si la conexión de escucha se cae, las notificaciones de ese intervalo se pierden
+escucha.al_reconectar(cache_catalogo.invalidar_todo)
+escucha.al_reconectar(notificar_escritura)
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+
+# --- Coalescencia de lecturas idénticas (single-flight) ---
+# Cuando caduca o se invalida una entrada de caché muy pedida, todas las
+# peticiones que llegan a la vez fallan la caché. Con un VueloUnico solo la
+# primera (la líder) ejecuta la carga; las demás con la misma clave esperan su
+# resultado. Funciona por proceso worker: con N workers hay como mucho N cargas.
+# CACHE_COALESCENCIA=0 la desactiva (útil para comparar en los benchmarks).
+CACHE_COALESCENCIA = os.getenv("CACHE_COALESCENCIA", "1") != "0"
+
+_registrados = []
+
+class _Vuelo:
+    """Una carga en curso y lo necesario para que las seguidoras esperen su resultado."""
+
+    def __init__(self):
+        self.hecho = threading.Event()
+        self.resultado = None
+        self.error = None
+
+class VueloUnico:
+    """
+    Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+    ejecutar() sirve a código síncrono (endpoints en el threadpool: las
+    seguidoras bloquean su hilo) y ejecutar_async() a corrutinas del event
+    loop (las seguidoras no ocupan ningún hilo). Las dos variantes no se
+    mezclan: una clave en vuelo síncrono no agrupa llamadas async ni al revés.
+    """
+
+    def __init__(self, nombre: str, activo: bool = CACHE_COALESCENCIA):
+        self.nombre = nombre
+        self.activo = activo
+        self._vuelos = {} # clave -> _Vuelo
+        self._tareas = {} # clave -> asyncio.Task
+        self._lock = threading.Lock()
+        self.ejecuciones = 0
+        self.coalescidas = 0
+        _registrados.append(self)
+
+    def ejecutar(self, clave, funcion):
+        """Ejecuta funcion() o, si ya hay una ejecución en curso con 'clave', espera la suya."""
+        if not self.activo:
+            return funcion()
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+                self.ejecuciones += 1
+            else:
+                self.coalescidas += 1
+        if not lider:
+            vuelo.hecho.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+        try:
+            vuelo.resultado = funcion()
+            return vuelo.resultado
+        except BaseException as error:
+            vuelo.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+            vuelo.hecho.set()
+
+    async def ejecutar_async(self, clave, funcion):
+        """
+        Variante para el event loop: 'funcion' retorna un awaitable. La carga
+        corre en su propia tarea, así que si la petición líder se cancela
+        (p. ej. el cliente cierra la conexión) las seguidoras no se quedan sin él.
+        """
+        if not self.activo:
+            return await funcion()
+        tarea = self._tareas.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(funcion())
+            self._tareas[clave] = tarea
+            tarea.add_done_callback(lambda terminada: self._terminar_tarea(clave, terminada))
+            with self._lock:
+                self.ejecuciones += 1
+        else:
+            with self._lock:
+                self.coalescidas += 1
+        return await asyncio.shield(tarea)
+
+    def _terminar_tarea(self, clave, tarea):
+        if self._tareas.get(clave) is tarea:
+            del self._tareas[clave]
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "nombre": self.nombre,
+                "activo": self.activo,
+                "ejecuciones": self.ejecuciones,
+                "coalescidas": self.coalescidas,
+                "en_vuelo": len(self._vuelos) + len(self._tareas),
+            }
+
+def estadisticas() -> list:
+    """Estadísticas de todos los VueloUnico del proceso."""
+    return [vuelo.estadisticas() for vuelo in _registrados]
@@ -1,38 +1,206 @@
 # Importaciones necesarias
-from app.db.database import get_db_connection
+from app.db.database import get_db_connection, release_db_connection, transaccion, transaccion_pipeline
+from app.db.consultas import registro, registrar_actualizacion, parametros_actualizacion, registrar_borrado_masivo
 # Importamos ClienteCreate y ClienteUpdate para validación
 from app.schemas import ClienteCreate, ClienteUpdate 
+from app.archivo import ventas as archivo
+from app.auditoria import auditoria
+from calendar import monthrange
+from datetime import date
 import psycopg
 
 # Importación de la función auxiliar para conversión de filas
 from .crud_productos import row_to_dict 
+from .crud_direcciones import ClienteNoEncontrado
+
+# --- Consultas registradas (preparadas una vez por conexión) ---
+CLIENTES_TODOS = registro.registrar(
+    "cliente.todos", "SELECT id_cliente, nombre, telefono FROM cliente ORDER BY nombre, id_cliente"
+)
+# Paginación por clave (nombre, id_cliente): cada página continúa tras la
+# última fila de la anterior recorriendo el índice idx_cliente_nombre_id,
+# sin OFFSET que obligue a leer y descartar las páginas previas.
+CLIENTES_PRIMERA_PAGINA = registro.registrar(
+    "cliente.primera_pagina",
+    "SELECT id_cliente, nombre, telefono FROM cliente ORDER BY nombre, id_cliente LIMIT %s"
+)
+CLIENTES_PAGINA = registro.registrar("cliente.pagina", """
+    SELECT id_cliente, nombre, telefono FROM cliente
+    WHERE (nombre, id_cliente) > (%s, %s)
+    ORDER BY nombre, id_cliente LIMIT %s
+""")
+CLIENTE_POR_ID = registro.registrar(
+    "cliente.por_id", "SELECT id_cliente, nombre, telefono FROM cliente WHERE id_cliente = %s", ejemplo=(0,)
+)
+CLIENTE_CREAR = registro.registrar(
+    "cliente.crear",
+    "INSERT INTO cliente (nombre, telefono) VALUES (%s, %s) RETURNING id_cliente, nombre, telefono"
+)
+COLUMNAS_CLIENTE = {"nombre": "varchar", "telefono": "varchar"}
+CLIENTE_ACTUALIZAR = registrar_actualizacion(
+    "cliente.actualizar", "cliente", COLUMNAS_CLIENTE,
+    where="id_cliente = %(id)s", returning="id_cliente, nombre, telefono", clave="id_cliente"
+)
+CLIENTE_ELIMINAR = registro.registrar(
+    "cliente.eliminar", "DELETE FROM cliente WHERE id_cliente = %s RETURNING to_jsonb(cliente)::text"
+)
+# Direcciones y acumulados de compras se borran en cascada; las ventas lo impiden
+CLIENTES_BLOQUEAR, CLIENTES_ELIMINAR = registrar_borrado_masivo(
+    "cliente.eliminar_varios", "cliente", "id_cliente", {"venta": "id_cliente"}
+)
+# Ficha completa de un cliente en una sola consulta: sus direcciones y sus
+# últimas ventas se agregan a JSON en subconsultas LATERAL, y los acumulados
+# de compras salen de 'cliente_compras', que mantiene un trigger sobre 'venta'
+# (ver database/migraciones/0004_cliente_compras.py).
+CLIENTE_RESUMEN = registro.registrar("cliente.resumen", """
+    SELECT json_build_object('id_cliente', c.id_cliente, 'nombre', c.nombre, 'telefono', c.telefono) AS cliente,
+        d.direcciones,
+        COALESCE(a.total_gastado, 0) AS total_gastado,
+        COALESCE(a.num_compras, 0) AS num_compras,
+        a.ultima_compra,
+        v.ultimas_ventas
+    FROM cliente c
+    LEFT JOIN cliente_compras a ON a.id_cliente = c.id_cliente
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'id_direccion', d.id_direccion, 'calle', d.calle, 'ciudad', d.ciudad,
+            'codigo_postal', d.codigo_postal, 'id_cliente', d.id_cliente
+        ) ORDER BY d.id_direccion), '[]') AS direcciones
+        FROM direccion d
+        WHERE d.id_cliente = c.id_cliente
+    ) d
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(json_agg(json_build_object(
+            'id_venta', u.id_venta, 'id_cliente', u.id_cliente, 'fecha', u.fecha, 'monto_total', u.monto_total
+        ) ORDER BY u.fecha DESC, u.id_venta DESC), '[]') AS ultimas_ventas
+        FROM (
+            SELECT id_venta, id_cliente, fecha, monto_total
+            FROM venta
+            WHERE id_cliente = c.id_cliente
+            ORDER BY fecha DESC, id_venta DESC
+            LIMIT %(ventas)s
+        ) u
+    ) v
+    WHERE c.id_cliente = %(id_cliente)s
+""", ejemplo={"id_cliente": 0, "ventas": 1})
 
 # --- Funciones CRUD para Clientes ---
 
 # LEER (Read): Obtener todos los clientes (Sin cambios)
 def get_all_clientes():
     """Obtiene todos los registros de la tabla 'cliente'."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None: return []
-    with conn.cursor() as cur:
-        cur.execute("SELECT id_cliente, nombre, telefono FROM cliente ORDER BY nombre")
-        clientes_rows = cur.fetchall()
-        clientes = [row_to_dict(cur, row) for row in clientes_rows]
-    conn.close()
+    clientes = []
+    try:
+        with conn.cursor() as cur:
+            CLIENTES_TODOS.ejecutar(cur)
+            clientes_rows = cur.fetchall()
+            clientes = [row_to_dict(cur, row) for row in clientes_rows]
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener clientes: {error}")
+    finally:
+        release_db_connection(conn)
     return clientes
 
+# LEER (Read): Obtener una página de clientes
+def get_clientes_pagina(limite: int, desde=None):
+    """
+    Obtiene hasta 'limite' clientes en el orden de get_all_clientes(), a
+    continuación de 'desde' (nombre, id_cliente) de la última fila de la
+    página anterior. Retorna (clientes, (nombre, id_cliente) de su última
+    fila, o None si no quedan más). None si ocurre un error.
+    """
+    conn = get_db_connection(lectura=True)
+    if conn is None: return None
+    try:
+        with conn.cursor() as cur:
+            # Se pide una fila de más para saber si hay página siguiente
+            if desde is None:
+                CLIENTES_PRIMERA_PAGINA.ejecutar(cur, (limite + 1,))
+            else:
+                CLIENTES_PAGINA.ejecutar(cur, (*desde, limite + 1))
+            clientes = [row_to_dict(cur, row) for row in cur.fetchall()]
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener la página de clientes: {error}")
+        return None
+    finally:
+        release_db_connection(conn)
+    if len(clientes) <= limite:
+        return clientes, None
+    clientes = clientes[:limite]
+    return clientes, (clientes[-1]["nombre"], clientes[-1]["id_cliente"])
+
 # LEER (Read): Obtener un solo cliente por su ID (Sin cambios)
 def get_cliente_by_id(cliente_id: int):
     """Obtiene un cliente específico por su 'id_cliente'."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None: return None
-    with conn.cursor() as cur:
-        cur.execute("SELECT id_cliente, nombre, telefono FROM cliente WHERE id_cliente = %s", (cliente_id,))
-        cliente_row = cur.fetchone()
-        cliente = row_to_dict(cur, cliente_row) 
-    conn.close()
+    cliente = None
+    try:
+        with conn.cursor() as cur:
+            CLIENTE_POR_ID.ejecutar(cur, (cliente_id,))
+            cliente_row = cur.fetchone()
+            cliente = row_to_dict(cur, cliente_row) 
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener cliente {cliente_id}: {error}")
+    finally:
+        release_db_connection(conn)
     return cliente
 
+# LEER (Read): Ficha completa de un cliente
+def get_resumen_cliente(cliente_id: int, ventas: int):
+    """
+    Obtiene un cliente con todas sus direcciones, sus acumulados de compras
+    (gasto total, número de compras y fecha de la última) y sus 'ventas'
+    últimas ventas (cabeceras, de la más reciente a la más antigua).
+    Si en Postgres quedan menos ventas del cliente de las pedidas y tiene
+    compras en meses archivados, se completan con las del archivo.
+
+    Returns:
+        dict | None: El resumen, o None si ocurre un error.
+    Raises:
+        ClienteNoEncontrado: si el cliente no existe.
+    """
+    conn = get_db_connection(lectura=True)
+    if conn is None: return None
+    resumen = None
+    try:
+        with conn.cursor() as cur:
+            CLIENTE_RESUMEN.ejecutar(cur, {"id_cliente": cliente_id, "ventas": ventas})
+            resumen_row = cur.fetchone()
+            if resumen_row is None:
+                raise ClienteNoEncontrado(f"Cliente {cliente_id} no encontrado")
+            resumen = row_to_dict(cur, resumen_row)
+    except ClienteNoEncontrado:
+        raise
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener el resumen del cliente {cliente_id}: {error}")
+    finally:
+        release_db_connection(conn)
+    if resumen is None:
+        return None
+
+    ultimas = resumen["ultimas_ventas"]
+    archivados = archivo.meses_archivados()
+    if len(ultimas) < min(ventas, resumen["num_compras"]) and archivados:
+        # Un mes archivado se sirve solo del archivo, aunque sus particiones
+        # sigan en Postgres (el job aún no las ha borrado).
+        ultimas = [venta for venta in ultimas if venta["fecha"][:7] not in archivados]
+        # Los meses se recorren del más reciente al más antiguo y se para en
+        # cuanto hay 'ventas' filas: los anteriores no pueden aportar ninguna
+        # de las últimas, así que no se descomprimen.
+        for clave in sorted(archivados, reverse=True):
+            if len(ultimas) >= ventas:
+                break
+            anio, mes = map(int, clave.split("-"))
+            ultimas += archivo.leer_ventas(
+                date(anio, mes, 1), date(anio, mes, monthrange(anio, mes)[1]), cliente_id
+            )
+        ultimas.sort(key=lambda venta: (str(venta["fecha"]), venta["id_venta"]), reverse=True)
+        resumen["ultimas_ventas"] = ultimas[:ventas]
+    return resumen
+
 # CREAR (Create): Añadir un nuevo cliente (Sin cambios)
 def create_cliente(cliente: ClienteCreate):
     """Inserta un nuevo cliente en la base de datos."""
@@ -40,17 +208,16 @@ def create_cliente(cliente: ClienteCreate):
     if conn is None: return None
     new_cliente = None
     try:
-        with conn.cursor() as cur, conn.transaction():
-            cur.execute(
-                "INSERT INTO cliente (nombre, telefono) VALUES (%s, %s) RETURNING id_cliente, nombre, telefono",
-                (cliente.nombre, cliente.telefono)
-            )
+        with conn.cursor() as cur, transaccion(conn):
+            CLIENTE_CREAR.ejecutar(cur, (cliente.nombre, cliente.telefono))
             new_cliente_row = cur.fetchone()
             if new_cliente_row: new_cliente = row_to_dict(cur, new_cliente_row)
+        if new_cliente:
+            auditoria.registrar("cliente", "crear", new_cliente["id_cliente"], despues=new_cliente)
     except (Exception, psycopg.Error) as error:
         print(f"Error al crear cliente: {error}")
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
     return new_cliente
 
 # --- NUEVA Función ---
@@ -63,45 +230,40 @@ def update_cliente(cliente_id: int, cliente_update: ClienteUpdate):
     conn = get_db_connection()
     if conn is None: return None
 
-    # Construye la parte SET de la consulta dinámicamente
-    update_fields = []
-    update_values = []
-    
     # get_object_vars() funciona con Pydantic v1, model_dump() con v2
     update_data = cliente_update.model_dump(exclude_unset=True) # Pydantic v2
     # update_data = cliente_update.dict(exclude_unset=True) # Pydantic v1
     
-    for key, value in update_data.items():
-        if value is not None: # Asegura no intentar poner NULL si no se envió
-            update_fields.append(f"{key} = %s")
-            update_values.append(value)
+    # Asegura no intentar poner NULL si no se envió
+    update_data = {key: value for key, value in update_data.items() if value is not None}
 
     # Si no hay campos para actualizar, retorna el cliente actual sin cambios
-    if not update_fields:
-        conn.close()
+    if not update_data:
+        release_db_connection(conn)
         return get_cliente_by_id(cliente_id) 
 
-    # Añade el ID del cliente al final de la lista de valores para el WHERE
-    update_values.append(cliente_id)
-
     updated_cliente = None
     try:
-        with conn.cursor() as cur, conn.transaction():
-            # Construye y ejecuta la consulta UPDATE completa
-            query = f"UPDATE cliente SET {', '.join(update_fields)} WHERE id_cliente = %s RETURNING id_cliente, nombre, telefono"
-            cur.execute(query, tuple(update_values))
+        with conn.cursor() as cur, transaccion(conn):
+            # UPDATE canónico: la misma sentencia preparada para cualquier combinación de campos
+            CLIENTE_ACTUALIZAR.ejecutar(cur, parametros_actualizacion(COLUMNAS_CLIENTE, update_data, id=cliente_id))
             
             updated_cliente_row = cur.fetchone()
             # Verifica si la actualización afectó a alguna fila (si el ID existía)
             if updated_cliente_row:
                 updated_cliente = row_to_dict(cur, updated_cliente_row)
             # Commit automático al salir del 'with transaction'
+
+        if updated_cliente:
+            # La sentencia retorna también la fila anterior (para la auditoría)
+            antes = updated_cliente.pop("antes")
+            auditoria.registrar("cliente", "actualizar", cliente_id, antes, updated_cliente)
             
     except (Exception, psycopg.Error) as error:
         print(f"Error al actualizar cliente {cliente_id}: {error}")
         # Rollback automático
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
             
     return updated_cliente # Retorna el cliente actualizado o None si no se encontró/hubo error
 
@@ -122,14 +284,20 @@ def delete_cliente(cliente_id: int):
         return -1 # Indica error de conexión
 
     rows_deleted_code = 0 # Valor por defecto si no se encuentra
+    antes = None
     try:
-        with conn.cursor() as cur, conn.transaction():
-            cur.execute("DELETE FROM cliente WHERE id_cliente = %s", (cliente_id,))
+        with conn.cursor() as cur, transaccion(conn):
+            CLIENTE_ELIMINAR.ejecutar(cur, (cliente_id,))
             rows_deleted_code = cur.rowcount # Será 1 si se borró, 0 si no existía
+            if rows_deleted_code == 1:
+                antes = cur.fetchone()[0] # Fila borrada (para la auditoría)
             if rows_deleted_code == 0:
                  # Si no se borró nada, no es necesario hacer commit/rollback
                  pass # Se retornará 0
             # Commit automático si rowcount fue 1
+
+        if rows_deleted_code == 1:
+            auditoria.registrar("cliente", "eliminar", cliente_id, antes=antes)
             
     except psycopg.errors.ForeignKeyViolation as fk_error:
         # Error específico si el cliente está referenciado (ej. en venta o direccion)
@@ -143,7 +311,45 @@ def delete_cliente(cliente_id: int):
         rows_deleted_code = -1 # Código para error genérico
     finally:
         if conn: 
-            conn.close()
+            release_db_connection(conn)
             
     # Retorna el código numérico resultado de la operación
-    return rows_deleted_code
\ No newline at end of file
+    return rows_deleted_code
+
+# ELIMINAR (Delete): Borrar varios clientes de una vez
+def delete_clientes(ids: list):
+    """
+    Elimina en una transacción todos los clientes de 'ids' que se pueden
+    eliminar, es decir, los que no tienen ventas. Sus direcciones
+    se eliminan en cascada.
+
+    Returns:
+        list | None: [{"id", "estado"}] por cada ID distinto, con estado
+        'eliminado', 'referenciado' o 'no_encontrado'; None si ocurre un error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    resultados = None
+    try:
+        with conn.cursor() as cur_bloqueo, conn.cursor() as cur:
+            # Bloqueo y borrado en un solo viaje (modo pipeline)
+            with transaccion_pipeline(conn):
+                CLIENTES_BLOQUEAR.ejecutar(cur_bloqueo, {"ids": ids})
+                CLIENTES_ELIMINAR.ejecutar(cur, {"ids": ids})
+            resultados = [row_to_dict(cur, row) for row in cur.fetchall()]
+
+        # La fila borrada de cada eliminado solo va a la auditoría
+        for resultado in resultados:
+            antes = resultado.pop("antes")
+            if antes is not None:
+                auditoria.registrar("cliente", "eliminar", resultado["id"], antes=antes)
+
+    except (Exception, psycopg.Error) as error:
+        print(f"Error en el borrado masivo de clientes: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resultados
@@ -1,12 +1,47 @@
 # Importaciones necesarias
-from app.db.database import get_db_connection
+from app.db.database import get_db_connection, release_db_connection, transaccion, transaccion_pipeline
+from app.db.consultas import registro, registrar_actualizacion, parametros_actualizacion
 # Importamos DireccionCreate y DireccionUpdate para validación
 from app.schemas import DireccionCreate, DireccionUpdate 
+from app.auditoria import auditoria
 import psycopg
 
 # Importación de la función auxiliar para conversión de filas
 from .crud_productos import row_to_dict 
 
+# --- Consultas registradas (preparadas una vez por conexión) ---
+DIRECCION_CREAR = registro.registrar("direccion.crear", """
+    INSERT INTO direccion (calle, ciudad, codigo_postal, id_cliente) 
+    VALUES (%s, %s, %s, %s) 
+    RETURNING id_direccion, calle, ciudad, codigo_postal, id_cliente
+""")
+DIRECCIONES_POR_CLIENTE = registro.registrar("direccion.por_cliente", """
+    SELECT id_direccion, calle, ciudad, codigo_postal, id_cliente 
+    FROM direccion 
+    WHERE id_cliente = %s 
+    ORDER BY id_direccion
+""", ejemplo=(0,))
+DIRECCION_POR_ID = registro.registrar(
+    "direccion.por_id",
+    "SELECT id_direccion, calle, ciudad, codigo_postal, id_cliente FROM direccion WHERE id_direccion = %s", ejemplo=(0,)
+)
+COLUMNAS_DIRECCION = {"calle": "varchar", "ciudad": "varchar", "codigo_postal": "varchar"}
+DIRECCION_ACTUALIZAR = registrar_actualizacion(
+    "direccion.actualizar", "direccion", COLUMNAS_DIRECCION,
+    where="id_direccion = %(id_direccion)s AND id_cliente = %(id_cliente)s",
+    returning="id_direccion, calle, ciudad, codigo_postal, id_cliente", clave="id_direccion"
+)
+DIRECCION_ELIMINAR = registro.registrar(
+    "direccion.eliminar",
+    "DELETE FROM direccion WHERE id_direccion = %s AND id_cliente = %s RETURNING to_jsonb(direccion)::text"
+)
+CLIENTE_EXISTE = registro.registrar(
+    "direccion.cliente_existe", "SELECT 1 FROM cliente WHERE id_cliente = %s", ejemplo=(0,)
+)
+
+class ClienteNoEncontrado(Exception):
+    """El cliente indicado en la ruta no existe."""
+
 # --- Funciones CRUD para Direcciones ---
 
 # CREAR (Create): Añadir dirección a un cliente (Sin cambios)
@@ -16,48 +51,36 @@ def create_direccion_for_cliente(cliente_id: int, direccion: DireccionCreate):
     if conn is None: return None
     new_direccion = None
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO direccion (calle, ciudad, codigo_postal, id_cliente) 
-                VALUES (%s, %s, %s, %s) 
-                RETURNING id_direccion, calle, ciudad, codigo_postal, id_cliente
-                """,
-                (direccion.calle, direccion.ciudad, direccion.codigo_postal, cliente_id)
+        with conn.cursor() as cur, transaccion(conn):
+            DIRECCION_CREAR.ejecutar(
+                cur, (direccion.calle, direccion.ciudad, direccion.codigo_postal, cliente_id)
             )
             new_direccion_row = cur.fetchone()
             if new_direccion_row: new_direccion = row_to_dict(cur, new_direccion_row)
-            conn.commit() 
+        if new_direccion:
+            auditoria.registrar("direccion", "crear", new_direccion["id_direccion"], despues=new_direccion)
     except (Exception, psycopg.Error) as error:
         print(f"Error al crear dirección para cliente {cliente_id}: {error}")
         if conn: conn.rollback()
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
     return new_direccion
 
 # LEER (Read): Obtener direcciones de un cliente (Sin cambios)
 def get_direcciones_by_cliente(cliente_id: int):
     """Obtiene todas las direcciones asociadas a un cliente específico."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None: return []
     direcciones = []
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id_direccion, calle, ciudad, codigo_postal, id_cliente 
-                FROM direccion 
-                WHERE id_cliente = %s 
-                ORDER BY id_direccion
-                """, 
-                (cliente_id,)
-            )
+            DIRECCIONES_POR_CLIENTE.ejecutar(cur, (cliente_id,))
             direcciones_rows = cur.fetchall()
             direcciones = [row_to_dict(cur, row) for row in direcciones_rows]
     except (Exception, psycopg.Error) as error:
         print(f"Error al obtener direcciones para cliente {cliente_id}: {error}")
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
     return direcciones
 
 
@@ -66,53 +89,57 @@ def update_direccion(cliente_id: int, direccion_id: int, direccion_update: Direc
     """
     Actualiza una dirección específica perteneciente a un cliente.
     Verifica que la dirección pertenezca al cliente antes de actualizar.
+    La comprobación del cliente y el UPDATE se envían juntos (modo pipeline).
+
+    Raises:
+        ClienteNoEncontrado: si el cliente no existe.
     """
     conn = get_db_connection()
     if conn is None: return None
 
-    update_fields = []
-    update_values = []
     # Pydantic v2: model_dump | Pydantic v1: dict
-    update_data = direccion_update.model_dump(exclude_unset=True) 
-
-    for key, value in update_data.items():
-        if value is not None: 
-            update_fields.append(f"{key} = %s")
-            update_values.append(value)
+    update_data = {
+        key: value for key, value in direccion_update.model_dump(exclude_unset=True).items()
+        if value is not None
+    }
 
-    if not update_fields:
-        conn.close()
+    if not update_data:
+        release_db_connection(conn)
         # Si no hay nada que actualizar, podríamos retornar la dirección actual
         # Necesitaríamos una función get_direccion_by_id(direccion_id)
         return None # O manejarlo de otra forma
 
-    # Añade los IDs para las condiciones WHERE
-    update_values.append(direccion_id)
-    update_values.append(cliente_id) 
-
     updated_direccion = None
     try:
-        with conn.cursor() as cur, conn.transaction():
-            # Construye y ejecuta la consulta UPDATE con doble condición WHERE
-            query = f"""
-                UPDATE direccion 
-                SET {', '.join(update_fields)} 
-                WHERE id_direccion = %s AND id_cliente = %s 
-                RETURNING id_direccion, calle, ciudad, codigo_postal, id_cliente
-            """
-            cur.execute(query, tuple(update_values))
+        with conn.cursor() as cur_cliente, conn.cursor() as cur:
+            # Comprobación del cliente y UPDATE en un solo viaje (modo pipeline).
+            # Si el cliente no existe el UPDATE no encuentra filas, así que no
+            # hace falta esperar a la comprobación para escribir.
+            with transaccion_pipeline(conn):
+                CLIENTE_EXISTE.ejecutar(cur_cliente, (cliente_id,))
+                # UPDATE canónico con doble condición WHERE
+                DIRECCION_ACTUALIZAR.ejecutar(cur, parametros_actualizacion(
+                    COLUMNAS_DIRECCION, update_data, id_direccion=direccion_id, id_cliente=cliente_id
+                ))
+            # Commit ya realizado al salir del bloque
+            if cur_cliente.fetchone() is None:
+                raise ClienteNoEncontrado(f"Cliente {cliente_id} no encontrado")
             
             updated_direccion_row = cur.fetchone()
             # Verifica si se actualizó una fila (si la dirección existe y pertenece al cliente)
             if updated_direccion_row:
                 updated_direccion = row_to_dict(cur, updated_direccion_row)
-            # Commit automático
+                # La sentencia retorna también la fila anterior (para la auditoría)
+                antes = updated_direccion.pop("antes")
+                auditoria.registrar("direccion", "actualizar", direccion_id, antes, updated_direccion)
             
+    except ClienteNoEncontrado:
+        raise
     except (Exception, psycopg.Error) as error:
         print(f"Error al actualizar dirección {direccion_id} para cliente {cliente_id}: {error}")
         # Rollback automático
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
             
     return updated_direccion # Retorna la dirección actualizada o None si no se encontró/error
 
@@ -122,26 +149,36 @@ def delete_direccion(cliente_id: int, direccion_id: int):
     """
     Elimina una dirección específica perteneciente a un cliente.
     Verifica que la dirección pertenezca al cliente antes de eliminar.
+    La comprobación del cliente y el DELETE se envían juntos (modo pipeline).
+
+    Raises:
+        ClienteNoEncontrado: si el cliente no existe.
     """
     conn = get_db_connection()
     if conn is None: return False
 
     rows_deleted = 0
     try:
-        with conn.cursor() as cur, conn.transaction():
-            # Ejecuta DELETE con doble condición WHERE
-            cur.execute(
-                "DELETE FROM direccion WHERE id_direccion = %s AND id_cliente = %s", 
-                (direccion_id, cliente_id)
-            )
+        with conn.cursor() as cur_cliente, conn.cursor() as cur:
+            # Comprobación del cliente y DELETE en un solo viaje (modo pipeline)
+            with transaccion_pipeline(conn):
+                CLIENTE_EXISTE.ejecutar(cur_cliente, (cliente_id,))
+                # Ejecuta DELETE con doble condición WHERE
+                DIRECCION_ELIMINAR.ejecutar(cur, (direccion_id, cliente_id))
+            # Commit ya realizado al salir del bloque
+            if cur_cliente.fetchone() is None:
+                raise ClienteNoEncontrado(f"Cliente {cliente_id} no encontrado")
             rows_deleted = cur.rowcount 
-            # Commit automático
+            if rows_deleted == 1:
+                auditoria.registrar("direccion", "eliminar", direccion_id, antes=cur.fetchone()[0])
             
+    except ClienteNoEncontrado:
+        raise
     except (Exception, psycopg.Error) as error:
         print(f"Error al eliminar dirección {direccion_id} para cliente {cliente_id}: {error}")
         # Rollback automático
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
             
     # Retorna True si se eliminó exactamente una fila
     return rows_deleted == 1 
@@ -149,19 +186,16 @@ def delete_direccion(cliente_id: int, direccion_id: int):
 
 def get_direccion_by_id(direccion_id: int):
     """Obtiene una dirección específica por su 'id_direccion'."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None: return None
     direccion = None
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id_direccion, calle, ciudad, codigo_postal, id_cliente FROM direccion WHERE id_direccion = %s", 
-                (direccion_id,)
-            )
+            DIRECCION_POR_ID.ejecutar(cur, (direccion_id,))
             direccion_row = cur.fetchone()
             direccion = row_to_dict(cur, direccion_row) 
     except (Exception, psycopg.Error) as error:
          print(f"Error al obtener dirección {direccion_id}: {error}")
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
     return direccion
\ No newline at end of file
@@ -0,0 +1,195 @@
+# Importaciones necesarias
+from app.db.database import get_db_connection, release_db_connection, transaccion
+from app.auditoria import auditoria
+import codecs
+import csv
+import json
+import psycopg
+
+# --- Importación masiva de clientes y direcciones ---
+# Cada registro de entrada es una fila plana con los datos del cliente y,
+# opcionalmente, una dirección. Un cliente con varias direcciones aparece en
+# varias filas con la misma 'clave_externa'.
+
+COLUMNAS_IMPORTACION = ("clave_externa", "nombre", "telefono", "calle", "ciudad", "codigo_postal")
+
+class ArchivoDemasiadoGrande(Exception):
+    """El cuerpo de la importación supera el tamaño máximo admitido."""
+
+def lineas_del_cuerpo(trozos, max_bytes: int):
+    """
+    Convierte los trozos de bytes del cuerpo en líneas de texto UTF-8 a medida
+    que llegan, sin tener el archivo entero en memoria. Cada línea conserva su
+    salto de línea para que el lector CSV una los campos entre comillas que
+    contienen saltos de línea (solo se corta en '\n', no en los demás
+    separadores que reconoce str.splitlines()).
+
+    Raises:
+        ArchivoDemasiadoGrande: si se leen más de 'max_bytes'.
+        UnicodeDecodeError: si el cuerpo no es UTF-8 válido.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    leidos = 0
+    pendiente = ""
+    for trozo in trozos:
+        leidos += len(trozo)
+        if leidos > max_bytes:
+            raise ArchivoDemasiadoGrande(f"El archivo supera {max_bytes} bytes")
+        pendiente += decodificador.decode(trozo)
+        *lineas, pendiente = pendiente.split("\n")
+        for linea in lineas:
+            yield linea + "\n"
+    pendiente += decodificador.decode(b"", final=True)
+    if pendiente:
+        yield pendiente
+
+def _leer_registros(lineas, formato: str, rechazos: list):
+    """
+    Genera tuplas (linea, valores) a partir de líneas CSV (con cabecera) o NDJSON.
+    Las líneas que no se pueden interpretar se añaden a 'rechazos'.
+    """
+    if formato == "csv":
+        lector = csv.DictReader(lineas)
+        for registro in lector:
+            yield lector.line_num, tuple(
+                (registro.get(col) or "").strip() or None for col in COLUMNAS_IMPORTACION
+            )
+        return
+
+    for numero, linea in enumerate(lineas, start=1):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+            if not isinstance(registro, dict):
+                raise ValueError("se esperaba un objeto JSON")
+        except ValueError as error:
+            rechazos.append({"linea": numero, "clave_externa": None, "motivo": f"JSON inválido: {error}"})
+            continue
+        yield numero, tuple(
+            None if registro.get(col) in (None, "") else str(registro.get(col)).strip()
+            for col in COLUMNAS_IMPORTACION
+        )
+
+def importar_clientes(lineas, formato: str):
+    """
+    Importa (inserta o actualiza) clientes y sus direcciones en bloque.
+
+    Las filas se envían con COPY a una tabla temporal, se validan en SQL y se
+    fusionan de forma conjunta: clientes con INSERT ... ON CONFLICT sobre
+    'clave_externa' (gana la última fila de cada clave) y direcciones nuevas
+    asociadas por esa misma clave, sin duplicar las que ya existen.
+    Todo ocurre en una única transacción y una única conexión. Las líneas se
+    consumen a medida que se copian, así que pueden venir de un flujo (ver
+    lineas_del_cuerpo); si su lectura falla no se importa nada.
+
+    Args:
+        lineas: Iterable de líneas de texto con su salto de línea (CSV con
+            cabecera o NDJSON).
+        formato (str): 'csv' o 'ndjson'.
+
+    Returns:
+        dict | None: Resumen con contadores y rechazos por fila, o None si hubo un error.
+    Raises:
+        ArchivoDemasiadoGrande, UnicodeDecodeError: los de la lectura de 'lineas'.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    rechazos = []
+    resumen = None
+    try:
+        with conn.cursor() as cur, transaccion(conn):
+            cur.execute("""
+                CREATE TEMP TABLE importacion_cliente (
+                    linea INT, clave_externa TEXT, nombre TEXT, telefono TEXT,
+                    calle TEXT, ciudad TEXT, codigo_postal TEXT, motivo TEXT
+                ) ON COMMIT DROP
+            """)
+            filas = 0
+            with cur.copy(
+                "COPY importacion_cliente (linea, clave_externa, nombre, telefono, calle, ciudad, codigo_postal) FROM STDIN"
+            ) as copy:
+                for linea, valores in _leer_registros(lineas, formato, rechazos):
+                    copy.write_row((linea, *valores))
+                    filas += 1
+            rechazos_lectura = len(rechazos) # Líneas que ni siquiera se pudieron leer
+
+            # 1. Validación conjunta: cada fila inválida recibe su motivo
+            cur.execute("""
+                UPDATE importacion_cliente SET motivo = CASE
+                    WHEN clave_externa IS NULL THEN 'clave_externa es obligatoria'
+                    WHEN length(clave_externa) > 64 THEN 'clave_externa supera 64 caracteres'
+                    WHEN nombre IS NULL THEN 'nombre es obligatorio'
+                    WHEN length(nombre) > 100 THEN 'nombre supera 100 caracteres'
+                    WHEN length(telefono) > 15 THEN 'telefono supera 15 caracteres'
+                    WHEN num_nulls(calle, ciudad, codigo_postal) NOT IN (0, 3)
+                        THEN 'dirección incompleta (calle, ciudad y codigo_postal)'
+                    WHEN length(calle) > 255 THEN 'calle supera 255 caracteres'
+                    WHEN length(ciudad) > 100 THEN 'ciudad supera 100 caracteres'
+                    WHEN length(codigo_postal) > 10 THEN 'codigo_postal supera 10 caracteres'
+                END
+            """)
+            cur.execute("""
+                SELECT linea, clave_externa, motivo FROM importacion_cliente
+                WHERE motivo IS NOT NULL ORDER BY linea
+            """)
+            rechazos.extend(
+                {"linea": linea, "clave_externa": clave, "motivo": motivo}
+                for linea, clave, motivo in cur.fetchall()
+            )
+
+            # 2. Clientes: inserta o actualiza por clave externa (gana la última fila)
+            cur.execute("""
+                INSERT INTO cliente (clave_externa, nombre, telefono)
+                SELECT DISTINCT ON (clave_externa) clave_externa, nombre, telefono
+                FROM importacion_cliente
+                WHERE motivo IS NULL
+                ORDER BY clave_externa, linea DESC
+                ON CONFLICT (clave_externa) DO UPDATE
+                    SET nombre = EXCLUDED.nombre, telefono = EXCLUDED.telefono
+                    WHERE (cliente.nombre, cliente.telefono) IS DISTINCT FROM (EXCLUDED.nombre, EXCLUDED.telefono)
+                RETURNING (xmax = 0) AS insertado
+            """)
+            resultados_clientes = [row[0] for row in cur.fetchall()]
+
+            # 3. Direcciones: se vinculan por clave externa y solo se añaden las nuevas
+            cur.execute("""
+                INSERT INTO direccion (calle, ciudad, codigo_postal, id_cliente)
+                SELECT DISTINCT i.calle, i.ciudad, i.codigo_postal, c.id_cliente
+                FROM importacion_cliente i
+                JOIN cliente c ON c.clave_externa = i.clave_externa
+                WHERE i.motivo IS NULL AND i.calle IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM direccion d
+                      WHERE d.id_cliente = c.id_cliente AND d.calle = i.calle
+                        AND d.ciudad = i.ciudad AND d.codigo_postal = i.codigo_postal
+                  )
+            """)
+            direcciones_insertadas = cur.rowcount
+
+            resumen = {
+                "filas_procesadas": filas + rechazos_lectura,
+                "clientes_insertados": sum(1 for insertado in resultados_clientes if insertado),
+                "clientes_actualizados": sum(1 for insertado in resultados_clientes if not insertado),
+                "direcciones_insertadas": direcciones_insertadas,
+                "rechazos": sorted(rechazos, key=lambda r: r["linea"]),
+            }
+            # Commit automático al salir del 'with transaction'
+
+        # Un solo evento con los contadores: la importación puede tocar miles de clientes
+        auditoria.registrar("cliente", "importar", despues={
+            clave: valor for clave, valor in resumen.items() if clave != "rechazos"
+        })
+
+    except (ArchivoDemasiadoGrande, UnicodeDecodeError):
+        raise
+    except (Exception, psycopg.Error) as error:
+        print(f"Error durante la importación de clientes: {error}")
+        resumen = None
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resumen
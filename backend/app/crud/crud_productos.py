@@ -1,7 +1,11 @@
 # Importaciones necesarias
-from app.db.database import get_db_connection
+from app.db.database import get_db_connection, release_db_connection, transaccion, transaccion_pipeline
 # Importamos schemas relevantes para productos
-from app.schemas import ProductoUpdate 
+from app.schemas import ProductoUpdate, AjusteMasivo
+from app.cache.catalogo import cache_catalogo, cache_stock, espacio_relacionados
+from app.auditoria import auditoria
+from app.db.consultas import registro, registrar_actualizacion, parametros_actualizacion, registrar_borrado_masivo
+import asyncio
 import psycopg
 
 # --- Función Auxiliar ---
@@ -13,35 +17,200 @@ def row_to_dict(cursor, row):
     column_names = [desc[0] for desc in cursor.description]
     return dict(zip(column_names, row))
 
+# --- Consultas registradas (preparadas una vez por conexión) ---
+# Hacemos JOINs con las tablas de subtipo para identificar el tipo
+# Usamos LEFT JOIN para incluir productos que podrían no estar (incorrectamente) en ninguna subtipo
+PRODUCTOS_TODOS = registro.registrar("producto.todos", """
+    SELECT 
+        p.id_producto, p.nombre, p.descripcion, p.precio, p.cantidad_stock, p.id_proveedor,
+        CASE 
+            WHEN r.id_producto IS NOT NULL THEN 'ropa'
+            WHEN c.id_producto IS NOT NULL THEN 'calzado'
+            WHEN a.id_producto IS NOT NULL THEN 'accesorios'
+            ELSE 'desconocido' 
+        END AS tipo_producto
+    FROM producto p
+    LEFT JOIN ropa r ON p.id_producto = r.id_producto
+    LEFT JOIN calzado c ON p.id_producto = c.id_producto
+    LEFT JOIN accesorios a ON p.id_producto = a.id_producto
+    ORDER BY p.nombre, p.id_producto
+""")
+PRODUCTO_POR_ID = registro.registrar("producto.por_id", """
+    SELECT id_producto, nombre, descripcion, precio, cantidad_stock, id_proveedor 
+    FROM producto WHERE id_producto = %s
+""", ejemplo=(0,))
+ROPA_POR_ID = registro.registrar(
+    "producto.ropa_por_id", "SELECT material, tipo_corte, talla FROM ropa WHERE id_producto = %s", ejemplo=(0,)
+)
+CALZADO_POR_ID = registro.registrar(
+    "producto.calzado_por_id", "SELECT talla_numerica, material_suela FROM calzado WHERE id_producto = %s", ejemplo=(0,)
+)
+ACCESORIOS_POR_ID = registro.registrar(
+    "producto.accesorios_por_id", "SELECT material, dimensiones FROM accesorios WHERE id_producto = %s", ejemplo=(0,)
+)
+COLUMNAS_PRODUCTO = {
+    "nombre": "varchar", "descripcion": "text", "precio": "numeric",
+    "cantidad_stock": "int", "id_proveedor": "int",
+}
+# El stock nuevo se fija con fijar_stock(), que lo reparte entre los shards
+# de un producto particionado aunque coincida con el valor (desfasado) de la
+# columna. Si no se fija, se pone al día con la suma de sus shards (ver
+# stock_particionado() en database/schema.sql): la columna no queda desfasada
+# y el trigger no tiene nada que repartir.
+PRODUCTO_ACTUALIZAR = registrar_actualizacion(
+    "producto.actualizar", "producto", COLUMNAS_PRODUCTO,
+    where="id_producto = %(id)s",
+    returning="id_producto, nombre, descripcion, precio, cantidad_stock, id_proveedor", clave="id_producto",
+    vigentes={"cantidad_stock": "COALESCE(stock_particionado(producto.id_producto), producto.cantidad_stock)"},
+    asignar={"cantidad_stock": "fijar_stock(antes.id_producto, {valor})"},
+)
+ROPA_ELIMINAR = registro.registrar("producto.eliminar_ropa", "DELETE FROM ropa WHERE id_producto = %s")
+CALZADO_ELIMINAR = registro.registrar("producto.eliminar_calzado", "DELETE FROM calzado WHERE id_producto = %s")
+ACCESORIOS_ELIMINAR = registro.registrar("producto.eliminar_accesorios", "DELETE FROM accesorios WHERE id_producto = %s")
+PRODUCTO_ELIMINAR = registro.registrar(
+    "producto.eliminar", "DELETE FROM producto WHERE id_producto = %s RETURNING to_jsonb(producto)::text"
+)
+# Subtipos, shards y pronóstico se borran en cascada; las ventas lo impiden
+PRODUCTOS_BLOQUEAR, PRODUCTOS_ELIMINAR = registrar_borrado_masivo(
+    "producto.eliminar_varios", "producto", "id_producto", {"detalle_venta": "id_producto"}
+)
+# Stock vigente de todos los productos: la suma de shards de los particionados
+STOCK_VIGENTE = registro.registrar("producto.stock_vigente", """
+    SELECT p.id_producto, COALESCE(s.total, p.cantidad_stock)
+    FROM producto p
+    LEFT JOIN (SELECT id_producto, sum(cantidad)::int AS total FROM producto_stock_shard GROUP BY id_producto) s
+        USING (id_producto)
+""")
+PRODUCTO_PARTICIONAR_STOCK = registro.registrar(
+    "producto.particionar_stock", "SELECT particionar_stock(%s::int, %s::int)"
+)
+# Ajuste masivo: un solo UPDATE para todos los productos que cumplen el filtro.
+# Cada criterio es opcional (NULL = no filtra), así la sentencia preparada es
+# siempre la misma. La subconsulta bloquea las filas y retorna sus valores
+# anteriores (para la auditoría); el stock de los particionados es la suma de
+# sus shards, también bloqueados. El nuevo stock se reparte entre los shards
+# en la misma sentencia con fijar_stock(), sin depender del trigger, y el de
+# los productos que solo cambian de precio se pone al día con esa suma.
+FILTRO_AJUSTE = """
+    (%(id_proveedor)s::int IS NULL OR p.id_proveedor = %(id_proveedor)s::int)
+    AND (%(tipo_producto)s::text IS NULL
+         OR (%(tipo_producto)s::text = 'ropa' AND EXISTS (SELECT 1 FROM ropa r WHERE r.id_producto = p.id_producto))
+         OR (%(tipo_producto)s::text = 'calzado' AND EXISTS (SELECT 1 FROM calzado c WHERE c.id_producto = p.id_producto))
+         OR (%(tipo_producto)s::text = 'accesorios' AND EXISTS (SELECT 1 FROM accesorios a WHERE a.id_producto = p.id_producto)))
+    AND (%(precio_min)s::numeric IS NULL OR p.precio >= %(precio_min)s::numeric)
+    AND (%(precio_max)s::numeric IS NULL OR p.precio <= %(precio_max)s::numeric)
+    AND (%(ids)s::int[] IS NULL OR p.id_producto = ANY(%(ids)s::int[]))
+"""
+# Stock que un ajuste de stock dejaría en negativo y se recorta a 0
+STOCK_RECORTADO = "%(operacion)s::text = 'stock' AND {stock} + %(valor)s::numeric < 0"
+PRODUCTOS_AJUSTE_CONTAR = registro.registrar("producto.ajuste_contar", f"""
+    SELECT count(*),
+           count(*) FILTER (WHERE {STOCK_RECORTADO.format(stock="COALESCE(stock_particionado(p.id_producto), p.cantidad_stock)")})
+    FROM producto p WHERE {FILTRO_AJUSTE}
+""")
+PRODUCTOS_AJUSTAR = registro.registrar("producto.ajustar", f"""
+    UPDATE producto SET
+        precio = CASE %(operacion)s::text
+            WHEN 'precio' THEN %(valor)s::numeric
+            WHEN 'porcentaje' THEN round(antes.precio * (1 + %(valor)s::numeric / 100), 2)
+            ELSE producto.precio END,
+        cantidad_stock = CASE %(operacion)s::text
+            WHEN 'stock' THEN fijar_stock(antes.id_producto, GREATEST(antes.cantidad_stock + %(valor)s::numeric, 0)::int)
+            ELSE antes.cantidad_stock END
+    FROM (
+        SELECT p.id_producto, p.precio, COALESCE(stock_particionado(p.id_producto), p.cantidad_stock) AS cantidad_stock
+        FROM producto p WHERE {FILTRO_AJUSTE}
+        FOR UPDATE OF p
+    ) AS antes
+    WHERE producto.id_producto = antes.id_producto
+    RETURNING producto.id_producto, producto.nombre, producto.descripcion, producto.precio,
+              producto.cantidad_stock, producto.id_proveedor,
+              antes.precio AS precio_antes, antes.cantidad_stock AS stock_antes,
+              {STOCK_RECORTADO.format(stock="antes.cantidad_stock")} AS recortado
+""")
+# Top-K precalculado de productos comprados juntos (ver app/recomendaciones.py)
+PRODUCTO_RELACIONADOS = registro.registrar(
+    "producto.relacionados",
+    "SELECT id_relacionado FROM producto_relacionado WHERE id_producto = %s ORDER BY posicion",
+    ejemplo=(0,)
+)
+
 # --- Funciones CRUD para Productos ---
 
 # LEER (Read): Obtener todos los productos (Modificada para incluir tipo)
 def get_all_productos():
+    """Obtiene todos los productos, desde la caché del catálogo si está vigente."""
+    productos = cache_catalogo.obtener("catalogo", "productos", _consultar_productos)
+    if productos is None:
+        return []
+    totales = get_stock_vigente()
+    for producto in productos:
+        _aplicar_stock(producto, totales)
+    return productos
+
+async def get_all_productos_async():
+    """
+    Igual que get_all_productos(), para endpoints async. Ante una avalancha de
+    peticiones con la caché vacía, una sola consulta a la base y las demás
+    esperan su resultado en el event loop, sin ocupar hilos.
+    """
+    productos = await cache_catalogo.obtener_async("catalogo", "productos", _consultar_productos)
+    if productos is None:
+        return []
+    totales = await get_stock_vigente_async()
+    for producto in productos:
+        _aplicar_stock(producto, totales)
+    return productos
+
+async def get_productos_pagina_async(limite: int, desde=None):
+    """
+    Una página del catálogo, en el orden de get_all_productos() y servida desde
+    la misma caché. 'desde' es (posición, id_producto) de la última fila de la
+    página anterior. Retorna (productos, (posición, id_producto) de su última
+    fila, o None si no quedan más), o None si falla la lectura del catálogo o
+    de su stock.
+    """
+    productos = await cache_catalogo.obtener_async("catalogo", "productos", _consultar_productos)
+    if productos is None:
+        return None
+    inicio = _posicion_siguiente(productos, desde)
+    pagina = productos[inicio:inicio + limite]
+    totales = await cache_stock.obtener_async("stock", "totales", _consultar_stock_vigente)
+    if totales is None:
+        return None
+    for producto in pagina:
+        _aplicar_stock(producto, totales)
+    fin = inicio + len(pagina)
+    siguiente = (fin - 1, pagina[-1]["id_producto"]) if fin < len(productos) else None
+    return pagina, siguiente
+
+def _posicion_siguiente(productos: list, desde) -> int:
+    """
+    Índice de la fila que sigue a 'desde' en el catálogo. Si el catálogo no
+    cambió entre páginas basta con la posición; si cambió, se busca la fila
+    por id, y si además se borró se sigue desde su antigua posición (las
+    filas posteriores se desplazaron una hacia atrás).
+    """
+    if desde is None:
+        return 0
+    posicion, id_producto = desde
+    if 0 <= posicion < len(productos) and productos[posicion]["id_producto"] == id_producto:
+        return posicion + 1
+    for indice, producto in enumerate(productos):
+        if producto["id_producto"] == id_producto:
+            return indice + 1
+    return min(max(posicion, 0), len(productos))
+
+def _consultar_productos():
     """Obtiene todos los productos de la tabla 'producto', determinando su tipo."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None:
-        return [] 
+        return None 
         
-    productos = []
+    productos = None
     try:
         with conn.cursor() as cur:
-            # Hacemos JOINs con las tablas de subtipo para identificar el tipo
-            # Usamos LEFT JOIN para incluir productos que podrían no estar (incorrectamente) en ninguna subtipo
-            cur.execute("""
-                SELECT 
-                    p.id_producto, p.nombre, p.descripcion, p.precio, p.cantidad_stock, p.id_proveedor,
-                    CASE 
-                        WHEN r.id_producto IS NOT NULL THEN 'ropa'
-                        WHEN c.id_producto IS NOT NULL THEN 'calzado'
-                        WHEN a.id_producto IS NOT NULL THEN 'accesorios'
-                        ELSE 'desconocido' 
-                    END AS tipo_producto
-                FROM producto p
-                LEFT JOIN ropa r ON p.id_producto = r.id_producto
-                LEFT JOIN calzado c ON p.id_producto = c.id_producto
-                LEFT JOIN accesorios a ON p.id_producto = a.id_producto
-                ORDER BY p.nombre
-            """)
+            PRODUCTOS_TODOS.ejecutar(cur)
             productos_rows = cur.fetchall()
             productos = [row_to_dict(cur, row) for row in productos_rows]
             
@@ -49,17 +218,35 @@ def get_all_productos():
         print(f"Error al obtener todos los productos: {error}")
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             
     return productos
 
 # LEER (Read): Obtener un solo producto por ID (Modificada para incluir detalles de subtipo)
 def get_producto_by_id(producto_id: int):
+    """Obtiene un producto por su ID, desde la caché del catálogo si está vigente."""
+    producto = cache_catalogo.obtener(
+        "catalogo", f"producto:{producto_id}", lambda: _consultar_producto(producto_id)
+    )
+    if producto is not None:
+        _aplicar_stock(producto, get_stock_vigente())
+    return producto
+
+async def get_producto_by_id_async(producto_id: int):
+    """Igual que get_producto_by_id(), para endpoints async."""
+    producto = await cache_catalogo.obtener_async(
+        "catalogo", f"producto:{producto_id}", lambda: _consultar_producto(producto_id)
+    )
+    if producto is not None:
+        _aplicar_stock(producto, await get_stock_vigente_async())
+    return producto
+
+def _consultar_producto(producto_id: int):
     """
     Obtiene un producto específico por su 'id_producto', incluyendo 
     los detalles de su tabla de subtipo correspondiente (ropa, calzado, accesorios).
     """
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None:
         return None 
         
@@ -67,10 +254,7 @@ def get_producto_by_id(producto_id: int):
     try:
         with conn.cursor() as cur:
             # Primero, obtener los datos base del producto
-            cur.execute("""
-                SELECT id_producto, nombre, descripcion, precio, cantidad_stock, id_proveedor 
-                FROM producto WHERE id_producto = %s
-                """, (producto_id,))
+            PRODUCTO_POR_ID.ejecutar(cur, (producto_id,))
             producto_row = cur.fetchone()
 
             if producto_row:
@@ -78,21 +262,21 @@ def get_producto_by_id(producto_id: int):
                 
                 # Ahora, buscar en las tablas de subtipos
                 # Ropa
-                cur.execute("SELECT material, tipo_corte, talla FROM ropa WHERE id_producto = %s", (producto_id,))
+                ROPA_POR_ID.ejecutar(cur, (producto_id,))
                 ropa_row = cur.fetchone()
                 if ropa_row:
                     producto['detalles_subtipo'] = row_to_dict(cur, ropa_row)
                     producto['tipo_producto'] = 'ropa' # Añadir tipo para claridad
                 else:
                     # Calzado
-                    cur.execute("SELECT talla_numerica, material_suela FROM calzado WHERE id_producto = %s", (producto_id,))
+                    CALZADO_POR_ID.ejecutar(cur, (producto_id,))
                     calzado_row = cur.fetchone()
                     if calzado_row:
                         producto['detalles_subtipo'] = row_to_dict(cur, calzado_row)
                         producto['tipo_producto'] = 'calzado'
                     else:
                         # Accesorios
-                        cur.execute("SELECT material, dimensiones FROM accesorios WHERE id_producto = %s", (producto_id,))
+                        ACCESORIOS_POR_ID.ejecutar(cur, (producto_id,))
                         accesorios_row = cur.fetchone()
                         if accesorios_row:
                             producto['detalles_subtipo'] = row_to_dict(cur, accesorios_row)
@@ -103,10 +287,46 @@ def get_producto_by_id(producto_id: int):
          producto = None # Asegura retornar None en caso de error
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             
     return producto
 
+# LEER (Read): Productos comprados junto con uno dado
+async def get_relacionados_async(producto_id: int, limite: int):
+    """
+    Obtiene los productos que más veces se compraron junto con 'producto_id'
+    (como mucho 'limite'), de más a menos frecuente. Los IDs salen de la caché
+    de relacionados (ver espacio_relacionados) y cada producto de la del
+    catálogo, así que precio y stock son los vigentes; los que ya no existen
+    se omiten.
+    Retorna None si ocurre un error.
+    """
+    ids = await cache_catalogo.obtener_async(
+        espacio_relacionados(producto_id), f"producto:{producto_id}", lambda: _consultar_relacionados(producto_id)
+    )
+    if ids is None:
+        return None
+    productos = await asyncio.gather(*(get_producto_by_id_async(id_relacionado) for id_relacionado in ids[:limite]))
+    return [producto for producto in productos if producto is not None]
+
+def _consultar_relacionados(producto_id: int):
+    """Obtiene los IDs del top-K de productos relacionados, en orden."""
+    conn = get_db_connection(lectura=True)
+    if conn is None:
+        return None
+
+    ids = None
+    try:
+        with conn.cursor() as cur:
+            PRODUCTO_RELACIONADOS.ejecutar(cur, (producto_id,))
+            ids = [row[0] for row in cur.fetchall()]
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener los productos relacionados con {producto_id}: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+    return ids
+
 # --- NUEVA Función ---
 # ACTUALIZAR (Update): Modificar un producto existente (solo tabla base 'producto')
 def update_producto(producto_id: int, producto_update: ProductoUpdate):
@@ -118,31 +338,18 @@ def update_producto(producto_id: int, producto_update: ProductoUpdate):
     if conn is None: 
         return None
 
-    update_fields = []
-    update_values = []
     # Pydantic v2: model_dump | Pydantic v1: dict
     update_data = producto_update.model_dump(exclude_unset=True) 
 
     if not update_data: # Si no hay datos para actualizar
-        conn.close()
+        release_db_connection(conn)
         return get_producto_by_id(producto_id) # Retorna el registro actual
 
-    for key, value in update_data.items():
-        update_fields.append(f"{key} = %s")
-        update_values.append(value)
-
-    update_values.append(producto_id) # ID para la cláusula WHERE
-    
     updated_producto_base = None
     try:
-        with conn.cursor() as cur, conn.transaction(): 
-            query = f"""
-                UPDATE producto 
-                SET {', '.join(update_fields)} 
-                WHERE id_producto = %s 
-                RETURNING id_producto, nombre, descripcion, precio, cantidad_stock, id_proveedor
-                """
-            cur.execute(query, tuple(update_values))
+        with conn.cursor() as cur, transaccion(conn): 
+            # UPDATE canónico: la misma sentencia preparada para cualquier combinación de campos
+            PRODUCTO_ACTUALIZAR.ejecutar(cur, parametros_actualizacion(COLUMNAS_PRODUCTO, update_data, id=producto_id))
             
             updated_row = cur.fetchone()
             if updated_row:
@@ -151,18 +358,93 @@ def update_producto(producto_id: int, producto_update: ProductoUpdate):
                 # Opcional: Podríamos aquí volver a llamar a get_producto_by_id para retornar 
                 # el objeto completo con detalles de subtipo, pero es menos eficiente.
             # Commit automático
+
+        if updated_producto_base:
+            # Invalida la caché local de inmediato; el resto de workers se entera
+            # por la notificación que emite el trigger al confirmar.
+            cache_catalogo.invalidar("catalogo")
+            if "cantidad_stock" in update_data:
+                cache_stock.invalidar("stock") # fijar_stock() lo repartió entre los shards
+            # La sentencia retorna también la fila anterior (para la auditoría)
+            antes = updated_producto_base.pop("antes")
+            auditoria.registrar("producto", "actualizar", producto_id, antes, updated_producto_base)
             
     except (Exception, psycopg.Error) as error:
         print(f"Error al actualizar producto {producto_id}: {error}")
         # Rollback automático
     finally:
         if conn: 
-            conn.close()
+            release_db_connection(conn)
             
     # Retornamos solo los datos base actualizados o None si falló/no existía
     # Si se necesita el objeto completo, se puede llamar a get_producto_by_id desde el router
     return updated_producto_base 
 
+# ACTUALIZAR (Update): Ajuste masivo de precio o stock
+class AjusteFueraDeRango(Exception):
+    """El ajuste masivo deja algún precio o stock fuera del rango de su columna."""
+
+def ajustar_productos(ajuste: AjusteMasivo):
+    """
+    Aplica la operación de 'ajuste' a todos los productos que cumplen su filtro
+    con un solo UPDATE: fijar el precio ('precio'), cambiarlo en un porcentaje
+    ('porcentaje', redondeado a céntimos) o sumar unidades al stock ('stock',
+    sin bajar de 0). Con 'simulacion' solo cuenta los productos afectados.
+
+    Returns:
+        dict | None: {"afectados", "recortados", "productos"} (productos
+        actualizados, vacío en la simulación; 'recortados' son los que se
+        quedaron en 0 en lugar de en negativo), o None si ocurre un error.
+    Raises:
+        AjusteFueraDeRango: si algún precio o stock nuevo no cabe en su
+        columna (el ajuste se deshace entero).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    filtro = ajuste.filtro
+    params = {
+        "id_proveedor": filtro.id_proveedor, "tipo_producto": filtro.tipo_producto,
+        "precio_min": filtro.precio_min, "precio_max": filtro.precio_max, "ids": filtro.ids,
+        "operacion": ajuste.operacion, "valor": ajuste.valor,
+    }
+    resultado = None
+    try:
+        with conn.cursor() as cur, transaccion(conn):
+            if ajuste.simulacion:
+                PRODUCTOS_AJUSTE_CONTAR.ejecutar(cur, params)
+                afectados, recortados = cur.fetchone()
+                resultado = {"afectados": afectados, "recortados": recortados, "productos": []}
+            else:
+                PRODUCTOS_AJUSTAR.ejecutar(cur, params)
+                productos = [row_to_dict(cur, row) for row in cur.fetchall()]
+                recortados = sum(producto.pop("recortado") for producto in productos)
+                resultado = {"afectados": len(productos), "recortados": recortados, "productos": productos}
+
+        if not ajuste.simulacion and resultado["afectados"]:
+            # Una invalidación para todo el lote; Postgres agrupa los avisos del trigger en uno por transacción
+            cache_catalogo.invalidar("catalogo")
+            if ajuste.operacion == "stock":
+                cache_stock.invalidar("stock")
+            # Un evento por producto, solo con los campos que cambia el ajuste
+            for producto in resultado["productos"]:
+                auditoria.registrar(
+                    "producto", "ajuste_masivo", producto["id_producto"],
+                    {"precio": producto.pop("precio_antes"), "cantidad_stock": producto.pop("stock_antes")},
+                    {"precio": producto["precio"], "cantidad_stock": producto["cantidad_stock"]},
+                )
+    except psycopg.errors.NumericValueOutOfRange as error:
+        raise AjusteFueraDeRango(f"El ajuste deja algún precio o stock fuera de rango: {error.diag.message_primary}")
+    except (Exception, psycopg.Error) as error:
+        print(f"Error en el ajuste masivo de productos: {error}")
+        resultado = None
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resultado
+
 # --- NUEVA Función ---
 # ELIMINAR (Delete): Borrar un producto existente (manejo de herencia)
 def delete_producto(producto_id: int):
@@ -180,24 +462,28 @@ def delete_producto(producto_id: int):
         return False
 
     rows_deleted_total = 0
+    antes = None
     try:
-        with conn.cursor() as cur, conn.transaction(): 
-            # 1. Eliminar de la tabla de subtipo (ignorará si no existe en una tabla específica)
-            # Como la FK en subtipos tiene ON DELETE CASCADE, podríamos omitir estos DELETEs
-            # si confiamos en la cascada, pero hacerlo explícito puede ser más claro.
-            cur.execute("DELETE FROM ropa WHERE id_producto = %s", (producto_id,))
-            cur.execute("DELETE FROM calzado WHERE id_producto = %s", (producto_id,))
-            cur.execute("DELETE FROM accesorios WHERE id_producto = %s", (producto_id,))
-
-            # 2. Eliminar de la tabla principal 'producto'
-            cur.execute("DELETE FROM producto WHERE id_producto = %s", (producto_id,))
-            rows_deleted_total = cur.rowcount # Verifica si se eliminó de la tabla 'producto'
-            
-            # Si rowcount es 0, el producto no existía en 'producto', forzamos rollback
-            if rows_deleted_total == 0:
-                raise psycopg.Error(f"Producto con ID {producto_id} no encontrado en tabla 'producto'.")
+        with conn.cursor() as cur:
+            # Los cuatro DELETE se envían juntos (modo pipeline) y se confirman en un solo viaje
+            with transaccion_pipeline(conn):
+                # 1. Eliminar de la tabla de subtipo (ignorará si no existe en una tabla específica)
+                # Como la FK en subtipos tiene ON DELETE CASCADE, podríamos omitir estos DELETEs
+                # si confiamos en la cascada, pero hacerlo explícito puede ser más claro.
+                ROPA_ELIMINAR.ejecutar(cur, (producto_id,))
+                CALZADO_ELIMINAR.ejecutar(cur, (producto_id,))
+                ACCESORIOS_ELIMINAR.ejecutar(cur, (producto_id,))
+
+                # 2. Eliminar de la tabla principal 'producto'
+                PRODUCTO_ELIMINAR.ejecutar(cur, (producto_id,))
+            # Si hubo un error de FK se lanza al salir del bloque (y todo se deshace)
+            rows_deleted_total = cur.rowcount # Filas eliminadas de la tabla 'producto' (0 si no existía)
+            if rows_deleted_total:
+                antes = cur.fetchone()[0] # Fila borrada (para la auditoría)
 
-            # Commit automático si no hubo excepciones
+        if rows_deleted_total:
+            cache_catalogo.invalidar("catalogo")
+            auditoria.registrar("producto", "eliminar", producto_id, antes=antes)
             
     except psycopg.errors.ForeignKeyViolation as fk_error:
         # Error específico si el producto está siendo referenciado (ej. en detalle_venta)
@@ -211,7 +497,121 @@ def delete_producto(producto_id: int):
         rows_deleted_total = -1 # Código de error genérico
     finally:
         if conn: 
-            conn.close()
+            release_db_connection(conn)
             
     # Retorna True solo si se eliminó exactamente una fila de la tabla 'producto'
-    return rows_deleted_total # Retorna el número directamente (0, 1, -1, -2)
\ No newline at end of file
+    return rows_deleted_total # Retorna el número directamente (0, 1, -1, -2)
+
+# ELIMINAR (Delete): Borrar varios productos de una vez
+def delete_productos(ids: list):
+    """
+    Elimina en una transacción todos los productos de 'ids' que se pueden
+    eliminar, es decir, los que no aparecen en ninguna venta. Sus
+    registros de subtipo se eliminan en cascada.
+
+    Returns:
+        list | None: [{"id", "estado"}] por cada ID distinto, con estado
+        'eliminado', 'referenciado' o 'no_encontrado'; None si ocurre un error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    resultados = None
+    try:
+        with conn.cursor() as cur_bloqueo, conn.cursor() as cur:
+            # Bloqueo y borrado en un solo viaje (modo pipeline)
+            with transaccion_pipeline(conn):
+                PRODUCTOS_BLOQUEAR.ejecutar(cur_bloqueo, {"ids": ids})
+                PRODUCTOS_ELIMINAR.ejecutar(cur, {"ids": ids})
+            resultados = [row_to_dict(cur, row) for row in cur.fetchall()]
+
+        if any(r["estado"] == "eliminado" for r in resultados):
+            cache_catalogo.invalidar("catalogo")
+
+        # La fila borrada de cada eliminado solo va a la auditoría
+        for resultado in resultados:
+            antes = resultado.pop("antes")
+            if antes is not None:
+                auditoria.registrar("producto", "eliminar", resultado["id"], antes=antes)
+
+    except (Exception, psycopg.Error) as error:
+        print(f"Error en el borrado masivo de productos: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resultados
+
+# --- Stock particionado (productos muy demandados) ---
+# Ver 'producto_stock_shard' en database/schema.sql. Las ventas reservan stock
+# con la función reservar_stock(); aquí solo se activa/desactiva el reparto y se
+# lee el stock vigente de todos los productos.
+
+def get_stock_vigente():
+    """
+    Retorna {id_producto: stock} de todos los productos (la suma de shards en
+    los particionados), desde una caché de vida corta (STOCK_CACHE_TTL). El
+    catálogo cacheado toma de aquí el stock: las ventas no lo invalidan.
+    """
+    totales = cache_stock.obtener("stock", "totales", _consultar_stock_vigente)
+    return totales if totales is not None else {}
+
+async def get_stock_vigente_async():
+    """Igual que get_stock_vigente(), para endpoints async."""
+    totales = await cache_stock.obtener_async("stock", "totales", _consultar_stock_vigente)
+    return totales if totales is not None else {}
+
+def _consultar_stock_vigente():
+    """Lee el stock de cada producto, sumando los shards de los particionados."""
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    totales = None
+    try:
+        with conn.cursor() as cur:
+            STOCK_VIGENTE.ejecutar(cur)
+            totales = dict(cur.fetchall())
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener el stock vigente: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return totales
+
+def _aplicar_stock(producto: dict, totales: dict):
+    """Sustituye 'cantidad_stock' del producto cacheado por su stock vigente (si ya se conoce)."""
+    total = totales.get(producto["id_producto"])
+    if total is not None:
+        producto["cantidad_stock"] = total
+
+def particionar_stock_producto(producto_id: int, shards: int):
+    """
+    Reparte el stock de un producto en 'shards' filas (shards=1 lo vuelve a
+    concentrar en 'producto'), conservando el stock actual.
+
+    Returns:
+        bool | None: True si se aplicó, False si el producto no existe, None si hubo un error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    aplicado = None
+    try:
+        with conn.cursor() as cur, transaccion(conn):
+            PRODUCTO_PARTICIONAR_STOCK.ejecutar(cur, (producto_id, shards))
+            aplicado = cur.fetchone()[0]
+        if aplicado:
+            cache_stock.invalidar("stock")
+            cache_catalogo.invalidar("catalogo")
+            auditoria.registrar("producto", "particionar_stock", producto_id, despues={"shards": shards})
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al particionar el stock del producto {producto_id}: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return aplicado
@@ -1,55 +1,145 @@
 # Importaciones necesarias
-from app.db.database import get_db_connection
+from app.db.database import get_db_connection, release_db_connection, transaccion, transaccion_pipeline
+from app.db.consultas import registro, registrar_actualizacion, parametros_actualizacion, registrar_borrado_masivo
 # Importamos los schemas para validación
 from app.schemas import ProveedorCreate, ProveedorUpdate 
+from app.cache.catalogo import cache_catalogo
+from app.auditoria import auditoria
 import psycopg
 
 # Importación de la función auxiliar para conversión de filas
 from .crud_productos import row_to_dict 
 
+# --- Consultas registradas (preparadas una vez por conexión) ---
+PROVEEDORES_TODOS = registro.registrar(
+    "proveedor.todos", "SELECT id_proveedor, nombre, telefono FROM proveedor ORDER BY nombre"
+)
+PROVEEDOR_POR_ID = registro.registrar(
+    "proveedor.por_id", "SELECT id_proveedor, nombre, telefono FROM proveedor WHERE id_proveedor = %s", ejemplo=(0,)
+)
+PROVEEDOR_CREAR = registro.registrar(
+    "proveedor.crear",
+    "INSERT INTO proveedor (nombre, telefono) VALUES (%s, %s) RETURNING id_proveedor, nombre, telefono"
+)
+COLUMNAS_PROVEEDOR = {"nombre": "varchar", "telefono": "varchar"}
+PROVEEDOR_ACTUALIZAR = registrar_actualizacion(
+    "proveedor.actualizar", "proveedor", COLUMNAS_PROVEEDOR,
+    where="id_proveedor = %(id)s", returning="id_proveedor, nombre, telefono", clave="id_proveedor"
+)
+PROVEEDOR_ELIMINAR = registro.registrar(
+    "proveedor.eliminar", "DELETE FROM proveedor WHERE id_proveedor = %s RETURNING to_jsonb(proveedor)::text"
+)
+PROVEEDORES_BLOQUEAR, PROVEEDORES_ELIMINAR = registrar_borrado_masivo(
+    "proveedor.eliminar_varios", "proveedor", "id_proveedor", {"producto": "id_proveedor"}
+)
+# Sugerencias de reposición: pronóstico del job app/jobs/reabastecimiento.py y
+# stock vigente (la suma de shards si el producto tiene el stock particionado)
+REABASTECIMIENTO_PROVEEDOR = registro.registrar("proveedor.reabastecimiento", """
+    SELECT r.id_producto, p.nombre, s.stock AS cantidad_stock, r.demanda_diaria, r.media_movil, r.desviacion,
+           r.punto_pedido, r.nivel_objetivo, GREATEST(r.nivel_objetivo - s.stock, 0) AS cantidad_sugerida,
+           s.stock / NULLIF(r.demanda_diaria, 0) AS dias_cobertura
+    FROM producto p
+    JOIN reabastecimiento r ON r.id_producto = p.id_producto
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(
+            (SELECT sum(sh.cantidad)::int FROM producto_stock_shard sh WHERE sh.id_producto = p.id_producto),
+            p.cantidad_stock
+        ) AS stock
+    ) s
+    WHERE p.id_proveedor = %(id_proveedor)s AND (%(todos)s OR s.stock <= r.punto_pedido)
+    ORDER BY dias_cobertura, r.id_producto
+""", ejemplo={"id_proveedor": 0, "todos": False})
+# Todas las filas son de la misma ejecución del job (se reemplazan en una transacción)
+REABASTECIMIENTO_CALCULADO = registro.registrar(
+    "proveedor.reabastecimiento_calculado", "SELECT calculado_en FROM reabastecimiento LIMIT 1", ejemplo=()
+)
+
 # --- Funciones CRUD para Proveedores ---
 
 def get_all_proveedores():
+    """Obtiene todos los proveedores, desde la caché si está vigente."""
+    proveedores = get_proveedores()
+    return proveedores if proveedores is not None else []
+
+def get_proveedores():
+    """Igual que get_all_proveedores(), pero retorna None si la consulta falla."""
+    return cache_catalogo.obtener("proveedores", "proveedores", _consultar_proveedores)
+
+def _consultar_proveedores():
     """Obtiene todos los registros de la tabla 'proveedor'."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None:
         # En un entorno real, loggear el error o lanzar excepción
-        return []
+        return None
 
-    proveedores = []
+    proveedores = None
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT id_proveedor, nombre, telefono FROM proveedor ORDER BY nombre")
+            PROVEEDORES_TODOS.ejecutar(cur)
             proveedores_rows = cur.fetchall()
             proveedores = [row_to_dict(cur, row) for row in proveedores_rows]
     except (Exception, psycopg.Error) as error:
         print(f"Error al obtener proveedores: {error}")
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             
     return proveedores
 
 def get_proveedor_by_id(proveedor_id: int):
+    """Obtiene un proveedor por su ID, desde la caché si está vigente."""
+    return cache_catalogo.obtener(
+        "proveedores", f"proveedor:{proveedor_id}", lambda: _consultar_proveedor(proveedor_id)
+    )
+
+def _consultar_proveedor(proveedor_id: int):
     """Obtiene un proveedor específico por su 'id_proveedor'."""
-    conn = get_db_connection()
+    conn = get_db_connection(lectura=True)
     if conn is None:
         return None
 
     proveedor = None
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT id_proveedor, nombre, telefono FROM proveedor WHERE id_proveedor = %s", (proveedor_id,))
+            PROVEEDOR_POR_ID.ejecutar(cur, (proveedor_id,))
             proveedor_row = cur.fetchone()
             proveedor = row_to_dict(cur, proveedor_row) 
     except (Exception, psycopg.Error) as error:
          print(f"Error al obtener proveedor {proveedor_id}: {error}")
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             
     return proveedor
 
+def get_reabastecimiento(proveedor_id: int, todos: bool = False):
+    """
+    Obtiene las sugerencias de reposición de los productos de un proveedor:
+    los que tienen el stock en su punto de pedido o por debajo (todos los que
+    tienen pronóstico si 'todos'), con las unidades que faltan hasta su nivel
+    objetivo, de menos a más días de cobertura.
+    Retorna {'calculado_en', 'productos'} o None si ocurre un error.
+    """
+    conn = get_db_connection(lectura=True)
+    if conn is None:
+        return None
+
+    reabastecimiento = None
+    try:
+        with conn.cursor() as cur:
+            REABASTECIMIENTO_PROVEEDOR.ejecutar(cur, {"id_proveedor": proveedor_id, "todos": todos})
+            productos = [row_to_dict(cur, row) for row in cur.fetchall()]
+            REABASTECIMIENTO_CALCULADO.ejecutar(cur)
+            calculado = cur.fetchone()
+            reabastecimiento = {"calculado_en": calculado[0] if calculado else None, "productos": productos}
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener el reabastecimiento del proveedor {proveedor_id}: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return reabastecimiento
+
 def create_proveedor(proveedor: ProveedorCreate):
     """Inserta un nuevo proveedor en la base de datos."""
     conn = get_db_connection()
@@ -58,24 +148,22 @@ def create_proveedor(proveedor: ProveedorCreate):
 
     new_proveedor = None
     try:
-        # Usar 'with conn.transaction()' es preferible para manejar commit/rollback
-        with conn.cursor() as cur: 
-            cur.execute(
-                "INSERT INTO proveedor (nombre, telefono) VALUES (%s, %s) RETURNING id_proveedor, nombre, telefono",
-                (proveedor.nombre, proveedor.telefono)
-            )
+        with conn.cursor() as cur, transaccion(conn):
+            PROVEEDOR_CREAR.ejecutar(cur, (proveedor.nombre, proveedor.telefono))
             new_proveedor_row = cur.fetchone()
             if new_proveedor_row:
                  new_proveedor = row_to_dict(cur, new_proveedor_row)
-            conn.commit() # Commit explícito si no se usa 'with transaction'
+        cache_catalogo.invalidar("proveedores")
+        if new_proveedor:
+            auditoria.registrar("proveedor", "crear", new_proveedor["id_proveedor"], despues=new_proveedor)
             
     except (Exception, psycopg.Error) as error:
         print(f"Error al crear proveedor: {error}")
         if conn:
-            conn.rollback() # Rollback explícito si no se usa 'with transaction'
+            conn.rollback()
     finally:
         if conn:
-            conn.close() 
+            release_db_connection(conn) 
             
     return new_proveedor
 
@@ -88,41 +176,38 @@ def update_proveedor(proveedor_id: int, proveedor_update: ProveedorUpdate):
     if conn is None: 
         return None
 
-    # Construcción dinámica de la cláusula SET
-    update_fields = []
-    update_values = []
     # Pydantic v2: model_dump | Pydantic v1: dict
+    # Las claves del schema coinciden con los nombres de columna
     update_data = proveedor_update.model_dump(exclude_unset=True) 
 
     if not update_data: # Si no hay datos para actualizar
-        conn.close()
+        release_db_connection(conn)
         return get_proveedor_by_id(proveedor_id) # Retorna el registro actual
-
-    for key, value in update_data.items():
-        # Asumiendo que las claves del schema coinciden con los nombres de columna
-        update_fields.append(f"{key} = %s")
-        update_values.append(value)
-
-    update_values.append(proveedor_id) # Añade el ID para la cláusula WHERE
     
     updated_proveedor = None
     try:
-        with conn.cursor() as cur, conn.transaction(): # Manejo de transacción recomendado
-            query = f"UPDATE proveedor SET {', '.join(update_fields)} WHERE id_proveedor = %s RETURNING id_proveedor, nombre, telefono"
-            cur.execute(query, tuple(update_values))
+        with conn.cursor() as cur, transaccion(conn): # Manejo de transacción recomendado
+            # UPDATE canónico: la misma sentencia preparada para cualquier combinación de campos
+            PROVEEDOR_ACTUALIZAR.ejecutar(cur, parametros_actualizacion(COLUMNAS_PROVEEDOR, update_data, id=proveedor_id))
             
             updated_proveedor_row = cur.fetchone()
             # Si fetchone() retorna None, el ID no existía
             if updated_proveedor_row:
                 updated_proveedor = row_to_dict(cur, updated_proveedor_row)
             # Commit automático al salir del 'with transaction'
+
+        if updated_proveedor:
+            cache_catalogo.invalidar("proveedores")
+            # La sentencia retorna también la fila anterior (para la auditoría)
+            antes = updated_proveedor.pop("antes")
+            auditoria.registrar("proveedor", "actualizar", proveedor_id, antes, updated_proveedor)
             
     except (Exception, psycopg.Error) as error:
         print(f"Error al actualizar proveedor {proveedor_id}: {error}")
         # Rollback automático
     finally:
         if conn: 
-            conn.close()
+            release_db_connection(conn)
             
     return updated_proveedor # Retorna None si el ID no se encontró o hubo error
 
@@ -143,17 +228,24 @@ def delete_proveedor(proveedor_id: int):
         return -1 # Indica error de conexión
 
     rows_deleted_code = 0 # Valor por defecto si no se encuentra
+    antes = None
     try:
         # Usar transacción para asegurar atomicidad y rollback automático
-        with conn.cursor() as cur, conn.transaction(): 
-            cur.execute("DELETE FROM proveedor WHERE id_proveedor = %s", (proveedor_id,))
+        with conn.cursor() as cur, transaccion(conn): 
+            PROVEEDOR_ELIMINAR.ejecutar(cur, (proveedor_id,))
             rows_deleted_code = cur.rowcount # Será 1 si se borró, 0 si no existía
+            if rows_deleted_code == 1:
+                antes = cur.fetchone()[0] # Fila borrada (para la auditoría)
             if rows_deleted_code == 0:
                  # Si no se borró nada, psycopg deshace la transacción implícitamente
                  # pero podemos dejarlo claro para el código de retorno.
                  pass 
             # Commit automático al salir del 'with transaction' si no hubo error
 
+        if rows_deleted_code == 1:
+            cache_catalogo.invalidar("proveedores")
+            auditoria.registrar("proveedor", "eliminar", proveedor_id, antes=antes)
+
     except psycopg.errors.ForeignKeyViolation as fk_error:
         # Error específico si el proveedor está referenciado (ej. en producto)
         print(f"Error de FK al eliminar proveedor {proveedor_id}: {fk_error}")
@@ -166,7 +258,47 @@ def delete_proveedor(proveedor_id: int):
         rows_deleted_code = -1 # Código para error genérico
     finally:
         if conn: 
-            conn.close()
+            release_db_connection(conn)
             
     # Retorna el código numérico resultado de la operación
-    return rows_deleted_code
\ No newline at end of file
+    return rows_deleted_code
+
+# ELIMINAR (Delete): Borrar varios proveedores de una vez
+def delete_proveedores(ids: list):
+    """
+    Elimina en una transacción todos los proveedores de 'ids' que se pueden
+    eliminar, es decir, los que no tienen productos.
+
+    Returns:
+        list | None: [{"id", "estado"}] por cada ID distinto, con estado
+        'eliminado', 'referenciado' o 'no_encontrado'; None si ocurre un error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    resultados = None
+    try:
+        with conn.cursor() as cur_bloqueo, conn.cursor() as cur:
+            # Bloqueo y borrado en un solo viaje (modo pipeline)
+            with transaccion_pipeline(conn):
+                PROVEEDORES_BLOQUEAR.ejecutar(cur_bloqueo, {"ids": ids})
+                PROVEEDORES_ELIMINAR.ejecutar(cur, {"ids": ids})
+            resultados = [row_to_dict(cur, row) for row in cur.fetchall()]
+
+        if any(r["estado"] == "eliminado" for r in resultados):
+            cache_catalogo.invalidar("proveedores")
+
+        # La fila borrada de cada eliminado solo va a la auditoría
+        for resultado in resultados:
+            antes = resultado.pop("antes")
+            if antes is not None:
+                auditoria.registrar("proveedor", "eliminar", resultado["id"], antes=antes)
+
+    except (Exception, psycopg.Error) as error:
+        print(f"Error en el borrado masivo de proveedores: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resultados
@@ -0,0 +1,121 @@
+# Importaciones necesarias
+from app.db.database import get_db_connection, release_db_connection
+from psycopg import sql
+from typing import Optional
+import psycopg
+
+# --- Sincronización incremental para terminales fuera de línea ---
+
+# Tablas sincronizables y su columna de clave primaria
+TABLAS_SYNC = {
+    "producto": "id_producto",
+    "ropa": "id_producto",
+    "calzado": "id_producto",
+    "accesorios": "id_producto",
+    "cliente": "id_cliente",
+    "direccion": "id_direccion",
+    "proveedor": "id_proveedor",
+}
+
+# Fila que se envía de cada tabla. En los productos con stock particionado,
+# 'cantidad_stock' es la suma de sus shards leída en la misma instantánea que
+# el registro de cambios: cada reserva anota un cambio del producto, y su
+# stock se envía tal como quedó hasta el token.
+FILA_SYNC = {
+    "producto": sql.SQL(
+        "to_jsonb(t) || jsonb_build_object('cantidad_stock', COALESCE("
+        "(SELECT sum(s.cantidad)::int FROM producto_stock_shard s WHERE s.id_producto = t.id_producto),"
+        " t.cantidad_stock))"
+    ),
+}
+
+class TokenExpirado(Exception):
+    """El token es anterior a la última purga del registro de cambios."""
+
+def _filas_por_id(cur, tabla: str, ids):
+    """Obtiene las filas actuales (como JSON) de una tabla para una lista de IDs."""
+    cur.execute(
+        sql.SQL("SELECT {fila} FROM {tabla} t WHERE {pk} = ANY(%s) ORDER BY {pk}").format(
+            fila=FILA_SYNC.get(tabla, sql.SQL("to_jsonb(t)")),
+            tabla=sql.Identifier(tabla), pk=sql.Identifier(TABLAS_SYNC[tabla]),
+        ),
+        (list(ids),),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+def _filas_completas(cur, tabla: str):
+    """Obtiene todas las filas de una tabla (sincronización completa)."""
+    cur.execute(
+        sql.SQL("SELECT {fila} FROM {tabla} t ORDER BY {pk}").format(
+            fila=FILA_SYNC.get(tabla, sql.SQL("to_jsonb(t)")),
+            tabla=sql.Identifier(tabla), pk=sql.Identifier(TABLAS_SYNC[tabla]),
+        )
+    )
+    return [row[0] for row in cur.fetchall()]
+
+def get_cambios_desde(desde: Optional[int], tablas=None):
+    """
+    Obtiene los cambios de las tablas sincronizables desde el token 'desde'.
+
+    Sin token retorna una copia completa de todas las tablas. Con token retorna,
+    por tabla, las filas insertadas o actualizadas (su estado actual) y los IDs
+    eliminados desde entonces. Todo se lee en una misma instantánea
+    REPEATABLE READ, y el token nuevo es el xmin de esa instantánea.
+    Con 'tablas' solo se leen esas (un subconjunto de TABLAS_SYNC).
+    En los productos con stock particionado, 'cantidad_stock' es la suma de
+    sus shards, como en el resto de la API (ver FILA_SYNC).
+
+    Returns:
+        dict | None: {'token', 'completo', 'cambios'} o None si hubo un error.
+    Raises:
+        TokenExpirado: si el token es anterior a la última purga.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    tablas = [tabla for tabla in TABLAS_SYNC if tablas is None or tabla in tablas]
+    resultado = None
+    try:
+        with conn.cursor() as cur, conn.transaction():
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text, txid::text FROM registro_cambios_horizonte")
+            hasta, horizonte = cur.fetchone()
+
+            cambios = {}
+            if desde is None:
+                for tabla in tablas:
+                    cambios[tabla] = {"actualizados": _filas_completas(cur, tabla), "eliminados": []}
+            else:
+                if int(horizonte) > 0 and desde <= int(horizonte):
+                    raise TokenExpirado(f"Token {desde} anterior al horizonte {horizonte}")
+                # Última operación de cada registro en el intervalo [desde, hasta)
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (tabla, id_registro) tabla, id_registro, operacion
+                    FROM registro_cambios
+                    WHERE txid >= %s::text::xid8 AND txid < %s::text::xid8
+                    ORDER BY tabla, id_registro, id_cambio DESC
+                    """,
+                    (str(desde), hasta),
+                )
+                ultimos = cur.fetchall()
+                for tabla in tablas:
+                    ids_actualizados = [r[1] for r in ultimos if r[0] == tabla and r[2] != "D"]
+                    ids_eliminados = [r[1] for r in ultimos if r[0] == tabla and r[2] == "D"]
+                    cambios[tabla] = {
+                        "actualizados": _filas_por_id(cur, tabla, ids_actualizados) if ids_actualizados else [],
+                        "eliminados": ids_eliminados,
+                    }
+
+            resultado = {"token": hasta, "completo": desde is None, "cambios": cambios}
+
+    except TokenExpirado:
+        raise
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener cambios desde {desde}: {error}")
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    return resultado
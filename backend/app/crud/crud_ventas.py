@@ -1,22 +1,201 @@
 # Importaciones necesarias
-from app.db.database import get_db_connection
-from app.schemas import VentaCreate 
-from datetime import date 
-import psycopg 
+from app.db.database import get_db_connection, release_db_connection, transaccion_pipeline
+from app.db.consultas import registro
+from app.archivo import ventas as archivo
+from app.auditoria import auditoria
+from app.recomendaciones import coocurrencias
+from app.schemas import VentaCreate
+from datetime import date
+from decimal import Decimal
+import psycopg
 
 # Importación de la función auxiliar para conversión de filas
-from .crud_productos import row_to_dict 
+from .crud_productos import row_to_dict
 
-def create_venta(venta_data: VentaCreate):
+# --- Consultas registradas (preparadas una vez por conexión) ---
+# Todas reciben las líneas de la venta como arrays paralelos (producto, cantidad,
+# precio), así el número de sentencias no crece con el tamaño de la cesta.
+
+# Cabecera: el total se calcula con los precios vigentes de 'producto' (NUMERIC)
+# en la misma sentencia; validar_total_venta() rechaza la venta si algún precio
+# enviado no coincide (ver database/schema.sql).
+VENTA_CREAR = registro.registrar("venta.crear", """
+    WITH lineas AS (
+        SELECT l.id_producto, l.cantidad, l.precio_unitario, p.precio
+        FROM unnest(%(productos)s::int[], %(cantidades)s::int[], %(precios)s::numeric[])
+            AS l(id_producto, cantidad, precio_unitario)
+        LEFT JOIN producto p ON p.id_producto = l.id_producto
+    )
+    INSERT INTO venta (id_cliente, fecha, monto_total)
+    SELECT %(id_cliente)s, %(fecha)s, validar_total_venta(
+        sum(cantidad * precio),
+        array_agg(id_producto) FILTER (WHERE precio IS NOT NULL AND precio <> precio_unitario)
+    )
+    FROM lineas
+    RETURNING id_venta, id_cliente, fecha, monto_total, txid::text
+""")
+# Descuenta stock de cada línea (del producto o de sus shards; ver database/schema.sql)
+STOCK_RESERVAR = registro.registrar("venta.reservar_stock", """
+    SELECT reservar_stock(l.id_producto, l.cantidad)
+    FROM unnest(%(productos)s::int[], %(cantidades)s::int[]) AS l(id_producto, cantidad)
+    ORDER BY l.id_producto
+""")
+# Los detalles se enlazan con la venta recién insertada en la misma sesión
+# (currval de su secuencia), así pueden encolarse sin esperar el id_venta.
+# Llevan la misma fecha que la cabecera: van a la partición del mismo mes.
+# Un producto inexistente deja el precio a NULL y la inserción falla.
+DETALLE_VENTA_CREAR = registro.registrar("venta.crear_detalle", """
+    INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario)
+    SELECT currval(pg_get_serial_sequence('venta', 'id_venta')), %(fecha)s, l.id_producto, l.cantidad, p.precio
+    FROM unnest(%(productos)s::int[], %(cantidades)s::int[]) AS l(id_producto, cantidad)
+    LEFT JOIN producto p ON p.id_producto = l.id_producto
+""")
+
+# Clave de idempotencia (cabecera Idempotency-Key) de la venta recién insertada.
+# Va justo después de la cabecera: un reenvío con la misma clave espera aquí a
+# que la primera petición confirme (sin haber bloqueado aún filas de stock) y
+# falla con UniqueViolation. Ver database/migraciones/0003_venta_idempotencia.
+VENTA_REGISTRAR_CLAVE = registro.registrar("venta.registrar_clave", """
+    INSERT INTO venta_idempotencia (clave, id_venta, fecha)
+    VALUES (%(clave)s, currval(pg_get_serial_sequence('venta', 'id_venta')), %(fecha)s)
+""")
+VENTA_POR_CLAVE = registro.registrar("venta.por_clave", """
+    SELECT k.id_venta, v.id_cliente, v.fecha, v.monto_total
+    FROM venta_idempotencia k
+    LEFT JOIN venta v ON v.id_venta = k.id_venta AND v.fecha = k.fecha
+    WHERE k.clave = %s
+""")
+
+# Lecturas. 'venta' está particionada por mes de 'fecha': filtrar por fecha
+# limita la consulta a las particiones del rango (también con el plan genérico
+# de la sentencia preparada, que descarta particiones al ejecutarse).
+VENTAS_POR_RANGO = registro.registrar("venta.por_rango", """
+    SELECT id_venta, id_cliente, fecha, monto_total
+    FROM venta
+    WHERE fecha BETWEEN %(desde)s AND %(hasta)s
+      AND (%(id_cliente)s::int IS NULL OR id_cliente = %(id_cliente)s::int)
+    ORDER BY fecha, id_venta
+""")
+# Los detalles se buscan con la fecha de su venta: solo se lee una partición
+VENTA_POR_ID = registro.registrar("venta.por_id", """
+    SELECT v.id_venta, v.id_cliente, v.fecha, v.monto_total,
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'id_venta', d.id_venta, 'id_producto', d.id_producto,
+                'cantidad', d.cantidad, 'precio_unitario', d.precio_unitario
+            ) ORDER BY d.id_producto)
+            FROM detalle_venta d
+            WHERE d.id_venta = v.id_venta AND d.fecha = v.fecha
+        ), '[]') AS detalles
+    FROM venta v
+    WHERE v.id_venta = %s
+""", ejemplo=(0,))
+
+# Meses por delante para los que se mantienen creadas las particiones de ventas
+PARTICIONES_MESES_ADELANTE = 3
+
+# SQLSTATE con los que la base de datos rechaza una venta (ver database/schema.sql)
+SQLSTATE_STOCK_INSUFICIENTE = "BZ001"
+SQLSTATE_PRECIO_DISTINTO = "BZ002"
+
+class VentaRechazada(Exception):
+    """La venta no se puede registrar tal como se pidió (stock insuficiente o precio desactualizado)."""
+
+def asegurar_particiones_venta():
+    """
+    Crea las particiones de ventas que falten para el mes actual y los
+    PARTICIONES_MESES_ADELANTE siguientes (ver database/schema.sql).
+
+    Returns:
+        int | None: Número de meses creados, o None si ocurre un error.
+    """
+    conn = get_db_connection()
+    if conn is None: return None
+    creadas = None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT asegurar_particiones_venta(%s::int)", (PARTICIONES_MESES_ADELANTE,))
+            creadas = cur.fetchone()[0]
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al crear las particiones de ventas: {error}")
+    finally:
+        release_db_connection(conn)
+    return creadas
+
+def _falta_particion(error: psycopg.Error) -> bool:
+    """Indica si el error se debe a que la fecha de la venta no tiene partición."""
+    return (
+        isinstance(error, psycopg.errors.CheckViolation)
+        and error.diag.table_name in ("venta", "detalle_venta")
+        and error.diag.constraint_name is None
+    )
+
+def _registrar_venta(conn, params: dict):
+    """Inserta cabecera, reservas de stock y detalles en una transacción en modo pipeline."""
+    with conn.cursor() as cur, conn.cursor() as cur_lineas:
+        # Transacción en modo pipeline: cabecera, reservas de stock y detalles
+        # se envían juntos y se confirman en un solo viaje de ida y vuelta.
+        with transaccion_pipeline(conn):
+            # 1. Insertar la cabecera con el total calculado y los precios validados.
+            VENTA_CREAR.ejecutar(cur, params)
+            if params["clave"] is not None:
+                VENTA_REGISTRAR_CLAVE.ejecutar(cur_lineas, params)
+
+            # 2. Reservar el stock de cada línea.
+            STOCK_RESERVAR.ejecutar(cur_lineas, params)
+
+            # 3. Insertar los detalles con el precio vigente.
+            DETALLE_VENTA_CREAR.ejecutar(cur_lineas, params)
+        # Al salir del bloque la transacción ya está confirmada (COMMIT);
+        # cualquier error (o rechazo) se habría lanzado al salir.
+
+        return row_to_dict(cur, cur.fetchone())
+
+def _es_clave_repetida(error: psycopg.Error) -> bool:
+    """Indica si el error se debe a que la clave de idempotencia ya estaba registrada."""
+    return isinstance(error, psycopg.errors.UniqueViolation) and error.diag.table_name == "venta_idempotencia"
+
+def _venta_por_clave(clave: str):
+    """Obtiene la venta registrada con una clave de idempotencia (de la primaria: puede ser muy reciente)."""
+    conn = get_db_connection()
+    if conn is None: return None
+    venta = None
+    try:
+        with conn.cursor() as cur:
+            VENTA_POR_CLAVE.ejecutar(cur, (clave,))
+            venta = row_to_dict(cur, cur.fetchone())
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener la venta de la clave {clave}: {error}")
+    finally:
+        release_db_connection(conn)
+    if venta is not None and venta["fecha"] is None:
+        # El mes de la venta ya se archivó
+        venta = archivo.buscar_venta(venta["id_venta"])
+    return venta
+
+def create_venta(venta_data: VentaCreate, clave: str = None):
     """
-    Crea un registro de venta y sus detalles asociados dentro de una transacción.
+    Crea un registro de venta y sus detalles asociados dentro de una transacción,
+    descontando el stock de cada producto vendido.
+
+    Los precios y el total se toman de la base de datos: el precio unitario
+    enviado por el cliente solo se compara con el vigente.
+
+    Con 'clave' (de la cabecera Idempotency-Key), si ya se registró una venta
+    con esa clave se retorna esa venta y no se registra otra: un reenvío de la
+    misma petición (p. ej. desde la cola de un terminal sin conexión) no
+    duplica la venta.
 
     Args:
         venta_data (VentaCreate): Datos de la venta a crear, incluyendo detalles.
+        clave (str, opcional): Clave de idempotencia.
 
     Returns:
-        dict | None: Diccionario con los datos de la venta creada (incluyendo detalles) 
+        dict | None: Diccionario con los datos de la venta creada (incluyendo detalles)
                       o None si ocurre un error.
+    Raises:
+        VentaRechazada: si algún producto no tiene stock suficiente o su
+            precio no coincide con el vigente.
     """
     conn = get_db_connection()
     if conn is None:
@@ -24,61 +203,110 @@ def create_venta(venta_data: VentaCreate):
         print("Error crítico: No se pudo establecer conexión con la base de datos.")
         return None
 
-    monto_total_calculado = 0.0
+    try:
+        # Las líneas se ordenan por producto: dos ventas concurrentes bloquean
+        # las filas de stock en el mismo orden y no se interbloquean.
+        detalles = sorted(venta_data.detalles, key=lambda detalle: detalle.id_producto)
+        params = {
+            "id_cliente": venta_data.id_cliente,
+            "fecha": date.today(),
+            "productos": [detalle.id_producto for detalle in detalles],
+            "cantidades": [detalle.cantidad for detalle in detalles],
+            # str() evita arrastrar la representación binaria del float
+            "precios": [Decimal(str(detalle.precio_unitario)) for detalle in detalles],
+            "clave": clave,
+        }
+
+        try:
+            new_venta_dict = _registrar_venta(conn, params)
+        except psycopg.Error as error:
+            if not _falta_particion(error):
+                raise
+            # El mes en curso aún no tiene partición (las del arranque del
+            # worker ya no alcanzan): se crean y se reintenta una vez.
+            release_db_connection(conn)
+            conn = None
+            asegurar_particiones_venta()
+            conn = get_db_connection()
+            new_venta_dict = _registrar_venta(conn, params)
+
+        release_db_connection(conn)
+        conn = None
+
+    except psycopg.Error as error:
+        # Cualquier excepción dentro de la transacción causa un ROLLBACK.
+        release_db_connection(conn)
+        if _es_clave_repetida(error):
+            return _venta_por_clave(clave)
+        if error.sqlstate in (SQLSTATE_STOCK_INSUFICIENTE, SQLSTATE_PRECIO_DISTINTO):
+            raise VentaRechazada(error.diag.message_primary) from error
+        print(f"Error durante la transacción de venta: {error}")
+        return None
+
+    except Exception as error:
+        print(f"Error durante la transacción de venta: {error}")
+        if conn: # Asegura devolver la conexión al pool tras un error.
+             release_db_connection(conn)
+        return None # Indica que la operación falló.
+
+    # La venta ya está confirmada: lo que sigue queda fuera del try para que
+    # un fallo aquí no la presente como fallida (el cliente la reintentaría).
+    # Añade los detalles insertados al diccionario de la venta para retornarlo.
+    new_venta_dict['detalles'] = [
+        {"id_venta": new_venta_dict["id_venta"], **detalle.model_dump()}
+        for detalle in detalles
+    ]
+    # Sus productos cuentan como comprados juntos (ver app/recomendaciones.py)
+    coocurrencias.registrar_venta(new_venta_dict.pop("txid"), params["productos"])
+    auditoria.registrar("venta", "crear", new_venta_dict["id_venta"], despues=new_venta_dict)
+    return new_venta_dict
 
+# LEER (Read): Ventas de un rango de fechas
+def get_ventas_por_rango(desde: date, hasta: date, id_cliente: int = None):
+    """
+    Obtiene las ventas con fecha entre 'desde' y 'hasta' (ambas incluidas),
+    opcionalmente solo las de un cliente, ordenadas por fecha.
+    Solo se leen las particiones mensuales del rango; los meses archivados
+    (ver app/archivo/ventas.py) se leen de sus ficheros.
+    """
+    conn = get_db_connection(lectura=True)
+    if conn is None: return None
+    ventas = None
     try:
-        # Inicia una transacción para garantizar la atomicidad.
-        with conn.cursor() as cur, conn.transaction(): 
-            
-            # 1. Calcular el monto total a partir de los detalles recibidos.
-            for detalle in venta_data.detalles:
-                monto_total_calculado += detalle.cantidad * detalle.precio_unitario
-
-            # 2. Insertar el registro principal en la tabla 'venta'.
-            cur.execute(
-                """
-                INSERT INTO venta (id_cliente, fecha, monto_total) 
-                VALUES (%s, %s, %s) 
-                RETURNING id_venta, id_cliente, fecha, monto_total
-                """,
-                (venta_data.id_cliente, date.today(), monto_total_calculado)
-            )
-            new_venta_row = cur.fetchone()
-            if new_venta_row is None:
-                 # Si la inserción falla, lanza una excepción para forzar rollback.
-                 raise psycopg.Error("Fallo al insertar en la tabla 'venta'.") 
-            
-            new_venta_dict = row_to_dict(cur, new_venta_row)
-            new_venta_id = new_venta_dict['id_venta']
-
-            # 3. Insertar cada registro de detalle en 'detalle_venta'.
-            detalles_insertados = []
-            for detalle in venta_data.detalles:
-                cur.execute(
-                    """
-                    INSERT INTO detalle_venta (id_venta, id_producto, cantidad, precio_unitario) 
-                    VALUES (%s, %s, %s, %s)
-                    RETURNING id_venta, id_producto, cantidad, precio_unitario 
-                    """,
-                    (new_venta_id, detalle.id_producto, detalle.cantidad, detalle.precio_unitario)
-                )
-                new_detalle_row = cur.fetchone()
-                if new_detalle_row is None:
-                    # Si alguna inserción de detalle falla, lanza excepción para rollback.
-                    raise psycopg.Error(f"Fallo al insertar detalle para producto ID: {detalle.id_producto}")
-                detalles_insertados.append(row_to_dict(cur, new_detalle_row))
-
-            # Al salir exitosamente del bloque 'with conn.transaction()', 
-            # la transacción se confirma (COMMIT) automáticamente.
-
-        conn.close()
-        # Añade los detalles insertados al diccionario de la venta para retornarlo.
-        new_venta_dict['detalles'] = detalles_insertados 
-        return new_venta_dict
+        with conn.cursor() as cur:
+            VENTAS_POR_RANGO.ejecutar(cur, {"desde": desde, "hasta": hasta, "id_cliente": id_cliente})
+            ventas = [row_to_dict(cur, row) for row in cur.fetchall()]
+        archivados = archivo.meses_archivados()
+        if any(archivo.clave_mes(desde) <= mes <= archivo.clave_mes(hasta) for mes in archivados):
+            # Un mes archivado se sirve solo del archivo, aunque sus particiones
+            # sigan en Postgres (el job aún no las ha borrado).
+            ventas = [venta for venta in ventas if archivo.clave_mes(venta["fecha"]) not in archivados]
+            ventas += archivo.leer_ventas(desde, hasta, id_cliente)
+            ventas.sort(key=lambda venta: (venta["fecha"], venta["id_venta"]))
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al obtener ventas: {error}")
+        ventas = None
+    finally:
+        release_db_connection(conn)
+    return ventas
 
+# LEER (Read): Una venta con sus detalles
+def get_venta_by_id(venta_id: int):
+    """
+    Obtiene una venta por su 'id_venta', incluyendo sus detalles.
+    Si no está en Postgres se busca en el archivo de meses antiguos.
+    """
+    conn = get_db_connection(lectura=True)
+    if conn is None: return None
+    try:
+        with conn.cursor() as cur:
+            VENTA_POR_ID.ejecutar(cur, (venta_id,))
+            venta = row_to_dict(cur, cur.fetchone())
     except (Exception, psycopg.Error) as error:
-        # Cualquier excepción dentro del bloque 'with transaction' causará un ROLLBACK.
-        print(f"Error durante la transacción de venta: {error}")
-        if conn: # Asegura cerrar la conexión si aún está abierta tras un error.
-             conn.close()
-        return None # Indica que la operación falló.
\ No newline at end of file
+        print(f"Error al obtener la venta {venta_id}: {error}")
+        return None
+    finally:
+        release_db_connection(conn)
+    if venta is None:
+        venta = archivo.buscar_venta(venta_id)
+    return venta
@@ -0,0 +1,209 @@
+import threading
+import time
+
+# --- Registro central de consultas preparadas ---
+# Cada consulta frecuente de los módulos CRUD se registra aquí con un nombre.
+# Al ejecutarla se pide a psycopg que la prepare (prepare=True): se analiza y
+# planifica una vez por conexión del pool y las siguientes ejecuciones en esa
+# conexión reutilizan el plan. El registro también acumula estadísticas de
+# ejecución por consulta (por proceso worker).
+# Las lecturas por clave se registran con unos parámetros de ejemplo para
+# prepararlas de antemano en cada conexión nueva del pool (precalentar()), así
+# la primera petición que las usa tras un arranque en frío no paga el análisis.
+
+class Consulta:
+    """Sentencia SQL con nombre, preparada en cada conexión la primera vez que se usa."""
+
+    def __init__(self, registro, nombre: str, sql: str, ejemplo=None):
+        self._registro = registro
+        self.nombre = nombre
+        self.sql = sql
+        self.ejemplo = ejemplo # Parámetros inocuos para prepararla por adelantado
+
+    def ejecutar(self, cur, params=None):
+        """
+        Ejecuta la consulta en el cursor dado y registra su duración.
+        Dentro de una transacción en modo pipeline solo se mide el encolado.
+        """
+        inicio = time.perf_counter()
+        try:
+            cur.execute(self.sql, params, prepare=True)
+        except Exception:
+            self._registro.anotar(self.nombre, time.perf_counter() - inicio, error=True)
+            raise
+        self._registro.anotar(self.nombre, time.perf_counter() - inicio)
+        return cur
+
+    def ejecutar_lote(self, cur, lista_params):
+        """Ejecuta la consulta una vez por cada juego de parámetros (executemany)."""
+        inicio = time.perf_counter()
+        try:
+            cur.executemany(self.sql, lista_params)
+        except Exception:
+            self._registro.anotar(self.nombre, time.perf_counter() - inicio, error=True)
+            raise
+        self._registro.anotar(self.nombre, time.perf_counter() - inicio)
+        return cur
+
+class RegistroConsultas:
+    """Catálogo de consultas con nombre y sus estadísticas de ejecución."""
+
+    def __init__(self):
+        self._consultas = {}
+        self._estadisticas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, sql: str, ejemplo=None) -> Consulta:
+        """
+        Registra una consulta con nombre. 'ejemplo' (solo para lecturas baratas,
+        p. ej. un id inexistente) marca la consulta para precalentar().
+        """
+        if nombre in self._consultas:
+            raise ValueError(f"Consulta '{nombre}' registrada dos veces")
+        consulta = Consulta(self, nombre, sql, ejemplo)
+        self._consultas[nombre] = consulta
+        self._estadisticas[nombre] = {"ejecuciones": 0, "errores": 0, "tiempo_total": 0.0, "tiempo_max": 0.0}
+        return consulta
+
+    def anotar(self, nombre: str, duracion: float, error: bool = False):
+        with self._lock:
+            stats = self._estadisticas[nombre]
+            stats["ejecuciones"] += 1
+            stats["errores"] += int(error)
+            stats["tiempo_total"] += duracion
+            stats["tiempo_max"] = max(stats["tiempo_max"], duracion)
+
+    def consultas(self):
+        return list(self._consultas.values())
+
+    def precalentar(self, conn):
+        """
+        Prepara en la conexión las consultas registradas con parámetros de
+        ejemplo, todas en un solo viaje de ida y vuelta (modo pipeline). No
+        cuenta en las estadísticas. Si ya estaban preparadas solo se ejecutan.
+        """
+        consultas = [c for c in self._consultas.values() if c.ejemplo is not None]
+        if not consultas:
+            return
+        try:
+            with conn.pipeline(), conn.cursor() as cur:
+                for consulta in consultas:
+                    cur.execute(consulta.sql, consulta.ejemplo, prepare=True)
+        except Exception as error:
+            print(f"Error al precalentar las consultas: {error}")
+
+    def estadisticas(self):
+        """Retorna las estadísticas de cada consulta registrada (tiempos en ms)."""
+        with self._lock:
+            return [
+                {
+                    "nombre": nombre,
+                    "ejecuciones": s["ejecuciones"],
+                    "errores": s["errores"],
+                    "tiempo_total_ms": round(s["tiempo_total"] * 1000, 3),
+                    "tiempo_medio_ms": round(s["tiempo_total"] * 1000 / s["ejecuciones"], 3) if s["ejecuciones"] else 0.0,
+                    "tiempo_max_ms": round(s["tiempo_max"] * 1000, 3),
+                }
+                for nombre, s in sorted(self._estadisticas.items())
+            ]
+
+registro = RegistroConsultas()
+
+# --- UPDATE canónicos ---
+# Los UPDATE parciales (solo los campos enviados) generaban un texto SQL distinto
+# por cada combinación de campos, y cada uno se planificaba por separado. En su
+# lugar se registra UN UPDATE por tabla que asigna todas las columnas con
+#   columna = CASE WHEN <se envió> THEN <valor>::tipo ELSE columna END
+# Los valores se envían como texto y se convierten en el servidor, así los tipos
+# de los parámetros (y por tanto la sentencia preparada) son siempre los mismos.
+
+def registrar_actualizacion(
+    nombre: str, tabla: str, columnas: dict, where: str, returning: str, clave: str,
+    vigentes: dict = None, asignar: dict = None,
+) -> Consulta:
+    """
+    Registra el UPDATE canónico de una tabla. La fila se lee y bloquea antes
+    (FOR UPDATE) en la misma sentencia, y RETURNING añade la columna 'antes':
+    la fila previa como JSON (texto), para la auditoría (ver app/auditoria.py).
+
+    Args:
+        columnas (dict): columna -> tipo SQL al que se convierte el valor.
+        where (str): condición con parámetros con nombre, p. ej. 'id_cliente = %(id)s'.
+        returning (str): columnas de la cláusula RETURNING.
+        clave (str): clave primaria de la tabla.
+        vigentes (dict): columna -> expresión SQL con su valor vigente, que se
+            asigna cuando no se modifica (por defecto, el valor de la propia columna).
+        asignar (dict): columna -> expresión SQL que se asigna cuando se modifica,
+            con '{valor}' en lugar del valor nuevo (por defecto, el valor tal cual).
+    """
+    vigentes = vigentes or {}
+    asignar = asignar or {}
+    asignaciones = ", ".join(
+        f"{col} = CASE WHEN %({col}__set)s "
+        f"THEN {asignar.get(col, '{valor}').format(valor=f'%({col})s::{tipo}')} "
+        f"ELSE {vigentes.get(col, f'{tabla}.{col}')} END"
+        for col, tipo in columnas.items()
+    )
+    retorno = ", ".join(f"{tabla}.{col.strip()}" for col in returning.split(","))
+    return registro.registrar(nombre, f"""
+        UPDATE {tabla} SET {asignaciones}
+        FROM (SELECT * FROM {tabla} WHERE {where} FOR UPDATE) AS antes
+        WHERE {tabla}.{clave} = antes.{clave}
+        RETURNING {retorno}, to_jsonb(antes)::text AS antes
+    """)
+
+def parametros_actualizacion(columnas: dict, datos: dict, **condicion) -> dict:
+    """Construye los parámetros del UPDATE canónico a partir de los campos a modificar."""
+    params = dict(condicion)
+    for col in columnas:
+        params[f"{col}__set"] = col in datos
+        valor = datos.get(col)
+        params[col] = None if valor is None else str(valor)
+    return params
+
+# --- Borrados masivos ---
+# Borrar de uno en uno cuesta una petición por ID, y los registros referenciados
+# solo se detectan al capturar la violación de clave foránea. El borrado masivo
+# lo resuelve en conjunto: primero bloquea las filas pedidas (FOR UPDATE, para
+# que ninguna venta o producto nuevo las referencie mientras tanto) y después
+# una sola sentencia marca las referenciadas con un semi-join por cada tabla
+# que las referencia, borra el resto y retorna el estado de cada ID.
+
+def registrar_borrado_masivo(nombre: str, tabla: str, clave: str, referencias: dict) -> tuple:
+    """
+    Registra las dos sentencias del borrado masivo de 'tabla' por su 'clave'.
+    Ambas reciben la lista de IDs en el parámetro %(ids)s.
+
+    Args:
+        referencias (dict): tabla -> columna que referencia 'clave' con ON DELETE RESTRICT.
+
+    Returns:
+        (bloquear, borrar): 'borrar' retorna (id, estado, antes) por cada ID
+        distinto, con estado 'eliminado', 'referenciado' o 'no_encontrado' y,
+        si se eliminó, la fila borrada en JSON ('antes') para la auditoría.
+    """
+    referenciado = " OR ".join(
+        f"EXISTS (SELECT 1 FROM {ref} r WHERE r.{columna} = e.id)" for ref, columna in referencias.items()
+    )
+    bloquear = registro.registrar(f"{nombre}_bloquear", f"""
+        SELECT 1 FROM {tabla} WHERE {clave} = ANY(%(ids)s::int[]) ORDER BY {clave} FOR UPDATE
+    """)
+    borrar = registro.registrar(nombre, f"""
+        WITH estado AS (
+            SELECT e.id, t.{clave} IS NOT NULL AS existe, {referenciado} AS referenciado
+            FROM (SELECT DISTINCT unnest(%(ids)s::int[]) AS id) e
+            LEFT JOIN {tabla} t ON t.{clave} = e.id
+        ), borrados AS (
+            DELETE FROM {tabla} t USING estado e
+            WHERE t.{clave} = e.id AND e.existe AND NOT e.referenciado
+            RETURNING t.{clave} AS id, to_jsonb(t)::text AS antes
+        )
+        SELECT e.id,
+               CASE WHEN b.id IS NOT NULL THEN 'eliminado'
+                    WHEN e.existe THEN 'referenciado'
+                    ELSE 'no_encontrado' END AS estado,
+               b.antes
+        FROM estado e LEFT JOIN borrados b ON b.id = e.id
+        ORDER BY e.id
+    """)
+    return bloquear, borrar
@@ -1,18 +1,448 @@
+import itertools
 import os
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 import psycopg
+from psycopg import pq
+from psycopg.types.numeric import Int8Dumper
+from psycopg_pool import ConnectionPool
 from dotenv import load_dotenv
 
+from app.db.consultas import registro
+
 # Carga las variables del archivo .env (como DATABASE_URL)
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Creamos una función simple para obtener una conexión
-def get_db_connection():
+# --- Configuración del pool de conexiones ---
+# Cada proceso worker tiene su propio pool. En producción el lanzador
+# (gunicorn.conf.py) reparte el presupuesto global de conexiones de Postgres
+# entre los workers y fija DB_POOL_MAX_SIZE antes de crearlos.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+# Segundos que una petición espera por una conexión libre antes de fallar
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _configurar_conexion(conn):
+    """
+    Ajustes de cada conexión nueva del pool.
+    psycopg envía los int de Python como smallint, integer o bigint según su
+    magnitud, y cada combinación de tipos crea una sentencia preparada distinta.
+    Enviándolos siempre como bigint, cada consulta registrada en app/db/consultas.py
+    se prepara una sola vez por conexión.
+    Las lecturas por clave del registro se preparan ya aquí, antes de que la
+    conexión atienda su primera petición.
+    """
+    conn.adapters.register_dumper(int, Int8Dumper)
+    registro.precalentar(conn)
+
+def get_pool():
+    """
+    Retorna el pool de conexiones del proceso, creándolo la primera vez.
+    El pool se crea de forma perezosa para que cada worker abra sus propias
+    conexiones después del fork (arranque sin estado compartido).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    # Autocommit: las lecturas no dejan transacciones abiertas al devolver
+                    # la conexión; las escrituras usan 'with conn.transaction()'.
+                    kwargs={"autocommit": True},
+                    configure=_configurar_conexion,
+                    name="bazar",
+                    open=True,
+                )
+    return _pool
+
+def abrir_pool(timeout: float = 30.0):
+    """
+    Abre el pool y espera a que las conexiones mínimas estén listas.
+    Se llama al arrancar el worker, antes de aceptar tráfico.
+    """
+    get_pool().wait(timeout=timeout)
+
+def precalentar_pool():
+    """
+    Prepara las consultas del registro en las conexiones mínimas del pool.
+    Las conexiones nuevas ya se preparan al abrirse (_configurar_conexion),
+    pero las primeras se abren mientras se importa la app, antes de que los
+    módulos CRUD registren sus consultas. El pool presta las conexiones
+    libres por turnos, así que pidiendo una tras otra se recorren todas.
+    """
+    pool = get_pool()
+    for _ in range(DB_POOL_MIN_SIZE):
+        with pool.connection() as conn:
+            registro.precalentar(conn)
+
+def cerrar_pool():
+    """Cierra el pool del proceso y los de las réplicas (drenado al recibir SIGTERM)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    for replica in _replicas:
+        replica.cerrar()
+
+# Obtiene una conexión del pool del proceso.
+# Con lectura=True (funciones CRUD de solo lectura) la conexión sale de una
+# réplica si hay alguna sana y al día para la petición en curso.
+def get_db_connection(lectura: bool = False):
+    if lectura and _replicas:
+        conn = _conexion_replica()
+        if conn is not None:
+            return conn
     try:
-        # Intenta conectarse a la base de datos
-        conn = psycopg.connect(DATABASE_URL)
+        # Toma una conexión del pool (espera como máximo DB_POOL_TIMEOUT segundos)
+        conn = get_pool().getconn()
         return conn
     except Exception as e:
         print(f"Error al conectar a la base de datos: {e}")
-        return None
\ No newline at end of file
+        return None
+
+# Devuelve una conexión al pool en lugar de cerrarla
+def release_db_connection(conn):
+    if conn is None:
+        return
+    try:
+        _pool_de_conexion.pop(conn, get_pool()).putconn(conn)
+    except Exception as e:
+        print(f"Error al devolver la conexión al pool: {e}")
+        conn.close()
+
+# --- Réplicas de lectura ---
+# DATABASE_REPLICA_URLS: DSNs de réplicas en streaming de DATABASE_URL,
+# separados por comas. Cada worker abre un pool por réplica y un hilo vigila
+# cada REPLICA_CHECK_INTERVAL segundos su salud y el LSN que han reproducido.
+# Una lectura va a la primaria si ninguna réplica está sana, si todas van por
+# detrás del LSN exigido (lecturas propias, ver app/lecturas_propias.py, o
+# cargas de caché tras una escritura) o si no hay conexión libre de réplica.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+# Segundos de espera por una conexión de réplica antes de leer de la primaria
+REPLICA_POOL_TIMEOUT = float(os.getenv("REPLICA_POOL_TIMEOUT", "0.5"))
+# Conexiones máximas de cada pool de réplica (gunicorn.conf.py la reparte)
+DB_REPLICA_POOL_MAX_SIZE = int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", str(DB_POOL_MAX_SIZE)))
+# Retraso máximo (en MB de WAL sin reproducir) para seguir usando una réplica
+REPLICA_MAX_RETRASO_MB = float(os.getenv("REPLICA_MAX_RETRASO_MB", "16"))
+
+# LSN exigido que ninguna réplica alcanza: la petición lee solo de la primaria
+SOLO_PRIMARIA = float("inf")
+
+def lsn_a_entero(lsn: str) -> int:
+    """Convierte un LSN de Postgres ('16/B374D848') en un entero comparable."""
+    alto, _, bajo = lsn.partition("/")
+    return (int(alto, 16) << 32) + int(bajo, 16)
+
+class Replica:
+    """Una réplica de lectura: su pool (perezoso, como el de la primaria) y su estado."""
+
+    def __init__(self, indice: int, url: str):
+        self.nombre = f"bazar-replica-{indice}"
+        self.url = url
+        self.sana = False
+        self.lsn = 0 # Último LSN reproducido
+        self.retraso_bytes = None
+        self.error = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self.url,
+                        min_size=min(DB_POOL_MIN_SIZE, DB_REPLICA_POOL_MAX_SIZE),
+                        max_size=DB_REPLICA_POOL_MAX_SIZE,
+                        timeout=REPLICA_POOL_TIMEOUT,
+                        kwargs={"autocommit": True},
+                        configure=_configurar_conexion,
+                        # Comprueba cada conexión al prestarla: si la réplica cayó
+                        # desde la última vigilancia, la lectura pasa a la primaria
+                        # en lugar de fallar con la conexión rota.
+                        check=ConnectionPool.check_connection,
+                        name=self.nombre,
+                        open=True,
+                    )
+        return self._pool
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+        self.sana = False
+
+    def comprobar(self, lsn_primaria):
+        """Consulta si sigue en recuperación y cuánto WAL ha reproducido."""
+        try:
+            with self.pool().connection(timeout=REPLICA_POOL_TIMEOUT) as conn:
+                en_recuperacion, lsn = conn.execute(
+                    "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text"
+                ).fetchone()
+        except Exception as error:
+            self._marcar(False, str(error).strip() or type(error).__name__)
+            return
+        if not en_recuperacion or lsn is None:
+            # Promocionada o sin replicación: sus datos pueden divergir de la primaria
+            self._marcar(False, "no está replicando (pg_is_in_recovery() = false)")
+            return
+        self.lsn = lsn_a_entero(lsn)
+        self.retraso_bytes = max(0, lsn_primaria - self.lsn) if lsn_primaria is not None else None
+        if self.retraso_bytes is not None and self.retraso_bytes > REPLICA_MAX_RETRASO_MB * 1024 * 1024:
+            self._marcar(False, f"retraso de {self.retraso_bytes} bytes de WAL")
+        else:
+            self._marcar(True, None)
+
+    def _marcar(self, sana: bool, error):
+        if sana != self.sana:
+            print(f"Réplica {self.nombre}: {'sana' if sana else f'fuera de servicio ({error})'}")
+        self.sana, self.error = sana, error
+
+    def estado(self) -> dict:
+        return {"nombre": self.nombre, "sana": self.sana, "lsn": self.lsn,
+                "retraso_bytes": self.retraso_bytes, "error": self.error}
+
+_replicas = [Replica(indice, url) for indice, url in enumerate(DATABASE_REPLICA_URLS, start=1)]
+_turno = itertools.count() # Reparto round-robin entre las réplicas elegibles
+# Pool del que salió cada conexión de réplica (para devolverla a su pool)
+_pool_de_conexion = weakref.WeakKeyDictionary()
+
+# LSN de la primaria que debe haber reproducido una réplica para servir las
+# lecturas de la petición en curso (None: cualquiera sana vale)
+_lsn_minimo = ContextVar("lsn_minimo", default=None)
+
+# Escrituras anunciadas por NOTIFY (invalidación de cachés): hasta que el
+# vigilante anota un LSN de la primaria posterior a la última, las cargas de
+# caché (lecturas_para_cache) van a la primaria. Así una caché invalidada no
+# se rellena desde una réplica que aún no tiene la escritura.
+_para_cache = ContextVar("para_cache", default=False)
+_escrituras_lock = threading.Lock()
+_escrituras_notificadas = 0
+_escrituras_vistas = 0
+_lsn_escrituras = 0
+
+def hay_replicas() -> bool:
+    return bool(_replicas)
+
+def estado_replicas() -> list:
+    return [replica.estado() for replica in _replicas]
+
+@contextmanager
+def lecturas_desde(lsn):
+    """
+    Exige, dentro del bloque (y en los hilos que copian su contexto, como los
+    endpoints síncronos de FastAPI), que las lecturas vengan de una réplica
+    que haya reproducido al menos 'lsn'. SOLO_PRIMARIA las lleva a la primaria.
+    """
+    token = _lsn_minimo.set(lsn)
+    try:
+        yield
+    finally:
+        _lsn_minimo.reset(token)
+
+# LSN de las escrituras de la petición en curso (ver app/lecturas_propias.py):
+# cada transacción de escritura anota el de su commit, consultado en el mismo
+# viaje de ida y vuelta que el COMMIT (ver transaccion y transaccion_pipeline).
+_lsn_commits = ContextVar("lsn_commits", default=None)
+
+@contextmanager
+def anotar_lsn_commits():
+    """
+    Anota, dentro del bloque (y en los hilos que copian su contexto), el LSN
+    del commit de cada transacción de escritura. Retorna la lista de LSN.
+    """
+    lsns = []
+    token = _lsn_commits.set(lsns)
+    try:
+        yield lsns
+    finally:
+        _lsn_commits.reset(token)
+
+@contextmanager
+def lecturas_para_cache():
+    """Marca las lecturas del bloque como carga de una caché invalidada por NOTIFY."""
+    token = _para_cache.set(True)
+    try:
+        yield
+    finally:
+        _para_cache.reset(token)
+
+def lsn_primaria():
+    """LSN de WAL actual de la primaria (texto), o None si no se pudo consultar."""
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        return conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+    except (Exception, psycopg.Error) as error:
+        print(f"Error al consultar el LSN de la primaria: {error}")
+        return None
+    finally:
+        release_db_connection(conn)
+
+def notificar_escritura():
+    """Anota una escritura confirmada en la primaria (llamada desde la escucha de NOTIFY)."""
+    global _escrituras_notificadas
+    with _escrituras_lock:
+        _escrituras_notificadas += 1
+
+def _conexion_replica():
+    exigido = _lsn_minimo.get() or 0
+    if _para_cache.get():
+        if _escrituras_notificadas != _escrituras_vistas:
+            return None
+        exigido = max(exigido, _lsn_escrituras)
+    elegibles = [replica for replica in _replicas if replica.sana and replica.lsn >= exigido]
+    inicio = next(_turno)
+    for desplazamiento in range(len(elegibles)):
+        replica = elegibles[(inicio + desplazamiento) % len(elegibles)]
+        pool = replica.pool()
+        try:
+            conn = pool.getconn()
+        except Exception as error:
+            print(f"Sin conexión de la réplica {replica.nombre}, se prueba la siguiente: {error}")
+            replica.sana = False # Hasta que la vigilancia la vuelva a ver sana
+            continue
+        _pool_de_conexion[conn] = pool
+        return conn
+    return None
+
+def _comprobar_replicas():
+    global _escrituras_vistas, _lsn_escrituras
+    notificadas = _escrituras_notificadas
+    lsn = lsn_primaria()
+    lsn = lsn_a_entero(lsn) if lsn else None
+    if lsn is not None and notificadas != _escrituras_vistas:
+        # Este LSN es posterior al commit de todas las escrituras notificadas
+        _lsn_escrituras, _escrituras_vistas = lsn, notificadas
+    for replica in _replicas:
+        replica.comprobar(lsn)
+
+_vigilancia_detener = threading.Event()
+_vigilancia_hilo = None
+
+def _vigilar_replicas():
+    while not _vigilancia_detener.wait(REPLICA_CHECK_INTERVAL):
+        _comprobar_replicas()
+
+def iniciar_vigilancia_replicas():
+    """
+    Comprueba las réplicas una vez (para poder usarlas desde la primera
+    petición) y arranca el hilo que las vigila. Sin réplicas no hace nada.
+    """
+    global _vigilancia_hilo
+    if not _replicas or _vigilancia_hilo is not None:
+        return
+    _comprobar_replicas()
+    _vigilancia_detener.clear()
+    _vigilancia_hilo = threading.Thread(target=_vigilar_replicas, name="vigilancia-replicas", daemon=True)
+    _vigilancia_hilo.start()
+
+def detener_vigilancia_replicas(timeout: float = 5.0):
+    global _vigilancia_hilo
+    _vigilancia_detener.set()
+    if _vigilancia_hilo is not None:
+        _vigilancia_hilo.join(timeout=timeout)
+        _vigilancia_hilo = None
+
+# --- Transacciones de escritura ---
+@contextmanager
+def transaccion(conn):
+    """
+    Equivale a 'with conn.transaction()'. Si se anotan los LSN de la petición
+    (anotar_lsn_commits), el COMMIT y la consulta del LSN se envían juntos en
+    modo pipeline: el LSN cubre el commit y no cuesta un viaje más.
+    """
+    lsns = _lsn_commits.get()
+    if lsns is None or conn.info.transaction_status != pq.TransactionStatus.IDLE:
+        with conn.transaction():
+            yield
+        return
+    conn.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        _deshacer(conn)
+        raise
+    try:
+        with conn.pipeline():
+            conn.execute("COMMIT")
+            lsn = conn.execute("SELECT pg_current_wal_lsn()::text")
+    except BaseException:
+        _deshacer(conn)
+        raise
+    lsns.append(lsn.fetchone()[0])
+
+# --- Transacciones en modo pipeline ---
+@contextmanager
+def transaccion_pipeline(conn):
+    """
+    Transacción en modo pipeline de psycopg.
+
+    Las sentencias ejecutadas dentro del bloque solo se encolan: BEGIN, las
+    sentencias y COMMIT se envían juntos al salir del bloque y sus resultados
+    se leen en un único viaje de ida y vuelta. Por eso los resultados (filas,
+    rowcount) se consultan DESPUÉS del bloque, con la transacción ya confirmada;
+    leerlos dentro obliga a un viaje extra.
+    Si una sentencia falla, el servidor descarta las siguientes, el error se
+    lanza al salir del bloque con su tipo habitual (p. ej. ForeignKeyViolation)
+    y la transacción se deshace entera.
+
+    Uso:
+        with conn.cursor() as cur:
+            with transaccion_pipeline(conn):
+                cur.execute(...)
+                cur.execute(...)
+            filas = cur.rowcount
+    """
+    lsns = _lsn_commits.get()
+    lsn = None
+    error_bloque = None
+    try:
+        with conn.pipeline():
+            conn.execute("BEGIN")
+            try:
+                yield
+                conn.execute("COMMIT")
+                if lsns is not None:
+                    # Leído en el mismo viaje que el COMMIT (ver anotar_lsn_commits)
+                    lsn = conn.execute("SELECT pg_current_wal_lsn()::text")
+            except psycopg.Error as error:
+                # psycopg puede recibir el error de una sentencia antes de salir
+                # del bloque; se relanza después de cerrar el pipeline.
+                error_bloque = error
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    except psycopg.errors.PipelineAborted:
+        # Sentencias descartadas por el servidor tras el error ya capturado
+        if error_bloque is None:
+            _deshacer(conn)
+            raise
+    except BaseException:
+        _deshacer(conn)
+        raise
+    if error_bloque is not None:
+        _deshacer(conn)
+        raise error_bloque
+    if lsn is not None:
+        lsns.append(lsn.fetchone()[0])
+
+def _deshacer(conn):
+    """Tras un error del servidor la transacción queda abortada (el COMMIT se descartó)."""
+    if conn.info.transaction_status != pq.TransactionStatus.IDLE:
+        conn.rollback()
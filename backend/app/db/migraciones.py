@@ -0,0 +1,286 @@
+"""
+Migraciones versionadas del esquema.
+
+database/schema.sql crea la base inicial; los cambios posteriores son
+migraciones numeradas en database/migraciones/, en uno de dos formatos:
+
+  - NNNN_nombre.up.sql y NNNN_nombre.down.sql
+  - NNNN_nombre.py con las funciones up(conn) y down(conn)
+
+Cada migración se aplica en su propia transacción y se anota en la tabla
+'esquema_migraciones' con el checksum (SHA-256) de su fichero. Si un fichero ya
+aplicado cambia, el runner se niega a continuar. Un lock de sesión (advisory
+lock) impide que dos ejecuciones migren a la vez.
+
+Las operaciones que no admiten transacción (CREATE INDEX CONCURRENTLY) van en
+migraciones sin transacción: un .sql cuya primera línea es '-- sin transaccion'
+(se ejecuta sentencia a sentencia) o un .py con TRANSACCION = False. Si una
+migración sin transacción falla a medias no se anota, y debe poder repetirse.
+
+Uso (desde backend/, con DATABASE_URL apuntando a la base):
+    python -m app.db.migraciones estado
+    python -m app.db.migraciones aplicar [--hasta N]
+    python -m app.db.migraciones revertir [--pasos N]
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import time
+
+import psycopg
+from psycopg import sql
+
+from app.db.database import DATABASE_URL
+
+MIGRACIONES_DIR = os.getenv(
+    "MIGRACIONES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "database", "migraciones"),
+)
+# Espera máxima por un lock en las migraciones con transacción: mejor fallar
+# que dejar en cola todas las peticiones detrás de un ALTER TABLE.
+MIGRACIONES_LOCK_TIMEOUT = os.getenv("MIGRACIONES_LOCK_TIMEOUT", "5s")
+
+MARCA_SIN_TRANSACCION = "-- sin transaccion"
+_PATRON_FICHERO = re.compile(r"^(\d{4})_(\w+?)(\.up\.sql|\.down\.sql|\.py)$")
+
+class ErrorMigracion(Exception):
+    """Las migraciones del directorio no cuadran con las aplicadas en la base."""
+
+class Migracion:
+    """Una migración del directorio (SQL o Python)."""
+
+    def __init__(self, version: int, nombre: str):
+        self.version = version
+        self.nombre = nombre
+        self.ficheros = {}
+
+    @property
+    def checksum(self) -> str:
+        # El checksum cubre el código que se aplica (up), no el de revertir
+        fichero = self.ficheros.get(".up.sql") or self.ficheros[".py"]
+        with open(fichero, "rb") as origen:
+            return hashlib.sha256(origen.read()).hexdigest()
+
+    def _modulo(self):
+        spec = importlib.util.spec_from_file_location(f"migracion_{self.version:04d}", self.ficheros[".py"])
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        return modulo
+
+    def transaccional(self, sentido: str) -> bool:
+        if ".py" in self.ficheros:
+            return getattr(self._modulo(), "TRANSACCION", True)
+        with open(self.ficheros[f".{sentido}.sql"], encoding="utf-8") as origen:
+            return origen.readline().strip().lower() != MARCA_SIN_TRANSACCION
+
+    def ejecutar(self, conn, sentido: str):
+        """Ejecuta 'up' o 'down' en la conexión (la transacción la gestiona quien llama)."""
+        if ".py" in self.ficheros:
+            getattr(self._modulo(), sentido)(conn)
+            return
+        with open(self.ficheros[f".{sentido}.sql"], encoding="utf-8") as origen:
+            script = origen.read()
+        if self.transaccional(sentido):
+            conn.execute(script)
+        else:
+            # Fuera de una transacción cada sentencia debe enviarse por separado
+            for sentencia in _sentencias(script):
+                conn.execute(sentencia)
+
+def _sentencias(script: str) -> list:
+    """Divide un script en sentencias (terminadas en ';' al final de línea), sin comentarios."""
+    sentencias = []
+    for trozo in re.split(r";[ \t]*$", script, flags=re.MULTILINE):
+        lineas = [linea for linea in trozo.splitlines() if not linea.strip().startswith("--")]
+        sentencia = "\n".join(lineas).strip()
+        if sentencia:
+            sentencias.append(sentencia)
+    return sentencias
+
+def descubrir(directorio: str = MIGRACIONES_DIR) -> list:
+    """Migraciones del directorio ordenadas por versión."""
+    migraciones = {}
+    for fichero in sorted(os.listdir(directorio)):
+        coincidencia = _PATRON_FICHERO.match(fichero)
+        if not coincidencia:
+            continue
+        version, nombre, tipo = int(coincidencia[1]), coincidencia[2], coincidencia[3]
+        migracion = migraciones.setdefault(version, Migracion(version, nombre))
+        if migracion.nombre != nombre:
+            raise ErrorMigracion(f"La versión {version:04d} tiene dos nombres: {migracion.nombre} y {nombre}")
+        migracion.ficheros[tipo] = os.path.join(directorio, fichero)
+    for migracion in migraciones.values():
+        if ".py" not in migracion.ficheros and not {".up.sql", ".down.sql"} <= migracion.ficheros.keys():
+            raise ErrorMigracion(f"{migracion.version:04d}_{migracion.nombre}: falta el .up.sql o el .down.sql")
+    return [migraciones[version] for version in sorted(migraciones)]
+
+def _aplicadas(conn) -> dict:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS esquema_migraciones (
+            version INT PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            aplicada TIMESTAMPTZ NOT NULL DEFAULT now(),
+            duracion_ms INT NOT NULL
+        )
+    """)
+    filas = conn.execute("SELECT version, nombre, checksum FROM esquema_migraciones ORDER BY version").fetchall()
+    return {version: (nombre, checksum) for version, nombre, checksum in filas}
+
+def _verificar(migraciones: list, aplicadas: dict):
+    """Comprueba que cada migración aplicada sigue en el directorio y sin cambios."""
+    por_version = {migracion.version: migracion for migracion in migraciones}
+    for version, (nombre, checksum) in aplicadas.items():
+        migracion = por_version.get(version)
+        if migracion is None:
+            raise ErrorMigracion(f"La migración aplicada {version:04d}_{nombre} no está en {MIGRACIONES_DIR}")
+        if migracion.checksum != checksum:
+            raise ErrorMigracion(f"{version:04d}_{nombre} cambió después de aplicarse (checksum distinto)")
+
+class _Bloqueo:
+    """Advisory lock de sesión: una sola ejecución del runner a la vez."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("SELECT pg_advisory_lock(hashtext('esquema_migraciones'))")
+
+    def __exit__(self, *exc):
+        self.conn.execute("SELECT pg_advisory_unlock(hashtext('esquema_migraciones'))")
+
+def _ejecutar(conn, migracion: Migracion, sentido: str):
+    """Aplica o revierte una migración y actualiza 'esquema_migraciones'."""
+    inicio = time.perf_counter()
+    if migracion.transaccional(sentido):
+        with conn.transaction():
+            conn.execute(sql.SQL("SET LOCAL lock_timeout = {}").format(sql.Literal(MIGRACIONES_LOCK_TIMEOUT)))
+            migracion.ejecutar(conn, sentido)
+            _anotar(conn, migracion, sentido, inicio)
+    else:
+        migracion.ejecutar(conn, sentido)
+        _anotar(conn, migracion, sentido, inicio)
+
+def _anotar(conn, migracion: Migracion, sentido: str, inicio: float):
+    if sentido == "up":
+        conn.execute(
+            "INSERT INTO esquema_migraciones (version, nombre, checksum, duracion_ms) VALUES (%s, %s, %s, %s)",
+            (migracion.version, migracion.nombre, migracion.checksum, int((time.perf_counter() - inicio) * 1000)),
+        )
+    else:
+        conn.execute("DELETE FROM esquema_migraciones WHERE version = %s", (migracion.version,))
+
+def aplicar(conn, hasta: int = None) -> list:
+    """Aplica en orden las migraciones pendientes (hasta la versión 'hasta', incluida)."""
+    with _Bloqueo(conn):
+        migraciones = descubrir()
+        aplicadas = _aplicadas(conn)
+        _verificar(migraciones, aplicadas)
+        hechas = []
+        for migracion in migraciones:
+            if migracion.version in aplicadas or (hasta is not None and migracion.version > hasta):
+                continue
+            print(f"Aplicando {migracion.version:04d}_{migracion.nombre}...")
+            _ejecutar(conn, migracion, "up")
+            hechas.append(migracion)
+        return hechas
+
+def revertir(conn, pasos: int = 1) -> list:
+    """Revierte las 'pasos' últimas migraciones aplicadas, de la más reciente a la más antigua."""
+    with _Bloqueo(conn):
+        migraciones = {migracion.version: migracion for migracion in descubrir()}
+        aplicadas = _aplicadas(conn)
+        _verificar(list(migraciones.values()), aplicadas)
+        hechas = []
+        for version in sorted(aplicadas, reverse=True)[:pasos]:
+            migracion = migraciones[version]
+            print(f"Revirtiendo {migracion.version:04d}_{migracion.nombre}...")
+            _ejecutar(conn, migracion, "down")
+            hechas.append(migracion)
+        return hechas
+
+def estado(conn) -> list:
+    """Lista (versión, nombre, aplicada o None) de todas las migraciones."""
+    migraciones = descubrir()
+    _verificar(migraciones, _aplicadas(conn))
+    fechas = dict(conn.execute("SELECT version, aplicada FROM esquema_migraciones").fetchall())
+    return [(m.version, m.nombre, fechas.get(m.version)) for m in migraciones]
+
+# --- Utilidades para migraciones en Python ---
+
+def crear_indice_concurrente(conn, nombre: str, tabla: str, columnas: str):
+    """
+    CREATE INDEX CONCURRENTLY, sin bloquear las escrituras de la tabla.
+
+    Postgres no admite CONCURRENTLY sobre una tabla particionada: en ese caso se
+    crea el índice solo en la tabla padre (ON ONLY, inválido mientras le falten
+    particiones), se construye CONCURRENTLY el de cada partición y se le
+    adjunta. Las particiones que se creen después lo heredan.
+    Usar en migraciones con TRANSACCION = False. Se puede repetir tras un fallo.
+    """
+    columnas_sql = sql.SQL(columnas)
+    particionada = conn.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (tabla,)
+    ).fetchone()[0]
+    if not particionada:
+        # Un intento anterior fallido deja el índice INVALID: se rehace
+        conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(nombre)))
+        conn.execute(sql.SQL("CREATE INDEX CONCURRENTLY {} ON {} ({})").format(
+            sql.Identifier(nombre), sql.Identifier(tabla), columnas_sql))
+        return
+
+    conn.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON ONLY {} ({})").format(
+        sql.Identifier(nombre), sql.Identifier(tabla), columnas_sql))
+    pendientes = conn.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %(tabla)s::regclass
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_inherits ii JOIN pg_index x ON x.indexrelid = ii.inhrelid
+              WHERE ii.inhparent = %(indice)s::regclass AND x.indrelid = c.oid
+          )
+        ORDER BY c.relname
+    """, {"tabla": tabla, "indice": nombre}).fetchall()
+    for (particion,) in pendientes:
+        indice_particion = f"{particion}_{nombre}"[:63]
+        conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(indice_particion)))
+        conn.execute(sql.SQL("CREATE INDEX CONCURRENTLY {} ON {} ({})").format(
+            sql.Identifier(indice_particion), sql.Identifier(particion), columnas_sql))
+        conn.execute(sql.SQL("ALTER INDEX {} ATTACH PARTITION {}").format(
+            sql.Identifier(nombre), sql.Identifier(indice_particion)))
+
+def eliminar_indice(conn, nombre: str):
+    """DROP INDEX, CONCURRENTLY salvo en índices de tablas particionadas (no lo admiten)."""
+    particionado = conn.execute(
+        "SELECT relkind = 'I' FROM pg_class WHERE oid = to_regclass(%s)", (nombre,)
+    ).fetchone()
+    if particionado is None:
+        return
+    concurrente = sql.SQL("") if particionado[0] else sql.SQL("CONCURRENTLY ")
+    conn.execute(sql.SQL("DROP INDEX {}IF EXISTS {}").format(concurrente, sql.Identifier(nombre)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+    ordenes.add_parser("estado", help="Lista las migraciones y cuáles están aplicadas")
+    orden_aplicar = ordenes.add_parser("aplicar", help="Aplica las migraciones pendientes")
+    orden_aplicar.add_argument("--hasta", type=int, help="Última versión a aplicar")
+    orden_revertir = ordenes.add_parser("revertir", help="Revierte las últimas migraciones aplicadas")
+    orden_revertir.add_argument("--pasos", type=int, default=1)
+    args = parser.parse_args()
+
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        try:
+            if args.orden == "estado":
+                for version, nombre, aplicada in estado(conn):
+                    print(f"{version:04d}_{nombre:<40} {aplicada.isoformat(timespec='seconds') if aplicada else 'pendiente'}")
+            elif args.orden == "aplicar":
+                print(f"{len(aplicar(conn, args.hasta))} migraciones aplicadas.")
+            else:
+                print(f"{len(revertir(conn, args.pasos))} migraciones revertidas.")
+        except ErrorMigracion as error:
+            raise SystemExit(f"Error: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import threading
+import psycopg
+from psycopg import sql
+
+from app.db.database import DATABASE_URL
+
+# --- Escucha de notificaciones de Postgres (LISTEN/NOTIFY) ---
+# Cada proceso worker mantiene UNA conexión dedicada en modo LISTEN y reparte
+# las notificaciones recibidas entre los suscriptores registrados por canal.
+# Esta conexión no sale del pool: cuenta aparte dentro del presupuesto.
+
+class EscuchaNotificaciones:
+    """
+    Hilo en segundo plano que escucha canales de Postgres y despacha cada
+    notificación a las funciones suscritas. Los callbacks se ejecutan en el
+    hilo de escucha, por lo que deben ser rápidos y no bloquear.
+    """
+
+    def __init__(self):
+        self._suscriptores = {} # canal -> lista de callbacks(payload: str)
+        self._al_reconectar = [] # callbacks sin argumentos
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def suscribir(self, canal: str, callback):
+        """
+        Registra un callback para un canal. Las suscripciones deben hacerse
+        antes de llamar a iniciar() (normalmente al importar el módulo).
+        """
+        with self._lock:
+            self._suscriptores.setdefault(canal, []).append(callback)
+
+    def al_reconectar(self, callback):
+        """
+        Registra un callback que se llama cada vez que se (re)establece la
+        conexión de escucha: las notificaciones emitidas mientras estuvo caída
+        se pierden, así que los suscriptores deben asumir que todo cambió.
+        """
+        with self._lock:
+            self._al_reconectar.append(callback)
+
+    def iniciar(self):
+        """Arranca el hilo de escucha si hay canales suscritos."""
+        if self._hilo is not None or not self._suscriptores or not DATABASE_URL:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="escucha-notificaciones", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo de escucha y cierra su conexión."""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    def _despachar(self, canal: str, payload: str):
+        for callback in self._suscriptores.get(canal, []):
+            try:
+                callback(payload)
+            except Exception as error:
+                print(f"Error en suscriptor del canal '{canal}': {error}")
+
+    def _ejecutar(self):
+        espera = 1.0
+        while not self._detener.is_set():
+            try:
+                with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                    for canal in self._suscriptores:
+                        conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(canal)))
+                    for callback in self._al_reconectar:
+                        callback()
+                    espera = 1.0
+                    while not self._detener.is_set():
+                        # Espera notificaciones en tramos cortos para poder detenerse a tiempo
+                        for notificacion in conn.notifies(timeout=1.0):
+                            self._despachar(notificacion.channel, notificacion.payload)
+            except (Exception, psycopg.Error) as error:
+                print(f"Error en la escucha de notificaciones, reintentando en {espera:.0f}s: {error}")
+                self._detener.wait(espera)
+                espera = min(espera * 2, 30.0)
+
+# Instancia única por proceso
+escucha = EscuchaNotificaciones()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app.db.notificaciones import escucha
+
+# --- Difusión de cambios de stock y precio a los clientes (SSE) ---
+# Los triggers de 'producto' y 'detalle_venta' publican en el canal 'stock_cambios'
+# un JSON pequeño: {"id_producto", "cantidad_stock", "precio"} (o "eliminado").
+# La única escucha LISTEN del proceso entrega cada notificación al Difusor, que
+# la reparte entre todas las conexiones SSE abiertas en este worker.
+
+CANAL_STOCK = "stock_cambios"
+# Máximo de productos distintos pendientes por suscriptor lento antes de pedirle
+# que recargue el catálogo completo.
+SSE_MAX_PENDIENTES = int(os.getenv("SSE_MAX_PENDIENTES", "1000"))
+SSE_MAX_SUSCRIPTORES = int(os.getenv("SSE_MAX_SUSCRIPTORES", "10000"))
+
+class Suscripcion:
+    """
+    Cola de un cliente conectado. Los cambios pendientes se agrupan por
+    producto: si llega un cambio nuevo de un producto que aún no se envió,
+    reemplaza al anterior (el cliente solo necesita el último estado).
+    """
+
+    def __init__(self, max_pendientes: int):
+        self.pendientes = OrderedDict() # id_producto -> evento ya serializado
+        self.hay_datos = asyncio.Event()
+        self.desbordada = False
+        self._max_pendientes = max_pendientes
+
+    def encolar(self, id_producto, evento: str):
+        if self.desbordada:
+            return
+        if id_producto in self.pendientes:
+            self.pendientes.move_to_end(id_producto)
+        elif len(self.pendientes) >= self._max_pendientes:
+            # Consumidor demasiado lento: se descartan sus pendientes y se le
+            # indica que haga una recarga completa.
+            self.pendientes.clear()
+            self.desbordada = True
+        self.pendientes[id_producto] = evento
+        self.hay_datos.set()
+
+    def tomar_pendientes(self):
+        """Retorna y vacía los eventos pendientes, en orden de llegada."""
+        self.hay_datos.clear()
+        eventos = list(self.pendientes.values())
+        self.pendientes.clear()
+        return eventos
+
+class Difusor:
+    """Reparte los cambios recibidos por LISTEN entre las suscripciones del proceso."""
+
+    def __init__(self, max_pendientes: int, max_suscriptores: int):
+        self._suscripciones = set()
+        self._loop = None
+        self._max_pendientes = max_pendientes
+        self._max_suscriptores = max_suscriptores
+
+    def iniciar(self, loop: asyncio.AbstractEventLoop):
+        """Asocia el difusor al event loop del worker (se llama al arrancar)."""
+        self._loop = loop
+
+    @property
+    def lleno(self) -> bool:
+        return len(self._suscripciones) >= self._max_suscriptores
+
+    @property
+    def total_suscriptores(self) -> int:
+        return len(self._suscripciones)
+
+    @contextmanager
+    def suscribir(self):
+        suscripcion = Suscripcion(self._max_pendientes)
+        self._suscripciones.add(suscripcion)
+        try:
+            yield suscripcion
+        finally:
+            self._suscripciones.discard(suscripcion)
+
+    def publicar_desde_hilo(self, payload: str):
+        """Callback de la escucha LISTEN: pasa el cambio al event loop."""
+        if self._loop is None or not self._suscripciones:
+            return
+        try:
+            id_producto = json.loads(payload)["id_producto"]
+        except (ValueError, KeyError) as error:
+            print(f"Notificación de stock inválida ({payload!r}): {error}")
+            return
+        # El payload ya es JSON: se serializa una sola vez para todos los suscriptores
+        evento = f"event: stock\ndata: {payload}\n\n"
+        self._loop.call_soon_threadsafe(self._publicar, id_producto, evento)
+
+    def _publicar(self, id_producto, evento: str):
+        for suscripcion in self._suscripciones:
+            suscripcion.encolar(id_producto, evento)
+
+difusor = Difusor(SSE_MAX_PENDIENTES, SSE_MAX_SUSCRIPTORES)
+escucha.suscribir(CANAL_STOCK, difusor.publicar_desde_hilo)
@@ -0,0 +1,139 @@
+"""
+Job de archivado de ventas antiguas.
+
+Saca de Postgres los meses de ventas anteriores a los ARCHIVO_VENTAS_MESES_ACTIVOS
+últimos meses completos y los guarda comprimidos en ARCHIVO_VENTAS_DIR (ver
+app/archivo/ventas.py). Cada mes se archiva por separado y en este orden:
+
+  1. Se escribe y verifica su fichero (las ventas y detalles del mes).
+  2. Se registra en el manifiesto: desde ese momento la API lo lee del archivo.
+  3. Se borran sus particiones (venta_AAAA_MM y detalle_venta_AAAA_MM).
+
+Si el job se interrumpe entre 2 y 3, la siguiente ejecución solo borra las
+particiones. También archiva las particiones ya separadas con
+separar_particiones_venta() (ver database/schema.sql).
+
+Uso (desde backend/, p. ej. cada noche desde cron):
+    python -m app.jobs.archivar_ventas --meses-activos 12
+"""
+import argparse
+import os
+from datetime import date
+
+import psycopg
+from psycopg import sql
+
+from app.archivo import ventas as archivo
+from app.db.database import DATABASE_URL
+
+ARCHIVO_VENTAS_MESES_ACTIVOS = int(os.getenv("ARCHIVO_VENTAS_MESES_ACTIVOS", "12"))
+
+def _mes_anterior(mes: date, meses: int) -> date:
+    indice = mes.year * 12 + mes.month - 1 - meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+def _meses_en_postgres(conn) -> list:
+    """Meses con tabla venta_AAAA_MM, sea partición de 'venta' o tabla ya separada."""
+    cur = conn.execute("""
+        SELECT to_date(substr(relname, length('venta_') + 1), 'YYYY_MM')
+        FROM pg_class
+        WHERE relkind = 'r' AND relname ~ '^venta_[0-9]{4}_[0-9]{2}$' AND pg_table_is_visible(oid)
+        ORDER BY 1
+    """)
+    return [fila[0] for fila in cur.fetchall()]
+
+def _leer_mes(conn, tabla_venta: str, tabla_detalle: str):
+    """Genera las ventas del mes con sus detalles, en orden, con un cursor de servidor."""
+    if conn.execute("SELECT to_regclass(%s)", (tabla_detalle,)).fetchone()[0] is None:
+        detalles = sql.SQL("'[]'::json")
+    else:
+        detalles = sql.SQL("""COALESCE((
+            SELECT json_agg(json_build_object(
+                'id_producto', d.id_producto, 'cantidad', d.cantidad,
+                'precio_unitario', d.precio_unitario::text
+            ) ORDER BY d.id_producto)
+            FROM {detalle} d WHERE d.id_venta = v.id_venta
+        ), '[]')""").format(detalle=sql.Identifier(tabla_detalle))
+    consulta = sql.SQL("""
+        SELECT v.id_venta, v.id_cliente, v.fecha, v.monto_total, {detalles} AS detalles
+        FROM {venta} v
+        ORDER BY v.fecha, v.id_venta
+    """).format(detalles=detalles, venta=sql.Identifier(tabla_venta))
+    with conn.cursor(name="archivar_ventas") as cur:
+        cur.itersize = 5000
+        cur.execute(consulta)
+        columnas = None
+        for fila in cur:
+            columnas = columnas or [desc[0] for desc in cur.description]
+            yield dict(zip(columnas, fila))
+
+def _borrar_mes(conn, tabla_venta: str, tabla_detalle: str):
+    """Borra las particiones de un mes ya archivado (separando antes la de 'venta')."""
+    with conn.transaction():
+        # El detalle se borra primero: mientras exista, referencia a la venta
+        conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(tabla_detalle)))
+        particion = conn.execute(
+            "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s)", (tabla_venta,)
+        ).fetchone()
+        if particion:
+            conn.execute(sql.SQL("ALTER TABLE venta DETACH PARTITION {}").format(sql.Identifier(tabla_venta)))
+        conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(tabla_venta)))
+
+def archivar_ventas(meses_activos: int = ARCHIVO_VENTAS_MESES_ACTIVOS, hoy: date = None):
+    """
+    Archiva los meses anteriores a los 'meses_activos' últimos meses completos.
+
+    Returns:
+        list: Una entrada por mes tratado ('mes', 'ventas', 'detalles', 'bytes'),
+              o None si otra ejecución del job está en curso.
+    """
+    limite = _mes_anterior((hoy or date.today()).replace(day=1), meses_activos)
+    tratados = []
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        # Una sola ejecución a la vez (p. ej. si cron lo lanza en varias máquinas)
+        if not conn.execute("SELECT pg_try_advisory_lock(hashtext('archivar_ventas'))").fetchone()[0]:
+            return None
+        try:
+            for mes in _meses_en_postgres(conn):
+                if mes >= limite:
+                    break
+                sufijo = mes.strftime("%Y_%m")
+                tabla_venta, tabla_detalle = f"venta_{sufijo}", f"detalle_venta_{sufijo}"
+                entrada = archivo.meses_archivados().get(archivo.clave_mes(mes))
+                if entrada is None:
+                    with conn.transaction():
+                        esperadas = conn.execute(
+                            sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(tabla_venta))
+                        ).fetchone()[0]
+                        entrada = archivo.escribir_mes(mes, _leer_mes(conn, tabla_venta, tabla_detalle))
+                    if entrada["ventas"] != esperadas:
+                        raise RuntimeError(f"{tabla_venta}: {esperadas} ventas en Postgres, {entrada['ventas']} archivadas")
+                    entrada["archivado"] = archivo.marca_de_tiempo()
+                    archivo.registrar_mes(mes, entrada)
+                _borrar_mes(conn, tabla_venta, tabla_detalle)
+                # Las ventas de un mes archivado ya no se reenvían con su clave
+                conn.execute("DELETE FROM venta_idempotencia WHERE fecha < %s", (_mes_anterior(mes, -1),))
+                tratados.append({
+                    "mes": archivo.clave_mes(mes), "ventas": entrada["ventas"],
+                    "detalles": entrada["detalles"], "bytes": entrada["bytes"],
+                })
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(hashtext('archivar_ventas'))")
+    return tratados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses-activos", type=int, default=ARCHIVO_VENTAS_MESES_ACTIVOS,
+                        help="Meses completos que se conservan en Postgres")
+    args = parser.parse_args()
+
+    tratados = archivar_ventas(args.meses_activos)
+    if tratados is None:
+        print("Ya hay un archivado en curso.")
+        return
+    for mes in tratados:
+        print(f"{mes['mes']}: {mes['ventas']} ventas, {mes['detalles']} detalles, {mes['bytes']} bytes")
+    print(f"{len(tratados)} meses archivados en {archivo.ARCHIVO_VENTAS_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+COPY en formato binario entre Postgres y arrays de NumPy, para los jobs que
+procesan tablas enteras (app/jobs/recomendaciones.py, app/jobs/reabastecimiento.py).
+
+  - leer_arrays(): libpq entrega el COPY fila a fila, así que la consulta
+    agrupa antes los valores en arrays (array_agg) y cada fila trae miles.
+  - copiar(): escribe los arrays como filas del formato binario de COPY, sin
+    pasar por objetos de Python.
+"""
+import numpy as np
+from psycopg import sql
+
+FILAS_POR_ESCRITURA = 2_000_000
+
+# Formato binario de COPY: cabecera (firma, flags, extensión vacía), una fila
+# por registro (número de campos y, por campo, su longitud y su valor) y fin.
+CABECERA_COPY = b"PGCOPY\n\xff\r\n\x00" + bytes(8)
+FIN_COPY = b"\xff\xff"
+# Formato binario de un array de una dimensión sin NULL: cabecera
+# (dimensiones, flags, tipo, tamaño y límite inferior) y longitud y valor de cada elemento
+CABECERA_ARRAY = 20
+ELEMENTOS = {
+    "int4": (np.dtype([("longitud", ">i4"), ("valor", ">i4")]), np.int32),
+    "int8": (np.dtype([("longitud", ">i4"), ("valor", ">i8")]), np.int64),
+}
+
+# Tipo binario de Postgres de cada dtype de NumPy (int4 para los demás)
+TIPOS_BINARIOS = {np.dtype(np.int16): ">i2", np.dtype(np.float32): ">f4", np.dtype(np.float64): ">f8"}
+
+def array_numpy(datos: bytes, tipo: str = "int4") -> np.ndarray:
+    """Convierte un int4[] o int8[] en formato binario (array_send) a un array int32 o int64."""
+    elemento, dtype = ELEMENTOS[tipo]
+    return np.frombuffer(datos, elemento, offset=CABECERA_ARRAY)["valor"].astype(dtype)
+
+def leer_arrays(conn, consulta: sql.Composable, tipos) -> list:
+    """
+    Ejecuta 'consulta', un COPY ... TO STDOUT (FORMAT BINARY) de filas de
+    campos array_send(array_agg(...)) con los 'tipos' dados ("int4" o "int8"),
+    y retorna un array por campo con todos los valores, en el orden de las filas.
+    """
+    partes = [[np.empty(0, ELEMENTOS[tipo][1])] for tipo in tipos]
+    with conn.cursor() as cur, cur.copy(consulta) as copy:
+        copy.set_types(["bytea"] * len(tipos))
+        for fila in copy.rows():
+            for parte, datos, tipo in zip(partes, fila, tipos):
+                parte.append(array_numpy(datos, tipo))
+    return [np.concatenate(parte) for parte in partes]
+
+def copiar(cur, tabla: str, columnas: dict):
+    """
+    COPY binario a 'tabla' de {columna: array}: int2, real o double precision
+    para los arrays int16, float32 o float64 e int4 para el resto.
+    """
+    tipos = {nombre: TIPOS_BINARIOS.get(valores.dtype, ">i4") for nombre, valores in columnas.items()}
+    formato = [("campos", ">i2")]
+    for nombre, tipo in tipos.items():
+        formato += [(f"l_{nombre}", ">i4"), (nombre, tipo)]
+    filas = np.empty(len(next(iter(columnas.values()))), dtype=np.dtype(formato))
+    filas["campos"] = len(columnas)
+    for nombre, valores in columnas.items():
+        filas[f"l_{nombre}"] = np.dtype(tipos[nombre]).itemsize
+        filas[nombre] = valores
+    consulta = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+        sql.Identifier(tabla), sql.SQL(", ").join(map(sql.Identifier, columnas))
+    )
+    with cur.copy(consulta) as copy:
+        copy.write(CABECERA_COPY)
+        for inicio in range(0, len(filas), FILAS_POR_ESCRITURA):
+            copy.write(filas[inicio:inicio + FILAS_POR_ESCRITURA].tobytes())
+        copy.write(FIN_COPY)
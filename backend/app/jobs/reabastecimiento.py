@@ -0,0 +1,187 @@
+"""
+Job de pronóstico de demanda y puntos de pedido (reabastecimiento).
+
+Para cada producto, a partir de sus unidades vendidas por día en los últimos
+--dias días (sin contar hoy, que está a medias):
+
+  - demanda diaria: suavizado exponencial simple de la serie (--alfa);
+  - media móvil y desviación típica de las últimas --ventana jornadas;
+  - punto de pedido: la demanda durante el plazo de entrega (--plazo días)
+    más el stock de seguridad z·σ·√plazo del --nivel-servicio pedido;
+  - nivel objetivo: el punto de pedido más la demanda de --cobertura días,
+    hasta donde se repone al pedir.
+
+Los detalles de venta se leen con COPY binario a arrays de NumPy y todo se
+calcula por bloques de productos a la vez: las series de un bloque forman una
+matriz productos x días (bincount de los detalles), el suavizado es su
+producto por el vector de pesos α(1-α)^k y media y desviación son reducciones
+por fila.
+
+Los resultados reemplazan los de la tabla 'reabastecimiento' (migración 0006)
+en una transacción. GET /api/proveedores/{id}/reabastecimiento la cruza con el
+stock vigente. Los meses ya archivados (app/jobs/archivar_ventas.py) no están
+en Postgres: si --dias llega hasta ellos, las series empiezan en el primer mes
+sin archivar.
+
+Uso (desde backend/, p. ej. cada noche desde cron):
+    python -m app.jobs.reabastecimiento
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+import psycopg
+from psycopg import sql
+
+from app.archivo import ventas as archivo
+from app.db.database import DATABASE_URL
+from app.jobs.copia_binaria import copiar, leer_arrays
+
+BLOQUE_PRODUCTOS = 8192
+# Productos por fila al leer las ventas diarias (ver leer_demanda)
+PRODUCTOS_POR_FILA_BITS = 10
+
+def _mes_siguiente(dia: date) -> date:
+    return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+
+def leer_demanda(conn, desde: date, hasta: date, tabla: str = "detalle_venta") -> tuple:
+    """
+    Retorna (id_producto, día, unidades) de cada detalle de venta de [desde,
+    hasta) como arrays int32 ('día' cuenta desde 'desde'; pronosticar() suma
+    los del mismo producto y día). Se lee mes a mes, una partición cada vez,
+    con producto y día juntos en un int8: un array_agg menos por fila.
+    """
+    claves, unidades = [], []
+    mes = desde
+    while mes < hasta:
+        siguiente = min(_mes_siguiente(mes), hasta)
+        consulta = sql.SQL("""
+            COPY (
+                SELECT array_send(array_agg((id_producto::int8 << 16) | (fecha - {desde}))), array_send(array_agg(cantidad))
+                FROM {tabla}
+                WHERE fecha >= {mes} AND fecha < {siguiente}
+                GROUP BY id_producto >> {bits}
+            ) TO STDOUT (FORMAT BINARY)
+        """).format(
+            desde=sql.Literal(desde), tabla=sql.Identifier(tabla), mes=sql.Literal(mes),
+            siguiente=sql.Literal(siguiente), bits=sql.Literal(PRODUCTOS_POR_FILA_BITS),
+        )
+        clave, cantidad = leer_arrays(conn, consulta, ("int8", "int4"))
+        claves.append(clave)
+        unidades.append(cantidad)
+        mes = siguiente
+    clave = np.concatenate(claves)
+    return (clave >> 16).astype(np.int32), (clave & 0xFFFF).astype(np.int32), np.concatenate(unidades)
+
+def pronosticar(filas: np.ndarray, dias: np.ndarray, unidades: np.ndarray, n_productos: int, n_dias: int,
+                alfa: float, ventana: int, bloque: int = BLOQUE_PRODUCTOS) -> tuple:
+    """
+    Calcula la demanda diaria (suavizado exponencial), la media móvil y la
+    desviación típica de 'n_productos' series de 'n_dias' días. 'filas' es el
+    índice (0..n_productos-1) del producto de cada (día, unidades); las de un
+    mismo producto y día se suman y los días que no aparecen cuentan como 0.
+    Retorna tres arrays float32.
+    """
+    # Orden por bloque de productos: con int16, argsort estable es radix sort (lineal)
+    orden = np.argsort((filas // bloque).astype(np.int16), kind="stable")
+    filas, dias, unidades = filas[orden], dias[orden], unidades[orden]
+    ventana = min(ventana, n_dias)
+    # Nivel suavizado del último día: sum(alfa * (1 - alfa)^(n_dias - 1 - d) * x_d)
+    pesos = (alfa * (1 - alfa) ** np.arange(n_dias - 1, -1, -1)).astype(np.float32)
+
+    demanda = np.zeros(n_productos, np.float32)
+    media = np.zeros(n_productos, np.float32)
+    desviacion = np.zeros(n_productos, np.float32)
+    for inicio in range(0, n_productos, bloque):
+        fin = min(inicio + bloque, n_productos)
+        desde, hasta = np.searchsorted(filas, [inicio, fin])
+        posiciones = (filas[desde:hasta] - inicio).astype(np.int64) * n_dias + dias[desde:hasta]
+        serie = np.bincount(posiciones, weights=unidades[desde:hasta], minlength=(fin - inicio) * n_dias)
+        serie = serie.astype(np.float32).reshape(fin - inicio, n_dias)
+        demanda[inicio:fin] = serie @ pesos
+        recientes = serie[:, n_dias - ventana:]
+        media[inicio:fin] = recientes.mean(axis=1)
+        desviacion[inicio:fin] = recientes.std(axis=1)
+    return demanda, media, desviacion
+
+def puntos_de_pedido(demanda: np.ndarray, desviacion: np.ndarray, plazo: int, cobertura: int,
+                     nivel_servicio: float) -> tuple:
+    """Retorna (punto de pedido, nivel objetivo) en unidades enteras, redondeados hacia arriba."""
+    z = NormalDist().inv_cdf(nivel_servicio)
+    # Redondeo previo: que 7.0000001 unidades no pasen a ser 8
+    punto = np.ceil(np.round(demanda * plazo + z * desviacion * np.sqrt(plazo), 3))
+    objetivo = np.ceil(np.round(punto + demanda * cobertura, 3))
+    return punto.astype(np.int32), objetivo.astype(np.int32)
+
+def _primer_dia(hasta: date, dias: int) -> date:
+    """Primer día de la serie: 'dias' antes de 'hasta', sin entrar en meses archivados."""
+    desde = hasta - timedelta(days=dias)
+    archivados = archivo.meses_archivados()
+    if archivados:
+        anio, mes = map(int, max(archivados).split("-"))
+        primer_mes = _mes_siguiente(date(anio, mes, 1))
+        if desde < primer_mes:
+            print(f"Las ventas anteriores a {primer_mes} están archivadas: las series empiezan ahí.")
+            desde = primer_mes
+    return desde
+
+def calcular(conn, args):
+    inicio = time.perf_counter()
+    hasta = date.today()
+    desde = _primer_dia(hasta, args.dias)
+    n_dias = (hasta - desde).days
+    if n_dias <= 0:
+        print("No hay días de ventas que analizar.")
+        return
+
+    productos = np.array([fila[0] for fila in conn.execute("SELECT id_producto FROM producto ORDER BY id_producto")],
+                         dtype=np.int32)
+    ids, dias, unidades = leer_demanda(conn, desde, hasta)
+    lectura = time.perf_counter()
+
+    # Los detalles solo pueden ser de productos existentes (FK de 'detalle_venta')
+    filas = np.searchsorted(productos, ids)
+    demanda, media, desviacion = pronosticar(filas, dias, unidades, len(productos), n_dias, args.alfa, args.ventana)
+    punto, objetivo = puntos_de_pedido(demanda, desviacion, args.plazo, args.cobertura, args.nivel_servicio)
+    calculo = time.perf_counter()
+
+    # Solo los productos con ventas en el periodo: los demás no necesitan reponerse
+    con_ventas = demanda > 0
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("DELETE FROM reabastecimiento")
+        copiar(cur, "reabastecimiento", {
+            "id_producto": productos[con_ventas], "demanda_diaria": demanda[con_ventas],
+            "media_movil": media[con_ventas], "desviacion": desviacion[con_ventas],
+            "punto_pedido": punto[con_ventas], "nivel_objetivo": objetivo[con_ventas],
+        })
+    fin = time.perf_counter()
+    print(f"{len(productos)} productos, {int(np.count_nonzero(con_ventas))} con ventas entre {desde} y {hasta},"
+          f" {len(ids)} detalles: lectura {lectura - inicio:.1f} s, cálculo {calculo - lectura:.1f} s,"
+          f" escritura {fin - calculo:.1f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=365, help="Días de historial")
+    parser.add_argument("--alfa", type=float, default=0.1, help="Factor del suavizado exponencial")
+    parser.add_argument("--ventana", type=int, default=28, help="Días de la media móvil y la desviación")
+    parser.add_argument("--plazo", type=int, default=7, help="Días de entrega del proveedor")
+    parser.add_argument("--cobertura", type=int, default=14, help="Días de demanda que cubre cada pedido")
+    parser.add_argument("--nivel-servicio", type=float, default=0.95, help="Probabilidad de no quedarse sin stock")
+    args = parser.parse_args()
+    if not 0 < args.dias <= 0xFFFF:
+        parser.error("--dias debe estar entre 1 y 65535") # El día va en 16 bits (ver leer_demanda)
+
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute("SET work_mem = '256MB'") # Agrupación de leer_demanda sin pasar a disco
+        if not conn.execute("SELECT pg_try_advisory_lock(hashtext('reabastecimiento'))").fetchone()[0]:
+            print("Otro cálculo de reabastecimiento está en curso; no se hace nada.")
+            return
+        try:
+            calcular(conn, args)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(hashtext('reabastecimiento'))")
+
+if __name__ == "__main__":
+    main()
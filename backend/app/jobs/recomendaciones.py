@@ -0,0 +1,227 @@
+"""
+Job de reconstrucción de los productos comprados juntos.
+
+Recalcula desde 'detalle_venta' las tablas 'producto_coocurrencia' y
+'producto_relacionado' (ver app/recomendaciones.py), que la API va
+actualizando venta a venta entre reconstrucciones:
+
+  1. Lee los pares (id_venta, id_producto) de cada partición mensual, todas
+     con la misma instantánea (REPEATABLE READ), con COPY en formato binario, agrupados en arrays que se convierten a
+     arrays de NumPy sin pasar por objetos de Python.
+  2. Por lotes de --lote filas (cortados en el límite de una venta) forma la
+     matriz dispersa ventas x productos B y suma B.T @ B: la matriz de
+     coocurrencia producto x producto (cuántas ventas tienen a los dos).
+  3. Ordena los pares de cada producto por frecuencia y se queda con los
+     RELACIONADOS_TOP_K primeros.
+  4. Escribe los pares y el top-K en tablas nuevas (COPY binario) y las
+     cambia por las actuales en una transacción corta, que suma también las
+     ventas confirmadas después de la instantánea del paso 1 y anota en
+     'producto_coocurrencia_corte' la instantánea del cambio. La API solo
+     suma las ventas que esa instantánea no incluye (ver app/recomendaciones.py):
+     ninguna venta registrada durante el job se pierde ni se cuenta dos veces.
+
+Solo cuentan las ventas que siguen en Postgres: las de los meses archivados
+(ver app/jobs/archivar_ventas.py) no.
+
+Requiere NumPy y SciPy (en requirements.txt; la API no los importa).
+
+Uso (desde backend/, p. ej. cada noche desde cron):
+    python -m app.jobs.recomendaciones
+"""
+import argparse
+import time
+
+import numpy as np
+import psycopg
+from psycopg import sql
+from scipy import sparse
+
+from app.db.database import DATABASE_URL
+from app.jobs.copia_binaria import copiar, leer_arrays
+from app.recomendaciones import LOCK_COOCURRENCIA, RELACIONADOS_BORRAR, RELACIONADOS_CALCULAR, RELACIONADOS_TOP_K
+
+LOTE_FILAS = 2_000_000
+# Ventas por fila al leer los detalles (ver leer_detalles)
+VENTAS_POR_FILA_BITS = 11
+
+# Ventas confirmadas después de la instantánea de lectura y visibles en la del
+# cambio de tablas: sus pares se suman a las tablas nuevas. 'desde' limita la
+# búsqueda a las particiones recientes (la fecha de una venta es la del día en
+# que se registra, con margen para desfases de zona horaria).
+COOCURRENCIA_RECIENTES = """
+    WITH recientes AS (
+        SELECT id_venta, fecha FROM venta
+        WHERE fecha >= %(desde)s
+          AND txid >= pg_snapshot_xmin(%(lectura)s::pg_snapshot)
+          AND pg_visible_in_snapshot(txid, %(corte)s::pg_snapshot)
+          AND NOT pg_visible_in_snapshot(txid, %(lectura)s::pg_snapshot)
+    ), sumados AS (
+        INSERT INTO producto_coocurrencia AS c (id_producto, id_relacionado, veces)
+        SELECT a.id_producto, b.id_producto, count(*)
+        FROM recientes
+        JOIN detalle_venta a USING (id_venta, fecha)
+        JOIN detalle_venta b USING (id_venta, fecha)
+        WHERE a.id_producto <> b.id_producto
+        GROUP BY a.id_producto, b.id_producto
+        ON CONFLICT (id_producto, id_relacionado) DO UPDATE SET veces = c.veces + EXCLUDED.veces
+        RETURNING id_producto
+    )
+    SELECT COALESCE(array_agg(DISTINCT id_producto), '{}') FROM sumados
+"""
+
+def _particiones(conn) -> list:
+    """Particiones de 'detalle_venta' (o la propia tabla si no está particionada)."""
+    cur = conn.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'detalle_venta'::regclass ORDER BY 1
+    """)
+    return [fila[0] for fila in cur.fetchall()] or ["detalle_venta"]
+
+def leer_detalles(conn, tabla: str) -> tuple:
+    """
+    Retorna (id_venta, id_producto) de todas las filas de 'tabla' como arrays
+    int32. Cada fila del COPY agrupa los detalles de 2^VENTAS_POR_FILA_BITS
+    ventas: unos cientos de filas por millón de detalles en vez de un millón.
+    """
+    consulta = sql.SQL("""
+        COPY (
+            SELECT array_send(array_agg(id_venta)), array_send(array_agg(id_producto))
+            FROM {} GROUP BY id_venta >> {}
+        ) TO STDOUT (FORMAT BINARY)
+    """).format(sql.Identifier(tabla), sql.Literal(VENTAS_POR_FILA_BITS))
+    ventas, productos = leer_arrays(conn, consulta, ("int4", "int4"))
+    return ventas, productos
+
+def _lotes(ventas: np.ndarray, lote: int):
+    """Rangos [inicio, fin) de unas 'lote' filas de 'ventas' (ordenado) sin partir ninguna venta."""
+    cortes = np.searchsorted(ventas, ventas[lote::lote], side="left")
+    cortes = np.unique(np.concatenate(([0], cortes, [len(ventas)])))
+    return zip(cortes[:-1], cortes[1:])
+
+def sumar_coocurrencias(matriz, ventas: np.ndarray, productos: np.ndarray, lote: int = LOTE_FILAS):
+    """
+    Suma a 'matriz' (productos x productos) las coocurrencias de las filas
+    (id_venta, id_producto) dadas. Cada venta debe estar entera en ellas.
+    """
+    orden = np.argsort(ventas, kind="stable")
+    ventas, productos = ventas[orden], productos[orden]
+    for inicio, fin in _lotes(ventas, lote):
+        v, p = ventas[inicio:fin], productos[inicio:fin]
+        # Fila de B de cada detalle: índice de su venta dentro del lote
+        fila = np.concatenate(([0], np.cumsum(v[1:] != v[:-1])))
+        b = sparse.csr_matrix((np.ones(len(p), dtype=np.int32), (fila, p)), shape=(int(fila[-1]) + 1, matriz.shape[1]))
+        b.data[:] = 1 # Un producto repetido en una venta cuenta una vez
+        matriz = matriz + (b.T @ b).tocsr()
+    return matriz
+
+def pares_y_top_k(matriz, k: int) -> tuple:
+    """
+    Retorna los pares de la matriz sin la diagonal (producto, relacionado,
+    veces), ordenados por producto y frecuencia, y su posición en el orden
+    de cada producto (1 = el más frecuente).
+    """
+    coo = matriz.tocoo()
+    distinto = coo.row != coo.col
+    producto, relacionado, veces = coo.row[distinto], coo.col[distinto], coo.data[distinto]
+    orden = np.lexsort((relacionado, -veces, producto))
+    producto, relacionado, veces = producto[orden], relacionado[orden], veces[orden]
+    posicion = np.arange(len(producto)) - np.searchsorted(producto, producto, side="left") + 1
+    return producto, relacionado, veces, posicion
+
+def escribir(conn, producto, relacionado, veces, posicion, k: int, lectura: str, desde):
+    """
+    Escribe los pares y el top-K en tablas nuevas y las cambia por las
+    actuales. 'lectura' es la instantánea con la que se leyeron las ventas y
+    'desde' la fecha desde la que buscar las confirmadas después.
+    Retorna cuántos productos recibieron pares de ventas posteriores a la lectura.
+    """
+    top = posicion <= k
+    with conn.cursor() as cur:
+        for tabla in ("producto_coocurrencia", "producto_relacionado"):
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(f"{tabla}_nueva")))
+            cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(
+                sql.Identifier(f"{tabla}_nueva"), sql.Identifier(tabla)
+            ))
+        copiar(cur, "producto_coocurrencia_nueva",
+               {"id_producto": producto, "id_relacionado": relacionado, "veces": veces})
+        copiar(cur, "producto_relacionado_nueva",
+               {"id_producto": producto[top], "posicion": posicion[top].astype(np.int16),
+                "id_relacionado": relacionado[top], "veces": veces[top]})
+        # La clave primaria se crea después de cargar: mucho más rápido que mantenerla fila a fila
+        for tabla, clave in (("producto_coocurrencia", "id_producto, id_relacionado"),
+                             ("producto_relacionado", "id_producto, posicion")):
+            cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} PRIMARY KEY ({})").format(
+                sql.Identifier(f"{tabla}_nueva"), sql.Identifier(f"{tabla}_nueva_pkey"), sql.SQL(clave)
+            ))
+            cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(f"{tabla}_nueva")))
+
+        # Cambio de tablas: las actualizaciones de la API esperan al lock
+        with conn.transaction():
+            cur.execute("SET LOCAL lock_timeout = '5s'")
+            cur.execute(LOCK_COOCURRENCIA)
+            # Instantánea del cambio, tomada ya con el lock: las sumas de la API
+            # que se confirmaron antes están en ella y las que esperan la leerán
+            cur.execute("UPDATE producto_coocurrencia_corte SET instantanea = pg_current_snapshot() RETURNING instantanea::text")
+            corte = cur.fetchone()[0]
+            for tabla in ("producto_coocurrencia", "producto_relacionado"):
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(tabla)))
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                    sql.Identifier(f"{tabla}_nueva"), sql.Identifier(tabla)
+                ))
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+                    sql.Identifier(tabla), sql.Identifier(f"{tabla}_nueva_pkey"), sql.Identifier(f"{tabla}_pkey")
+                ))
+            # Ventas confirmadas entre la lectura y el cambio: las tablas nuevas
+            # no las tienen y la API ya no las sumará (son visibles en 'corte')
+            params = {"lectura": lectura, "corte": corte, "desde": desde, "k": k}
+            cur.execute(COOCURRENCIA_RECIENTES, params)
+            params["afectados"] = cur.fetchone()[0]
+            if params["afectados"]:
+                cur.execute(RELACIONADOS_BORRAR.sql, params)
+                cur.execute(RELACIONADOS_CALCULAR.sql, params)
+            cur.execute("SELECT pg_notify('cache_invalidacion', 'relacionados:' || txid_current())")
+    return len(params["afectados"])
+
+def reconstruir(conn, k: int, lote: int = LOTE_FILAS):
+    inicio = time.perf_counter()
+    conn.execute("SET work_mem = '256MB'") # Agrupación de leer_detalles sin pasar a disco
+    # Todas las particiones se leen con una misma instantánea, que se anota
+    # para saber después qué ventas quedaron fuera
+    with conn.transaction():
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        lectura, desde, n_productos = conn.execute("""
+            SELECT pg_current_snapshot()::text, current_date - 2,
+                   (SELECT COALESCE(max(id_producto), 0) + 1 FROM producto)
+        """).fetchone()
+        matriz = sparse.csr_matrix((n_productos, n_productos), dtype=np.int32)
+        filas = 0
+        for tabla in _particiones(conn):
+            ventas, productos = leer_detalles(conn, tabla)
+            filas += len(ventas)
+            if len(ventas):
+                matriz = sumar_coocurrencias(matriz, ventas, productos, lote)
+    calculo = time.perf_counter()
+    producto, relacionado, veces, posicion = pares_y_top_k(matriz, k)
+    recientes = escribir(conn, producto, relacionado, veces, posicion, k, lectura, desde)
+    fin = time.perf_counter()
+    print(f"{filas} detalles, {len(producto)} pares, {int(np.count_nonzero(posicion <= k))} en el top-{k}"
+          f" (y {recientes} productos con ventas posteriores a la lectura):"
+          f" lectura y cálculo {calculo - inicio:.1f} s, escritura {fin - calculo:.1f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=RELACIONADOS_TOP_K)
+    parser.add_argument("--lote", type=int, default=LOTE_FILAS, help="Filas de detalle por lote de la matriz")
+    args = parser.parse_args()
+
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        if not conn.execute("SELECT pg_try_advisory_lock(hashtext('recomendaciones'))").fetchone()[0]:
+            print("Otra reconstrucción está en curso; no se hace nada.")
+            return
+        try:
+            reconstruir(conn, args.top_k, args.lote)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(hashtext('recomendaciones'))")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from app.db.database import SOLO_PRIMARIA, anotar_lsn_commits, lecturas_desde, lsn_a_entero
+
+# --- Lecturas propias con réplicas de lectura ---
+# Tras una escritura, la respuesta lleva el LSN de su commit en la primaria en
+# la cabecera X-Bazar-LSN y en la cookie 'bazar_lsn'. Lo anota la propia
+# transacción de escritura (ver transaccion en app/db/database.py), sin
+# consultas extra; una petición sin escrituras confirmadas no lo lleva. Las lecturas siguientes del mismo
+# cliente que lo reenvíen (cabecera o cookie) solo se sirven desde réplicas que
+# ya hayan reproducido ese LSN; si ninguna llega, desde la primaria.
+# Las lecturas dentro de una petición de escritura van siempre a la primaria.
+# Solo se instala si hay réplicas configuradas (ver app/main.py).
+
+CABECERA_LSN = "X-Bazar-LSN"
+COOKIE_LSN = "bazar_lsn"
+# Vida de la cookie: basta con que cubra el retraso de las réplicas
+LECTURAS_PROPIAS_SEGUNDOS = 60
+METODOS_LECTURA = {"GET", "HEAD", "OPTIONS"}
+
+def _lsn_de_peticion(conexion: HTTPConnection):
+    """LSN enviado por el cliente (cabecera antes que cookie), o None."""
+    valor = conexion.headers.get(CABECERA_LSN) or conexion.cookies.get(COOKIE_LSN)
+    if not valor:
+        return None
+    try:
+        return lsn_a_entero(valor)
+    except ValueError:
+        return None
+
+class LecturasPropiasMiddleware:
+    """Middleware ASGI que aplica la consistencia 'leer lo que uno escribió'."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] in METODOS_LECTURA:
+            with lecturas_desde(_lsn_de_peticion(HTTPConnection(scope))):
+                await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] < 400 and lsns:
+                lsn = max(lsns, key=lsn_a_entero)
+                if lsn:
+                    cabeceras = MutableHeaders(scope=mensaje)
+                    cabeceras[CABECERA_LSN] = lsn
+                    cabeceras.append(
+                        "set-cookie",
+                        f"{COOKIE_LSN}={lsn}; Max-Age={LECTURAS_PROPIAS_SEGUNDOS}; Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(mensaje)
+
+        with lecturas_desde(SOLO_PRIMARIA), anotar_lsn_commits() as lsns:
+            await self.app(scope, receive, enviar)
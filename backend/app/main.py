@@ -1,13 +1,93 @@
+# --- Arranque en frío ---
+# Lo primero es crear el pool: sus conexiones a Postgres se establecen en
+# segundo plano mientras se importan FastAPI y los routers, que es la mayor
+# parte del arranque del worker (ver benchmarks/bench_arranque.py).
+from app import arranque
+from app.db.database import get_pool
+get_pool()
+
 # Importaciones principales de FastAPI y middleware
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware 
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 
 # Importación de los módulos de routers para las diferentes entidades
 # Se incluye el nuevo router 'direcciones'
-from app.routers import productos, clientes, ventas, proveedores, direcciones 
+from app.routers import productos, clientes, ventas, proveedores, direcciones, eventos, sync, metricas, bootstrap
+from app.db.database import (
+    abrir_pool, cerrar_pool, precalentar_pool, hay_replicas, iniciar_vigilancia_replicas, detener_vigilancia_replicas,
+)
+from app.lecturas_propias import CABECERA_LSN, LecturasPropiasMiddleware
+from app.admision import ADMISION, AdmisionMiddleware
+from app.paginacion import CABECERA_SIGUIENTE
+from app.crud.crud_productos import get_all_productos_async
+from app.crud.crud_proveedores import get_all_proveedores
+from app.crud.crud_ventas import asegurar_particiones_venta
+from app.db.notificaciones import escucha
+from app.difusion import difusor
+from app.recomendaciones import coocurrencias
+from app.auditoria import AuditoriaMiddleware, auditoria
+
+# --- Ciclo de vida del worker ---
+async def precalentar():
+    """
+    Trabajo de arranque que no hace falta para atender la primera petición y
+    se hace en segundo plano con el worker ya aceptando tráfico: preparar las
+    consultas en las conexiones del pool, cargar el catálogo y los proveedores
+    en caché (una petición al catálogo que llegue mientras tanto espera esta
+    misma carga en lugar de lanzar otra) y crear las particiones de ventas de
+    los próximos meses que falten (si una venta llega antes, crea la suya).
+    """
+    with arranque.fase("precalentamiento"):
+        try:
+            await run_in_threadpool(precalentar_pool)
+            await get_all_productos_async()
+            await run_in_threadpool(get_all_proveedores)
+            await run_in_threadpool(asegurar_particiones_venta)
+        except Exception as error:
+            print(f"Error en el precalentamiento: {error}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque y apagado de cada proceso worker.
+    El worker no acepta tráfico hasta que termina la fase de arranque, así que
+    aquí solo se hace lo imprescindible: esperar a que el pool (abierto al
+    importar este módulo) tenga sus conexiones mínimas, comprobar las réplicas
+    de lectura (si las hay) y arrancar la escucha de notificaciones de
+    Postgres (invalidación de cachés y eventos de stock), el hilo que suma
+    los productos comprados juntos de cada venta y el que guarda la
+    auditoría (recuperando la de un worker caído, si la hay). El resto se
+    precalienta en segundo plano y el esquema OpenAPI se construye al pedir
+    /docs por primera vez.
+    Al recibir SIGTERM, el servidor deja de aceptar conexiones, termina las
+    peticiones en curso y después se aplican los pares de productos comprados
+    juntos pendientes, se guardan los eventos de auditoría en cola y se
+    cierran la escucha y el pool.
+    """
+    arranque.anotar("importacion", arranque.INICIO)
+    with arranque.fase("pool"):
+        abrir_pool()
+    iniciar_vigilancia_replicas()
+    difusor.iniciar(asyncio.get_running_loop())
+    escucha.iniciar()
+    coocurrencias.iniciar()
+    auditoria.iniciar()
+    precalentamiento = asyncio.create_task(precalentar())
+    arranque.marcar_listo()
+    yield
+    precalentamiento.cancel()
+    coocurrencias.detener()
+    auditoria.detener()
+    escucha.detener()
+    detener_vigilancia_replicas()
+    cerrar_pool()
 
 # Inicialización de la aplicación FastAPI
-app = FastAPI(title="API del Bazar de Ropa", version="0.1.0")
+app = FastAPI(title="API del Bazar de Ropa", version="0.1.0", lifespan=lifespan)
 
 # --- Configuración de CORS ---
 # Define los orígenes permitidos para las peticiones cross-origin.
@@ -20,12 +100,39 @@ origins = [
     "null", # Permite peticiones desde 'file:///'
 ]
 
+# --- Lecturas propias con réplicas de lectura ---
+# Se añade antes que CORS para que CORS quede por fuera y responda él las
+# peticiones preflight.
+if hay_replicas():
+    app.add_middleware(LecturasPropiasMiddleware)
+
+# --- Auditoría ---
+# Atribuye los cambios de cada petición de escritura a la cabecera
+# X-Bazar-Usuario (o a la IP del cliente), con su IP, su clave de API si es
+# conocida y su método y ruta (ver app/auditoria.py).
+if auditoria.activo:
+    app.add_middleware(AuditoriaMiddleware)
+
+# --- Control de admisión ---
+# Límites de tasa por cliente y descarte de carga cuando el pool de conexiones
+# está saturado (ver app/admision.py). Queda por dentro de CORS para que las
+# respuestas 429/503 lleven sus cabeceras y el frontend pueda leerlas.
+if ADMISION:
+    app.add_middleware(AdmisionMiddleware)
+
+# --- Compresión ---
+# Las respuestas JSON de más de 1 KB (listados, /api/bootstrap, /api/sync) se
+# comprimen con gzip si el cliente lo acepta. Starlette no comprime los
+# flujos text/event-stream, así que los eventos SSE siguen llegando al momento.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,       # Orígenes permitidos
     allow_credentials=True,    # Soporte para credenciales (cookies, etc.)
     allow_methods=["*"],       # Métodos HTTP permitidos
     allow_headers=["*"],       # Cabeceras HTTP permitidas
+    expose_headers=[CABECERA_LSN, CABECERA_SIGUIENTE, "Retry-After"], # Legibles desde el frontend
 )
 
 # --- Inclusión de Routers ---
@@ -35,6 +142,10 @@ app.include_router(clientes.router)
 app.include_router(ventas.router) 
 app.include_router(proveedores.router) 
 app.include_router(direcciones.router) # <-- Se añade el router de direcciones
+app.include_router(eventos.router) # Flujo SSE de cambios de stock y precio
+app.include_router(sync.router) # Sincronización incremental de terminales
+app.include_router(metricas.router) # Estadísticas de las consultas registradas
+app.include_router(bootstrap.router) # Primera carga del frontend en una sola petición
 
 # --- Endpoint Raíz ---
 @app.get("/", tags=["Root"]) 
@@ -0,0 +1,32 @@
+import base64
+import json
+
+# --- Paginación por cursor ---
+# Los listados largos (productos, clientes) aceptan ?limite=N y devuelven como
+# mucho N filas. Si quedan más, la respuesta lleva en la cabecera
+# X-Bazar-Siguiente el cursor de la página siguiente, que se pasa tal cual en
+# ?cursor=... El cursor es opaco para el cliente: cada listado guarda en él lo
+# que necesita para continuar donde lo dejó (la clave de la última fila
+# servida), en JSON codificado en base64. Sin 'limite' ni 'cursor' los
+# endpoints devuelven la lista completa, como antes.
+
+CABECERA_SIGUIENTE = "X-Bazar-Siguiente"
+LIMITE_POR_DEFECTO = 500
+LIMITE_MAXIMO = 1000
+
+def codificar_cursor(*valores) -> str:
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, tipos: tuple):
+    """
+    Retorna la tupla de valores del cursor si tiene los tipos esperados
+    (p. ej. (str, int)), o None si el cursor no es válido.
+    """
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if (not isinstance(valores, list) or len(valores) != len(tipos)
+            or not all(isinstance(valor, tipo) for valor, tipo in zip(valores, tipos))):
+        return None
+    return tuple(valores)
@@ -0,0 +1,168 @@
+import os
+import threading
+from itertools import permutations
+
+import psycopg
+
+from app.db.consultas import registro
+from app.db.database import DATABASE_URL, get_db_connection, release_db_connection, transaccion_pipeline
+
+# --- "Comprados juntos con frecuencia" ---
+# 'producto_coocurrencia' guarda, por cada par de productos, en cuántas ventas
+# aparecen juntos (en los dos sentidos: (a, b) y (b, a)), y
+# 'producto_relacionado' los RELACIONADOS_TOP_K más frecuentes de cada
+# producto, que es lo que sirve GET /api/productos/{id}/relacionados.
+#
+# Las dos tablas se reconstruyen desde 'detalle_venta' con el job
+# app/jobs/recomendaciones.py (p. ej. cada noche). Entre reconstrucciones,
+# cada venta registrada se suma aquí: create_venta() encola sus productos al
+# confirmar y un hilo por worker aplica los pares pendientes cada
+# RELACIONADOS_INTERVALO segundos, en una sola transacción, fuera del camino
+# de la venta (los pares de productos populares serían filas muy disputadas).
+# Si el worker se cae con pares pendientes, la siguiente reconstrucción los cuenta.
+#
+# Cada venta pendiente lleva la transacción que la registró ('venta.txid').
+# Al cambiar las tablas el job anota en 'producto_coocurrencia_corte' la
+# instantánea de ese momento, y ya ha contado todas las ventas visibles en
+# ella: aquí solo se suman las que no lo son (ver la migración 0012).
+RELACIONADOS_TOP_K = int(os.getenv("RELACIONADOS_TOP_K", "10"))
+RELACIONADOS_INTERVALO = float(os.getenv("RELACIONADOS_INTERVALO", "2"))
+# Pares pendientes como máximo mientras la base no responde; el resto se
+# descarta (la siguiente reconstrucción los cuenta).
+RELACIONADOS_MAX_PENDIENTES = int(os.getenv("RELACIONADOS_MAX_PENDIENTES", "1000000"))
+# Grupos de productos en la caché de relacionados (ver app/cache/catalogo.py):
+# cada suma solo invalida los grupos de los productos que cambia.
+RELACIONADOS_GRUPOS = 64
+
+# Serializa las actualizaciones entre workers y con el cambio de tablas del job
+LOCK_COOCURRENCIA = "SELECT pg_advisory_xact_lock(hashtext('producto_coocurrencia'))"
+
+# Suma los pares de las ventas que la última reconstrucción no contó
+# (ordenados: los workers bloquean las filas en el mismo orden)
+COOCURRENCIA_SUMAR = registro.registrar("recomendacion.sumar", """
+    INSERT INTO producto_coocurrencia AS c (id_producto, id_relacionado, veces)
+    SELECT par.id_producto, par.id_relacionado, count(*)
+    FROM unnest(%(txids)s::text[]::xid8[], %(productos)s::int[], %(relacionados)s::int[])
+        AS par(txid, id_producto, id_relacionado)
+    WHERE NOT COALESCE(
+        pg_visible_in_snapshot(par.txid, (SELECT instantanea FROM producto_coocurrencia_corte)), FALSE
+    )
+    GROUP BY par.id_producto, par.id_relacionado
+    ORDER BY par.id_producto, par.id_relacionado
+    ON CONFLICT (id_producto, id_relacionado) DO UPDATE SET veces = c.veces + EXCLUDED.veces
+""")
+# Rehace el top-K de los productos afectados a partir de sus pares
+RELACIONADOS_BORRAR = registro.registrar(
+    "recomendacion.borrar_top", "DELETE FROM producto_relacionado WHERE id_producto = ANY(%(afectados)s::int[])"
+)
+RELACIONADOS_CALCULAR = registro.registrar("recomendacion.calcular_top", """
+    INSERT INTO producto_relacionado (id_producto, posicion, id_relacionado, veces)
+    SELECT id_producto, posicion, id_relacionado, veces
+    FROM (
+        SELECT id_producto, id_relacionado, veces,
+            row_number() OVER (PARTITION BY id_producto ORDER BY veces DESC, id_relacionado) AS posicion
+        FROM producto_coocurrencia
+        WHERE id_producto = ANY(%(afectados)s::int[])
+    ) t
+    WHERE posicion <= %(k)s
+""")
+# Solo se invalidan en la caché los grupos de los productos afectados
+RELACIONADOS_NOTIFICAR = registro.registrar(
+    "recomendacion.notificar",
+    "SELECT pg_notify('cache_invalidacion', 'relacionados:' || txid_current() || ':' || %(grupos)s::text)"
+)
+
+class AcumuladorCoocurrencias:
+    """
+    Pares de productos de las ventas confirmadas pendientes de sumar, y el
+    hilo que los aplica periódicamente.
+    """
+
+    def __init__(self, intervalo: float):
+        self._intervalo = intervalo
+        self._ventas = [] # (txid, productos distintos ordenados) de cada venta pendiente
+        self._n_pares = 0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def registrar_venta(self, txid: str, productos):
+        """
+        Encola una venta confirmada: la transacción que la registró y sus
+        productos (los pares se forman al aplicarla).
+        """
+        productos = sorted(set(productos))
+        if len(productos) < 2:
+            return
+        with self._lock:
+            self._ventas.append((txid, productos))
+            self._n_pares += len(productos) * (len(productos) - 1)
+
+    def iniciar(self):
+        if self._hilo is not None or not DATABASE_URL:
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name="coocurrencias", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo aplicando antes los pares pendientes."""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    def _ejecutar(self):
+        while not self._detener.wait(self._intervalo):
+            self.aplicar()
+        self.aplicar()
+
+    def aplicar(self):
+        """
+        Suma los pares de las ventas pendientes y rehace el top-K de sus
+        productos en una transacción. Si falla, las ventas vuelven a la cola
+        para el siguiente intento.
+        """
+        with self._lock:
+            ventas, self._ventas = self._ventas, []
+            self._n_pares = 0
+        if not ventas:
+            return
+        conn = get_db_connection()
+        if conn is None:
+            self._devolver(ventas)
+            return
+        params = {"txids": [], "productos": [], "relacionados": [], "k": RELACIONADOS_TOP_K}
+        for txid, productos in ventas:
+            for producto, relacionado in permutations(productos, 2):
+                params["txids"].append(txid)
+                params["productos"].append(producto)
+                params["relacionados"].append(relacionado)
+        params["afectados"] = sorted(set(params["productos"]))
+        params["grupos"] = ",".join(
+            str(grupo) for grupo in sorted({producto % RELACIONADOS_GRUPOS for producto in params["afectados"]})
+        )
+        try:
+            with conn.cursor() as cur, transaccion_pipeline(conn):
+                cur.execute(LOCK_COOCURRENCIA)
+                COOCURRENCIA_SUMAR.ejecutar(cur, params)
+                RELACIONADOS_BORRAR.ejecutar(cur, params)
+                RELACIONADOS_CALCULAR.ejecutar(cur, params)
+                RELACIONADOS_NOTIFICAR.ejecutar(cur, params)
+        except (Exception, psycopg.Error) as error:
+            print(f"Error al sumar {len(params['txids'])} pares de productos comprados juntos: {error}")
+            self._devolver(ventas)
+        finally:
+            release_db_connection(conn)
+
+    def _devolver(self, ventas: list):
+        n_pares = sum(len(productos) * (len(productos) - 1) for _, productos in ventas)
+        with self._lock:
+            if self._n_pares + n_pares > RELACIONADOS_MAX_PENDIENTES:
+                print(f"Descartados {n_pares} pares de productos comprados juntos (demasiados pendientes)")
+                return
+            self._ventas[:0] = ventas
+            self._n_pares += n_pares
+
+# Instancia única por proceso
+coocurrencias = AcumuladorCoocurrencias(RELACIONADOS_INTERVALO)
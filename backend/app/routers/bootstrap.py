@@ -0,0 +1,89 @@
+# Importaciones necesarias de FastAPI, tipos y estado HTTP
+import asyncio
+import hashlib
+import json
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+# Importa las funciones CRUD y los schemas Pydantic de la primera carga
+from app.crud import crud_clientes, crud_productos, crud_proveedores
+from app.schemas import Bootstrap
+from app.paginacion import LIMITE_MAXIMO, LIMITE_POR_DEFECTO, codificar_cursor
+
+# Crea un router específico para el arranque del frontend
+router = APIRouter()
+
+def _etag(datos) -> str:
+    """
+    ETag débil de una sección: resumen de sus filas serializadas. Las filas
+    salen de las consultas con las columnas siempre en el mismo orden, así que
+    basta json.dumps con str() para Decimal y fechas (jsonable_encoder cuesta
+    varias veces más con páginas de cientos de filas).
+    """
+    contenido = json.dumps(datos, default=str, separators=(",", ":"))
+    return f'W/"{hashlib.blake2b(contenido.encode(), digest_size=12).hexdigest()}"'
+
+def _etags_conocidos(if_none_match: Optional[str]) -> set:
+    """ETags de If-None-Match, con y sin el prefijo W/ (comparación débil)."""
+    if not if_none_match:
+        return set()
+    etags = {etag.strip() for etag in if_none_match.split(",") if etag.strip()}
+    return etags | {etag.removeprefix("W/") for etag in etags} | {f"W/{etag}" for etag in etags}
+
+# --- Endpoint de arranque del frontend ---
+@router.get(
+    "/api/bootstrap",
+    response_model=Bootstrap,
+    summary="Obtener todo lo necesario para la primera carga del frontend",
+    tags=["Arranque"]
+)
+async def read_bootstrap(
+    response: Response,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO, description="Filas de la primera página de productos y clientes"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Retorna en una sola respuesta la primera página de productos, la primera
+    página de clientes y todos los proveedores, leídos en paralelo. Cada
+    sección trae su ETag y, si quedan más filas, el cursor para seguir con
+    /api/productos o /api/clientes (?cursor=...).
+    Las secciones cuyo ETag venga en `If-None-Match` se retornan con
+    'sin_cambios' y sin 'datos'. Si la respuesta entera no cambió (su ETag
+    viene en `If-None-Match`), retorna 304 Not Modified sin cuerpo.
+    Retorna 500 si falla la lectura de cualquiera de las secciones.
+    """
+    pagina_productos, pagina_clientes, proveedores = await asyncio.gather(
+        crud_productos.get_productos_pagina_async(limite),
+        run_in_threadpool(crud_clientes.get_clientes_pagina, limite),
+        run_in_threadpool(crud_proveedores.get_proveedores),
+    )
+    # Si falla cualquier sección no se responde nada: una sección vacía con su
+    # ETag se tomaría por datos válidos y el navegador la revalidaría como tal
+    for nombre, datos in (("productos", pagina_productos), ("clientes", pagina_clientes), ("proveedores", proveedores)):
+        if datos is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error interno del servidor al obtener los {nombre}."
+            )
+
+    conocidos = _etags_conocidos(if_none_match)
+    respuesta = {}
+    for nombre, (datos, siguiente) in (
+        ("productos", pagina_productos), ("clientes", pagina_clientes), ("proveedores", (proveedores, None)),
+    ):
+        etag = _etag(datos)
+        sin_cambios = etag in conocidos
+        respuesta[nombre] = {
+            "etag": etag,
+            "sin_cambios": sin_cambios,
+            "siguiente": codificar_cursor(*siguiente) if siguiente is not None else None,
+            "datos": None if sin_cambios else datos,
+        }
+
+    etag_total = _etag([respuesta[nombre]["etag"] for nombre in ("productos", "clientes", "proveedores")])
+    cabeceras = {"ETag": etag_total, "Cache-Control": "no-cache"}
+    if etag_total in conocidos:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    response.headers.update(cabeceras)
+    return respuesta
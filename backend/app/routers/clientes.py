@@ -1,14 +1,25 @@
 # Importaciones necesarias de FastAPI, tipos y estado HTTP
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from anyio import from_thread
+from typing import List, Optional
 
 # Importa las funciones CRUD y los schemas Pydantic para clientes
-from app.crud import crud_clientes
-from app.schemas import Cliente, ClienteCreate, ClienteUpdate
+from app.crud import crud_clientes, crud_importacion
+from app.crud.crud_direcciones import ClienteNoEncontrado
+from app.schemas import (
+    BorradoMasivo, BorradoMasivoResultado, Cliente, ClienteCreate, ClienteResumen, ClienteUpdate, ImportacionResultado,
+)
+from app.paginacion import (
+    CABECERA_SIGUIENTE, LIMITE_MAXIMO, LIMITE_POR_DEFECTO, codificar_cursor, decodificar_cursor,
+)
 
 # Crea un router específico para las rutas de clientes
 router = APIRouter()
 
+# Tamaño máximo del cuerpo aceptado por la importación masiva (50 MB)
+IMPORTACION_MAX_BYTES = 50 * 1024 * 1024
+
 # --- Endpoint para CREAR un nuevo cliente ---
 @router.post(
     "/api/clientes", 
@@ -31,6 +42,64 @@ def create_new_cliente(cliente: ClienteCreate):
         )
     return new_cliente
 
+# --- Endpoint para IMPORTAR clientes y direcciones en bloque ---
+@router.post(
+    "/api/clientes/importar",
+    response_model=ImportacionResultado,
+    summary="Importar clientes y direcciones en bloque (CSV o NDJSON)",
+    tags=["Clientes"]
+)
+async def importar_clientes(request: Request):
+    """
+    Inserta o actualiza clientes y sus direcciones a partir de un archivo
+    enviado en el cuerpo de la petición:
+    - `Content-Type: text/csv`: CSV con cabecera.
+    - `Content-Type: application/x-ndjson`: un objeto JSON por línea.
+
+    Columnas: `clave_externa` (obligatoria, identifica al cliente), `nombre`,
+    `telefono` y, opcionalmente, `calle`, `ciudad` y `codigo_postal`.
+    Retorna los contadores de la importación y las filas rechazadas con su motivo.
+    """
+    tipo = request.headers.get("content-type", "").split(";")[0].strip()
+    if tipo == "text/csv":
+        formato = "csv"
+    elif tipo in ("application/x-ndjson", "application/ndjson"):
+        formato = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use Content-Type 'text/csv' o 'application/x-ndjson'."
+        )
+    longitud = request.headers.get("content-length", "")
+    if longitud.isdigit() and int(longitud) > IMPORTACION_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Archivo demasiado grande.")
+
+    flujo = request.stream()
+
+    def trozos():
+        # El hilo de la importación pide al event loop cada trozo del cuerpo
+        # según lo va copiando: el archivo nunca está entero en memoria.
+        while True:
+            try:
+                yield from_thread.run(flujo.__anext__)
+            except StopAsyncIteration:
+                return
+
+    lineas = crud_importacion.lineas_del_cuerpo(trozos(), IMPORTACION_MAX_BYTES)
+    # La importación usa una conexión bloqueante: se ejecuta fuera del event loop
+    try:
+        resultado = await run_in_threadpool(crud_importacion.importar_clientes, lineas, formato)
+    except crud_importacion.ArchivoDemasiadoGrande:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Archivo demasiado grande.")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo debe estar codificado en UTF-8.")
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor durante la importación."
+        )
+    return resultado
+
 # --- Endpoint para LEER todos los clientes ---
 @router.get(
     "/api/clientes", 
@@ -38,11 +107,33 @@ def create_new_cliente(cliente: ClienteCreate):
     summary="Obtener lista de clientes",
     tags=["Clientes"]
 )
-def read_clientes():
+def read_clientes(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO, description="Clientes por página"),
+    cursor: Optional[str] = Query(None, description=f"Valor de la cabecera {CABECERA_SIGUIENTE} de la página anterior"),
+):
     """
     Obtiene una lista de todos los clientes registrados, ordenados por nombre.
+    Con 'limite' o 'cursor' retorna una sola página; si quedan más clientes,
+    la cabecera X-Bazar-Siguiente trae el cursor de la siguiente.
     """
-    clientes = crud_clientes.get_all_clientes()
+    if limite is None and cursor is None:
+        clientes = crud_clientes.get_all_clientes()
+        return clientes
+    desde = None
+    if cursor is not None:
+        desde = decodificar_cursor(cursor, (str, int))
+        if desde is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación no válido")
+    pagina = crud_clientes.get_clientes_pagina(limite or LIMITE_POR_DEFECTO, desde)
+    if pagina is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener los clientes."
+        )
+    clientes, siguiente = pagina
+    if siguiente is not None:
+        response.headers[CABECERA_SIGUIENTE] = codificar_cursor(*siguiente)
     return clientes
 
 # --- Endpoint para LEER un cliente específico por ID ---
@@ -62,6 +153,34 @@ def read_cliente(cliente_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
     return db_cliente
 
+# --- Endpoint para LEER la ficha completa de un cliente ---
+@router.get(
+    "/api/clientes/{cliente_id}/resumen",
+    response_model=ClienteResumen,
+    summary="Obtener un cliente con sus direcciones y su historial de compras",
+    tags=["Clientes"]
+)
+def read_resumen_cliente(
+    cliente_id: int,
+    ventas: int = Query(10, ge=1, le=100, description="Número de ventas recientes a incluir"),
+):
+    """
+    Obtiene en una sola consulta los datos de un cliente, todas sus
+    direcciones, el gasto total, el número de compras, la fecha de la última
+    y las cabeceras de sus 'ventas' ventas más recientes.
+    Retorna 404 Not Found si el cliente no existe.
+    """
+    try:
+        resumen = crud_clientes.get_resumen_cliente(cliente_id, ventas)
+    except ClienteNoEncontrado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
+    if resumen is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener el resumen del cliente."
+        )
+    return resumen
+
 # --- Endpoint para ACTUALIZAR un cliente existente ---
 @router.put(
     "/api/clientes/{cliente_id}",
@@ -118,4 +237,27 @@ def delete_existing_cliente(cliente_id: int):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Error interno del servidor al intentar eliminar el cliente."
-        )
\ No newline at end of file
+        )
+
+# --- Endpoint para ELIMINAR varios clientes a la vez ---
+@router.post(
+    "/api/clientes/borrado-masivo",
+    response_model=BorradoMasivoResultado,
+    summary="Eliminar varios clientes a la vez",
+    tags=["Clientes"]
+)
+def delete_clientes_masivo(borrado: BorradoMasivo):
+    """
+    Elimina en una transacción los clientes de `ids` que no tienen ventas,
+    con sus direcciones, y retorna el estado de cada ID: `eliminado`,
+    `referenciado` (no se elimina) o `no_encontrado`. Retorna 500 si ocurre
+    un error.
+    """
+    resultados = crud_clientes.delete_clientes(borrado.ids)
+    if resultados is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al eliminar los clientes."
+        )
+    eliminados = sum(resultado["estado"] == "eliminado" for resultado in resultados)
+    return {"eliminados": eliminados, "resultados": resultados}
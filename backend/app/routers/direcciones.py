@@ -81,17 +81,16 @@ def update_existing_direccion(
     Solo actualiza los campos proporcionados en el cuerpo de la petición.
     Retorna 404 si el cliente o la dirección (asociada a ese cliente) no existen.
     """
-    # Verifica si el cliente existe (redundante si se confía en la FK, pero bueno para claridad)
-    db_cliente = crud_clientes.get_cliente_by_id(cliente_id)
-    if db_cliente is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
-
     # Llama a la función CRUD para actualizar, pasando ambos IDs
-    updated_direccion = crud_direcciones.update_direccion(
-        cliente_id=cliente_id, 
-        direccion_id=direccion_id, 
-        direccion_update=direccion_update
-    )
+    # (la existencia del cliente se comprueba en la misma transacción)
+    try:
+        updated_direccion = crud_direcciones.update_direccion(
+            cliente_id=cliente_id, 
+            direccion_id=direccion_id, 
+            direccion_update=direccion_update
+        )
+    except crud_direcciones.ClienteNoEncontrado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
     
     # Si la función CRUD retorna None, la dirección no existía o no pertenecía al cliente
     if updated_direccion is None:
@@ -114,13 +113,12 @@ def delete_existing_direccion(
     Elimina una dirección específica, verificando que pertenezca al cliente especificado.
     Retorna 204 No Content en caso de éxito, o 404 si el cliente o la dirección no existen.
     """
-    # Verifica si el cliente existe
-    db_cliente = crud_clientes.get_cliente_by_id(cliente_id)
-    if db_cliente is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
-
     # Llama a la función CRUD para eliminar, pasando ambos IDs
-    success = crud_direcciones.delete_direccion(cliente_id=cliente_id, direccion_id=direccion_id)
+    # (la existencia del cliente se comprueba en la misma transacción)
+    try:
+        success = crud_direcciones.delete_direccion(cliente_id=cliente_id, direccion_id=direccion_id)
+    except crud_direcciones.ClienteNoEncontrado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cliente no encontrado")
     
     # Si la función CRUD retorna False, la dirección no existía o no pertenecía al cliente
     if not success:
@@ -0,0 +1,61 @@
+# Importaciones necesarias de FastAPI y utilidades de asyncio
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+# Importa el difusor de cambios de stock del proceso
+from app.difusion import difusor
+
+# Crea un router específico para los flujos de eventos
+router = APIRouter()
+
+# Intervalo (segundos) de los comentarios 'ping' que mantienen viva la conexión
+INTERVALO_PING = 15.0
+
+async def _flujo_stock(request: Request):
+    """Generador SSE: envía los cambios pendientes de la suscripción del cliente."""
+    with difusor.suscribir() as suscripcion:
+        # Indica al navegador cuánto esperar antes de reconectar si se corta
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                await asyncio.wait_for(suscripcion.hay_datos.wait(), timeout=INTERVALO_PING)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            if suscripcion.desbordada:
+                # El cliente no siguió el ritmo: debe recargar el catálogo completo
+                yield "event: resync\ndata: {}\n\n"
+                break
+            # Un solo envío por lote; si el cliente es lento, el envío espera
+            # (control de flujo del transporte) y mientras tanto los cambios
+            # se siguen agrupando por producto en la suscripción.
+            yield "".join(suscripcion.tomar_pendientes())
+
+# --- Endpoint de eventos de stock y precio (Server-Sent Events) ---
+@router.get(
+    "/api/eventos/stock",
+    summary="Flujo de cambios de stock y precio (SSE)",
+    tags=["Eventos"]
+)
+async def stream_stock(request: Request):
+    """
+    Abre un flujo Server-Sent Events con los cambios de stock y precio de los
+    productos. Cada evento 'stock' contiene `id_producto`, `cantidad_stock` y
+    `precio` (o `eliminado: true`). Un evento 'resync' indica que el cliente
+    debe recargar el catálogo completo.
+    Retorna 503 si el worker alcanzó el máximo de suscriptores.
+    """
+    if difusor.lleno:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas conexiones de eventos abiertas, intente más tarde.",
+            headers={"Retry-After": "10"},
+        )
+    return StreamingResponse(
+        _flujo_stock(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,108 @@
+# Importaciones necesarias de FastAPI y tipos
+from fastapi import APIRouter
+from typing import List
+
+# Importa el registro de consultas preparadas y el schema de sus estadísticas
+from app import arranque
+from app.admision import control
+from app.auditoria import auditoria
+from app.cache import coalescencia
+from app.db.consultas import registro
+from app.db.database import estado_replicas
+from app.schemas import (
+    EstadisticaAdmision, EstadisticaAuditoria, EstadisticaConsulta, EstadisticaCoalescencia, EstadoArranque,
+    EstadoReplica,
+)
+
+# Crea un router específico para las métricas internas
+router = APIRouter()
+
+# --- Endpoint de estadísticas de consultas ---
+@router.get(
+    "/api/metricas/consultas",
+    response_model=List[EstadisticaConsulta],
+    summary="Estadísticas de ejecución de las consultas registradas",
+    tags=["Métricas"]
+)
+def read_estadisticas_consultas():
+    """
+    Retorna, por cada consulta del registro, el número de ejecuciones, errores
+    y los tiempos total, medio y máximo (en milisegundos).
+    Las estadísticas son del proceso worker que atiende la petición.
+    """
+    return registro.estadisticas()
+
+# --- Endpoint de coalescencia de lecturas ---
+@router.get(
+    "/api/metricas/coalescencia",
+    response_model=List[EstadisticaCoalescencia],
+    summary="Peticiones agrupadas en una sola carga de caché",
+    tags=["Métricas"]
+)
+def read_estadisticas_coalescencia():
+    """
+    Retorna, por cada caché (catálogo y stock), cuántas cargas se ejecutaron
+    contra la base y cuántas peticiones esperaron el resultado de una carga
+    idéntica ya en curso. Las estadísticas son del proceso worker.
+    """
+    return coalescencia.estadisticas()
+
+# --- Endpoint del control de admisión ---
+@router.get(
+    "/api/metricas/admision",
+    response_model=List[EstadisticaAdmision],
+    summary="Peticiones admitidas, limitadas (429) y descartadas (503)",
+    tags=["Métricas"]
+)
+def read_estadisticas_admision():
+    """
+    Retorna, por clase de ruta (lecturas, escrituras, masivas), sus límites
+    y cuántas peticiones se admitieron, se limitaron por tasa (429) o se
+    descartaron por saturación del pool (503) en este proceso worker.
+    """
+    return control.estadisticas()
+
+# --- Endpoint de la auditoría ---
+@router.get(
+    "/api/metricas/auditoria",
+    response_model=EstadisticaAuditoria,
+    summary="Eventos de auditoría en cola, guardados y descartados",
+    tags=["Métricas"]
+)
+def read_estadisticas_auditoria():
+    """
+    Retorna cuántos eventos de auditoría registró el proceso worker, cuántos
+    copió ya a la tabla 'auditoria', cuántos esperan en la cola, cuántos se
+    descartaron con la cola llena y, en modo durable, cuántos fsync hizo.
+    """
+    return auditoria.estadisticas()
+
+# --- Endpoint de estado de las réplicas de lectura ---
+@router.get(
+    "/api/metricas/replicas",
+    response_model=List[EstadoReplica],
+    summary="Salud y retraso de las réplicas de lectura",
+    tags=["Métricas"]
+)
+def read_estado_replicas():
+    """
+    Retorna, por cada réplica configurada en DATABASE_REPLICA_URLS, si el
+    worker la considera sana, el último LSN reproducido y su retraso en bytes
+    de WAL respecto a la primaria. Lista vacía si no hay réplicas.
+    """
+    return estado_replicas()
+
+# --- Endpoint de las fases del arranque ---
+@router.get(
+    "/api/metricas/arranque",
+    response_model=EstadoArranque,
+    summary="Duración de las fases del arranque del worker",
+    tags=["Métricas"]
+)
+def read_estado_arranque():
+    """
+    Retorna cuánto tardó cada fase del arranque del proceso worker que atiende
+    la petición (importación de la app, apertura del pool, precalentamiento) y
+    cuándo empezó a aceptar peticiones, en milisegundos.
+    """
+    return arranque.estado()
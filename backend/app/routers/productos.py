@@ -1,10 +1,14 @@
 # Importaciones necesarias de FastAPI, tipos y estado HTTP
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import List, Optional
 
 # Importa las funciones CRUD y los schemas Pydantic para productos
 from app.crud import crud_productos
-from app.schemas import Producto, ProductoUpdate # <-- Se añade ProductoUpdate
+from app.schemas import Producto, ProductoUpdate, ParticionStock, AjusteMasivo, AjusteMasivoResultado, BorradoMasivo, BorradoMasivoResultado # <-- Se añade ProductoUpdate
+from app.recomendaciones import RELACIONADOS_TOP_K
+from app.paginacion import (
+    CABECERA_SIGUIENTE, LIMITE_MAXIMO, LIMITE_POR_DEFECTO, codificar_cursor, decodificar_cursor,
+)
 
 # Crea un router específico para las rutas de productos
 router = APIRouter()
@@ -16,12 +20,36 @@ router = APIRouter()
     summary="Obtener lista de productos",
     tags=["Productos"] # Agrupa endpoints en la documentación /docs
 )
-def read_productos():
+async def read_productos(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO, description="Productos por página"),
+    cursor: Optional[str] = Query(None, description=f"Valor de la cabecera {CABECERA_SIGUIENTE} de la página anterior"),
+):
     """
     Obtiene una lista de todos los productos del bazar, 
     incluyendo una indicación del tipo de producto (ropa, calzado, accesorios).
+    Con 'limite' o 'cursor' retorna una sola página; si quedan más productos,
+    la cabecera X-Bazar-Siguiente trae el cursor de la siguiente.
+    Es async para que las peticiones simultáneas con la caché vacía esperen
+    la misma consulta sin ocupar hilos del threadpool.
     """
-    productos = crud_productos.get_all_productos()
+    if limite is None and cursor is None:
+        productos = await crud_productos.get_all_productos_async()
+        return productos
+    desde = None
+    if cursor is not None:
+        desde = decodificar_cursor(cursor, (int, int))
+        if desde is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación no válido")
+    pagina = await crud_productos.get_productos_pagina_async(limite or LIMITE_POR_DEFECTO, desde)
+    if pagina is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener los productos."
+        )
+    productos, siguiente = pagina
+    if siguiente is not None:
+        response.headers[CABECERA_SIGUIENTE] = codificar_cursor(*siguiente)
     return productos
 
 # --- Endpoint para LEER un producto específico por ID ---
@@ -31,17 +59,86 @@ def read_productos():
     summary="Obtener un producto por ID",
     tags=["Productos"]
 )
-def read_producto(producto_id: int):
+async def read_producto(producto_id: int):
     """
     Obtiene los detalles de un producto específico usando su 'id_producto',
     incluyendo los atributos específicos de su subtipo (si existen).
     Retorna 404 Not Found si el producto no existe.
     """
-    db_producto = crud_productos.get_producto_by_id(producto_id)
+    db_producto = await crud_productos.get_producto_by_id_async(producto_id)
     if db_producto is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
     return db_producto
 
+# --- Endpoint para LEER los productos comprados junto con uno dado ---
+@router.get(
+    "/api/productos/{producto_id}/relacionados",
+    response_model=List[Producto],
+    summary="Obtener los productos comprados juntos con frecuencia",
+    tags=["Productos"]
+)
+async def read_relacionados(
+    producto_id: int,
+    limite: int = Query(RELACIONADOS_TOP_K, ge=1, le=RELACIONADOS_TOP_K, description="Número máximo de productos"),
+):
+    """
+    Obtiene los productos que más veces aparecen en las mismas ventas que
+    'producto_id', de más a menos frecuente (lista vacía si aún no hay datos).
+    Se sirven de un top-K precalculado y en caché.
+    Retorna 404 Not Found si el producto no existe.
+    """
+    if await crud_productos.get_producto_by_id_async(producto_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+    relacionados = await crud_productos.get_relacionados_async(producto_id, limite)
+    if relacionados is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener los productos relacionados."
+        )
+    return relacionados
+
+# --- Endpoint para AJUSTAR el precio o el stock de muchos productos a la vez ---
+@router.post(
+    "/api/productos/ajuste-masivo",
+    response_model=AjusteMasivoResultado,
+    summary="Ajustar precio o stock de todos los productos de un filtro",
+    tags=["Productos"]
+)
+def ajuste_masivo_productos(ajuste: AjusteMasivo):
+    """
+    Aplica la misma operación a todos los productos que cumplen el filtro
+    (proveedor, tipo, rango de precio, lista de IDs) en una sola sentencia,
+    p. ej. rebajar un 20 % el calzado de un proveedor. Con `simulacion` solo
+    retorna cuántos productos se modificarían.
+    Retorna 400 si el filtro está vacío (no se ajusta el catálogo entero por
+    descuido), si el rango de precio está invertido, si el valor no es válido
+    para la operación o si algún precio o stock resultante no cabe en su
+    columna (no se modifica nada). En los ajustes de stock, 'recortados'
+    cuenta los productos que se quedaron en 0 en lugar de en negativo.
+    """
+    if not ajuste.filtro.model_dump(exclude_none=True):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El filtro debe tener al menos un criterio")
+    filtro = ajuste.filtro
+    if filtro.precio_min is not None and filtro.precio_max is not None and filtro.precio_min > filtro.precio_max:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="precio_min no puede ser mayor que precio_max")
+    if ajuste.operacion == "precio" and ajuste.valor < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El precio no puede ser negativo")
+    if ajuste.operacion == "porcentaje" and ajuste.valor <= -100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La rebaja debe ser menor del 100 %")
+    if ajuste.operacion == "stock" and ajuste.valor != ajuste.valor.to_integral_value():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El ajuste de stock debe ser un número entero")
+
+    try:
+        resultado = crud_productos.ajustar_productos(ajuste)
+    except crud_productos.AjusteFueraDeRango as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al ajustar los productos."
+        )
+    return {"simulacion": ajuste.simulacion, **resultado}
+
 # --- NUEVO Endpoint para ACTUALIZAR un producto existente ---
 @router.put(
     "/api/productos/{producto_id}",
@@ -111,4 +208,51 @@ def delete_existing_producto(producto_id: int):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Error interno del servidor al intentar eliminar el producto."
-        )
\ No newline at end of file
+        )
+
+# --- Endpoint para ELIMINAR varios productos a la vez ---
+@router.post(
+    "/api/productos/borrado-masivo",
+    response_model=BorradoMasivoResultado,
+    summary="Eliminar varios productos a la vez",
+    tags=["Productos"]
+)
+def delete_productos_masivo(borrado: BorradoMasivo):
+    """
+    Elimina en una transacción los productos de `ids` que no aparecen en
+    ninguna venta, con su registro de subtipo, y retorna el estado de cada
+    ID: `eliminado`, `referenciado` (no se elimina) o `no_encontrado`.
+    Retorna 500 si ocurre un error.
+    """
+    resultados = crud_productos.delete_productos(borrado.ids)
+    if resultados is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al eliminar los productos."
+        )
+    eliminados = sum(resultado["estado"] == "eliminado" for resultado in resultados)
+    return {"eliminados": eliminados, "resultados": resultados}
+
+# --- Endpoint para activar/desactivar el stock particionado ---
+@router.put(
+    "/api/productos/{producto_id}/stock-particionado",
+    response_model=Producto,
+    summary="Particionar el stock de un producto muy demandado",
+    tags=["Productos"]
+)
+def update_particion_stock(producto_id: int, particion: ParticionStock):
+    """
+    Reparte el stock del producto en `shards` contadores para que las ventas
+    concurrentes (p. ej. en una venta flash) no compitan por la misma fila.
+    `shards = 1` vuelve a concentrar el stock en el producto.
+    El stock total se conserva. Retorna 404 si el producto no existe.
+    """
+    aplicado = crud_productos.particionar_stock_producto(producto_id, particion.shards)
+    if aplicado is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al particionar el stock."
+        )
+    if not aplicado:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+    return crud_productos.get_producto_by_id(producto_id)
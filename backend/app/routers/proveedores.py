@@ -1,10 +1,10 @@
 # Importaciones necesarias de FastAPI, tipos y estado HTTP
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from typing import List
 
 # Importa las funciones CRUD y los schemas Pydantic para proveedores
 from app.crud import crud_proveedores
-from app.schemas import Proveedor, ProveedorCreate, ProveedorUpdate 
+from app.schemas import BorradoMasivo, BorradoMasivoResultado, Proveedor, ProveedorCreate, ProveedorUpdate, Reabastecimiento
 
 # Crea un router específico para las rutas de proveedores
 router = APIRouter()
@@ -53,6 +53,32 @@ def read_proveedor(proveedor_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Proveedor no encontrado")
     return db_proveedor
 
+# --- Endpoint para LEER las sugerencias de reposición de un proveedor ---
+@router.get(
+    "/api/proveedores/{proveedor_id}/reabastecimiento",
+    response_model=Reabastecimiento,
+    summary="Obtener qué productos de un proveedor hay que reponer",
+    tags=["Proveedores"]
+)
+def read_reabastecimiento(
+    proveedor_id: int,
+    todos: bool = Query(False, description="Incluir los productos que aún no llegaron a su punto de pedido"),
+):
+    """
+    Retorna los productos del proveedor con el stock en su punto de pedido o
+    por debajo y cuántas unidades pedir de cada uno, según el último pronóstico
+    de demanda (job app/jobs/reabastecimiento.py) y el stock vigente.
+    """
+    if crud_proveedores.get_proveedor_by_id(proveedor_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Proveedor no encontrado")
+    reabastecimiento = crud_proveedores.get_reabastecimiento(proveedor_id, todos)
+    if reabastecimiento is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener el reabastecimiento."
+        )
+    return {"id_proveedor": proveedor_id, **reabastecimiento}
+
 # --- Endpoint para ACTUALIZAR un proveedor existente ---
 @router.put(
     "/api/proveedores/{proveedor_id}",
@@ -103,4 +129,26 @@ def delete_existing_proveedor(proveedor_id: int):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Error interno del servidor al intentar eliminar el proveedor."
-        )
\ No newline at end of file
+        )
+
+# --- Endpoint para ELIMINAR varios proveedores a la vez ---
+@router.post(
+    "/api/proveedores/borrado-masivo",
+    response_model=BorradoMasivoResultado,
+    summary="Eliminar varios proveedores a la vez",
+    tags=["Proveedores"]
+)
+def delete_proveedores_masivo(borrado: BorradoMasivo):
+    """
+    Elimina en una transacción los proveedores de `ids` que no tienen
+    productos y retorna el estado de cada ID (como el borrado masivo de
+    productos). Retorna 500 si ocurre un error.
+    """
+    resultados = crud_proveedores.delete_proveedores(borrado.ids)
+    if resultados is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al eliminar los proveedores."
+        )
+    eliminados = sum(resultado["estado"] == "eliminado" for resultado in resultados)
+    return {"eliminados": eliminados, "resultados": resultados}
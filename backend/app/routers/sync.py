@@ -0,0 +1,61 @@
+# Importaciones necesarias de FastAPI, tipos y estado HTTP
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from typing import Optional
+
+# Importa las funciones CRUD y los schemas Pydantic para la sincronización
+from app.crud import crud_sync
+from app.schemas import SyncRespuesta
+
+# Crea un router específico para la sincronización de terminales
+router = APIRouter()
+
+# --- Endpoint de sincronización incremental ---
+@router.get(
+    "/api/sync",
+    response_model=SyncRespuesta,
+    summary="Obtener cambios desde un token de sincronización",
+    tags=["Sincronización"]
+)
+def read_cambios(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Token devuelto por la sincronización anterior"),
+    tablas: Optional[str] = Query(None, description="Tablas a sincronizar, separadas por comas (por defecto todas)"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Retorna las filas insertadas, actualizadas o eliminadas en productos (y sus
+    subtipos), clientes, direcciones y proveedores desde el token 'since'.
+    Sin 'since' retorna una copia completa. La respuesta incluye el token a
+    usar en la siguiente petición (también como ETag).
+    Con `If-None-Match` igual al ETag de la sincronización anterior
+    (`"<since>"`) y sin cambios desde entonces, retorna 304 Not Modified sin
+    cuerpo: el terminal sigue usando su token.
+    Retorna 410 Gone si el token es demasiado antiguo (el terminal debe hacer
+    una sincronización completa).
+    """
+    if tablas is not None:
+        tablas = [tabla.strip() for tabla in tablas.split(",") if tabla.strip()]
+        desconocidas = [tabla for tabla in tablas if tabla not in crud_sync.TABLAS_SYNC]
+        if desconocidas:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Tablas no sincronizables: {', '.join(desconocidas)}."
+            )
+    try:
+        resultado = crud_sync.get_cambios_desde(since, tablas)
+    except crud_sync.TokenExpirado:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="El token de sincronización expiró. Realice una sincronización completa (sin 'since')."
+        )
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener los cambios."
+        )
+    if since is not None and if_none_match == f'"{since}"' and not any(
+        cambios["actualizados"] or cambios["eliminados"] for cambios in resultado["cambios"].values()
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": if_none_match})
+    response.headers["ETag"] = f'"{resultado["token"]}"'
+    return resultado
@@ -1,10 +1,11 @@
 # Importaciones de FastAPI y tipos necesarios
-from fastapi import APIRouter, HTTPException, status
-from typing import List 
+from fastapi import APIRouter, Header, HTTPException, status
+from typing import List, Optional
+from datetime import date
 # Importa las funciones CRUD para ventas
 from app.crud import crud_ventas 
 # Importa los schemas Pydantic para validar entrada y salida
-from app.schemas import Venta, VentaCreate 
+from app.schemas import Venta, VentaCreate, VentaDetallada
 
 # Crea un router específico para las rutas de ventas
 router = APIRouter()
@@ -17,7 +18,10 @@ router = APIRouter()
     summary="Registrar una nueva venta", # Título corto en la documentación
     tags=["Ventas"] # Agrupa este endpoint bajo "Ventas" en la documentación /docs
 )
-def create_new_venta(venta: VentaCreate):
+def create_new_venta(
+    venta: VentaCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=100, description="Clave única de la venta para poder reenviarla sin duplicarla"),
+):
     """
     Registra una nueva venta en la base de datos, incluyendo sus detalles.
 
@@ -25,11 +29,22 @@ def create_new_venta(venta: VentaCreate):
     - `id_cliente`: ID del cliente que realiza la compra.
     - `detalles`: Una lista de objetos, cada uno con `id_producto`, `cantidad`, y `precio_unitario`.
 
+    Descuenta el stock de cada producto vendido. El total se calcula en el
+    servidor con los precios vigentes; `precio_unitario` debe coincidir con ellos.
+
     Retorna los datos de la venta creada, incluyendo los detalles insertados, 
-    o un error HTTP si la operación falla.
+    409 Conflict si algún producto no tiene stock suficiente o su precio no
+    coincide con el vigente (no se registra nada), o un error HTTP si la
+    operación falla.
+
+    Con la cabecera `Idempotency-Key`, reenviar la petición con la misma clave
+    retorna la venta ya registrada en lugar de registrar otra.
     """
     # Llama a la función CRUD para procesar la creación de la venta
-    db_venta = crud_ventas.create_venta(venta_data=venta)
+    try:
+        db_venta = crud_ventas.create_venta(venta_data=venta, clave=idempotency_key)
+    except crud_ventas.VentaRechazada as rechazo:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(rechazo))
     
     # Si la función CRUD retorna None, indica un error durante la transacción
     if db_venta is None:
@@ -41,4 +56,46 @@ def create_new_venta(venta: VentaCreate):
     # Si la creación fue exitosa, retorna los datos de la venta creada
     return db_venta
 
-# --- (Endpoints para LEER ventas (GET /api/ventas, GET /api/ventas/{id}) se añadirían aquí) ---
\ No newline at end of file
+# --- Endpoint para LEER las ventas de un rango de fechas ---
+@router.get(
+    "/api/ventas",
+    response_model=List[Venta],
+    summary="Listar las ventas de un rango de fechas",
+    tags=["Ventas"]
+)
+def read_ventas(desde: date, hasta: date, id_cliente: Optional[int] = None):
+    """
+    Retorna las ventas con fecha entre `desde` y `hasta` (ambas incluidas),
+    ordenadas por fecha. Con `id_cliente`, solo las de ese cliente.
+    Las ventas están particionadas por mes: cuanto más corto el rango, menos
+    datos se leen.
+    """
+    if desde > hasta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'desde' no puede ser posterior a 'hasta'."
+        )
+    ventas = crud_ventas.get_ventas_por_rango(desde, hasta, id_cliente)
+    if ventas is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor al obtener las ventas."
+        )
+    return ventas
+
+# --- Endpoint para LEER una venta por su ID ---
+@router.get(
+    "/api/ventas/{venta_id}",
+    response_model=VentaDetallada,
+    summary="Obtener una venta con sus detalles",
+    tags=["Ventas"]
+)
+def read_venta(venta_id: int):
+    """
+    Obtiene una venta específica por su ID, incluyendo sus detalles.
+    Retorna un error 404 si la venta no se encuentra.
+    """
+    db_venta = crud_ventas.get_venta_by_id(venta_id=venta_id)
+    if db_venta is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Venta no encontrada")
+    return db_venta
@@ -1,7 +1,8 @@
 # Importaciones necesarias de Pydantic y tipos estándar
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any # 'Any' permite flexibilidad para detalles_subtipo
-from datetime import date 
+from typing import Optional, List, Any, Dict, Literal # 'Any' permite flexibilidad para detalles_subtipo
+from datetime import date, datetime
+from decimal import Decimal
 
 # --- Schemas de Producto ---
 
@@ -35,6 +36,41 @@ class Producto(ProductoBase):
         # En Pydantic V2, usar 'from_attributes = True'.
         orm_mode = True 
 
+class ParticionStock(BaseModel):
+    """Schema para activar (shards > 1) o desactivar (shards = 1) el stock particionado."""
+    shards: int = Field(ge=1, le=64)
+
+class FiltroProductos(BaseModel):
+    """Productos a los que se aplica un ajuste masivo: los que cumplen todos los criterios dados."""
+    id_proveedor: Optional[int] = None
+    tipo_producto: Optional[Literal["ropa", "calzado", "accesorios"]] = None
+    # Mismo rango que la columna NUMERIC(10, 2); NaN e infinito no son precios
+    precio_min: Optional[Decimal] = Field(None, ge=0, allow_inf_nan=False, max_digits=10, decimal_places=2)
+    precio_max: Optional[Decimal] = Field(None, ge=0, allow_inf_nan=False, max_digits=10, decimal_places=2)
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+
+class AjusteMasivo(BaseModel):
+    """
+    Schema para ajustar de una vez el precio o el stock de muchos productos.
+    'operacion': 'precio' fija el precio a 'valor', 'porcentaje' lo cambia en
+    'valor' % (-20 = rebaja del 20 %) y 'stock' suma 'valor' unidades (o resta).
+    """
+    filtro: FiltroProductos
+    operacion: Literal["precio", "porcentaje", "stock"]
+    valor: Decimal = Field(allow_inf_nan=False, max_digits=10, decimal_places=2) # Cabe en NUMERIC(10, 2)
+    simulacion: bool = False # Solo cuenta los productos afectados, sin modificarlos
+
+class AjusteMasivoResultado(BaseModel):
+    """
+    Resultado de un ajuste masivo: productos afectados y, si se aplicó, su
+    estado nuevo. 'recortados' cuenta los productos cuyo stock habría quedado
+    negativo y se dejó en 0.
+    """
+    afectados: int
+    recortados: int = 0
+    simulacion: bool
+    productos: List[Producto]
+
 # --- Schemas de Cliente ---
 
 class ClienteBase(BaseModel):
@@ -58,6 +94,20 @@ class Cliente(ClienteBase):
     class Config:
         orm_mode = True 
 
+class RechazoImportacion(BaseModel):
+    """Fila rechazada durante una importación masiva y el motivo."""
+    linea: int
+    clave_externa: Optional[str] = None
+    motivo: str
+
+class ImportacionResultado(BaseModel):
+    """Resumen de una importación masiva de clientes y direcciones."""
+    filas_procesadas: int
+    clientes_insertados: int
+    clientes_actualizados: int
+    direcciones_insertadas: int
+    rechazos: List[RechazoImportacion]
+
 # --- Schemas de Ventas ---
 
 class DetalleVentaBase(BaseModel):
@@ -95,6 +145,10 @@ class Venta(VentaBase):
     class Config:
         orm_mode = True 
 
+class VentaDetallada(Venta):
+    """Schema para retornar una Venta junto con sus detalles."""
+    detalles: List[DetalleVenta]
+
 # --- Schemas de Proveedores ---
 
 class ProveedorBase(BaseModel):
@@ -142,4 +196,146 @@ class Direccion(DireccionBase):
     id_cliente: int 
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# --- Schemas de Resumen de Cliente ---
+
+class ClienteResumen(BaseModel):
+    """Schema para retornar la ficha de un cliente: datos, direcciones y compras."""
+    cliente: Cliente
+    direcciones: List[Direccion]
+    total_gastado: float # Suma de todas sus compras, también las de meses archivados
+    num_compras: int
+    ultima_compra: Optional[date] = None
+    ultimas_ventas: List[Venta] # De la más reciente a la más antigua
+
+# --- Schemas de Reabastecimiento ---
+
+class ProductoReabastecimiento(BaseModel):
+    """Schema para retornar la sugerencia de reposición de un producto."""
+    id_producto: int
+    nombre: str
+    cantidad_stock: int # Stock vigente
+    demanda_diaria: float # Pronóstico (suavizado exponencial)
+    media_movil: float
+    desviacion: float
+    punto_pedido: int
+    nivel_objetivo: int
+    cantidad_sugerida: int # Unidades que faltan hasta el nivel objetivo
+    dias_cobertura: Optional[float] = None # Días que dura el stock con la demanda pronosticada
+
+class Reabastecimiento(BaseModel):
+    """Schema para retornar las sugerencias de reposición de un proveedor."""
+    id_proveedor: int
+    calculado_en: Optional[datetime] = None # Última ejecución del pronóstico
+    productos: List[ProductoReabastecimiento] # Los que antes se quedan sin stock primero
+
+# --- Schemas de Borrado Masivo ---
+
+class BorradoMasivo(BaseModel):
+    """Schema para eliminar varios registros de una vez por sus IDs."""
+    ids: List[int] = Field(min_length=1, max_length=10000)
+
+class ResultadoBorrado(BaseModel):
+    """Resultado del borrado de un ID: 'referenciado' si otra tabla lo impide (ventas, productos)."""
+    id: int
+    estado: Literal["eliminado", "referenciado", "no_encontrado"]
+
+class BorradoMasivoResultado(BaseModel):
+    """Resultado de un borrado masivo: total eliminado y estado de cada ID pedido (sin repetidos)."""
+    eliminados: int
+    resultados: List[ResultadoBorrado]
+
+# --- Schemas de Sincronización ---
+
+class CambiosTabla(BaseModel):
+    """Cambios de una tabla: filas nuevas o modificadas (estado actual) e IDs eliminados."""
+    actualizados: List[Any]
+    eliminados: List[int]
+
+class SyncRespuesta(BaseModel):
+    """Respuesta de /api/sync. 'token' se envía como 'since' en la siguiente petición."""
+    token: str
+    completo: bool # True si es una copia completa (petición sin 'since')
+    cambios: Dict[str, CambiosTabla]
+
+# --- Schemas de Arranque del Frontend ---
+
+class SeccionBootstrap(BaseModel):
+    """
+    Una sección de /api/bootstrap. Si su ETag venía en If-None-Match, el
+    cliente ya la tiene: 'sin_cambios' es True y no trae 'datos'.
+    """
+    etag: str
+    sin_cambios: bool = False
+    siguiente: Optional[str] = None # Cursor de la página siguiente (como X-Bazar-Siguiente)
+
+class SeccionProductos(SeccionBootstrap):
+    datos: Optional[List[Producto]] = None
+
+class SeccionClientes(SeccionBootstrap):
+    datos: Optional[List[Cliente]] = None
+
+class SeccionProveedores(SeccionBootstrap):
+    datos: Optional[List[Proveedor]] = None
+
+class Bootstrap(BaseModel):
+    """Respuesta de /api/bootstrap: lo que necesita la primera carga del frontend."""
+    productos: SeccionProductos
+    clientes: SeccionClientes
+    proveedores: SeccionProveedores
+
+# --- Schemas de Métricas ---
+
+class EstadisticaConsulta(BaseModel):
+    """Estadísticas de ejecución de una consulta del registro (tiempos en milisegundos)."""
+    nombre: str
+    ejecuciones: int
+    errores: int
+    tiempo_total_ms: float
+    tiempo_medio_ms: float
+    tiempo_max_ms: float
+
+class EstadisticaCoalescencia(BaseModel):
+    """Cargas de una caché ejecutadas y peticiones que esperaron a otra idéntica en curso."""
+    nombre: str
+    activo: bool
+    ejecuciones: int
+    coalescidas: int
+    en_vuelo: int
+
+class EstadisticaAdmision(BaseModel):
+    """Límites y decisiones del control de admisión para una clase de ruta."""
+    clase: str
+    tasa: float
+    rafaga: float
+    umbral_cola: int
+    admitidas: int
+    limitadas: int
+    descartadas: int
+
+class EstadisticaAuditoria(BaseModel):
+    """Eventos de auditoría registrados, guardados y en cola del worker."""
+    activo: bool
+    durable: bool # Con fichero local (AUDITORIA_SPOOL)
+    pendientes: int
+    registrados: int
+    guardados: int
+    descartados: int # Cola llena (sin fichero local)
+    desbordados: int # Cola llena: guardados solo en el fichero local
+    errores: int # Guardados fallidos (los eventos se reintentan)
+    fsync: int
+    errores_spool: int # Errores de E/S del fichero local (el worker sigue solo en memoria)
+
+class EstadoReplica(BaseModel):
+    """Estado de una réplica de lectura visto por el worker (LSN como entero)."""
+    nombre: str
+    sana: bool
+    lsn: int
+    retraso_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+class EstadoArranque(BaseModel):
+    """Duración en milisegundos de cada fase del arranque del worker."""
+    fases: Dict[str, float]
+    listo_ms: Optional[float] = None # Desde que empieza a importarse app.main hasta aceptar peticiones
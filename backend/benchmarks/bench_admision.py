@@ -0,0 +1,117 @@
+"""
+Benchmark del control de admisión bajo sobrecarga.
+
+Lanza la API con gunicorn (un worker y un pool pequeño) con y sin control de
+admisión (ADMISION=1/0) y la satura con --clientes clientes en bucle cerrado
+contra GET /api/clientes, cada uno con su propia X-API-Key para que no los
+frene el límite de tasa sino la saturación del pool. Los clientes esperan lo
+que indica Retry-After antes de reintentar; con --ignorar-retry-after
+reintentan en el acto (los rechazos también cuestan CPU al worker).
+
+Reporta, por modo, las respuestas 200 por segundo y su latencia (p50/p99/max),
+las rechazadas (429/503) y los errores. Sin admisión las peticiones se encolan
+hasta DB_POOL_TIMEOUT y la latencia crece con la carga; con admisión el
+exceso se rechaza enseguida y la latencia de las admitidas se mantiene acotada.
+Con --misma-clave todos los clientes comparten una clave (un solo cliente
+desbocado) y lo que actúa es el límite de tasa.
+
+Crea --filas clientes 'bench admision' y los borra al terminar: usar contra una
+base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_admision.py --clientes 100 --duracion 10
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import psycopg
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_workers import BACKEND_DIR, esperar_servidor
+
+RUTA = "/api/clientes"
+
+def cliente_carga(puerto: int, clave: str, hasta: float, resultados: list, respetar_retry_after: bool):
+    """Hace peticiones keep-alive hasta 'hasta' y anota (status, latencia en ms)."""
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+    while time.monotonic() < hasta:
+        inicio = time.perf_counter()
+        try:
+            conn.request("GET", RUTA, headers={"X-API-Key": clave})
+            respuesta = conn.getresponse()
+            respuesta.read()
+            estado = respuesta.status
+            espera = respuesta.getheader("Retry-After")
+        except (OSError, http.client.HTTPException):
+            estado, espera = None, None
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+        resultados.append((estado, (time.perf_counter() - inicio) * 1000))
+        if espera and respetar_retry_after:
+            time.sleep(min(float(espera), max(0.0, hasta - time.monotonic())))
+    conn.close()
+
+def medir(admision: bool, args):
+    entorno = dict(os.environ, WEB_CONCURRENCY="1", BIND=f"127.0.0.1:{args.puerto}",
+                   DB_MAX_CONNECTIONS=str(args.conexiones + 1), ADMISION="1" if admision else "0")
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=entorno, stdout=subprocess.DEVNULL,
+    )
+    try:
+        esperar_servidor(args.puerto, "/")
+        resultados = []
+        hasta = time.monotonic() + args.duracion
+        hilos = [
+            threading.Thread(target=cliente_carga, args=(
+                args.puerto, "bench" if args.misma_clave else f"bench-{i}", hasta, resultados,
+                not args.ignorar_retry_after))
+            for i in range(args.clientes)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+
+    correctas = sorted(latencia for estado, latencia in resultados if estado == 200)
+    rechazadas = {codigo: sum(1 for estado, _ in resultados if estado == codigo) for codigo in (429, 503)}
+    errores = sum(1 for estado, _ in resultados if estado not in (200, 429, 503))
+    print(f"\n{'Con' if admision else 'Sin'} control de admisión:")
+    if correctas:
+        print(f"  200: {len(correctas) / args.duracion:8.1f} /s   p50 {statistics.median(correctas):8.1f} ms"
+              f"   p99 {correctas[int(len(correctas) * 0.99) - 1]:8.1f} ms   max {correctas[-1]:8.1f} ms")
+    print(f"  429: {rechazadas[429]}   503: {rechazadas[503]}   errores: {errores}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=100, help="Clientes concurrentes en bucle cerrado")
+    parser.add_argument("--duracion", type=float, default=10.0)
+    parser.add_argument("--conexiones", type=int, default=3, help="Tamaño del pool del worker")
+    parser.add_argument("--filas", type=int, default=5000, help="Clientes de prueba en la tabla")
+    parser.add_argument("--misma-clave", action="store_true")
+    parser.add_argument("--ignorar-retry-after", action="store_true")
+    parser.add_argument("--puerto", type=int, default=8767)
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    conn.execute("INSERT INTO cliente (nombre) SELECT 'bench admision ' || g FROM generate_series(1, %s) g", (args.filas,))
+    try:
+        medir(False, args)
+        medir(True, args)
+    finally:
+        conn.execute("DELETE FROM cliente WHERE nombre LIKE 'bench admision %%'")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark del ajuste masivo de precios (crud_productos.ajustar_productos)
+frente a lo que hacía antes el frontend: un PUT /api/productos/{id} por
+producto, es decir, update_producto() y después get_producto_by_id().
+
+Crea un proveedor con --productos productos de calzado ('bench ajuste'),
+rebaja un 20 % su precio producto a producto y después con un solo ajuste
+masivo (también mide la simulación, que solo cuenta), y borra los datos al
+terminar: usar contra una base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_ajuste_masivo.py --productos 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=5000)
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.crud import crud_productos
+    from app.db.database import abrir_pool, cerrar_pool
+    from app.schemas import AjusteMasivo, ProductoUpdate
+
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    cur = conn.cursor()
+    with conn.transaction():
+        cur.execute("INSERT INTO proveedor (nombre) VALUES ('bench ajuste') RETURNING id_proveedor")
+        proveedor = cur.fetchone()[0]
+        cur.execute(
+            """
+            INSERT INTO producto (nombre, precio, cantidad_stock, id_proveedor)
+            SELECT 'bench ajuste ' || g, 100, 10, %s FROM generate_series(1, %s) g
+            RETURNING id_producto
+            """,
+            (proveedor, args.productos),
+        )
+        ids = [fila[0] for fila in cur.fetchall()]
+        cur.execute("INSERT INTO calzado (id_producto, talla_numerica, material_suela) SELECT unnest(%s::int[]), 42, 'goma'",
+                    (ids,))
+    cur.execute("ANALYZE producto")
+    abrir_pool()
+
+    try:
+        print(f"Rebaja del 20 % de {args.productos} productos de calzado de un proveedor:")
+        inicio = time.perf_counter()
+        for producto_id in ids:
+            crud_productos.update_producto(producto_id, ProductoUpdate(precio=80)) # Todos cuestan 100
+            crud_productos.get_producto_by_id(producto_id)
+        segundos = time.perf_counter() - inicio
+        print(f"  {'un PUT por producto':<28} {segundos:8.3f} s   {segundos * 1000 / len(ids):7.3f} ms/producto")
+
+        filtro = {"id_proveedor": proveedor, "tipo_producto": "calzado"}
+        for simulacion in (True, False):
+            ajuste = AjusteMasivo(filtro=filtro, operacion="porcentaje", valor=-20, simulacion=simulacion)
+            inicio = time.perf_counter()
+            resultado = crud_productos.ajustar_productos(ajuste)
+            segundos = time.perf_counter() - inicio
+            if resultado is None or resultado["afectados"] != len(ids):
+                sys.exit(f"ajustar_productos retornó {resultado and resultado['afectados']} productos")
+            nombre = "ajuste masivo (simulación)" if simulacion else "ajuste masivo"
+            print(f"  {nombre:<28} {segundos:8.3f} s   {segundos * 1000 / len(ids):7.3f} ms/producto")
+    finally:
+        cerrar_pool()
+        with conn.transaction():
+            cur.execute("DELETE FROM producto WHERE id_proveedor = %s", (proveedor,))
+            cur.execute("DELETE FROM proveedor WHERE id_proveedor = %s", (proveedor,))
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark del archivado de ventas antiguas.
+
+Genera ventas de prueba repartidas en los últimos N meses, ejecuta el job de
+archivado (app/jobs/archivar_ventas.py) conservando los M últimos meses en
+Postgres y compara antes y después:
+
+  - tamaño de 'venta' y 'detalle_venta' (datos e índices) frente al archivo
+  - volcado de ambas tablas con COPY (lo que recorre una copia lógica)
+  - lectura de un mes por la API (crud_ventas.get_ventas_por_rango), de un
+    mes en Postgres y de uno archivado
+
+Borra TODAS las ventas anteriores a los M meses conservados (quedan en el
+archivo) y crea un cliente 'bench archivo': usar contra una base de desarrollo,
+con ARCHIVO_VENTAS_DIR apuntando a un directorio de pruebas.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    ARCHIVO_VENTAS_DIR=/tmp/archivo_bench python benchmarks/bench_archivo.py --meses 36 --meses-activos 12
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+
+def sumar_meses(dia: date, meses: int) -> date:
+    mes = dia.year * 12 + dia.month - 1 + meses
+    return date(mes // 12, mes % 12 + 1, 1)
+
+def tamano_tablas(cur) -> int:
+    """Bytes de todas las particiones de ventas (datos, TOAST e índices)."""
+    cur.execute("""
+        SELECT COALESCE(sum(pg_total_relation_size(c.oid)), 0)::bigint
+        FROM pg_class c
+        WHERE c.relkind = 'r' AND c.relname ~ '^(detalle_)?venta_[0-9]{4}_[0-9]{2}$'
+    """)
+    return cur.fetchone()[0]
+
+def tiempo_volcado(cur) -> tuple:
+    """Segundos y bytes de volcar 'venta' y 'detalle_venta' con COPY."""
+    inicio, total = time.perf_counter(), 0
+    for tabla in ("venta", "detalle_venta"):
+        with cur.copy(f"COPY (SELECT * FROM {tabla}) TO STDOUT") as copia:
+            for bloque in copia:
+                total += len(bloque)
+    return time.perf_counter() - inicio, total
+
+def medir_lectura(mes: date, id_cliente: int, iteraciones: int) -> float:
+    from app.crud import crud_ventas
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        crud_ventas.get_ventas_por_rango(mes, sumar_meses(mes, 1), id_cliente)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses", type=int, default=36)
+    parser.add_argument("--meses-activos", type=int, default=12)
+    parser.add_argument("--ventas-por-mes", type=int, default=5000)
+    parser.add_argument("--iteraciones", type=int, default=5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.archivo import ventas as archivo
+    from app.db.database import abrir_pool, cerrar_pool
+    from app.jobs.archivar_ventas import archivar_ventas
+
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    este_mes = date.today().replace(day=1)
+    primer_mes = sumar_meses(este_mes, -args.meses)
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO cliente (nombre) VALUES ('bench archivo') RETURNING id_cliente")
+        cliente_id = cur.fetchone()[0]
+        cur.execute("SELECT crear_particiones_venta(%s, %s)", (primer_mes, este_mes))
+        print(f"Generando {args.meses} meses x {args.ventas_por_mes} ventas...")
+        with conn.transaction():
+            cur.execute(
+                """
+                INSERT INTO venta (fecha, monto_total, id_cliente)
+                SELECT %(primer_mes)s::date + (g %% (%(este_mes)s::date - %(primer_mes)s::date)),
+                       round((random() * 500)::numeric, 2), %(cliente)s
+                FROM generate_series(0, %(total)s - 1) g
+                """,
+                {"primer_mes": primer_mes, "este_mes": este_mes, "cliente": cliente_id,
+                 "total": args.meses * args.ventas_por_mes},
+            )
+            cur.execute(
+                """
+                INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario)
+                SELECT v.id_venta, v.fecha, p.id_producto, 1 + (random() * 3)::int, p.precio
+                FROM venta v
+                CROSS JOIN (SELECT id_producto, precio FROM producto ORDER BY id_producto LIMIT 2) p
+                WHERE v.id_cliente = %s
+                """,
+                (cliente_id,),
+            )
+        cur.execute("VACUUM ANALYZE venta")
+        cur.execute("VACUUM ANALYZE detalle_venta")
+
+        abrir_pool()
+        mes_activo = sumar_meses(este_mes, -1)
+        mes_antiguo = primer_mes
+        tamano_antes = tamano_tablas(cur)
+        volcado_antes = tiempo_volcado(cur)
+        lectura_antes = medir_lectura(mes_antiguo, cliente_id, args.iteraciones)
+
+        inicio = time.perf_counter()
+        meses = archivar_ventas(args.meses_activos)
+        duracion = time.perf_counter() - inicio
+        archivados = sum(mes["bytes"] for mes in archivo.meses_archivados().values())
+        print(f"Job: {len(meses)} meses archivados en {duracion:.1f} s ({archivados / 1e6:.1f} MB en {archivo.ARCHIVO_VENTAS_DIR})")
+
+        tamano_despues = tamano_tablas(cur)
+        volcado_despues = tiempo_volcado(cur)
+        print(f"\nTablas de ventas en Postgres:  {tamano_antes / 1e6:8.1f} MB -> {tamano_despues / 1e6:8.1f} MB")
+        print(f"Volcado con COPY:              {volcado_antes[0]:8.2f} s ({volcado_antes[1] / 1e6:.1f} MB) -> "
+              f"{volcado_despues[0]:.2f} s ({volcado_despues[1] / 1e6:.1f} MB)")
+        print(f"\nLectura de un mes por la API (mediana de {args.iteraciones}):")
+        print(f"  mes antiguo en Postgres      {lectura_antes:8.1f} ms")
+        print(f"  mes antiguo archivado        {medir_lectura(mes_antiguo, cliente_id, args.iteraciones):8.1f} ms")
+        print(f"  mes reciente en Postgres     {medir_lectura(mes_activo, cliente_id, args.iteraciones):8.1f} ms")
+        cerrar_pool()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
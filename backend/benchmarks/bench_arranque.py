@@ -0,0 +1,149 @@
+"""
+Benchmark del arranque en frío (despliegue que escala a cero).
+
+Mide dos cosas, cada una --repeticiones veces en procesos nuevos:
+
+  1. Importación: cuánto tarda un intérprete nuevo en importar app.main
+     (python -X importtime) y qué paquetes se llevan la mayor parte.
+  2. Primera respuesta: lanza la API con gunicorn (un worker, como una
+     instancia recién despertada), pide GET --ruta en bucle desde el instante
+     del lanzamiento y anota cuándo llega el primer 200, cuánto tardó esa
+     petición y cuánto tarda la siguiente (ya en caliente). Al final lee las
+     fases del arranque del worker en /api/metricas/arranque.
+
+Con --presupuesto-ms termina con código 1 si la mediana del tiempo hasta la
+primera respuesta correcta supera el presupuesto (para usarlo en CI).
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_arranque.py --repeticiones 5 --presupuesto-ms 2500
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_workers import BACKEND_DIR
+
+def medir_importacion(repeticiones: int):
+    """Retorna (ms de importar app.main, ms totales del proceso, ms por paquete) de cada repetición."""
+    resultados = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", "import app.main"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        )
+        total_proceso = (time.perf_counter() - inicio) * 1000
+        por_paquete = defaultdict(float)
+        app_main = 0.0
+        # Formato: "import time: <propio us> | <acumulado us> | <sangría><módulo>"
+        for linea in proceso.stderr.splitlines():
+            coincidencia = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", linea)
+            if not coincidencia:
+                continue
+            propio, acumulado, _, modulo = coincidencia.groups()
+            por_paquete[modulo.split(".")[0]] += int(propio) / 1000
+            if modulo == "app.main":
+                app_main = int(acumulado) / 1000
+        resultados.append((app_main, total_proceso, por_paquete))
+    return resultados
+
+def pedir(puerto: int, ruta: str):
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+    try:
+        conn.request("GET", ruta)
+        respuesta = conn.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conn.close()
+
+def medir_primera_respuesta(args):
+    """Retorna (ms hasta el primer 200, ms de esa petición, ms de la siguiente, fases del worker)."""
+    entorno = dict(os.environ, WEB_CONCURRENCY="1", BIND=f"127.0.0.1:{args.puerto}")
+    lanzamiento = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=entorno, stdout=subprocess.DEVNULL,
+    )
+    try:
+        limite = lanzamiento + 60
+        while True:
+            if time.perf_counter() > limite:
+                raise RuntimeError("El servidor no respondió a tiempo")
+            inicio = time.perf_counter()
+            try:
+                estado, _ = pedir(args.puerto, args.ruta)
+            except OSError:
+                time.sleep(0.005)
+                continue
+            if estado == 200:
+                fin = time.perf_counter()
+                break
+            time.sleep(0.005)
+        primera = (fin - lanzamiento) * 1000, (fin - inicio) * 1000
+        inicio = time.perf_counter()
+        pedir(args.puerto, args.ruta)
+        siguiente = (time.perf_counter() - inicio) * 1000
+        # Versiones anteriores de la API no publican las fases
+        estado, cuerpo = pedir(args.puerto, "/api/metricas/arranque")
+        fases = json.loads(cuerpo) if estado == 200 else None
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+    return primera[0], primera[1], siguiente, fases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--ruta", default="/api/productos", help="Ruta de la primera petición")
+    parser.add_argument("--presupuesto-ms", type=float, help="Máximo admitido para la mediana hasta el primer 200")
+    parser.add_argument("--puerto", type=int, default=8768)
+    args = parser.parse_args()
+
+    importaciones = medir_importacion(args.repeticiones)
+    print(f"Importación de app.main ({args.repeticiones} procesos nuevos):")
+    print(f"  app.main: mediana {statistics.median(i[0] for i in importaciones):7.1f} ms"
+          f"   proceso completo (intérprete incluido): {statistics.median(i[1] for i in importaciones):7.1f} ms")
+    paquetes = defaultdict(list)
+    for _, _, por_paquete in importaciones:
+        for paquete, ms in por_paquete.items():
+            paquetes[paquete].append(ms)
+    mayores = sorted(paquetes.items(), key=lambda item: -statistics.median(item[1]))[:10]
+    print("  Paquetes más costosos (tiempo propio de sus módulos):")
+    for paquete, tiempos in mayores:
+        print(f"    {paquete:<20} {statistics.median(tiempos):7.1f} ms")
+
+    print(f"\nPrimera respuesta a GET {args.ruta} desde el lanzamiento de gunicorn:")
+    hasta_primera, primeras, siguientes, fases = [], [], [], []
+    for _ in range(args.repeticiones):
+        total, primera, siguiente, fases_worker = medir_primera_respuesta(args)
+        hasta_primera.append(total)
+        primeras.append(primera)
+        siguientes.append(siguiente)
+        fases.append(fases_worker)
+        print(f"  hasta el primer 200 {total:7.1f} ms   esa petición {primera:6.1f} ms   la siguiente {siguiente:6.1f} ms")
+    mediana = statistics.median(hasta_primera)
+    print(f"  mediana hasta el primer 200: {mediana:.1f} ms (max {max(hasta_primera):.1f} ms)")
+    fases = [f for f in fases if f]
+    if fases:
+        print(f"  worker listo tras {statistics.median(f['listo_ms'] for f in fases):.1f} ms desde que empezó a importar app.main")
+        print("  Fases del arranque del worker (mediana; el precalentamiento sigue en segundo plano):")
+        for nombre in dict.fromkeys(nombre for f in fases for nombre in f["fases"]):
+            tiempos = [f["fases"][nombre] for f in fases if nombre in f["fases"]]
+            print(f"    {nombre:<24} {statistics.median(tiempos):7.1f} ms")
+
+    if args.presupuesto_ms is not None:
+        if mediana > args.presupuesto_ms:
+            print(f"\nFUERA DE PRESUPUESTO: {mediana:.1f} ms > {args.presupuesto_ms:.1f} ms")
+            sys.exit(1)
+        print(f"\nDentro del presupuesto: {mediana:.1f} ms <= {args.presupuesto_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark del coste de la auditoría (app/auditoria.py) en las escrituras.
+
+Mide la latencia de crud_clientes.update_cliente() (p50, p99 y máximo) con
+--hilos hilos, cada uno actualizando su propio cliente --escrituras veces,
+en tres modos:
+
+  - sin auditoría;
+  - memoria: los eventos se encolan y el hilo de la auditoría los copia a la
+    tabla cada AUDITORIA_INTERVALO segundos;
+  - durable: además, cada evento se escribe con fsync en un fichero local
+    (en un directorio temporal) antes de volver.
+
+Crea los clientes ('bench auditoria') y borra al terminar los clientes y sus
+eventos: usar contra una base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con la migración
+0007 aplicada):
+    python benchmarks/bench_auditoria.py --hilos 4 --escrituras 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+
+USUARIO = "bench auditoria"
+
+def medir(crud_clientes, ClienteUpdate, actor, clientes: list, escrituras: int) -> list:
+    """Latencias (ms) de 'escrituras' update_cliente() por cliente, un hilo por cliente."""
+    latencias = []
+    lock = threading.Lock()
+
+    def escribir(cliente: int):
+        propias = []
+        with actor(USUARIO, "bench"):
+            for i in range(escrituras):
+                inicio = time.perf_counter()
+                crud_clientes.update_cliente(cliente, ClienteUpdate(telefono=str(i)))
+                propias.append((time.perf_counter() - inicio) * 1000)
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=escribir, args=(cliente,)) for cliente in clientes]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--escrituras", type=int, default=2000, help="Actualizaciones por hilo")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.auditoria import actor, auditoria
+    from app.crud import crud_clientes
+    from app.db.database import abrir_pool, cerrar_pool
+    from app.schemas import ClienteUpdate
+
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO cliente (nombre) SELECT %s FROM generate_series(1, %s) RETURNING id_cliente",
+        (USUARIO, args.hilos),
+    )
+    clientes = [fila[0] for fila in cur.fetchall()]
+    abrir_pool()
+    spool = tempfile.TemporaryDirectory()
+
+    try:
+        # Calentamiento: conexiones del pool y sentencias preparadas
+        auditoria.activo = False
+        medir(crud_clientes, ClienteUpdate, actor, clientes, 100)
+
+        print(f"update_cliente, {args.hilos} hilos x {args.escrituras} escrituras:")
+        for nombre, activo, directorio in (("sin auditoría", False, None), ("memoria", True, None),
+                                           ("durable (fsync)", True, spool.name)):
+            auditoria.activo, auditoria.spool = activo, directorio
+            antes = auditoria.estadisticas()
+            auditoria.iniciar()
+            latencias = medir(crud_clientes, ClienteUpdate, actor, clientes, args.escrituras)
+            auditoria.detener()
+            despues = auditoria.estadisticas()
+            cuantiles = statistics.quantiles(latencias, n=100)
+            print(f"  {nombre:<16} p50 {cuantiles[49]:7.3f} ms   p99 {cuantiles[98]:7.3f} ms   "
+                  f"máx {max(latencias):7.3f} ms   "
+                  f"{despues['guardados'] - antes['guardados']} guardados, {despues['fsync'] - antes['fsync']} fsync")
+            if despues["pendientes"] or despues["descartados"] != antes["descartados"]:
+                sys.exit(f"Eventos sin guardar: {despues}")
+    finally:
+        cerrar_pool()
+        spool.cleanup()
+        cur.execute("DELETE FROM auditoria WHERE usuario = %s", (USUARIO,))
+        cur.execute("DELETE FROM cliente WHERE id_cliente = ANY(%s)", (clientes,))
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark de la primera carga del frontend: peticiones separadas frente a
+GET /api/bootstrap.
+
+Lanza la API con gunicorn y mide, por repetición, lo que pide el frontend
+para poder empezar a vender:
+  - antes: la primera página de productos, la de clientes y los proveedores
+    en tres peticiones en paralelo, cada una en su conexión y sin comprimir
+    (como hacía el frontend antes de /api/bootstrap y de GZipMiddleware);
+  - después: una sola petición a /api/bootstrap comprimida con gzip;
+  - revalidación: /api/bootstrap con If-None-Match (304 sin cuerpo), lo que
+    hace el navegador al volver a abrir la página.
+
+En local la red no cuesta casi nada, así que además del tiempo medido se
+estima el de una red móvil (--rtt y --ancho-banda): cada petición en una
+conexión nueva paga dos viajes de ida y vuelta (conexión y petición) y sus
+bytes comparten el ancho de banda con las que van en paralelo.
+
+Crea --productos productos y --clientes clientes 'bench bootstrap' para que
+las páginas estén llenas, y los borra al terminar: usar contra una base de
+desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_bootstrap.py --productos 2000 --clientes 2000 --repeticiones 20
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_workers import BACKEND_DIR, esperar_servidor
+
+def pedir(puerto: int, ruta: str, cabeceras: dict) -> tuple:
+    """Petición en una conexión nueva; retorna (estado, bytes recibidos, cabeceras)."""
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+    try:
+        conn.request("GET", ruta, headers=cabeceras)
+        respuesta = conn.getresponse()
+        cuerpo = respuesta.read()
+        return respuesta.status, len(cuerpo), dict(respuesta.getheaders())
+    finally:
+        conn.close()
+
+def carga(puerto: int, rutas: list, cabeceras: dict) -> tuple:
+    """Pide las rutas en paralelo; retorna (ms hasta la última respuesta, bytes, estados)."""
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(len(rutas)) as hilos:
+        resultados = list(hilos.map(lambda ruta: pedir(puerto, ruta, cabeceras), rutas))
+    ms = (time.perf_counter() - inicio) * 1000
+    return ms, sum(r[1] for r in resultados), [r[0] for r in resultados]
+
+def estimar_red(ms: float, bytes_totales: int, args) -> float:
+    """Tiempo estimado en la red simulada: dos RTT más la transferencia de todos los bytes."""
+    return ms + 2 * args.rtt + bytes_totales * 8 / args.ancho_banda # kbit/s = bit/ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--clientes", type=int, default=2000)
+    parser.add_argument("--limite", type=int, default=500, help="Tamaño de página (el TAMANO_PAGINA del frontend)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=150.0, help="Ida y vuelta de la red simulada (ms)")
+    parser.add_argument("--ancho-banda", type=float, default=1600.0, help="Ancho de banda de la red simulada (kbit/s)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--puerto", type=int, default=8767)
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    with conn.transaction():
+        conn.execute(
+            """
+            INSERT INTO producto (nombre, descripcion, precio, cantidad_stock, id_proveedor)
+            SELECT 'bench bootstrap ' || g, 'producto de prueba', 10, 5, (SELECT min(id_proveedor) FROM proveedor)
+            FROM generate_series(1, %s) g
+            """,
+            (args.productos,),
+        )
+        conn.execute(
+            "INSERT INTO cliente (nombre, telefono) SELECT 'bench bootstrap ' || g, '555-' || g FROM generate_series(1, %s) g",
+            (args.clientes,),
+        )
+
+    entorno = dict(os.environ, WEB_CONCURRENCY=str(args.workers), BIND=f"127.0.0.1:{args.puerto}", ADMISION="0")
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=entorno,
+    )
+    try:
+        esperar_servidor(args.puerto, "/api/bootstrap")
+        separadas = [f"/api/productos?limite={args.limite}", f"/api/clientes?limite={args.limite}", "/api/proveedores"]
+        arranque = f"/api/bootstrap?limite={args.limite}"
+        etag = pedir(args.puerto, arranque, {})[2]["etag"]
+        escenarios = (
+            ("antes (3 peticiones)", separadas, {"Accept-Encoding": "identity"}),
+            ("después (bootstrap)", [arranque], {"Accept-Encoding": "gzip"}),
+            ("revalidación (304)", [arranque], {"Accept-Encoding": "gzip", "If-None-Match": etag}),
+        )
+        for _, rutas, cabeceras in escenarios: # Calentamiento (cachés de la API)
+            carga(args.puerto, rutas, cabeceras)
+
+        print(f"{args.productos} productos y {args.clientes} clientes de prueba, páginas de {args.limite},"
+              f" {args.repeticiones} repeticiones (mediana); red simulada: RTT {args.rtt:.0f} ms, {args.ancho_banda:.0f} kbit/s")
+        for nombre, rutas, cabeceras in escenarios:
+            medidas = [carga(args.puerto, rutas, cabeceras) for _ in range(args.repeticiones)]
+            ms = statistics.median(m[0] for m in medidas)
+            bytes_totales = medidas[-1][1]
+            estados = sorted(set(estado for m in medidas for estado in m[2]))
+            print(f"  {nombre:<22} {ms:8.1f} ms   {bytes_totales / 1024:8.1f} KB"
+                  f"   estimado en la red simulada {estimar_red(ms, bytes_totales, args):8.1f} ms   HTTP {estados}")
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+        print("\nBorrando los datos de prueba...")
+        conn.execute("DELETE FROM producto WHERE nombre LIKE 'bench bootstrap %%'")
+        conn.execute("DELETE FROM cliente WHERE nombre LIKE 'bench bootstrap %%'")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
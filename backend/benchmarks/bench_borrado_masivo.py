@@ -0,0 +1,100 @@
+"""
+Benchmark del borrado masivo de productos (crud_productos.delete_productos)
+frente a una llamada a delete_producto() por ID (un DELETE /api/productos/{id}
+por producto).
+
+Crea dos lotes de --productos productos de calzado ('bench borrado masivo');
+en cada lote, uno de cada --vendidos aparece en una venta y no se puede
+borrar. Borra un lote producto a producto y el otro de una vez, comprueba que
+los resultados coinciden y borra los datos al terminar: usar contra una base
+de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_borrado_masivo.py --productos 5000 --vendidos 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+
+def crear_lote(cur, proveedor: int, cliente: int, productos: int, vendidos: int) -> list:
+    """Crea los productos del lote y una venta con uno de cada 'vendidos'. Retorna sus IDs."""
+    cur.execute(
+        """
+        INSERT INTO producto (nombre, precio, cantidad_stock, id_proveedor)
+        SELECT 'bench borrado masivo ' || g, 10, 0, %s FROM generate_series(1, %s) g
+        RETURNING id_producto
+        """,
+        (proveedor, productos),
+    )
+    ids = [fila[0] for fila in cur.fetchall()]
+    cur.execute("INSERT INTO calzado (id_producto, talla_numerica, material_suela) SELECT unnest(%s::int[]), 42, 'goma'",
+                (ids,))
+    cur.execute("INSERT INTO venta (fecha, monto_total, id_cliente) VALUES (current_date, 0, %s) RETURNING id_venta",
+                (cliente,))
+    venta = cur.fetchone()[0]
+    cur.execute(
+        """
+        INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario)
+        SELECT %s, current_date, unnest(%s::int[]), 1, 10
+        """,
+        (venta, ids[::vendidos]),
+    )
+    return ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=5000, help="Productos de cada lote")
+    parser.add_argument("--vendidos", type=int, default=4, help="Uno de cada N productos tiene ventas")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.crud import crud_productos
+    from app.db.database import abrir_pool, cerrar_pool
+
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    cur = conn.cursor()
+    with conn.transaction():
+        cur.execute("INSERT INTO proveedor (nombre) VALUES ('bench borrado masivo') RETURNING id_proveedor")
+        proveedor = cur.fetchone()[0]
+        cur.execute("INSERT INTO cliente (nombre) VALUES ('bench borrado masivo') RETURNING id_cliente")
+        cliente = cur.fetchone()[0]
+        uno_a_uno = crear_lote(cur, proveedor, cliente, args.productos, args.vendidos)
+        masivo = crear_lote(cur, proveedor, cliente, args.productos, args.vendidos)
+    cur.execute("ANALYZE producto")
+    abrir_pool()
+
+    try:
+        print(f"Borrado de {args.productos} productos (uno de cada {args.vendidos} con ventas):")
+        inicio = time.perf_counter()
+        codigos = [crud_productos.delete_producto(producto_id) for producto_id in uno_a_uno]
+        segundos = time.perf_counter() - inicio
+        print(f"  {'delete_producto por ID':<24} {segundos:8.3f} s   {codigos.count(1)} eliminados, "
+              f"{codigos.count(-2)} con ventas")
+
+        inicio = time.perf_counter()
+        resultados = crud_productos.delete_productos(masivo)
+        segundos = time.perf_counter() - inicio
+        if resultados is None:
+            sys.exit("delete_productos retornó None")
+        estados = [resultado["estado"] for resultado in resultados]
+        print(f"  {'delete_productos':<24} {segundos:8.3f} s   {estados.count('eliminado')} eliminados, "
+              f"{estados.count('referenciado')} con ventas")
+        if (estados.count("eliminado"), estados.count("referenciado")) != (codigos.count(1), codigos.count(-2)):
+            sys.exit("Los dos borrados no coinciden")
+    finally:
+        cerrar_pool()
+        with conn.transaction():
+            cur.execute("DELETE FROM venta WHERE id_cliente = %s", (cliente,))
+            cur.execute("DELETE FROM producto WHERE id_proveedor = %s", (proveedor,))
+            cur.execute("DELETE FROM cliente WHERE id_cliente = %s", (cliente,))
+            cur.execute("DELETE FROM proveedor WHERE id_proveedor = %s", (proveedor,))
+        conn.close()
+
+if __name__ == "__main__":
+    main()
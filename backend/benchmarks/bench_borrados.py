@@ -0,0 +1,132 @@
+"""
+Benchmark de borrado de clientes y proveedores con y sin índices en las
+columnas de clave foránea (migración 0001_indices_claves_foraneas).
+
+Crea muchos clientes con dirección, ventas de otros clientes y productos de
+otros proveedores, y mide crud_clientes.delete_cliente y
+crud_proveedores.delete_proveedor sobre clientes/proveedores sin dependencias
+restrictivas. Cada borrado de cliente arrastra su dirección (ON DELETE CASCADE)
+y comprueba que no tenga ventas (RESTRICT); cada borrado de proveedor
+comprueba que no tenga productos. Sin índices, cada una de esas comprobaciones
+recorre la tabla entera.
+
+Revierte la migración 0001 con el runner si está aplicada, mide, la aplica y
+vuelve a medir (la deja aplicada). Crea datos de prueba ('bench borrados') y
+los borra al terminar: usar contra una base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_borrados.py --clientes 200000 --ventas 300000 --productos 50000 --borrados 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+
+VERSION_INDICES = 1
+
+def informe(nombre, tiempos):
+    tiempos = sorted(tiempos)
+    print(f"  {nombre:<28} media {statistics.mean(tiempos):8.2f} ms   p50 {tiempos[len(tiempos) // 2]:8.2f} ms   max {tiempos[-1]:8.2f} ms")
+
+def medir(funcion, ids):
+    tiempos = []
+    for id_ in ids:
+        inicio = time.perf_counter()
+        resultado = funcion(id_)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if resultado != 1:
+            sys.exit(f"{funcion.__name__}({id_}) retornó {resultado}")
+    return tiempos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=200000)
+    parser.add_argument("--ventas", type=int, default=300000)
+    parser.add_argument("--productos", type=int, default=50000)
+    parser.add_argument("--borrados", type=int, default=200, help="Clientes y proveedores borrados en cada fase")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.crud import crud_clientes, crud_proveedores
+    from app.db import migraciones
+    from app.db.database import abrir_pool, cerrar_pool
+
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    cur = conn.cursor()
+    print("Generando datos...")
+    with conn.transaction():
+        cur.execute(
+            """
+            INSERT INTO cliente (nombre) SELECT 'bench borrados ' || g FROM generate_series(1, %s) g
+            RETURNING id_cliente
+            """,
+            (args.clientes,),
+        )
+        clientes = [fila[0] for fila in cur.fetchall()]
+        cur.execute(
+            """
+            INSERT INTO direccion (calle, ciudad, codigo_postal, id_cliente)
+            SELECT 'calle', 'ciudad', '00000', id_cliente FROM cliente WHERE id_cliente >= %s
+            """,
+            (min(clientes),),
+        )
+        cur.execute(
+            "INSERT INTO proveedor (nombre) SELECT 'bench borrados ' || g FROM generate_series(1, %s) g RETURNING id_proveedor",
+            (2 * args.borrados + 1,),
+        )
+        proveedores = [fila[0] for fila in cur.fetchall()]
+        # Productos y ventas cuelgan del último proveedor y de los últimos clientes:
+        # los que se borran no tienen dependencias restrictivas
+        cur.execute(
+            """
+            INSERT INTO producto (nombre, precio, cantidad_stock, id_proveedor)
+            SELECT 'bench borrados ' || g, 10, 0, %s FROM generate_series(1, %s) g
+            """,
+            (proveedores[-1], args.productos),
+        )
+        cur.execute(
+            """
+            INSERT INTO venta (fecha, monto_total, id_cliente)
+            SELECT current_date, 10, (%s::int[])[1 + g %% 1000] FROM generate_series(0, %s - 1) g
+            """,
+            (clientes[-1000:], args.ventas),
+        )
+    for tabla in ("cliente", "direccion", "proveedor", "producto", "venta"):
+        cur.execute(f"ANALYZE {tabla}")
+
+    a_borrar_clientes = iter(clientes[:2 * args.borrados])
+    a_borrar_proveedores = iter(proveedores[:2 * args.borrados])
+    abrir_pool()
+
+    def fase(titulo):
+        print(f"\n{titulo} ({args.borrados} borrados de cada tipo):")
+        informe("delete_cliente", medir(crud_clientes.delete_cliente, [next(a_borrar_clientes) for _ in range(args.borrados)]))
+        informe("delete_proveedor", medir(crud_proveedores.delete_proveedor, [next(a_borrar_proveedores) for _ in range(args.borrados)]))
+
+    aplicadas = {version for version, _, aplicada in migraciones.estado(conn) if aplicada}
+    if VERSION_INDICES in aplicadas:
+        migraciones.revertir(conn, pasos=len([v for v in aplicadas if v >= VERSION_INDICES]))
+    fase("Sin índices en las claves foráneas")
+
+    inicio = time.perf_counter()
+    migraciones.aplicar(conn)
+    print(f"\nMigraciones aplicadas en {time.perf_counter() - inicio:.1f} s (CREATE INDEX CONCURRENTLY)")
+    fase("Con índices en las claves foráneas")
+    cerrar_pool()
+
+    print("\nBorrando los datos de prueba...")
+    with conn.transaction():
+        cur.execute("DELETE FROM venta WHERE id_cliente = ANY(%s)", (clientes[-1000:],))
+        cur.execute("DELETE FROM producto WHERE id_proveedor = %s", (proveedores[-1],))
+        cur.execute("DELETE FROM cliente WHERE id_cliente = ANY(%s)", (clientes,))
+        cur.execute("DELETE FROM proveedor WHERE id_proveedor = ANY(%s)", (proveedores,))
+    conn.close()
+
+if __name__ == "__main__":
+    main()
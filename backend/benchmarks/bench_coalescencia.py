@@ -0,0 +1,138 @@
+"""
+Benchmark de avalancha (thundering herd) sobre el catálogo.
+
+Lanza la API con gunicorn con y sin coalescencia de lecturas
+(CACHE_COALESCENCIA=1/0). En cada ronda invalida la caché del catálogo con un
+NOTIFY, como haría una escritura, y dispara a la vez --concurrencia peticiones
+idénticas a GET /api/productos y a GET /api/productos/{id}. Mide la latencia de
+las peticiones y cuántas consultas llegaron a Postgres y cuánto tardaron
+(métricas de la API; con un solo worker, que es el valor por defecto, cuentan
+todas). Con catálogos grandes la latencia la domina serializar la respuesta
+de cada petición, no la consulta.
+
+Crea --productos productos 'bench coalescencia' para que cargar el catálogo
+cueste algo, y los borra al terminar: usar contra una base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_coalescencia.py --productos 2000 --concurrencia 200 --rondas 3
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import psycopg
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_workers import BACKEND_DIR, esperar_servidor
+
+def pedir(puerto: int, ruta: str):
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=120)
+    try:
+        conn.request("GET", ruta)
+        respuesta = conn.getresponse()
+        cuerpo = respuesta.read()
+        return respuesta.status, cuerpo
+    finally:
+        conn.close()
+
+def metricas(puerto: int) -> tuple:
+    """((ejecuciones, ms) por consulta registrada, estadísticas de coalescencia del catálogo)."""
+    consultas = {
+        c["nombre"]: (c["ejecuciones"], c["tiempo_total_ms"])
+        for c in json.loads(pedir(puerto, "/api/metricas/consultas")[1])
+    }
+    catalogo = next(c for c in json.loads(pedir(puerto, "/api/metricas/coalescencia")[1]) if c["nombre"] == "catalogo")
+    return consultas, catalogo
+
+def avalancha(puerto: int, ruta: str, concurrencia: int) -> list:
+    """Lanza 'concurrencia' peticiones a la vez y retorna sus latencias en ms."""
+    salida = threading.Barrier(concurrencia)
+    latencias, errores = [], []
+
+    def cliente():
+        salida.wait()
+        inicio = time.perf_counter()
+        estado, _ = pedir(puerto, ruta)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if estado != 200:
+            errores.append(estado)
+
+    hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    if errores:
+        print(f"    {len(errores)} peticiones con error (p. ej. HTTP {errores[0]})")
+    return latencias
+
+def medir(coalescencia: bool, producto_id: int, conn, args):
+    entorno = dict(os.environ, WEB_CONCURRENCY=str(args.workers), BIND=f"127.0.0.1:{args.puerto}",
+                   CACHE_COALESCENCIA="1" if coalescencia else "0")
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=entorno,
+    )
+    try:
+        esperar_servidor(args.puerto, "/api/productos")
+        print(f"\n{'Con' if coalescencia else 'Sin'} coalescencia ({args.workers} worker(s), {args.concurrencia} peticiones por ronda):")
+        for ruta, consulta in (("/api/productos", "producto.todos"), (f"/api/productos/{producto_id}", "producto.por_id")):
+            latencias = []
+            consultas_antes, catalogo_antes = metricas(args.puerto)
+            for ronda in range(args.rondas):
+                conn.execute("SELECT pg_notify('cache_invalidacion', %s)", (f"catalogo:bench-{time.time_ns()}",))
+                time.sleep(0.3) # Entrega de la notificación a los workers
+                latencias += avalancha(args.puerto, ruta, args.concurrencia)
+            consultas_despues, catalogo_despues = metricas(args.puerto)
+            latencias.sort()
+            ejecutadas, tiempo_db = (
+                despues - antes for despues, antes in zip(consultas_despues.get(consulta, (0, 0)), consultas_antes.get(consulta, (0, 0)))
+            )
+            coalescidas = catalogo_despues["coalescidas"] - catalogo_antes["coalescidas"]
+            print(f"  {ruta:<22} consultas {ejecutadas:>5} / {args.rondas * args.concurrencia} peticiones"
+                  f" ({tiempo_db:8.1f} ms en Postgres)   coalescidas {coalescidas:>5}"
+                  f"   p50 {statistics.median(latencias):8.1f} ms"
+                  f"   p99 {latencias[int(len(latencias) * 0.99) - 1]:8.1f} ms"
+                  f"   max {latencias[-1]:8.1f} ms")
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--concurrencia", type=int, default=200)
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--puerto", type=int, default=8766)
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    with conn.transaction():
+        conn.execute(
+            """
+            INSERT INTO producto (nombre, descripcion, precio, cantidad_stock, id_proveedor)
+            SELECT 'bench coalescencia ' || g, 'producto de prueba', 10, 5, (SELECT min(id_proveedor) FROM proveedor)
+            FROM generate_series(1, %s) g
+            """,
+            (args.productos,),
+        )
+    producto_id = conn.execute("SELECT min(id_producto) FROM producto").fetchone()[0]
+    try:
+        medir(False, producto_id, conn, args)
+        medir(True, producto_id, conn, args)
+    finally:
+        print("\nBorrando los productos de prueba...")
+        conn.execute("DELETE FROM producto WHERE nombre LIKE 'bench coalescencia %%'")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
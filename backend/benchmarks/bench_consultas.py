@@ -0,0 +1,119 @@
+"""
+Benchmark de sentencias preparadas.
+
+Compara, en una misma conexión, las consultas del detalle de producto y el
+UPDATE de producto ejecutadas sin preparar (el servidor analiza y planifica
+cada vez) y preparadas desde el registro de consultas (se planifican una vez).
+Para el UPDATE compara además el antiguo SQL dinámico (un texto distinto por
+combinación de campos) con el UPDATE canónico.
+También muestra el 'Planning Time' que informa EXPLAIN ANALYZE para cada consulta.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_consultas.py --iteraciones 2000 --producto 1
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+from psycopg.types.numeric import Int8Dumper
+
+from app.crud import crud_productos
+from app.db.consultas import parametros_actualizacion
+
+CAMPOS_UPDATE = ("nombre", "descripcion", "precio", "cantidad_stock")
+
+def detalle_sin_preparar(cur, producto_id):
+    for consulta in (crud_productos.PRODUCTO_POR_ID, crud_productos.ROPA_POR_ID,
+                     crud_productos.CALZADO_POR_ID, crud_productos.ACCESORIOS_POR_ID):
+        cur.execute(consulta.sql, (producto_id,), prepare=False)
+        cur.fetchall()
+
+def detalle_preparado(cur, producto_id):
+    for consulta in (crud_productos.PRODUCTO_POR_ID, crud_productos.ROPA_POR_ID,
+                     crud_productos.CALZADO_POR_ID, crud_productos.ACCESORIOS_POR_ID):
+        consulta.ejecutar(cur, (producto_id,))
+        cur.fetchall()
+
+def _datos_update(actual, campos):
+    return {campo: actual[campo] for campo in campos}
+
+def update_dinamico(cur, producto_id, actual, campos):
+    """El UPDATE tal como se construía antes: un texto SQL por combinación de campos."""
+    datos = _datos_update(actual, campos)
+    query = f"UPDATE producto SET {', '.join(f'{k} = %s' for k in datos)} WHERE id_producto = %s RETURNING id_producto"
+    cur.execute(query, (*datos.values(), producto_id), prepare=False)
+    cur.fetchall()
+
+def update_canonico(cur, producto_id, actual, campos):
+    crud_productos.PRODUCTO_ACTUALIZAR.ejecutar(
+        cur, parametros_actualizacion(crud_productos.COLUMNAS_PRODUCTO, _datos_update(actual, campos), id=producto_id)
+    )
+    cur.fetchall()
+
+def medir(funcion, iteraciones):
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def informe(nombre, tiempos):
+    tiempos = sorted(tiempos)
+    p99 = tiempos[int(len(tiempos) * 0.99) - 1]
+    print(f"  {nombre:<28} media {statistics.mean(tiempos):7.3f} ms   p50 {tiempos[len(tiempos) // 2]:7.3f} ms   p99 {p99:7.3f} ms")
+
+def tiempo_planificacion(cur, sql, params):
+    """Planning Time (ms) que informa EXPLAIN ANALYZE, dentro de una transacción que se deshace."""
+    cur.execute("BEGIN")
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    plan = cur.fetchone()[0][0]
+    cur.execute("ROLLBACK")
+    return plan["Planning Time"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    parser.add_argument("--producto", type=int, default=1, help="ID de un producto existente")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    conn.adapters.register_dumper(int, Int8Dumper) # Igual que el pool de la aplicación
+    conn.prepare_threshold = 0
+
+    with conn.cursor() as cur:
+        cur.execute(crud_productos.PRODUCTO_POR_ID.sql, (args.producto,))
+        fila = cur.fetchone()
+        if fila is None:
+            sys.exit(f"No existe el producto {args.producto}")
+        actual = dict(zip([d[0] for d in cur.description], fila))
+
+        print(f"Planning Time según EXPLAIN (producto {args.producto}):")
+        print(f"  detalle (base)              {tiempo_planificacion(cur, crud_productos.PRODUCTO_POR_ID.sql, (args.producto,)):.3f} ms")
+        params = parametros_actualizacion(crud_productos.COLUMNAS_PRODUCTO, _datos_update(actual, CAMPOS_UPDATE), id=args.producto)
+        print(f"  update canónico             {tiempo_planificacion(cur, crud_productos.PRODUCTO_ACTUALIZAR.sql, params):.3f} ms")
+
+        # Todas las combinaciones no vacías de campos, recorridas en bucle
+        combinaciones = [c for n in range(1, len(CAMPOS_UPDATE) + 1) for c in itertools.combinations(CAMPOS_UPDATE, n)]
+        ciclo = itertools.cycle(combinaciones)
+
+        print(f"\nDetalle de producto ({args.iteraciones} iteraciones, 4 consultas cada una):")
+        informe("sin preparar", medir(lambda: detalle_sin_preparar(cur, args.producto), args.iteraciones))
+        informe("preparado (registro)", medir(lambda: detalle_preparado(cur, args.producto), args.iteraciones))
+
+        print(f"\nUPDATE de producto ({args.iteraciones} iteraciones, {len(combinaciones)} combinaciones de campos):")
+        informe("dinámico sin preparar", medir(lambda: update_dinamico(cur, args.producto, actual, next(ciclo)), args.iteraciones))
+        informe("canónico preparado", medir(lambda: update_canonico(cur, args.producto, actual, next(ciclo)), args.iteraciones))
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
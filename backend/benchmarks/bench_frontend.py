@@ -0,0 +1,256 @@
+"""
+Benchmark de renderizado del frontend en un navegador headless.
+
+Abre frontend/index.html en Chromium (Playwright) servido desde un servidor
+HTTP local, con la API simulada: las peticiones a la URL de la API de app.js
+se responden desde el propio script con --productos productos y --clientes
+clientes generados (paginados como la API real si el frontend pide 'limite').
+No hace falta backend ni base de datos.
+
+Mide, por repetición:
+  - primer render: desde la navegación hasta que se ve la primera tarjeta
+    de producto, en la primera visita y al volver a abrir la página (con la
+    copia local del catálogo ya guardada en IndexedDB);
+  - interactivo: hasta que se puede empezar a vender (hay productos y
+    clientes en el selector de compra) y terminó la tarea larga que estuviera
+    en curso entonces (una aproximación al Time to Interactive);
+  - listo: hasta que terminan la última respuesta de la API y la última
+    tarea larga del hilo principal (todo cargado y pintado);
+  - bloqueo: suma de lo que exceden de 50 ms las tareas largas (Total
+    Blocking Time: cuánto tiempo la página no responde a la entrada);
+  - memoria: heap de JavaScript usado y nodos del DOM tras la carga;
+  - scroll: duración de los frames al recorrer el catálogo con la rueda.
+
+Para comparar con otra versión del frontend, --frontend apunta a su carpeta
+(p. ej. tras 'git worktree add /tmp/bazar-anterior <commit>').
+
+Requiere Playwright (no está en requirements.txt):
+    pip install playwright && python -m playwright install chromium
+Si no se puede descargar el Chromium de Playwright, --navegador usa un
+Chromium o Chrome ya instalado (p. ej. /usr/bin/chromium).
+
+Uso (desde backend/):
+    python benchmarks/bench_frontend.py --productos 10000 --clientes 10000
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_workers import BACKEND_DIR
+
+FRONTEND_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "frontend")
+CABECERAS_CORS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Expose-Headers": "X-Bazar-Siguiente, X-Bazar-LSN",
+    "Content-Type": "application/json",
+}
+
+# Tiempos de la carga vistos desde la página (ms desde el inicio de la navegación)
+MEDIR_CARGA = """() => {
+    const tareas = window.__tareasLargas || [];
+    const api = performance.getEntriesByType('resource').filter(r => r.name.includes('/api/'));
+    const finTareas = Math.max(0, ...tareas.map(t => t.startTime + t.duration));
+    const finApi = Math.max(0, ...api.map(r => r.responseEnd));
+    return {
+        listo: Math.max(finTareas, finApi),
+        bloqueo: tareas.reduce((total, t) => total + Math.max(0, t.duration - 50), 0),
+        nodos: document.getElementsByTagName('*').length,
+        tarjetas: document.querySelectorAll('.producto-item').length,
+    };
+}"""
+
+# Se puede vender: hay productos en el catálogo y clientes en el selector
+PUEDE_VENDER = "document.querySelector('.producto-item') && document.querySelectorAll('#selector-cliente option').length > 1"
+
+# Momento de 'interactivo': el instante dado, o el final de la tarea larga que estuviera en curso
+FIN_TAREA_EN_CURSO = """(instante) => Math.max(instante, ...(window.__tareasLargas || [])
+    .filter(t => t.startTime <= instante).map(t => t.startTime + t.duration))"""
+
+# Registra las tareas largas desde el principio de la carga
+OBSERVAR_TAREAS = """
+window.__tareasLargas = [];
+new PerformanceObserver((lista) => { window.__tareasLargas.push(...lista.getEntries()); })
+    .observe({ type: 'longtask', buffered: true });
+"""
+
+# Recorre el catálogo con la rueda y retorna la duración de cada frame (ms)
+RECORRER_CATALOGO = """async (pasos) => {
+    const frames = [];
+    let anterior = await new Promise(requestAnimationFrame);
+    for (let i = 0; i < pasos; i++) {
+        window.scrollBy(0, 600);
+        const ahora = await new Promise(requestAnimationFrame);
+        frames.push(ahora - anterior);
+        anterior = ahora;
+    }
+    return frames;
+}"""
+
+def generar_datos(productos: int, clientes: int) -> dict:
+    return {
+        "productos": [
+            {"id_producto": i, "nombre": f"Producto {i:05d}", "descripcion": f"Descripción del producto {i}",
+             "precio": 10 + i % 90, "cantidad_stock": i % 50, "id_proveedor": 1, "tipo_producto": "ropa"}
+            for i in range(1, productos + 1)
+        ],
+        "clientes": [
+            {"id_cliente": i, "nombre": f"Cliente {i:05d}", "telefono": f"555-{i:05d}"}
+            for i in range(1, clientes + 1)
+        ],
+        "proveedores": [{"id_proveedor": 1, "nombre": "Proveedor 1", "telefono": None}],
+    }
+
+def api_simulada(datos: dict, route):
+    """Responde una petición a la API como lo haría el backend."""
+    url = urlparse(route.request.url)
+    if url.path.startswith("/api/eventos"):
+        route.fulfill(status=204, headers=CABECERAS_CORS) # EventSource no reconecta tras un 204
+        return
+    recurso = url.path.removeprefix("/api/")
+    filas = datos.get(recurso)
+    if filas is None and recurso not in ("sync", "bootstrap"):
+        route.fulfill(status=404, headers=CABECERAS_CORS, body=json.dumps({"detail": "No encontrado"}))
+        return
+    params = parse_qs(url.query)
+    cabeceras = dict(CABECERAS_CORS)
+    if recurso == "sync":
+        # La copia completa en la primera visita; después, nada cambió (304)
+        if "since" in params:
+            route.fulfill(status=304, headers=cabeceras)
+            return
+        cambios = {tabla: {"actualizados": [], "eliminados": []} for tabla in ("calzado", "accesorios")}
+        cambios["producto"] = {"actualizados": datos["productos"], "eliminados": []}
+        cambios["ropa"] = {"actualizados": [{"id_producto": p["id_producto"]} for p in datos["productos"]], "eliminados": []}
+        cambios["cliente"] = {"actualizados": datos["clientes"], "eliminados": []}
+        cambios["proveedor"] = {"actualizados": datos["proveedores"], "eliminados": []}
+        route.fulfill(status=200, headers=cabeceras, body=json.dumps({"token": "1", "completo": True, "cambios": cambios}))
+        return
+    if recurso == "bootstrap":
+        # Primera página de productos y clientes y todos los proveedores
+        limite = int(params.get("limite", ["500"])[0])
+        seccion = lambda filas, siguiente: {"etag": 'W/"1"', "sin_cambios": False, "siguiente": siguiente, "datos": filas}
+        cuerpo = {
+            nombre: seccion(datos[nombre][:limite], str(limite) if len(datos[nombre]) > limite else None)
+            for nombre in ("productos", "clientes")
+        }
+        cuerpo["proveedores"] = seccion(datos["proveedores"], None)
+        route.fulfill(status=200, headers=cabeceras, body=json.dumps(cuerpo))
+        return
+    if "limite" in params or "cursor" in params:
+        # El cursor es opaco para el frontend: aquí basta con la posición
+        inicio = int(params.get("cursor", ["0"])[0])
+        fin = inicio + int(params.get("limite", ["500"])[0])
+        if fin < len(filas):
+            cabeceras["X-Bazar-Siguiente"] = str(fin)
+        filas = filas[inicio:fin]
+    route.fulfill(status=200, headers=cabeceras, body=json.dumps(filas))
+
+def servir_frontend(directorio: str):
+    """Sirve la carpeta del frontend en un puerto libre y retorna el servidor."""
+    manejador = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directorio)
+    manejador.log_message = lambda *args: None
+    servidor = http.server.ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def medir(navegador, url_pagina: str, url_api: str, datos: dict, args) -> dict:
+    pagina = navegador.new_page(viewport={"width": 1280, "height": 800})
+    pagina.route(f"{url_api}/**", functools.partial(api_simulada, datos))
+    pagina.add_init_script(OBSERVAR_TAREAS)
+    cdp = pagina.context.new_cdp_session(pagina)
+    cdp.send("Performance.enable")
+    try:
+        pagina.goto(url_pagina)
+        pagina.wait_for_selector(".producto-item", timeout=120000)
+        primer_render = pagina.evaluate("performance.now()")
+        pagina.wait_for_function(PUEDE_VENDER, timeout=120000, polling="raf")
+        puede_vender = pagina.evaluate("performance.now()")
+        pagina.wait_for_load_state("networkidle", timeout=120000)
+        carga = pagina.evaluate(MEDIR_CARGA)
+        interactivo = pagina.evaluate(FIN_TAREA_EN_CURSO, puede_vender)
+        cdp.send("HeapProfiler.collectGarbage")
+        metricas = {m["name"]: m["value"] for m in cdp.send("Performance.getMetrics")["metrics"]}
+
+        # El carrito tiene que seguir funcionando con la lista virtual y la delegación
+        pagina.click(".producto-item .btn-add-carrito")
+        carrito_ok = pagina.locator("#carrito-items .carrito-item").count() == 1
+
+        catalogo = pagina.locator("#productos-lista")
+        pagina.evaluate("(y) => window.scrollTo(0, y)", catalogo.bounding_box()["y"])
+        frames = sorted(pagina.evaluate(RECORRER_CATALOGO, args.pasos_scroll))
+
+        # Segunda visita: el catálogo sale de la copia local
+        pagina.reload()
+        pagina.wait_for_selector(".producto-item", timeout=120000)
+        segunda_visita = pagina.evaluate("performance.now()")
+    finally:
+        pagina.close()
+    return {
+        "primer_render": primer_render,
+        "segunda_visita": segunda_visita,
+        "interactivo": interactivo,
+        "listo": carga["listo"],
+        "bloqueo": carga["bloqueo"],
+        "heap_mb": metricas["JSHeapUsedSize"] / 1024 / 1024,
+        "nodos": carga["nodos"],
+        "tarjetas": carga["tarjetas"],
+        "frame_p95": frames[int(len(frames) * 0.95) - 1],
+        "frame_max": frames[-1],
+        "carrito_ok": carrito_ok,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=10000)
+    parser.add_argument("--clientes", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--pasos-scroll", type=int, default=120)
+    parser.add_argument("--frontend", default=FRONTEND_DIR, help="Carpeta del frontend a medir")
+    parser.add_argument("--navegador", help="Ejecutable de Chromium/Chrome en lugar del de Playwright")
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        sys.exit("Falta Playwright: pip install playwright && python -m playwright install chromium")
+
+    with open(os.path.join(args.frontend, "app.js"), encoding="utf-8") as f:
+        url_api = re.search(r"const API_URL = '([^']+)'", f.read()).group(1).rstrip("/")
+    datos = generar_datos(args.productos, args.clientes)
+    servidor = servir_frontend(args.frontend)
+    url_pagina = f"http://127.0.0.1:{servidor.server_address[1]}/index.html"
+
+    resultados = []
+    with sync_playwright() as playwright:
+        navegador = playwright.chromium.launch(executable_path=args.navegador)
+        try:
+            for _ in range(args.repeticiones):
+                resultados.append(medir(navegador, url_pagina, url_api, datos, args))
+        finally:
+            navegador.close()
+    servidor.shutdown()
+
+    print(f"Frontend: {args.frontend}")
+    print(f"{args.productos} productos, {args.clientes} clientes, {args.repeticiones} repeticiones (mediana):")
+    mediana = lambda clave: statistics.median(r[clave] for r in resultados)
+    print(f"  primer render        {mediana('primer_render'):9.1f} ms")
+    print(f"    segunda visita     {mediana('segunda_visita'):9.1f} ms   (desde la copia local)")
+    print(f"  interactivo          {mediana('interactivo'):9.1f} ms   (productos y clientes para vender)")
+    print(f"  listo                {mediana('listo'):9.1f} ms")
+    print(f"  bloqueo (TBT)        {mediana('bloqueo'):9.1f} ms")
+    print(f"  heap JS              {mediana('heap_mb'):9.1f} MB")
+    print(f"  nodos del DOM        {mediana('nodos'):9.0f}   (tarjetas de producto: {mediana('tarjetas'):.0f})")
+    print(f"  frame al hacer scroll p95 {mediana('frame_p95'):6.1f} ms   max {mediana('frame_max'):6.1f} ms")
+    if not all(r["carrito_ok"] for r in resultados):
+        print("  AVISO: 'Añadir al Carrito' no añadió el producto al carrito")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Benchmark del particionado mensual de ventas.
+
+Genera ventas de prueba repartidas en los últimos N meses y compara dos
+informes mensuales sobre las tablas particionadas y sobre copias sin
+particionar (el esquema anterior: solo clave primaria, y el detalle sin fecha):
+
+  - resumen del mes: número de ventas e importe total
+  - productos del mes: unidades e importe por producto (detalle del mes)
+
+Con EXPLAIN muestra cuántas tablas y bloques lee cada consulta (con el
+particionado, solo la partición del mes) y comprueba que la consulta preparada del API con plan
+genérico (venta.por_rango) también descarta particiones al ejecutarse.
+Se mide además la copia sin particionar con un índice sobre 'fecha'.
+
+Crea un cliente 'bench particiones' con sus ventas (se borran al terminar,
+salvo --conservar) y las particiones de los meses pasados: usar contra una
+base de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_particiones.py --meses 24 --ventas-por-mes 10000 --iteraciones 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from dotenv import load_dotenv
+from psycopg.sql import SQL, Literal
+
+from app.crud import crud_ventas
+
+RESUMEN_MES = """
+    SELECT count(*), sum(monto_total) FROM {venta}
+    WHERE fecha >= %(desde)s AND fecha < %(hasta)s
+"""
+# Con el particionado el detalle tiene su propia fecha; antes había que unirlo con la venta
+PRODUCTOS_MES = """
+    SELECT d.id_producto, sum(d.cantidad), sum(d.cantidad * d.precio_unitario)
+    FROM detalle_venta d
+    WHERE d.fecha >= %(desde)s AND d.fecha < %(hasta)s
+    GROUP BY d.id_producto
+"""
+PRODUCTOS_MES_PLANO = """
+    SELECT d.id_producto, sum(d.cantidad), sum(d.cantidad * d.precio_unitario)
+    FROM bench_detalle_plano d
+    JOIN bench_venta_plana v ON v.id_venta = d.id_venta
+    WHERE v.fecha >= %(desde)s AND v.fecha < %(hasta)s
+    GROUP BY d.id_producto
+"""
+
+def sumar_meses(dia: date, meses: int) -> date:
+    mes = dia.year * 12 + dia.month - 1 + meses
+    return date(mes // 12, mes % 12 + 1, 1)
+
+def tablas_leidas(plan) -> set:
+    """Tablas que recorre un plan de EXPLAIN (FORMAT JSON)."""
+    tablas = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for hijo in plan.get("Plans", []):
+        tablas |= tablas_leidas(hijo)
+    return tablas
+
+def subplanes_descartados(plan) -> int:
+    """Particiones descartadas al ejecutar (poda en tiempo de ejecución)."""
+    return plan.get("Subplans Removed", 0) + sum(subplanes_descartados(hijo) for hijo in plan.get("Plans", []))
+
+def explicar(cur, consulta, params=None):
+    cur.execute(SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ") + consulta, params)
+    return cur.fetchone()[0][0]
+
+def bloques(plan) -> int:
+    """Bloques de 8 kB leídos por la consulta (de la caché de Postgres o del disco)."""
+    return plan["Shared Hit Blocks"] + plan["Shared Read Blocks"]
+
+def informe(nombre, tiempos, plan):
+    tiempos = sorted(tiempos)
+    print(f"  {nombre:<34} media {statistics.mean(tiempos):8.2f} ms   p50 {tiempos[len(tiempos) // 2]:8.2f} ms"
+          f"   tablas leídas {len(tablas_leidas(plan)):3}   bloques {bloques(plan):7}")
+
+def medir(cur, sql, meses, iteraciones):
+    """Ejecuta la consulta sobre meses al azar; retorna los tiempos y el plan de un mes."""
+    tiempos = []
+    for _ in range(iteraciones):
+        desde = random.choice(meses)
+        params = {"desde": desde, "hasta": sumar_meses(desde, 1)}
+        inicio = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    plan = explicar(cur, SQL(sql), {"desde": meses[0], "hasta": sumar_meses(meses[0], 1)})
+    return tiempos, plan["Plan"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meses", type=int, default=24)
+    parser.add_argument("--ventas-por-mes", type=int, default=10000)
+    parser.add_argument("--detalles", type=int, default=2, help="Líneas por venta (como máximo, los productos existentes)")
+    parser.add_argument("--iteraciones", type=int, default=20)
+    parser.add_argument("--conservar", action="store_true", help="No borrar las ventas generadas")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+    este_mes = date.today().replace(day=1)
+    primer_mes = sumar_meses(este_mes, -args.meses)
+    meses = [sumar_meses(primer_mes, i) for i in range(args.meses)]
+
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO cliente (nombre) VALUES ('bench particiones') RETURNING id_cliente")
+        cliente_id = cur.fetchone()[0]
+        cur.execute("SELECT crear_particiones_venta(%s, %s)", (primer_mes, este_mes))
+        print(f"Generando {args.meses} meses x {args.ventas_por_mes} ventas ({primer_mes} a {sumar_meses(este_mes, -1)})...")
+        inicio = time.perf_counter()
+        with conn.transaction():
+            cur.execute(
+                """
+                INSERT INTO venta (fecha, monto_total, id_cliente)
+                SELECT %(primer_mes)s::date + (random() * (%(este_mes)s::date - %(primer_mes)s::date - 1))::int,
+                       round((random() * 500)::numeric, 2), %(cliente)s
+                FROM generate_series(1, %(total)s)
+                """,
+                {"primer_mes": primer_mes, "este_mes": este_mes, "cliente": cliente_id,
+                 "total": args.meses * args.ventas_por_mes},
+            )
+            cur.execute(
+                """
+                INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario)
+                SELECT v.id_venta, v.fecha, p.id_producto, 1 + (random() * 3)::int, p.precio
+                FROM venta v
+                CROSS JOIN (SELECT id_producto, precio FROM producto ORDER BY id_producto LIMIT %s) p
+                WHERE v.id_cliente = %s
+                """,
+                (args.detalles, cliente_id),
+            )
+        # Copias sin particionar, como era el esquema antes
+        cur.execute("DROP TABLE IF EXISTS bench_detalle_plano, bench_venta_plana")
+        cur.execute("CREATE TABLE bench_venta_plana AS SELECT id_venta, fecha, monto_total, id_cliente FROM venta")
+        cur.execute("ALTER TABLE bench_venta_plana ADD PRIMARY KEY (id_venta)")
+        cur.execute("CREATE TABLE bench_detalle_plano AS SELECT id_venta, id_producto, cantidad, precio_unitario FROM detalle_venta")
+        cur.execute("ALTER TABLE bench_detalle_plano ADD PRIMARY KEY (id_venta, id_producto)")
+        for tabla in ("venta", "detalle_venta", "bench_venta_plana", "bench_detalle_plano"):
+            cur.execute(f"VACUUM ANALYZE {tabla}")
+        print(f"  listo en {time.perf_counter() - inicio:.1f} s")
+
+        print(f"\nResumen del mes ({args.iteraciones} iteraciones, mes al azar):")
+        informe("particionada", *medir(cur, RESUMEN_MES.format(venta="venta"), meses, args.iteraciones))
+        informe("sin particionar", *medir(cur, RESUMEN_MES.format(venta="bench_venta_plana"), meses, args.iteraciones))
+
+        print(f"\nProductos del mes ({args.iteraciones} iteraciones, mes al azar):")
+        informe("particionada (fecha en el detalle)", *medir(cur, PRODUCTOS_MES, meses, args.iteraciones))
+        informe("sin particionar (JOIN con venta)", *medir(cur, PRODUCTOS_MES_PLANO, meses, args.iteraciones))
+
+        cur.execute("CREATE INDEX ON bench_venta_plana (fecha)")
+        cur.execute("ANALYZE bench_venta_plana")
+        print("\nSin particionar, con índice sobre fecha:")
+        informe("resumen del mes", *medir(cur, RESUMEN_MES.format(venta="bench_venta_plana"), meses, args.iteraciones))
+        informe("productos del mes", *medir(cur, PRODUCTOS_MES_PLANO, meses, args.iteraciones))
+
+        # La consulta del API es una sentencia preparada: con el plan genérico
+        # los valores no se conocen al planificar y las particiones se
+        # descartan al empezar la ejecución.
+        cur.execute("SET plan_cache_mode = force_generic_plan")
+        cur.execute(f"PREPARE por_rango AS {crud_ventas.VENTAS_POR_RANGO.sql.replace('%(desde)s', '$1').replace('%(hasta)s', '$2').replace('%(id_cliente)s', '$3')}")
+        # EXECUTE no admite parámetros: los valores van como literales
+        plan = explicar(cur, SQL("EXECUTE por_rango({}::date, {}::date, {}::int)").format(
+            Literal(meses[0]), Literal(sumar_meses(meses[0], 1)), Literal(cliente_id)))
+        cur.execute("DEALLOCATE por_rango")
+        cur.execute("RESET plan_cache_mode")
+        print("\nventa.por_rango preparada con plan genérico (un mes):")
+        print(f"  tablas leídas {len(tablas_leidas(plan['Plan']))}   particiones descartadas al ejecutar {subplanes_descartados(plan['Plan'])}")
+
+        cur.execute("DROP TABLE bench_detalle_plano, bench_venta_plana")
+        if not args.conservar:
+            cur.execute("DELETE FROM venta WHERE id_cliente = %s", (cliente_id,))
+            cur.execute("DELETE FROM cliente WHERE id_cliente = %s", (cliente_id,))
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark del modo pipeline con latencia de red artificial.
+
+Arranca un proxy TCP local que retrasa cada paquete un tiempo fijo en cada
+sentido (simula la distancia entre la aplicación y Postgres) y mide, a través
+de él, las operaciones de varias sentencias en su versión secuencial (una ida y
+vuelta por sentencia, como se hacía antes) y en la versión actual en modo
+pipeline (las funciones CRUD reales):
+
+  - delete_producto: 4 DELETE
+  - create_venta: 1 INSERT de cabecera + N INSERT de detalle
+  - update_direccion: comprobación del cliente + UPDATE
+
+Crea productos y ventas de prueba ('bench pipeline ...'): usar contra una base
+de desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_pipeline.py --retardo-ms 5 --iteraciones 50 --detalles 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+# --- Proxy TCP con retardo ---
+
+async def _reenviar(lector, escritor, retardo: float):
+    """Copia bytes de 'lector' a 'escritor' entregando cada bloque 'retardo' segundos después."""
+    cola = asyncio.Queue()
+
+    async def entregar():
+        while True:
+            instante, datos = await cola.get()
+            if datos is None:
+                break
+            espera = instante - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            escritor.write(datos)
+            await escritor.drain()
+        escritor.close()
+
+    entrega = asyncio.create_task(entregar())
+    try:
+        while datos := await lector.read(65536):
+            await cola.put((time.monotonic() + retardo, datos))
+    except ConnectionError:
+        pass
+    await cola.put((0, None))
+    await entrega
+
+def iniciar_proxy(destino: dict, retardo: float) -> int:
+    """Arranca el proxy en un hilo y retorna el puerto local en el que escucha."""
+    listo = threading.Event()
+    puerto = []
+
+    async def atender(lector_cliente, escritor_cliente):
+        host = destino.get("host") or "localhost"
+        port = int(destino.get("port") or 5432)
+        if host.startswith("/"): # Directorio del socket Unix de Postgres
+            lector_db, escritor_db = await asyncio.open_unix_connection(f"{host}/.s.PGSQL.{port}")
+        else:
+            lector_db, escritor_db = await asyncio.open_connection(host, port)
+        await asyncio.gather(
+            _reenviar(lector_cliente, escritor_db, retardo),
+            _reenviar(lector_db, escritor_cliente, retardo),
+        )
+
+    async def servir():
+        servidor = await asyncio.start_server(atender, "127.0.0.1", 0)
+        puerto.append(servidor.sockets[0].getsockname()[1])
+        listo.set()
+        async with servidor:
+            await servidor.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(servir()), daemon=True).start()
+    listo.wait()
+    return puerto[0]
+
+# --- Versiones secuenciales (una ida y vuelta por sentencia) ---
+
+def delete_producto_secuencial(conn, producto_id):
+    with conn.cursor() as cur, conn.transaction():
+        for tabla in ("ropa", "calzado", "accesorios", "producto"):
+            cur.execute(f"DELETE FROM {tabla} WHERE id_producto = %s", (producto_id,))
+
+def create_venta_secuencial(conn, venta):
+    with conn.cursor() as cur, conn.transaction():
+        total = sum(d.cantidad * d.precio_unitario for d in venta.detalles)
+        fecha = date.today()
+        cur.execute(
+            "INSERT INTO venta (id_cliente, fecha, monto_total) VALUES (%s, %s, %s) RETURNING id_venta",
+            (venta.id_cliente, fecha, total),
+        )
+        id_venta = cur.fetchone()[0]
+        for d in venta.detalles:
+            cur.execute(
+                "INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario) "
+                "VALUES (%s, %s, %s, %s, %s) RETURNING id_venta",
+                (id_venta, fecha, d.id_producto, d.cantidad, d.precio_unitario),
+            )
+            cur.fetchone()
+
+def update_direccion_secuencial(conn, cliente_id, direccion_id, ciudad):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM cliente WHERE id_cliente = %s", (cliente_id,))
+        cur.fetchone()
+        with conn.transaction():
+            cur.execute(
+                "UPDATE direccion SET ciudad = %s WHERE id_direccion = %s AND id_cliente = %s RETURNING id_direccion",
+                (ciudad, direccion_id, cliente_id),
+            )
+            cur.fetchone()
+
+# --- Medición ---
+
+def informe(nombre, tiempos):
+    tiempos = sorted(tiempos)
+    print(f"  {nombre:<32} media {statistics.mean(tiempos):8.2f} ms   p50 {tiempos[len(tiempos) // 2]:8.2f} ms   max {tiempos[-1]:8.2f} ms")
+
+def medir(funcion, iteraciones):
+    tiempos = []
+    for i in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retardo-ms", type=float, default=5.0, help="Retardo en cada sentido (ms)")
+    parser.add_argument("--iteraciones", type=int, default=50)
+    parser.add_argument("--detalles", type=int, default=5, help="Líneas por venta")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    puerto = iniciar_proxy(conninfo_to_dict(url), args.retardo_ms / 1000)
+    # La aplicación (y su pool) se conectan a través del proxy
+    os.environ["DATABASE_URL"] = make_conninfo(url, host="127.0.0.1", port=str(puerto), sslmode="disable")
+    os.environ["DB_POOL_MIN_SIZE"] = os.environ["DB_POOL_MAX_SIZE"] = "1"
+
+    from app.crud import crud_direcciones, crud_productos, crud_ventas
+    from app.db.database import abrir_pool, cerrar_pool, get_db_connection, release_db_connection
+    from app.schemas import DetalleVentaCreate, DireccionCreate, DireccionUpdate, VentaCreate
+
+    abrir_pool()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id_cliente FROM cliente ORDER BY id_cliente LIMIT 1")
+            cliente_id = cur.fetchone()[0]
+            cur.execute("SELECT id_proveedor FROM proveedor ORDER BY id_proveedor LIMIT 1")
+            proveedor_id = cur.fetchone()[0]
+            # Productos desechables: unos para las ventas y dos lotes para borrar
+            cur.execute(
+                """
+                INSERT INTO producto (nombre, precio, cantidad_stock, id_proveedor)
+                SELECT 'bench pipeline ' || g, 10, 1000000, %s FROM generate_series(1, %s) g
+                RETURNING id_producto
+                """,
+                (proveedor_id, args.detalles + 2 * args.iteraciones),
+            )
+            ids = [row[0] for row in cur.fetchall()]
+    finally:
+        release_db_connection(conn)
+    para_venta, ids = ids[:args.detalles], ids[args.detalles:]
+    borrar_secuencial, borrar_pipeline = ids[:args.iteraciones], ids[args.iteraciones:]
+
+    venta = VentaCreate(id_cliente=cliente_id, detalles=[
+        DetalleVentaCreate(id_producto=pid, cantidad=1, precio_unitario=10) for pid in para_venta
+    ])
+    direccion = crud_direcciones.create_direccion_for_cliente(
+        cliente_id, DireccionCreate(calle="bench", ciudad="bench", codigo_postal="00000")
+    )
+
+    def con_conexion(funcion):
+        def envoltura(i):
+            conn = get_db_connection()
+            try:
+                funcion(conn, i)
+            finally:
+                release_db_connection(conn)
+        return envoltura
+
+    print(f"Retardo {args.retardo_ms} ms por sentido (ida y vuelta ~{2 * args.retardo_ms} ms), {args.iteraciones} iteraciones")
+
+    print("\ndelete_producto (4 sentencias):")
+    informe("secuencial", medir(con_conexion(lambda c, i: delete_producto_secuencial(c, borrar_secuencial[i])), args.iteraciones))
+    informe("pipeline", medir(lambda i: crud_productos.delete_producto(borrar_pipeline[i]), args.iteraciones))
+
+    print(f"\ncreate_venta ({args.detalles + 1} sentencias):")
+    informe("secuencial", medir(con_conexion(lambda c, i: create_venta_secuencial(c, venta)), args.iteraciones))
+    informe("pipeline", medir(lambda i: crud_ventas.create_venta(venta), args.iteraciones))
+
+    print("\nupdate_direccion (comprobación + UPDATE):")
+    informe("secuencial", medir(con_conexion(
+        lambda c, i: update_direccion_secuencial(c, cliente_id, direccion["id_direccion"], f"c{i}")
+    ), args.iteraciones))
+    informe("pipeline", medir(lambda i: crud_direcciones.update_direccion(
+        cliente_id, direccion["id_direccion"], DireccionUpdate(ciudad=f"p{i}")
+    ), args.iteraciones))
+
+    crud_direcciones.delete_direccion(cliente_id, direccion["id_direccion"])
+    cerrar_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark del pronóstico de demanda y puntos de pedido (app/jobs/reabastecimiento.py).
+
+Genera las ventas diarias sintéticas de --productos productos durante --dias
+días (cada producto con su demanda media, lognormal, y unidades Poisson por
+día) y mide cada fase del job:
+
+  - lectura: leer_demanda() del job sobre una tabla temporal particionada por
+    mes como 'detalle_venta', con una fila por producto y día con ventas;
+  - pronóstico: suavizado exponencial, media móvil y desviación de todos los
+    productos por bloques (pronosticar());
+  - puntos de pedido: punto de pedido y nivel objetivo (puntos_de_pedido());
+  - escritura: COPY binario de los resultados a una tabla temporal.
+
+Como referencia, calcula lo mismo con un bucle de Python por producto y día
+para --muestra productos y extrapola al total.
+
+Con --sin-base solo mide las fases en memoria. Las tablas temporales
+desaparecen al cerrar la conexión.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con la migración
+0006 aplicada):
+    python benchmarks/bench_reabastecimiento.py --productos 100000 --dias 730
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psycopg
+from dotenv import load_dotenv
+
+from app.jobs.copia_binaria import copiar
+from app.jobs.reabastecimiento import _mes_siguiente, leer_demanda, pronosticar, puntos_de_pedido
+
+def generar_ventas(productos: int, dias: int, semilla: int, bloque: int = 10_000) -> tuple:
+    """(fila de producto, día, unidades) de cada día con ventas de cada producto."""
+    rng = np.random.default_rng(semilla)
+    tasas = rng.lognormal(mean=-1.0, sigma=1.5, size=productos)
+    filas, dias_venta, unidades = [], [], []
+    for inicio in range(0, productos, bloque):
+        fin = min(inicio + bloque, productos)
+        serie = rng.poisson(tasas[inicio:fin, None], (fin - inicio, dias)).astype(np.int32)
+        fila, dia = np.nonzero(serie)
+        filas.append((fila + inicio).astype(np.int32))
+        dias_venta.append(dia.astype(np.int32))
+        unidades.append(serie[fila, dia])
+    return np.concatenate(filas), np.concatenate(dias_venta), np.concatenate(unidades)
+
+def bucle_python(filas, dias, unidades, muestra: int, n_dias: int, alfa: float, ventana: int) -> float:
+    """Segundos de calcular demanda, media y desviación de 'muestra' productos producto a producto."""
+    seleccion = filas < muestra
+    por_producto = [[0] * n_dias for _ in range(muestra)]
+    for fila, dia, cantidad in zip(filas[seleccion].tolist(), dias[seleccion].tolist(), unidades[seleccion].tolist()):
+        por_producto[fila][dia] = cantidad
+    inicio = time.perf_counter()
+    for serie in por_producto:
+        nivel = 0.0
+        for cantidad in serie:
+            nivel = alfa * cantidad + (1 - alfa) * nivel
+        recientes = serie[-ventana:]
+        statistics.fmean(recientes)
+        statistics.pstdev(recientes)
+    return time.perf_counter() - inicio
+
+def cronometrar(nombre: str, funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    print(f"  {nombre:<18} {time.perf_counter() - inicio:8.2f} s")
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=100_000)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--alfa", type=float, default=0.1)
+    parser.add_argument("--ventana", type=int, default=28)
+    parser.add_argument("--muestra", type=int, default=1000, help="Productos del bucle de Python de referencia")
+    parser.add_argument("--sin-base", action="store_true", help="Solo las fases en memoria")
+    args = parser.parse_args()
+
+    print(f"Generando {args.productos} productos x {args.dias} días...")
+    filas, dias, unidades = generar_ventas(args.productos, args.dias, semilla=42)
+    print(f"{len(filas)} días con ventas ({len(filas) / (args.productos * args.dias):.0%} de la matriz)")
+
+    conn = None
+    if not args.sin_base:
+        load_dotenv()
+        conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+        conn.execute("SET work_mem = '256MB'") # Como el job
+        desde = date(2000, 1, 1)
+        hasta = desde + timedelta(days=args.dias)
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE bench_detalle (id_producto INT NOT NULL, fecha DATE NOT NULL, cantidad INT NOT NULL)
+                PARTITION BY RANGE (fecha)
+            """)
+            mes = desde
+            while mes < hasta:
+                cur.execute(f"CREATE TEMP TABLE bench_detalle_{mes:%Y_%m} PARTITION OF bench_detalle"
+                            f" FOR VALUES FROM ('{mes}') TO ('{_mes_siguiente(mes)}')")
+                mes = _mes_siguiente(mes)
+            # COPY binario de una fecha: días desde 2000-01-01
+            cur.execute("CREATE TEMP TABLE bench_carga (id_producto INT, dia INT, cantidad INT)")
+            copiar(cur, "bench_carga", {"id_producto": filas + 1, "dia": dias, "cantidad": unidades})
+            cur.execute("INSERT INTO bench_detalle SELECT id_producto, %s::date + dia, cantidad FROM bench_carga", (desde,))
+            cur.execute("DROP TABLE bench_carga")
+            cur.execute("ANALYZE bench_detalle")
+        ids, dias, unidades = cronometrar("lectura", lambda: leer_demanda(conn, desde, hasta, "bench_detalle"))
+        filas = ids - 1
+
+    demanda, media, desviacion = cronometrar("pronóstico", lambda: pronosticar(
+        filas, dias, unidades, args.productos, args.dias, args.alfa, args.ventana
+    ))
+    punto, objetivo = cronometrar("puntos de pedido", lambda: puntos_de_pedido(demanda, desviacion, 7, 14, 0.95))
+
+    if conn is not None:
+        def escribir():
+            with conn.cursor() as cur:
+                cur.execute("CREATE TEMP TABLE bench_reabastecimiento (LIKE reabastecimiento INCLUDING DEFAULTS)")
+                copiar(cur, "bench_reabastecimiento", {
+                    "id_producto": np.arange(1, args.productos + 1, dtype=np.int32), "demanda_diaria": demanda,
+                    "media_movil": media, "desviacion": desviacion, "punto_pedido": punto, "nivel_objetivo": objetivo,
+                })
+        cronometrar("escritura", escribir)
+        conn.close()
+
+    muestra = min(args.muestra, args.productos)
+    segundos = bucle_python(filas, dias, unidades, muestra, args.dias, args.alfa, args.ventana)
+    print(f"\nBucle de Python con {muestra} productos: {segundos:.2f} s"
+          f" (~{segundos * args.productos / muestra:.0f} s para {args.productos})")
+
+if __name__ == "__main__":
+    main()
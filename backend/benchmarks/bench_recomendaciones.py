@@ -0,0 +1,157 @@
+"""
+Benchmark de la reconstrucción de "comprados juntos" (app/jobs/recomendaciones.py)
+y de la consulta de relacionados.
+
+Genera --filas detalles de venta sintéticos (unas --lineas líneas por venta,
+productos con popularidad Zipf entre --productos) y mide cada fase del job:
+
+  - lectura: COPY binario de los detalles a arrays de NumPy (desde una tabla
+    temporal con los datos sintéticos);
+  - coocurrencias: suma de B.T @ B por lotes de --lote filas;
+  - top-K: orden de los pares y posición de cada uno;
+  - escritura: COPY binario de pares y top-K a tablas temporales y sus claves
+    primarias.
+
+Después mide la consulta del top-K de un producto cualquiera sobre la tabla
+temporal (lo que hace la API cuando no lo tiene en caché) y la lectura de
+crud_productos.get_relacionados_async() con la caché ya cargada.
+
+Con --sin-base solo mide las fases en memoria (coocurrencias y top-K).
+Las tablas temporales desaparecen al cerrar la conexión.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con la migración
+0005 aplicada):
+    python benchmarks/bench_recomendaciones.py --filas 10000000 --productos 50000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import psycopg
+from dotenv import load_dotenv
+from scipy import sparse
+
+from app.jobs.copia_binaria import copiar
+from app.jobs.recomendaciones import leer_detalles, pares_y_top_k, sumar_coocurrencias
+from app.recomendaciones import RELACIONADOS_TOP_K
+
+def generar_detalles(filas: int, productos: int, lineas: float, zipf: float, semilla: int) -> tuple:
+    """(id_venta, id_producto) de 'filas' detalles sintéticos, ventas consecutivas."""
+    rng = np.random.default_rng(semilla)
+    tamanos = 1 + rng.poisson(lineas - 1, int(filas / lineas) + 1)
+    ventas = np.repeat(np.arange(1, len(tamanos) + 1, dtype=np.int32), tamanos)[:filas]
+    # Rango de popularidad Zipf, repartido al azar entre los IDs de producto
+    rangos = (rng.zipf(zipf, len(ventas)) - 1) % productos
+    ids = rng.permutation(productos).astype(np.int32) + 1
+    return ventas, ids[rangos]
+
+def cronometrar(nombre: str, funcion, filas: int):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre:<14} {segundos:8.2f} s   {filas / segundos / 1e6:8.2f} M filas/s")
+    return resultado
+
+def medir_consultas(conn, productos: int, consultas: int) -> list:
+    """ms de cada consulta del top-K de un producto al azar (como PRODUCTO_RELACIONADOS)."""
+    rng = np.random.default_rng(1)
+    tiempos = []
+    with conn.cursor() as cur:
+        for producto_id in rng.integers(1, productos + 1, consultas):
+            inicio = time.perf_counter()
+            cur.execute(
+                "SELECT id_relacionado FROM bench_relacionado WHERE id_producto = %s ORDER BY posicion",
+                (int(producto_id),), prepare=True,
+            )
+            cur.fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+async def medir_cache(consultas: int) -> list:
+    """ms de cada get_relacionados_async() con la caché ya cargada."""
+    from app.crud import crud_productos
+    producto_id = 1
+    await crud_productos.get_relacionados_async(producto_id, RELACIONADOS_TOP_K)
+    tiempos = []
+    for _ in range(consultas):
+        inicio = time.perf_counter()
+        await crud_productos.get_relacionados_async(producto_id, RELACIONADOS_TOP_K)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+def resumir(nombre: str, tiempos: list):
+    tiempos = sorted(tiempos)
+    p99 = tiempos[int(len(tiempos) * 0.99) - 1]
+    print(f"  {nombre:<40} mediana {statistics.median(tiempos):7.3f} ms   p99 {p99:7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--productos", type=int, default=50_000)
+    parser.add_argument("--lineas", type=float, default=4.0, help="Líneas por venta (media)")
+    parser.add_argument("--zipf", type=float, default=1.3, help="Exponente de la popularidad de los productos")
+    parser.add_argument("--lote", type=int, default=2_000_000)
+    parser.add_argument("--top-k", type=int, default=RELACIONADOS_TOP_K)
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--sin-base", action="store_true", help="Solo las fases en memoria")
+    args = parser.parse_args()
+
+    print(f"Generando {args.filas} detalles de {args.productos} productos...")
+    ventas, productos = generar_detalles(args.filas, args.productos, args.lineas, args.zipf, semilla=42)
+    print(f"{int(ventas[-1])} ventas, {len(np.unique(productos))} productos vendidos; lotes de {args.lote} filas")
+
+    conn = None
+    if not args.sin_base:
+        load_dotenv()
+        conn = psycopg.connect(os.getenv("DATABASE_URL"), autocommit=True)
+        conn.execute("SET work_mem = '256MB'") # Como el job
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE bench_detalle (id_venta INT NOT NULL, id_producto INT NOT NULL)")
+            copiar(cur, "bench_detalle", {"id_venta": ventas, "id_producto": productos})
+        ventas, productos = cronometrar("lectura", lambda: leer_detalles(conn, "bench_detalle"), args.filas)
+
+    vacia = sparse.csr_matrix((args.productos + 1, args.productos + 1), dtype=np.int32)
+    matriz = cronometrar(
+        "coocurrencias", lambda: sumar_coocurrencias(vacia, ventas, productos, args.lote), args.filas
+    )
+    producto, relacionado, veces, posicion = cronometrar(
+        "top-K", lambda: pares_y_top_k(matriz, args.top_k), args.filas
+    )
+    top = posicion <= args.top_k
+    print(f"  {len(producto)} pares, {int(np.count_nonzero(top))} en el top-{args.top_k}")
+    if conn is None:
+        return
+
+    def escribir():
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE bench_coocurrencia (LIKE producto_coocurrencia)")
+            cur.execute("CREATE TEMP TABLE bench_relacionado (LIKE producto_relacionado)")
+            copiar(cur, "bench_coocurrencia",
+                   {"id_producto": producto, "id_relacionado": relacionado, "veces": veces})
+            copiar(cur, "bench_relacionado",
+                   {"id_producto": producto[top], "posicion": posicion[top].astype(np.int16),
+                    "id_relacionado": relacionado[top], "veces": veces[top]})
+            cur.execute("ALTER TABLE bench_coocurrencia ADD PRIMARY KEY (id_producto, id_relacionado)")
+            cur.execute("ALTER TABLE bench_relacionado ADD PRIMARY KEY (id_producto, posicion)")
+            cur.execute("ANALYZE bench_relacionado")
+    cronometrar("escritura", escribir, args.filas)
+
+    print(f"\nConsulta del top-{args.top_k} ({args.consultas} consultas):")
+    resumir("SQL sobre el top-K (sin caché)", medir_consultas(conn, args.productos, args.consultas))
+    conn.close()
+
+    from app.db.database import abrir_pool, cerrar_pool
+    abrir_pool()
+    try:
+        resumir("get_relacionados_async (caché cargada)", asyncio.run(medir_cache(args.consultas)))
+    finally:
+        cerrar_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de contención de stock en una venta flash.
+
+N compradores concurrentes (hilos) compran el mismo producto a la vez llamando
+a crud_ventas.create_venta. Se mide con el stock en una sola fila de 'producto'
+y con el stock particionado en K shards, y se comprueba que no se vende más
+stock del que había (ventas aceptadas + stock final = stock inicial).
+
+Crea un producto de prueba ('bench stock') y sus ventas: usar contra una base de
+desarrollo.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_stock.py --compradores 500 --conexiones 40 --shards 16
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compradores", type=int, default=500)
+    parser.add_argument("--conexiones", type=int, default=40, help="Tamaño del pool (conexiones a Postgres)")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=None, help="Stock inicial (por defecto, uno por comprador)")
+    args = parser.parse_args()
+    stock_inicial = args.stock if args.stock is not None else args.compradores
+
+    os.environ["DB_POOL_MIN_SIZE"] = os.environ["DB_POOL_MAX_SIZE"] = str(args.conexiones)
+    os.environ["DB_POOL_TIMEOUT"] = "120"
+    from app.crud import crud_productos, crud_ventas
+    from app.db.database import abrir_pool, cerrar_pool, get_db_connection, release_db_connection
+    from app.schemas import DetalleVentaCreate, VentaCreate
+
+    abrir_pool()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id_cliente FROM cliente ORDER BY id_cliente LIMIT 1")
+            cliente_id = cur.fetchone()[0]
+            cur.execute(
+                """
+                INSERT INTO producto (nombre, precio, cantidad_stock, id_proveedor)
+                SELECT 'bench stock', 10, 0, id_proveedor FROM proveedor ORDER BY id_proveedor LIMIT 1
+                RETURNING id_producto
+                """
+            )
+            producto_id = cur.fetchone()[0]
+    finally:
+        release_db_connection(conn)
+
+    venta = VentaCreate(id_cliente=cliente_id, detalles=[
+        DetalleVentaCreate(id_producto=producto_id, cantidad=1, precio_unitario=10)
+    ])
+
+    def stock_real():
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT COALESCE((SELECT sum(cantidad) FROM producto_stock_shard WHERE id_producto = %s), cantidad_stock)
+                    FROM producto WHERE id_producto = %s
+                    """,
+                    (producto_id, producto_id),
+                )
+                return cur.fetchone()[0]
+        finally:
+            release_db_connection(conn)
+
+    def ronda(shards):
+        crud_productos.particionar_stock_producto(producto_id, 1)
+        crud_productos.update_producto(producto_id, crud_productos.ProductoUpdate(cantidad_stock=stock_inicial))
+        crud_productos.particionar_stock_producto(producto_id, shards)
+
+        tiempos, aceptadas, rechazadas, errores = [], [0], [0], [0]
+        lock = threading.Lock()
+        salida = threading.Barrier(args.compradores + 1)
+
+        def comprador():
+            salida.wait() # Todos salen a la vez
+            inicio = time.perf_counter()
+            try:
+                resultado = crud_ventas.create_venta(venta)
+                contador = aceptadas if resultado is not None else errores
+            except crud_ventas.VentaRechazada:
+                contador = rechazadas
+            duracion = (time.perf_counter() - inicio) * 1000
+            with lock:
+                contador[0] += 1
+                tiempos.append(duracion)
+
+        hilos = [threading.Thread(target=comprador) for _ in range(args.compradores)]
+        for hilo in hilos:
+            hilo.start()
+        salida.wait()
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        total = time.perf_counter() - inicio
+
+        final = stock_real()
+        tiempos.sort()
+        print(f"\n{'sin shards' if shards == 1 else f'{shards} shards'}:")
+        print(f"  tiempo total {total:.2f} s   {args.compradores / total:.0f} ventas/s")
+        print(f"  latencia p50 {tiempos[len(tiempos) // 2]:.1f} ms   p99 {tiempos[int(len(tiempos) * 0.99) - 1]:.1f} ms   max {tiempos[-1]:.1f} ms")
+        print(f"  aceptadas {aceptadas[0]}   rechazadas (sin stock) {rechazadas[0]}   errores {errores[0]}")
+        correcto = aceptadas[0] + final == stock_inicial
+        print(f"  stock final {final}   {'OK' if correcto else 'INCONSISTENTE'} (aceptadas + final = {aceptadas[0] + final}, inicial {stock_inicial})")
+
+    print(f"{args.compradores} compradores, {args.conexiones} conexiones, stock inicial {stock_inicial}, producto {producto_id}")
+    ronda(1)
+    ronda(args.shards)
+    cerrar_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de escalado por workers.
+
+Lanza la API con gunicorn usando 1, 2, ..., N workers y mide el throughput
+(peticiones/segundo) de un endpoint de lectura con varios clientes concurrentes.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base con datos):
+    python benchmarks/bench_workers.py --max-workers 4 --duracion 10 --ruta /api/productos
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def esperar_servidor(puerto: int, ruta: str, timeout: float = 30.0):
+    """Espera hasta que el servidor responda 200 en la ruta indicada."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=2)
+            conn.request("GET", ruta)
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor en el puerto {puerto} no respondió a tiempo")
+
+def cliente_carga(puerto: int, ruta: str, hasta: float, resultados):
+    """Proceso cliente: hace peticiones keep-alive hasta el instante 'hasta'."""
+    completadas = 0
+    errores = 0
+    conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=10)
+    while time.monotonic() < hasta:
+        try:
+            conn.request("GET", ruta)
+            respuesta = conn.getresponse()
+            respuesta.read()
+            if respuesta.status == 200:
+                completadas += 1
+            else:
+                errores += 1
+        except (OSError, http.client.HTTPException):
+            errores += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", puerto, timeout=10)
+    conn.close()
+    resultados.put((completadas, errores))
+
+def medir(workers: int, args) -> tuple:
+    """Arranca gunicorn con 'workers' procesos y mide el throughput."""
+    entorno = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.puerto}")
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=entorno,
+    )
+    try:
+        esperar_servidor(args.puerto, args.ruta)
+        resultados = multiprocessing.Queue()
+        hasta = time.monotonic() + args.duracion
+        clientes = [
+            multiprocessing.Process(target=cliente_carga, args=(args.puerto, args.ruta, hasta, resultados))
+            for _ in range(args.clientes)
+        ]
+        for proceso in clientes:
+            proceso.start()
+        totales = [resultados.get() for _ in clientes]
+        for proceso in clientes:
+            proceso.join()
+        completadas = sum(t[0] for t in totales)
+        errores = sum(t[1] for t in totales)
+        return completadas / args.duracion, errores
+    finally:
+        # SIGTERM: apagado ordenado (drenado) de gunicorn y sus workers
+        servidor.terminate()
+        servidor.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--clientes", type=int, default=32, help="Procesos cliente concurrentes")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga por medición")
+    parser.add_argument("--ruta", default="/api/productos")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>10} {'escalado':>9} {'errores':>8}")
+    base = None
+    for workers in range(1, args.max_workers + 1):
+        throughput, errores = medir(workers, args)
+        base = base or throughput
+        print(f"{workers:>8} {throughput:>10.1f} {throughput / base:>8.2f}x {errores:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Configuración de producción: varios procesos worker de uvicorn bajo gunicorn.
+# Uso (desde el directorio backend/):
+#   gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+# Aplicación ASGI a servir
+wsgi_app = "app.main:app"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# Proxies de confianza: solo en conexiones que vienen de estas IPs toma uvicorn
+# la IP del cliente de X-Forwarded-For (la usa el control de admisión). Detrás
+# del balanceador de Render, p. ej. FORWARDED_ALLOW_IPS='*' si el puerto no es
+# accesible de otro modo.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# --- Número de workers ---
+# Por defecto un worker por núcleo; WEB_CONCURRENCY permite fijarlo a mano.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Sin estado compartido: la app NO se precarga en el proceso maestro, así cada
+# worker importa la app y abre su propio pool de conexiones después del fork.
+preload_app = False
+
+# --- Presupuesto de conexiones a Postgres ---
+# DB_MAX_CONNECTIONS es el total que la app puede usar en la primaria (debe
+# quedar por debajo de 'max_connections' del servidor). De él se apartan
+# DB_CONEXIONES_RESERVADAS para lo que corre fuera de los workers (jobs de
+# app/jobs lanzados por cron, migraciones, psql) y el resto se reparte por
+# igual entre los workers. Cada worker abre además, fuera del pool, la conexión
+# dedicada a LISTEN (app/db/notificaciones.py); los hilos de volcado de la
+# auditoría y de las coocurrencias toman su conexión del propio pool.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "20"))
+DB_CONEXIONES_RESERVADAS = int(os.getenv("DB_CONEXIONES_RESERVADAS", "2"))
+# Conexiones por worker que no salen del pool: la de LISTEN
+CONEXIONES_FIJAS_POR_WORKER = 1
+
+pool_por_worker = (DB_MAX_CONNECTIONS - DB_CONEXIONES_RESERVADAS) // workers - CONEXIONES_FIJAS_POR_WORKER
+if pool_por_worker < 1:
+    # Sin sitio para un pool de al menos una conexión por worker: mejor no
+    # arrancar que pasarse de 'max_connections' con carga.
+    raise SystemExit(
+        f"DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS} no alcanza para {workers} workers: "
+        f"cada uno necesita {CONEXIONES_FIJAS_POR_WORKER + 1} conexiones como mínimo además de "
+        f"las {DB_CONEXIONES_RESERVADAS} reservadas. Sube DB_MAX_CONNECTIONS o baja WEB_CONCURRENCY."
+    )
+os.environ["DB_POOL_MAX_SIZE"] = str(pool_por_worker)
+os.environ["DB_POOL_MIN_SIZE"] = str(min(int(os.getenv("DB_POOL_MIN_SIZE", "1")), pool_por_worker))
+
+# Réplicas: cada worker abre un pool por réplica (app/db/database.py), así que
+# el mismo reparto se aplica en cada servidor réplica con su propio total,
+# DB_REPLICA_MAX_CONNECTIONS (por defecto el de la primaria). En la réplica no
+# hay LISTEN ni jobs: todo el total se reparte entre los pools.
+if os.getenv("DATABASE_REPLICA_URLS", "").strip():
+    DB_REPLICA_MAX_CONNECTIONS = int(os.getenv("DB_REPLICA_MAX_CONNECTIONS", str(DB_MAX_CONNECTIONS)))
+    replica_por_worker = DB_REPLICA_MAX_CONNECTIONS // workers
+    if replica_por_worker < 1:
+        raise SystemExit(
+            f"DB_REPLICA_MAX_CONNECTIONS={DB_REPLICA_MAX_CONNECTIONS} no alcanza para {workers} workers: "
+            "cada uno abre un pool de al menos una conexión por réplica."
+        )
+    os.environ["DB_REPLICA_POOL_MAX_SIZE"] = str(replica_por_worker)
+
+# --- Caché del catálogo ---
+# Con varios workers la caché vive en memoria compartida (/dev/shm) en lugar
+# de que cada proceso guarde su propia copia (ver app/cache/catalogo.py).
+os.environ.setdefault("CACHE_BACKEND", "compartida")
+
+# --- Apagado ordenado ---
+# Con SIGTERM cada worker deja de aceptar conexiones, termina las peticiones
+# en curso y cierra su pool; pasado este plazo gunicorn lo finaliza a la fuerza.
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
@@ -0,0 +1,26 @@
+"""
+Índices sobre las columnas de clave foránea.
+
+Sin ellos, cada borrado de un cliente, proveedor o producto recorre entera la
+tabla que lo referencia: para el ON DELETE CASCADE de 'direccion' y para
+comprobar los ON DELETE RESTRICT de 'venta', 'producto' y 'detalle_venta'.
+Se crean CONCURRENTLY para no bloquear las escrituras mientras se construyen.
+"""
+from app.db.migraciones import crear_indice_concurrente, eliminar_indice
+
+TRANSACCION = False
+
+INDICES = (
+    ("idx_direccion_id_cliente", "direccion", "id_cliente"),
+    ("idx_venta_id_cliente", "venta", "id_cliente"),
+    ("idx_producto_id_proveedor", "producto", "id_proveedor"),
+    ("idx_detalle_venta_id_producto", "detalle_venta", "id_producto"),
+)
+
+def up(conn):
+    for nombre, tabla, columnas in INDICES:
+        crear_indice_concurrente(conn, nombre, tabla, columnas)
+
+def down(conn):
+    for nombre, _, _ in reversed(INDICES):
+        eliminar_indice(conn, nombre)
@@ -0,0 +1,16 @@
+"""
+Índice para listar clientes por nombre.
+
+GET /api/clientes ordena por (nombre, id_cliente) y, paginado, cada página
+continúa tras la última fila de la anterior. Con este índice cada página es
+un recorrido corto del índice en lugar de ordenar la tabla entera.
+"""
+from app.db.migraciones import crear_indice_concurrente, eliminar_indice
+
+TRANSACCION = False
+
+def up(conn):
+    crear_indice_concurrente(conn, "idx_cliente_nombre_id", "cliente", "nombre, id_cliente")
+
+def down(conn):
+    eliminar_indice(conn, "idx_cliente_nombre_id")
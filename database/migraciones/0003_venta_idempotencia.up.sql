@@ -0,0 +1,11 @@
+-- Claves de idempotencia de POST /api/ventas (cabecera Idempotency-Key).
+-- Un terminal que se quedó sin conexión reenvía la venta con la misma clave:
+-- si la primera petición llegó a registrarse, la clave ya está aquí y la API
+-- devuelve esa venta en lugar de registrar otra. La fila se inserta en la
+-- misma transacción que la venta. 'fecha' es la de la venta: el archivado de
+-- un mes (app/jobs/archivar_ventas.py) borra también sus claves.
+CREATE TABLE venta_idempotencia (
+    clave VARCHAR(100) PRIMARY KEY,
+    id_venta INTEGER NOT NULL,
+    fecha DATE NOT NULL
+);
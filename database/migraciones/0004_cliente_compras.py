@@ -0,0 +1,79 @@
+"""
+Acumulados de compras por cliente.
+
+'cliente_compras' guarda, por cliente, el gasto total, el número de compras y
+la fecha de la última. Un trigger sobre 'venta' la actualiza con cada venta
+insertada, así GET /api/clientes/{id}/resumen no tiene que sumar el historial
+(que además deja de estar entero en Postgres al archivar los meses antiguos:
+borrar sus particiones no dispara triggers y los acumulados se conservan).
+
+Al aplicarse se rellena con las ventas de Postgres y las del archivo. El
+CREATE TRIGGER bloquea las inserciones en 'venta' hasta el COMMIT, así que
+ninguna venta queda sin contar ni se cuenta dos veces.
+"""
+from collections import defaultdict
+from datetime import date
+
+from app.archivo import ventas as archivo
+
+def up(conn):
+    conn.execute("""
+        CREATE TABLE cliente_compras (
+            id_cliente INT PRIMARY KEY REFERENCES cliente(id_cliente) ON DELETE CASCADE,
+            total_gastado NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            num_compras INT NOT NULL DEFAULT 0,
+            ultima_compra DATE
+        )
+    """)
+    conn.execute("""
+        CREATE FUNCTION acumular_compra_cliente() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO cliente_compras AS c (id_cliente, total_gastado, num_compras, ultima_compra)
+            VALUES (NEW.id_cliente, NEW.monto_total, 1, NEW.fecha)
+            ON CONFLICT (id_cliente) DO UPDATE SET
+                total_gastado = c.total_gastado + EXCLUDED.total_gastado,
+                num_compras = c.num_compras + 1,
+                ultima_compra = GREATEST(c.ultima_compra, EXCLUDED.ultima_compra);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    conn.execute("""
+        CREATE TRIGGER trg_venta_cliente_compras AFTER INSERT ON venta
+            FOR EACH ROW EXECUTE FUNCTION acumular_compra_cliente()
+    """)
+
+    # Relleno: primero las ventas archivadas (de clientes que aún existan)...
+    archivadas = defaultdict(lambda: [0, 0, None])
+    for venta in archivo.leer_ventas(date.min, date.max):
+        acumulado = archivadas[venta["id_cliente"]]
+        acumulado[0] += venta["monto_total"]
+        acumulado[1] += 1
+        acumulado[2] = max(acumulado[2] or venta["fecha"], venta["fecha"])
+    if archivadas:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO cliente_compras (id_cliente, total_gastado, num_compras, ultima_compra)
+                SELECT id_cliente, %s, %s, %s FROM cliente WHERE id_cliente = %s
+                """,
+                [(total, compras, ultima, id_cliente) for id_cliente, (total, compras, ultima) in archivadas.items()],
+            )
+    # ... y después las que siguen en 'venta', salvo las de meses ya archivados
+    # cuyas particiones aún no se han borrado (ya están contadas arriba).
+    conn.execute("""
+        INSERT INTO cliente_compras AS c (id_cliente, total_gastado, num_compras, ultima_compra)
+        SELECT id_cliente, sum(monto_total), count(*), max(fecha)
+        FROM venta
+        WHERE to_char(fecha, 'YYYY-MM') <> ALL(%s::text[])
+        GROUP BY id_cliente
+        ON CONFLICT (id_cliente) DO UPDATE SET
+            total_gastado = c.total_gastado + EXCLUDED.total_gastado,
+            num_compras = c.num_compras + EXCLUDED.num_compras,
+            ultima_compra = GREATEST(c.ultima_compra, EXCLUDED.ultima_compra)
+    """, (list(archivo.meses_archivados()),))
+
+def down(conn):
+    conn.execute("DROP TRIGGER IF EXISTS trg_venta_cliente_compras ON venta")
+    conn.execute("DROP FUNCTION IF EXISTS acumular_compra_cliente()")
+    conn.execute("DROP TABLE IF EXISTS cliente_compras")
@@ -0,0 +1,2 @@
+DROP TABLE IF EXISTS producto_relacionado;
+DROP TABLE IF EXISTS producto_coocurrencia;
@@ -0,0 +1,21 @@
+-- Productos comprados juntos con frecuencia (ver app/recomendaciones.py).
+-- Sin claves foráneas: el job app/jobs/recomendaciones.py reemplaza las dos
+-- tablas enteras en cada reconstrucción, y la API descarta al leer los
+-- productos que ya no existen.
+
+-- Por cada par de productos, en cuántas ventas aparecen juntos (los dos sentidos)
+CREATE TABLE producto_coocurrencia (
+    id_producto INT NOT NULL,
+    id_relacionado INT NOT NULL,
+    veces INT NOT NULL,
+    CONSTRAINT producto_coocurrencia_pkey PRIMARY KEY (id_producto, id_relacionado)
+);
+
+-- Los RELACIONADOS_TOP_K pares más frecuentes de cada producto, ya ordenados
+CREATE TABLE producto_relacionado (
+    id_producto INT NOT NULL,
+    posicion SMALLINT NOT NULL,
+    id_relacionado INT NOT NULL,
+    veces INT NOT NULL,
+    CONSTRAINT producto_relacionado_pkey PRIMARY KEY (id_producto, posicion)
+);
@@ -0,0 +1,13 @@
+-- Pronóstico de demanda y puntos de pedido por producto. El job
+-- app/jobs/reabastecimiento.py reemplaza todas las filas en cada ejecución
+-- (solo tiene las de productos con ventas en el periodo analizado).
+-- GET /api/proveedores/{id}/reabastecimiento las cruza con el stock vigente.
+CREATE TABLE reabastecimiento (
+    id_producto INT PRIMARY KEY REFERENCES producto(id_producto) ON DELETE CASCADE,
+    demanda_diaria REAL NOT NULL,
+    media_movil REAL NOT NULL,
+    desviacion REAL NOT NULL,
+    punto_pedido INT NOT NULL,
+    nivel_objetivo INT NOT NULL,
+    calculado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,19 @@
+-- Registro de auditoría: un evento por alta, modificación o borrado hecho por
+-- la API, con su autor y la fila antes y después (JSON). Lo escribe en lotes
+-- un hilo por worker (app/auditoria.py); sin claves foráneas, para conservar
+-- los eventos de registros ya eliminados.
+CREATE TABLE auditoria (
+    id_evento UUID PRIMARY KEY,
+    fecha TIMESTAMPTZ NOT NULL,
+    usuario VARCHAR(100) NOT NULL,
+    origen VARCHAR(200),
+    entidad VARCHAR(30) NOT NULL,
+    id_registro INT,
+    operacion VARCHAR(30) NOT NULL,
+    antes JSONB,
+    despues JSONB
+);
+-- Historial de un registro
+CREATE INDEX idx_auditoria_entidad_registro ON auditoria (entidad, id_registro, fecha);
+-- Consultas por periodo: las filas llegan casi en orden de fecha
+CREATE INDEX idx_auditoria_fecha ON auditoria USING brin (fecha);
@@ -0,0 +1,22 @@
+DROP TRIGGER IF EXISTS trg_producto_repartir_stock ON producto;
+DROP FUNCTION IF EXISTS sincronizar_stock_particionado();
+
+CREATE OR REPLACE FUNCTION repartir_stock_al_fijar() RETURNS trigger AS $$
+DECLARE
+    v_shards INT;
+BEGIN
+    SELECT count(*) INTO v_shards FROM producto_stock_shard WHERE id_producto = NEW.id_producto;
+    IF v_shards > 0 THEN
+        PERFORM repartir_stock(NEW.id_producto, NEW.cantidad_stock, v_shards);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_producto_repartir_stock AFTER UPDATE OF cantidad_stock ON producto
+    FOR EACH ROW
+    WHEN (OLD.cantidad_stock IS DISTINCT FROM NEW.cantidad_stock)
+    EXECUTE FUNCTION repartir_stock_al_fijar();
+
+DROP FUNCTION IF EXISTS fijar_stock(INT, INT);
+DROP FUNCTION IF EXISTS stock_particionado(INT);
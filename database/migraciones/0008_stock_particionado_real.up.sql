@@ -0,0 +1,68 @@
+-- Stock particionado: asignar 'cantidad_stock' se compara con la suma de los
+-- shards y no con el valor anterior de la columna, que las reservas no ponen
+-- al día. Antes, volver a fijar ese mismo valor (p. ej. reponer hasta 100 cada
+-- día) no repartía nada y la reposición se perdía.
+
+-- Stock real de un producto particionado (NULL si no tiene shards), con sus
+-- shards bloqueados hasta el final de la transacción: una reserva simultánea
+-- espera en lugar de perderse al repartir un total ya leído.
+CREATE OR REPLACE FUNCTION stock_particionado(p_id_producto INT) RETURNS INT AS $$
+    SELECT sum(cantidad)::int FROM (
+        SELECT cantidad FROM producto_stock_shard WHERE id_producto = p_id_producto FOR UPDATE
+    ) s;
+$$ LANGUAGE sql;
+
+-- Fija el stock de un producto: si está particionado lo reparte entre sus
+-- shards. Retorna 'p_total', para usarla en el SET de un UPDATE de 'producto'
+-- (el trigger de abajo ve entonces que no hay nada que repartir).
+CREATE OR REPLACE FUNCTION fijar_stock(p_id_producto INT, p_total INT) RETURNS INT AS $$
+DECLARE
+    v_shards INT;
+BEGIN
+    SELECT count(*) INTO v_shards FROM producto_stock_shard WHERE id_producto = p_id_producto;
+    IF v_shards > 0 THEN
+        PERFORM repartir_stock(p_id_producto, p_total, v_shards);
+    END IF;
+    RETURN p_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Asignar a 'cantidad_stock' de un producto particionado un valor distinto de
+-- su stock real (la suma de los shards, no el valor anterior de la columna,
+-- que puede estar desfasado) lo reparte entre los shards.
+CREATE OR REPLACE FUNCTION repartir_stock_al_fijar() RETURNS trigger AS $$
+DECLARE
+    v_total INT;
+BEGIN
+    v_total := stock_particionado(NEW.id_producto);
+    IF v_total IS NOT NULL AND NEW.cantidad_stock IS DISTINCT FROM v_total THEN
+        PERFORM fijar_stock(NEW.id_producto, NEW.cantidad_stock);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_producto_repartir_stock ON producto;
+CREATE TRIGGER trg_producto_repartir_stock AFTER UPDATE OF cantidad_stock ON producto
+    FOR EACH ROW EXECUTE FUNCTION repartir_stock_al_fijar();
+
+-- Pone 'producto.cantidad_stock' de los productos particionados al día con la
+-- suma de sus shards (p. ej. cada minuto desde cron). Retorna las filas puestas al día.
+CREATE OR REPLACE FUNCTION sincronizar_stock_particionado() RETURNS INT AS $$
+DECLARE
+    v_filas INT;
+BEGIN
+    -- El total se vuelve a leer con los shards bloqueados, así el trigger no reparte nada
+    UPDATE producto p SET cantidad_stock = stock_particionado(p.id_producto)
+    WHERE p.id_producto IN (
+        SELECT s.id_producto FROM producto_stock_shard s JOIN producto q ON q.id_producto = s.id_producto
+        GROUP BY s.id_producto, q.cantidad_stock
+        HAVING sum(s.cantidad) <> q.cantidad_stock
+    );
+    GET DIAGNOSTICS v_filas = ROW_COUNT;
+    RETURN v_filas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pone al día las columnas ya desfasadas
+SELECT sincronizar_stock_particionado();
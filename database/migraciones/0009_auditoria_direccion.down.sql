@@ -0,0 +1,3 @@
+ALTER TABLE auditoria
+    DROP COLUMN IF EXISTS clave_api,
+    DROP COLUMN IF EXISTS direccion;
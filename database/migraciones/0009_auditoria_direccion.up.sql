@@ -0,0 +1,6 @@
+-- Quién hizo cada cambio: 'usuario' es lo que declara la petición (cabecera
+-- X-Bazar-Usuario, sin comprobar). Se añade la IP del cliente y la huella de
+-- la clave de API reconocida (ADMISION_CLAVES) con la que llegó, si la hubo.
+ALTER TABLE auditoria
+    ADD COLUMN direccion INET,
+    ADD COLUMN clave_api VARCHAR(12);
@@ -0,0 +1,6 @@
+DROP TRIGGER IF EXISTS trg_stock_shard_registro ON producto_stock_shard;
+DROP FUNCTION IF EXISTS registrar_cambio_shard();
+
+DROP TRIGGER IF EXISTS trg_producto_repartir_stock ON producto;
+CREATE TRIGGER trg_producto_repartir_stock AFTER UPDATE OF cantidad_stock ON producto
+    FOR EACH ROW EXECUTE FUNCTION repartir_stock_al_fijar();
@@ -0,0 +1,22 @@
+-- El reparto del stock particionado solo salta cuando cambia el valor de la
+-- columna (la API fija el stock con fijar_stock()), y las reservas sobre los
+-- shards se anotan en 'registro_cambios' como cambios del producto para que
+-- /api/sync las reenvíe (ver "Stock particionado" en schema.sql).
+DROP TRIGGER IF EXISTS trg_producto_repartir_stock ON producto;
+CREATE TRIGGER trg_producto_repartir_stock AFTER UPDATE OF cantidad_stock ON producto
+    FOR EACH ROW
+    WHEN (NEW.cantidad_stock IS DISTINCT FROM OLD.cantidad_stock)
+    EXECUTE FUNCTION repartir_stock_al_fijar();
+
+CREATE OR REPLACE FUNCTION registrar_cambio_shard() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO registro_cambios (tabla, id_registro, operacion)
+    VALUES ('producto', NEW.id_producto, 'U');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_stock_shard_registro AFTER UPDATE OF cantidad ON producto_stock_shard
+    FOR EACH ROW
+    WHEN (NEW.cantidad IS DISTINCT FROM OLD.cantidad)
+    EXECUTE FUNCTION registrar_cambio_shard();
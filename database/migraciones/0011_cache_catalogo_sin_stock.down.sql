@@ -0,0 +1,4 @@
+DROP TRIGGER IF EXISTS trg_producto_cache_actualizar ON producto;
+DROP TRIGGER IF EXISTS trg_producto_cache ON producto;
+CREATE TRIGGER trg_producto_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON producto
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
@@ -0,0 +1,11 @@
+-- Los UPDATE de 'producto' que solo cambian el stock (las ventas) dejan de
+-- invalidar la caché del catálogo: el catálogo toma el stock de una caché de
+-- vida corta aparte (ver app/cache/catalogo.py).
+DROP TRIGGER IF EXISTS trg_producto_cache ON producto;
+CREATE TRIGGER trg_producto_cache AFTER INSERT OR DELETE OR TRUNCATE ON producto
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+CREATE TRIGGER trg_producto_cache_actualizar AFTER UPDATE ON producto
+    FOR EACH ROW
+    WHEN ((OLD.nombre, OLD.descripcion, OLD.precio, OLD.id_proveedor)
+          IS DISTINCT FROM (NEW.nombre, NEW.descripcion, NEW.precio, NEW.id_proveedor))
+    EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
@@ -0,0 +1,2 @@
+DROP TABLE IF EXISTS producto_coocurrencia_corte;
+ALTER TABLE venta DROP COLUMN IF EXISTS txid;
@@ -0,0 +1,20 @@
+-- Productos comprados juntos: coordinación entre la reconstrucción del job
+-- (app/jobs/recomendaciones.py) y las sumas que la API hace venta a venta
+-- (app/recomendaciones.py).
+--
+-- Cada venta guarda la transacción que la registró. El job cuenta las ventas
+-- visibles en la instantánea con la que lee 'detalle_venta', y al cambiar las
+-- tablas suma las que se confirmaron después y anota aquí la instantánea del
+-- cambio: la API solo suma las ventas que esa instantánea no incluye, así que
+-- ninguna venta se pierde ni se cuenta dos veces.
+-- La columna se añade sin valor por defecto (no reescribe las particiones) y
+-- el valor por defecto se fija después; las ventas anteriores quedan con NULL.
+ALTER TABLE venta ADD COLUMN IF NOT EXISTS txid XID8;
+ALTER TABLE venta ALTER COLUMN txid SET DEFAULT pg_current_xact_id();
+
+-- Instantánea del último cambio de tablas del job (NULL: aún no se ha ejecutado)
+CREATE TABLE producto_coocurrencia_corte (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    instantanea PG_SNAPSHOT
+);
+INSERT INTO producto_coocurrencia_corte (instantanea) VALUES (NULL);
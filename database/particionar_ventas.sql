@@ -0,0 +1,142 @@
+-- Migración: convierte 'venta' y 'detalle_venta' de una base existente en
+-- tablas particionadas por mes (ver "Particionado mensual de ventas" en schema.sql).
+-- Una base creada con el schema.sql actual ya está particionada: no ejecutar.
+--
+-- Toda la migración es una única transacción: las tablas quedan bloqueadas
+-- mientras se copian las filas, así que conviene ejecutarla con la API parada.
+-- Es SQL plano, sin metacomandos de psql; por ejemplo:
+--     psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f database/particionar_ventas.sql
+
+BEGIN;
+
+-- 1. Las tablas actuales se conservan con otro nombre (junto con su PK y su
+--    secuencia, cuyos nombres necesitan las tablas nuevas) hasta copiar los datos.
+ALTER TABLE detalle_venta RENAME TO detalle_venta_sin_particionar;
+ALTER TABLE detalle_venta_sin_particionar RENAME CONSTRAINT pk_detalle_venta TO pk_detalle_venta_sin_particionar;
+ALTER TABLE venta RENAME TO venta_sin_particionar;
+ALTER INDEX venta_pkey RENAME TO venta_sin_particionar_pkey;
+ALTER SEQUENCE venta_id_venta_seq RENAME TO venta_sin_particionar_id_venta_seq;
+
+-- 2. Tablas particionadas (igual que en schema.sql)
+CREATE TABLE venta (
+    id_venta INT GENERATED BY DEFAULT AS IDENTITY,
+    fecha DATE NOT NULL,
+    monto_total NUMERIC(10, 2) NOT NULL,
+    id_cliente INT NOT NULL,
+    CONSTRAINT pk_venta PRIMARY KEY (id_venta, fecha),
+    CONSTRAINT fk_venta_cliente FOREIGN KEY (id_cliente)
+        REFERENCES cliente(id_cliente)
+        ON DELETE RESTRICT
+) PARTITION BY RANGE (fecha);
+
+CREATE TABLE detalle_venta (
+    id_venta INT NOT NULL,
+    fecha DATE NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    precio_unitario NUMERIC(10, 2) NOT NULL,
+    CONSTRAINT pk_detalle_venta PRIMARY KEY (id_venta, id_producto, fecha),
+    CONSTRAINT fk_detalle_venta_venta FOREIGN KEY (id_venta, fecha)
+        REFERENCES venta(id_venta, fecha)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_detalle_venta_producto FOREIGN KEY (id_producto)
+        REFERENCES producto(id_producto)
+        ON DELETE RESTRICT
+) PARTITION BY RANGE (fecha);
+
+-- 3. Funciones de mantenimiento de particiones (iguales que en schema.sql)
+-- Crea las particiones que falten de los meses entre 'p_desde' y 'p_hasta'
+-- (ambos incluidos). Retorna el número de meses creados.
+CREATE OR REPLACE FUNCTION crear_particiones_venta(p_desde DATE, p_hasta DATE) RETURNS INT AS $$
+DECLARE
+    v_mes DATE := date_trunc('month', p_desde);
+    v_sufijo TEXT;
+    v_creadas INT := 0;
+BEGIN
+    -- Varios workers pueden arrancar a la vez: se serializan aquí
+    PERFORM pg_advisory_xact_lock(hashtext('crear_particiones_venta'));
+    WHILE v_mes <= p_hasta LOOP
+        v_sufijo := to_char(v_mes, 'YYYY_MM');
+        -- Crear una partición bloquea la tabla padre: solo si no existe
+        IF to_regclass('venta_' || v_sufijo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF venta FOR VALUES FROM (%L) TO (%L)',
+                           'venta_' || v_sufijo, v_mes, v_mes + INTERVAL '1 month');
+            v_creadas := v_creadas + 1;
+        END IF;
+        IF to_regclass('detalle_venta_' || v_sufijo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF detalle_venta FOR VALUES FROM (%L) TO (%L)',
+                           'detalle_venta_' || v_sufijo, v_mes, v_mes + INTERVAL '1 month');
+        END IF;
+        v_mes := v_mes + INTERVAL '1 month';
+    END LOOP;
+    RETURN v_creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Garantiza las particiones del mes actual y de los 'p_meses' siguientes
+CREATE OR REPLACE FUNCTION asegurar_particiones_venta(p_meses INT DEFAULT 3) RETURNS INT AS $$
+    SELECT crear_particiones_venta(current_date, (current_date + make_interval(months => p_meses))::date);
+$$ LANGUAGE sql;
+
+-- Separa (DETACH) las particiones de los meses anteriores a 'p_antes_de'.
+-- Las tablas separadas conservan sus filas pero dejan de formar parte de
+-- 'venta'/'detalle_venta': quedan listas para archivarse o borrarse con DROP.
+-- Retorna el nombre de cada partición de 'venta' separada.
+CREATE OR REPLACE FUNCTION separar_particiones_venta(p_antes_de DATE) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_particion RECORD;
+BEGIN
+    FOR v_particion IN
+        SELECT c.relname, substr(c.relname, length('venta_') + 1) AS sufijo
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'venta'::regclass
+          AND CASE WHEN c.relname ~ '^venta_[0-9]{4}_[0-9]{2}$'
+                   THEN to_date(substr(c.relname, length('venta_') + 1), 'YYYY_MM') + INTERVAL '1 month' <= p_antes_de
+                   ELSE FALSE END
+        ORDER BY c.relname
+    LOOP
+        -- Primero el detalle, que referencia a la venta. Separado, su FK a
+        -- 'venta' ya no tiene sentido (esas ventas dejan de estar en 'venta').
+        IF to_regclass('detalle_venta_' || v_particion.sufijo) IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE detalle_venta DETACH PARTITION %I', 'detalle_venta_' || v_particion.sufijo);
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT fk_detalle_venta_venta', 'detalle_venta_' || v_particion.sufijo);
+        END IF;
+        EXECUTE format('ALTER TABLE venta DETACH PARTITION %I', v_particion.relname);
+        RETURN NEXT v_particion.relname::TEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 4. Particiones para todos los meses con ventas y los próximos meses
+SELECT crear_particiones_venta(
+    COALESCE((SELECT min(fecha) FROM venta_sin_particionar), current_date),
+    GREATEST((SELECT max(fecha) FROM venta_sin_particionar), current_date + 90)
+);
+
+-- 5. Copia de los datos; el detalle toma la fecha de su venta
+INSERT INTO venta (id_venta, fecha, monto_total, id_cliente)
+SELECT id_venta, fecha, monto_total, id_cliente FROM venta_sin_particionar;
+
+INSERT INTO detalle_venta (id_venta, fecha, id_producto, cantidad, precio_unitario)
+SELECT d.id_venta, v.fecha, d.id_producto, d.cantidad, d.precio_unitario
+FROM detalle_venta_sin_particionar d
+JOIN venta_sin_particionar v ON v.id_venta = d.id_venta;
+
+-- Los nuevos id_venta continúan donde terminaban los anteriores
+SELECT setval(pg_get_serial_sequence('venta', 'id_venta'),
+              COALESCE((SELECT max(id_venta) FROM venta), 1),
+              (SELECT max(id_venta) FROM venta) IS NOT NULL);
+
+-- 6. El trigger de eventos de stock se crea después de copiar, para no
+--    publicar un evento por cada detalle histórico
+CREATE TRIGGER trg_detalle_venta_stock AFTER INSERT ON detalle_venta
+    FOR EACH ROW EXECUTE FUNCTION notificar_venta_stock();
+
+DROP TABLE detalle_venta_sin_particionar;
+DROP TABLE venta_sin_particionar;
+
+COMMIT;
+
+ANALYZE venta;
+ANALYZE detalle_venta;
@@ -25,15 +25,18 @@ CREATE TABLE direccion (
 );
 
 -- Tabla de ventas (Dependiente de cliente)
+-- Particionada por mes de 'fecha' (ver "Particionado mensual de ventas" al final).
+-- La clave primaria de una tabla particionada debe incluir la columna de partición.
 CREATE TABLE venta (
-    id_venta INT PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    id_venta INT GENERATED BY DEFAULT AS IDENTITY,
     fecha DATE NOT NULL,
     monto_total NUMERIC(10, 2) NOT NULL,
     id_cliente INT NOT NULL,
+    CONSTRAINT pk_venta PRIMARY KEY (id_venta, fecha),
     CONSTRAINT fk_venta_cliente FOREIGN KEY (id_cliente)
         REFERENCES cliente(id_cliente)
         ON DELETE RESTRICT
-);
+) PARTITION BY RANGE (fecha);
 
 -- Tabla supertipo de productos
 CREATE TABLE producto (
@@ -80,16 +83,457 @@ CREATE TABLE accesorios (
 );
 
 -- Tabla asociativa para detalle de venta
+-- 'fecha' repite la de su venta para particionar el detalle por el mismo mes.
 CREATE TABLE detalle_venta (
     id_venta INT NOT NULL,
+    fecha DATE NOT NULL,
     id_producto INT NOT NULL,
     cantidad INT NOT NULL,
     precio_unitario NUMERIC(10, 2) NOT NULL,
-    CONSTRAINT pk_detalle_venta PRIMARY KEY (id_venta, id_producto),
-    CONSTRAINT fk_detalle_venta_venta FOREIGN KEY (id_venta)
-        REFERENCES venta(id_venta)
+    CONSTRAINT pk_detalle_venta PRIMARY KEY (id_venta, id_producto, fecha),
+    CONSTRAINT fk_detalle_venta_venta FOREIGN KEY (id_venta, fecha)
+        REFERENCES venta(id_venta, fecha)
         ON DELETE CASCADE,
     CONSTRAINT fk_detalle_venta_producto FOREIGN KEY (id_producto)
         REFERENCES producto(id_producto)
         ON DELETE RESTRICT
-);
\ No newline at end of file
+) PARTITION BY RANGE (fecha);
+
+-- --- Invalidación de cachés ---
+-- Cada sentencia que modifica el catálogo o los proveedores publica en el canal
+-- 'cache_invalidacion' el espacio de caché afectado y el id de la transacción
+-- ('<espacio>:<txid>'). Postgres entrega la notificación al hacer COMMIT y
+-- descarta los duplicados dentro de una misma transacción.
+CREATE OR REPLACE FUNCTION notificar_invalidacion_cache() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidacion', TG_ARGV[0] || ':' || txid_current());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_producto_cache AFTER INSERT OR DELETE OR TRUNCATE ON producto
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+-- Las ventas solo cambian 'cantidad_stock': no invalidan el catálogo, que toma
+-- el stock de una caché de vida corta aparte (ver app/cache/catalogo.py)
+CREATE TRIGGER trg_producto_cache_actualizar AFTER UPDATE ON producto
+    FOR EACH ROW
+    WHEN ((OLD.nombre, OLD.descripcion, OLD.precio, OLD.id_proveedor)
+          IS DISTINCT FROM (NEW.nombre, NEW.descripcion, NEW.precio, NEW.id_proveedor))
+    EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+CREATE TRIGGER trg_ropa_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ropa
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+CREATE TRIGGER trg_calzado_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON calzado
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+CREATE TRIGGER trg_accesorios_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON accesorios
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('catalogo');
+CREATE TRIGGER trg_proveedor_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON proveedor
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_invalidacion_cache('proveedores');
+
+
+-- --- Eventos de stock y precio para los clientes conectados ---
+-- Publica en el canal 'stock_cambios' un JSON pequeño por producto afectado:
+-- {"id_producto", "cantidad_stock", "precio"} o {"id_producto", "eliminado": true}.
+-- La API lo reenvía a los navegadores por Server-Sent Events (/api/eventos/stock).
+CREATE OR REPLACE FUNCTION notificar_cambio_stock() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('stock_cambios',
+            json_build_object('id_producto', OLD.id_producto, 'eliminado', true)::text);
+    ELSE
+        PERFORM pg_notify('stock_cambios',
+            json_build_object('id_producto', NEW.id_producto,
+                              'cantidad_stock', NEW.cantidad_stock,
+                              'precio', NEW.precio)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ventas: al registrar un detalle se publica el estado actual del producto
+-- vendido, con su stock real (la suma de shards si lo tiene particionado,
+-- ver 'producto_stock_shard' más abajo)
+CREATE OR REPLACE FUNCTION notificar_venta_stock() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('stock_cambios',
+        json_build_object('id_producto', p.id_producto,
+                          'cantidad_stock', COALESCE(
+                              (SELECT sum(s.cantidad) FROM producto_stock_shard s WHERE s.id_producto = p.id_producto),
+                              p.cantidad_stock),
+                          'precio', p.precio)::text)
+    FROM producto p WHERE p.id_producto = NEW.id_producto;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_producto_stock_cambio AFTER UPDATE OF cantidad_stock, precio ON producto
+    FOR EACH ROW
+    WHEN (OLD.cantidad_stock IS DISTINCT FROM NEW.cantidad_stock OR OLD.precio IS DISTINCT FROM NEW.precio)
+    EXECUTE FUNCTION notificar_cambio_stock();
+CREATE TRIGGER trg_producto_stock_alta_baja AFTER INSERT OR DELETE ON producto
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_stock();
+CREATE TRIGGER trg_detalle_venta_stock AFTER INSERT ON detalle_venta
+    FOR EACH ROW EXECUTE FUNCTION notificar_venta_stock();
+
+
+-- --- Registro de cambios para la sincronización incremental (/api/sync) ---
+-- Cada INSERT/UPDATE/DELETE sobre las tablas sincronizables deja una fila con el
+-- id de la transacción que la produjo. Los DELETE quedan como lápidas ('D').
+-- El token de sincronización es el xmin de una instantánea: todas las
+-- transacciones con id menor ya terminaron, así que el intervalo
+-- [token anterior, token nuevo) está completo y no deja huecos.
+CREATE TABLE registro_cambios (
+    id_cambio BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    tabla VARCHAR(30) NOT NULL,
+    id_registro INT NOT NULL,
+    operacion CHAR(1) NOT NULL, -- 'I', 'U' o 'D'
+    fecha TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX idx_registro_cambios_txid ON registro_cambios (txid);
+
+-- Horizonte de la última purga: los tokens anteriores ya no son válidos
+CREATE TABLE registro_cambios_horizonte (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    txid XID8 NOT NULL
+);
+INSERT INTO registro_cambios_horizonte (txid) VALUES ('0');
+
+-- TG_ARGV[0]: nombre de la columna de clave primaria de la tabla
+CREATE OR REPLACE FUNCTION registrar_cambio() RETURNS trigger AS $$
+DECLARE
+    fila RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN fila := OLD; ELSE fila := NEW; END IF;
+    INSERT INTO registro_cambios (tabla, id_registro, operacion)
+    VALUES (TG_TABLE_NAME, (to_jsonb(fila) ->> TG_ARGV[0])::INT, left(TG_OP, 1));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_producto_registro AFTER INSERT OR UPDATE OR DELETE ON producto
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_producto');
+CREATE TRIGGER trg_ropa_registro AFTER INSERT OR UPDATE OR DELETE ON ropa
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_producto');
+CREATE TRIGGER trg_calzado_registro AFTER INSERT OR UPDATE OR DELETE ON calzado
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_producto');
+CREATE TRIGGER trg_accesorios_registro AFTER INSERT OR UPDATE OR DELETE ON accesorios
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_producto');
+CREATE TRIGGER trg_cliente_registro AFTER INSERT OR UPDATE OR DELETE ON cliente
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_cliente');
+CREATE TRIGGER trg_direccion_registro AFTER INSERT OR UPDATE OR DELETE ON direccion
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_direccion');
+CREATE TRIGGER trg_proveedor_registro AFTER INSERT OR UPDATE OR DELETE ON proveedor
+    FOR EACH ROW EXECUTE FUNCTION registrar_cambio('id_proveedor');
+
+-- Purga periódica (p. ej. diaria desde cron): elimina cambios más antiguos que
+-- 'retencion' y avanza el horizonte; los terminales con un token anterior
+-- deben hacer una sincronización completa.
+CREATE OR REPLACE FUNCTION purgar_registro_cambios(retencion INTERVAL DEFAULT '30 days') RETURNS BIGINT AS $$
+DECLARE
+    nuevo_horizonte XID8;
+    eliminados BIGINT;
+BEGIN
+    SELECT max(txid) INTO nuevo_horizonte FROM registro_cambios WHERE fecha < now() - retencion;
+    IF nuevo_horizonte IS NULL THEN
+        RETURN 0;
+    END IF;
+    DELETE FROM registro_cambios WHERE txid <= nuevo_horizonte;
+    GET DIAGNOSTICS eliminados = ROW_COUNT;
+    UPDATE registro_cambios_horizonte SET txid = nuevo_horizonte;
+    RETURN eliminados;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- --- Importación masiva de clientes ---
+-- Clave externa del sistema de origen (franquicia, CRM...). Permite repetir una
+-- importación sin duplicar clientes y asociar las direcciones a su cliente.
+ALTER TABLE cliente ADD COLUMN clave_externa VARCHAR(64) UNIQUE;
+
+
+-- --- Stock particionado para productos muy demandados ---
+-- En una venta masiva todas las compras de un mismo producto actualizan la
+-- misma fila de 'producto' y se serializan en su bloqueo. Para los productos
+-- marcados como muy demandados el stock se reparte en K filas (shards): cada
+-- reserva descuenta de un shard al azar, así las compras concurrentes bloquean
+-- filas distintas.
+-- Mientras un producto tiene shards, su stock real es la suma de los shards.
+-- Las reservas no tocan 'producto' (sería otra vez la fila caliente), así que
+-- 'producto.cantidad_stock' se pone al día con la suma en cada UPDATE del
+-- producto que no fija el stock y con sincronizar_stock_particionado(). Cada
+-- reserva sí queda en 'registro_cambios' como un cambio del producto (para
+-- /api/sync). El stock se fija con fijar_stock(); asignar a la columna un
+-- valor distinto del anterior también lo reparte entre los shards.
+CREATE TABLE producto_stock_shard (
+    id_producto INT NOT NULL,
+    shard SMALLINT NOT NULL,
+    cantidad INT NOT NULL CHECK (cantidad >= 0),
+    CONSTRAINT pk_producto_stock_shard PRIMARY KEY (id_producto, shard),
+    CONSTRAINT fk_stock_shard_producto FOREIGN KEY (id_producto)
+        REFERENCES producto(id_producto)
+        ON DELETE CASCADE
+);
+
+-- Reparte 'p_total' entre 'p_shards' shards (las unidades sobrantes van a los primeros)
+CREATE OR REPLACE FUNCTION repartir_stock(p_id_producto INT, p_total INT, p_shards INT) RETURNS VOID AS $$
+BEGIN
+    DELETE FROM producto_stock_shard WHERE id_producto = p_id_producto;
+    IF p_shards > 1 THEN
+        INSERT INTO producto_stock_shard (id_producto, shard, cantidad)
+        SELECT p_id_producto, g, p_total / p_shards + CASE WHEN g < p_total % p_shards THEN 1 ELSE 0 END
+        FROM generate_series(0, p_shards - 1) g;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Stock real de un producto particionado (NULL si no tiene shards), con sus
+-- shards bloqueados hasta el final de la transacción: una reserva simultánea
+-- espera en lugar de perderse al repartir un total ya leído.
+CREATE OR REPLACE FUNCTION stock_particionado(p_id_producto INT) RETURNS INT AS $$
+    SELECT sum(cantidad)::int FROM (
+        SELECT cantidad FROM producto_stock_shard WHERE id_producto = p_id_producto FOR UPDATE
+    ) s;
+$$ LANGUAGE sql;
+
+-- Fija el stock de un producto: si está particionado lo reparte entre sus
+-- shards. Retorna 'p_total', para usarla en el SET de un UPDATE de 'producto'
+-- (el trigger de abajo ve entonces que no hay nada que repartir).
+CREATE OR REPLACE FUNCTION fijar_stock(p_id_producto INT, p_total INT) RETURNS INT AS $$
+DECLARE
+    v_shards INT;
+BEGIN
+    SELECT count(*) INTO v_shards FROM producto_stock_shard WHERE id_producto = p_id_producto;
+    IF v_shards > 0 THEN
+        PERFORM repartir_stock(p_id_producto, p_total, v_shards);
+    END IF;
+    RETURN p_total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Activa (p_shards > 1) o desactiva (p_shards = 1) el stock particionado de un
+-- producto conservando su stock actual. Retorna FALSE si el producto no existe.
+CREATE OR REPLACE FUNCTION particionar_stock(p_id_producto INT, p_shards INT) RETURNS BOOLEAN AS $$
+DECLARE
+    v_total INT;
+BEGIN
+    SELECT COALESCE((SELECT sum(s.cantidad) FROM producto_stock_shard s WHERE s.id_producto = p.id_producto),
+                    p.cantidad_stock)
+    INTO v_total
+    FROM producto p WHERE p.id_producto = p_id_producto
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+    -- Primero se retiran los shards, para que el UPDATE no los vuelva a repartir
+    DELETE FROM producto_stock_shard WHERE id_producto = p_id_producto;
+    UPDATE producto SET cantidad_stock = v_total WHERE id_producto = p_id_producto;
+    PERFORM repartir_stock(p_id_producto, v_total, p_shards);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cambiar 'cantidad_stock' de un producto particionado (p. ej. con un UPDATE
+-- a mano) reparte el nuevo valor entre los shards si no coincide con su stock
+-- real, la suma de los shards. Como el trigger solo salta si el valor cambia
+-- y la columna puede estar desfasada, fijar el stock al valor que ya tiene la
+-- columna requiere fijar_stock(), que es lo que usa la API.
+CREATE OR REPLACE FUNCTION repartir_stock_al_fijar() RETURNS trigger AS $$
+DECLARE
+    v_total INT;
+BEGIN
+    v_total := stock_particionado(NEW.id_producto);
+    IF v_total IS NOT NULL AND NEW.cantidad_stock IS DISTINCT FROM v_total THEN
+        PERFORM fijar_stock(NEW.id_producto, NEW.cantidad_stock);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_producto_repartir_stock AFTER UPDATE OF cantidad_stock ON producto
+    FOR EACH ROW
+    WHEN (NEW.cantidad_stock IS DISTINCT FROM OLD.cantidad_stock)
+    EXECUTE FUNCTION repartir_stock_al_fijar();
+
+-- Las reservas sobre los shards se anotan en 'registro_cambios' como cambios
+-- del producto: /api/sync debe reenviar su stock aunque 'producto' no cambie
+CREATE OR REPLACE FUNCTION registrar_cambio_shard() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO registro_cambios (tabla, id_registro, operacion)
+    VALUES ('producto', NEW.id_producto, 'U');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_stock_shard_registro AFTER UPDATE OF cantidad ON producto_stock_shard
+    FOR EACH ROW
+    WHEN (NEW.cantidad IS DISTINCT FROM OLD.cantidad)
+    EXECUTE FUNCTION registrar_cambio_shard();
+
+-- Pone 'producto.cantidad_stock' de los productos particionados al día con la
+-- suma de sus shards (p. ej. cada minuto desde cron). Retorna las filas puestas al día.
+CREATE OR REPLACE FUNCTION sincronizar_stock_particionado() RETURNS INT AS $$
+DECLARE
+    v_filas INT;
+BEGIN
+    -- El total se vuelve a leer con los shards bloqueados, así el trigger no reparte nada
+    UPDATE producto p SET cantidad_stock = stock_particionado(p.id_producto)
+    WHERE p.id_producto IN (
+        SELECT s.id_producto FROM producto_stock_shard s JOIN producto q ON q.id_producto = s.id_producto
+        GROUP BY s.id_producto, q.cantidad_stock
+        HAVING sum(s.cantidad) <> q.cantidad_stock
+    );
+    GET DIAGNOSTICS v_filas = ROW_COUNT;
+    RETURN v_filas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reserva (descuenta) stock para una línea de venta.
+-- Sin shards: UPDATE condicional de 'producto'. Con shards: primero un shard al
+-- azar que no esté bloqueado y tenga stock suficiente; si no lo hay, barrido
+-- que bloquea todos los shards en orden y reparte la reserva entre ellos.
+-- Lanza SQLSTATE 'BZ001' si no hay stock suficiente. Un producto inexistente
+-- no se comprueba aquí: lo rechaza la FK de 'detalle_venta'.
+CREATE OR REPLACE FUNCTION reservar_stock(p_id_producto INT, p_cantidad INT) RETURNS VOID AS $$
+DECLARE
+    v_shard SMALLINT;
+    v_restante INT := p_cantidad;
+    v_tomado INT;
+    v_fila RECORD;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM producto_stock_shard WHERE id_producto = p_id_producto) THEN
+        UPDATE producto SET cantidad_stock = cantidad_stock - p_cantidad
+        WHERE id_producto = p_id_producto AND cantidad_stock >= p_cantidad;
+        IF NOT FOUND AND EXISTS (SELECT 1 FROM producto WHERE id_producto = p_id_producto) THEN
+            RAISE EXCEPTION 'Stock insuficiente para el producto %', p_id_producto
+                USING ERRCODE = 'BZ001';
+        END IF;
+        RETURN;
+    END IF;
+
+    -- 1. Un shard al azar, libre y con stock suficiente
+    SELECT shard INTO v_shard FROM producto_stock_shard
+    WHERE id_producto = p_id_producto AND cantidad >= p_cantidad
+    ORDER BY random()
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+    IF FOUND THEN
+        UPDATE producto_stock_shard SET cantidad = cantidad - p_cantidad
+        WHERE id_producto = p_id_producto AND shard = v_shard;
+        RETURN;
+    END IF;
+
+    -- 2. Barrido: todos los shards, bloqueados en orden (sin interbloqueos)
+    FOR v_fila IN
+        SELECT shard, cantidad FROM producto_stock_shard
+        WHERE id_producto = p_id_producto
+        ORDER BY shard
+        FOR UPDATE
+    LOOP
+        EXIT WHEN v_restante = 0;
+        v_tomado := LEAST(v_fila.cantidad, v_restante);
+        IF v_tomado > 0 THEN
+            UPDATE producto_stock_shard SET cantidad = cantidad - v_tomado
+            WHERE id_producto = p_id_producto AND shard = v_fila.shard;
+            v_restante := v_restante - v_tomado;
+        END IF;
+    END LOOP;
+    IF v_restante > 0 THEN
+        RAISE EXCEPTION 'Stock insuficiente para el producto %', p_id_producto
+            USING ERRCODE = 'BZ001';
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- --- Validación de precios de las ventas ---
+-- El total de una venta se calcula en el servidor con los precios vigentes
+-- (NUMERIC, sin redondeos de coma flotante). Si algún precio enviado por el
+-- cliente no coincide con el vigente la venta se rechaza con SQLSTATE 'BZ002'.
+CREATE OR REPLACE FUNCTION validar_total_venta(p_total NUMERIC, p_discrepancias INT[]) RETURNS NUMERIC AS $$
+BEGIN
+    IF cardinality(p_discrepancias) > 0 THEN
+        RAISE EXCEPTION 'El precio de los productos % no coincide con el precio vigente',
+            array_to_string(p_discrepancias, ', ')
+            USING ERRCODE = 'BZ002';
+    END IF;
+    RETURN COALESCE(p_total, 0);
+END;
+$$ LANGUAGE plpgsql;
+
+
+
+-- --- Particionado mensual de ventas ---
+-- 'venta' y 'detalle_venta' tienen una partición por mes: venta_AAAA_MM y
+-- detalle_venta_AAAA_MM, con el rango [día 1 del mes, día 1 del mes siguiente).
+-- Las consultas que filtran por 'fecha' solo leen las particiones del rango, y
+-- los meses antiguos se separan enteros (DETACH) en lugar de borrarse fila a fila.
+-- Una venta cuya fecha no tiene partición se rechaza: la aplicación crea las
+-- particiones de los próximos meses al arrancar (asegurar_particiones_venta).
+-- La identidad de 'id_venta' solo se genera al insertar a través de 'venta':
+-- hasta PostgreSQL 17 las particiones no la heredan (insertar siempre en la
+-- tabla padre). El esquema necesita PostgreSQL 13 o posterior (XID8).
+
+-- Crea las particiones que falten de los meses entre 'p_desde' y 'p_hasta'
+-- (ambos incluidos). Retorna el número de meses creados.
+CREATE OR REPLACE FUNCTION crear_particiones_venta(p_desde DATE, p_hasta DATE) RETURNS INT AS $$
+DECLARE
+    v_mes DATE := date_trunc('month', p_desde);
+    v_sufijo TEXT;
+    v_creadas INT := 0;
+BEGIN
+    -- Varios workers pueden arrancar a la vez: se serializan aquí
+    PERFORM pg_advisory_xact_lock(hashtext('crear_particiones_venta'));
+    WHILE v_mes <= p_hasta LOOP
+        v_sufijo := to_char(v_mes, 'YYYY_MM');
+        -- Crear una partición bloquea la tabla padre: solo si no existe
+        IF to_regclass('venta_' || v_sufijo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF venta FOR VALUES FROM (%L) TO (%L)',
+                           'venta_' || v_sufijo, v_mes, v_mes + INTERVAL '1 month');
+            v_creadas := v_creadas + 1;
+        END IF;
+        IF to_regclass('detalle_venta_' || v_sufijo) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF detalle_venta FOR VALUES FROM (%L) TO (%L)',
+                           'detalle_venta_' || v_sufijo, v_mes, v_mes + INTERVAL '1 month');
+        END IF;
+        v_mes := v_mes + INTERVAL '1 month';
+    END LOOP;
+    RETURN v_creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Garantiza las particiones del mes actual y de los 'p_meses' siguientes
+CREATE OR REPLACE FUNCTION asegurar_particiones_venta(p_meses INT DEFAULT 3) RETURNS INT AS $$
+    SELECT crear_particiones_venta(current_date, (current_date + make_interval(months => p_meses))::date);
+$$ LANGUAGE sql;
+
+-- Separa (DETACH) las particiones de los meses anteriores a 'p_antes_de'.
+-- Las tablas separadas conservan sus filas pero dejan de formar parte de
+-- 'venta'/'detalle_venta': quedan listas para archivarse o borrarse con DROP.
+-- Retorna el nombre de cada partición de 'venta' separada.
+CREATE OR REPLACE FUNCTION separar_particiones_venta(p_antes_de DATE) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_particion RECORD;
+BEGIN
+    FOR v_particion IN
+        SELECT c.relname, substr(c.relname, length('venta_') + 1) AS sufijo
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'venta'::regclass
+          AND CASE WHEN c.relname ~ '^venta_[0-9]{4}_[0-9]{2}$'
+                   THEN to_date(substr(c.relname, length('venta_') + 1), 'YYYY_MM') + INTERVAL '1 month' <= p_antes_de
+                   ELSE FALSE END
+        ORDER BY c.relname
+    LOOP
+        -- Primero el detalle, que referencia a la venta. Separado, su FK a
+        -- 'venta' ya no tiene sentido (esas ventas dejan de estar en 'venta').
+        IF to_regclass('detalle_venta_' || v_particion.sufijo) IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE detalle_venta DETACH PARTITION %I', 'detalle_venta_' || v_particion.sufijo);
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT fk_detalle_venta_venta', 'detalle_venta_' || v_particion.sufijo);
+        END IF;
+        EXECUTE format('ALTER TABLE venta DETACH PARTITION %I', v_particion.relname);
+        RETURN NEXT v_particion.relname::TEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT asegurar_particiones_venta();
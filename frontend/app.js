@@ -27,6 +27,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const proveedorMensaje = document.getElementById('proveedor-mensaje'); 
     const direccionesClienteDiv = document.getElementById('direcciones-cliente'); 
     const listaDireccionesCliente = document.getElementById('lista-direcciones-cliente');
+    const comprasCliente = document.getElementById('compras-cliente');
     const formNuevaDireccion = document.getElementById('form-nueva-direccion');
     const direccionMensaje = document.getElementById('direccion-mensaje');
     const nombreClienteSeleccionadoSpan = document.getElementById('nombre-cliente-seleccionado');
@@ -38,10 +39,15 @@ document.addEventListener("DOMContentLoaded", () => {
     const editTelefonoClienteInput = document.getElementById('edit-telefono-cliente');
     const editClienteMensaje = document.getElementById('edit-cliente-mensaje');
     const cerrarModalClienteBtn = document.getElementById('cerrar-modal-cliente');
+    const estadoConexion = document.getElementById('estado-conexion');
+    const sugerenciasCarrito = document.getElementById('carrito-sugerencias');
+    const listaSugerencias = document.getElementById('sugerencias-lista');
 
     // --- Estado de la Aplicación ---
     /** Almacena los items del carrito: { id_producto, nombre, precio, cantidad } */
     let carrito = []; 
+    /** Indica si ya se leyó el carrito guardado en la copia local (hasta entonces no se guarda encima). */
+    let carritoRecuperado = false;
     /** Almacena el ID del cliente seleccionado para gestión de direcciones. */
     let clienteSeleccionadoId = null; 
 
@@ -60,96 +66,432 @@ document.addEventListener("DOMContentLoaded", () => {
         }, 3500);
     }
 
-    /** Realiza una petición fetch genérica con manejo de errores básico. */
-    async function fetchData(url, options = {}) {
+    /**
+     * LSN de la última escritura propia (cabecera X-Bazar-LSN). Mientras dure,
+     * las lecturas lo reenvían para que la API no las sirva desde una réplica
+     * que aún no tiene esa escritura. Caduca como la cookie del backend.
+     */
+    let ultimaEscritura = null;
+    const LECTURAS_PROPIAS_MS = 60000;
+
+    /**
+     * Realiza una petición fetch con manejo de errores básico y retorna la
+     * respuesta (lanza un Error con el detalle de la API y su 'status' si no
+     * es 2xx ni 304).
+     */
+    async function peticion(url, options = {}) {
         try {
+            const metodo = (options.method || 'GET').toUpperCase();
+            if (metodo === 'GET' && ultimaEscritura && Date.now() < ultimaEscritura.hasta) {
+                options = { ...options, headers: { ...options.headers, 'X-Bazar-LSN': ultimaEscritura.lsn } };
+            }
             const response = await fetch(url, options);
-            if (!response.ok) {
+            const lsn = response.headers.get('X-Bazar-LSN');
+            if (lsn) { ultimaEscritura = { lsn, hasta: Date.now() + LECTURAS_PROPIAS_MS }; }
+            // 304: la copia local sigue vigente (peticiones condicionales)
+            if (!response.ok && response.status !== 304) {
                 let errorDetail = `Error HTTP ${response.status}: ${response.statusText}`;
                 try {
                     const errJson = await response.json();
                     errorDetail = errJson.detail || errorDetail; 
                 } catch (e) { /* Ignora si el cuerpo no es JSON */ }
-                throw new Error(errorDetail); 
+                const error = new Error(errorDetail);
+                error.status = response.status; // Sin 'status', el error es de red (sin respuesta)
+                throw error; 
             }
-            if (response.status === 204) { return null; } 
-            return await response.json(); 
+            return response;
         } catch (error) {
             console.error(`Error en fetch a ${url}:`, error);
             throw error; 
         }
     }
 
+    /** Realiza una petición fetch genérica y retorna el cuerpo JSON (null si es 204). */
+    async function fetchData(url, options = {}) {
+        const response = await peticion(url, options);
+        if (response.status === 204) { return null; } 
+        return await response.json(); 
+    }
+
+    /** Elementos por página al cargar los listados largos (productos, clientes). */
+    const TAMANO_PAGINA = 500;
+
+    /**
+     * Pide una página de un listado paginado de la API. Retorna { datos, siguiente },
+     * donde 'siguiente' es el cursor de la página siguiente (null si era la última).
+     */
+    async function fetchPagina(url, cursor) {
+        const params = new URLSearchParams({ limite: TAMANO_PAGINA });
+        if (cursor) params.set('cursor', cursor);
+        const response = await peticion(`${url}?${params}`);
+        return { datos: await response.json(), siguiente: response.headers.get('X-Bazar-Siguiente') };
+    }
+
+    // --- Copia Local (IndexedDB) ---
+
+    /**
+     * Copia local del catálogo, los clientes y los proveedores, con el token de
+     * /api/sync con que se obtuvo, el carrito y la cola de ventas pendientes de
+     * enviar. Al abrir la página se muestra la copia al instante y se pone al
+     * día pidiendo solo los cambios. Resuelve a null si el navegador no permite
+     * usar IndexedDB: entonces los listados se piden enteros en cada carga.
+     */
+    const almacenLocal = new Promise((resolve) => {
+        if (!window.indexedDB) { resolve(null); return; }
+        const apertura = indexedDB.open('bazar', 1);
+        apertura.onupgradeneeded = () => {
+            const db = apertura.result;
+            db.createObjectStore('productos', { keyPath: 'id_producto' });
+            db.createObjectStore('clientes', { keyPath: 'id_cliente' });
+            db.createObjectStore('proveedores', { keyPath: 'id_proveedor' });
+            db.createObjectStore('estado'); // 'token' de sincronización y 'carrito'
+            // En orden de llegada: se reenvían en el mismo orden
+            db.createObjectStore('ventasPendientes', { keyPath: 'orden', autoIncrement: true });
+        };
+        apertura.onsuccess = () => resolve(apertura.result);
+        apertura.onerror = () => {
+            console.warn('Copia local no disponible:', apertura.error);
+            resolve(null);
+        };
+    });
+
+    /** Convierte una petición de IndexedDB en una promesa con su resultado. */
+    function resultadoIdb(peticionIdb) {
+        return new Promise((resolve, reject) => {
+            peticionIdb.onsuccess = () => resolve(peticionIdb.result);
+            peticionIdb.onerror = () => reject(peticionIdb.error);
+        });
+    }
+
+    /** Lee una clave de un almacén, o todos sus valores (ordenados por clave) si se omite. */
+    function leerLocal(db, almacen, clave) {
+        const store = db.transaction(almacen).objectStore(almacen);
+        return resultadoIdb(clave === undefined ? store.getAll() : store.get(clave));
+    }
+
+    /**
+     * Modifica varios almacenes en una sola transacción: 'operacion' recibe
+     * sus object stores en el mismo orden. Resuelve cuando se confirma.
+     */
+    function escribirLocal(db, almacenes, operacion) {
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(almacenes, 'readwrite');
+            tx.oncomplete = () => resolve();
+            tx.onerror = tx.onabort = () => reject(tx.error);
+            operacion(...almacenes.map((almacen) => tx.objectStore(almacen)));
+        });
+    }
+
+    /** Guarda una fila en la copia local (si la hay) sin esperar a que termine. */
+    function guardarLocal(almacen, valor, clave) {
+        almacenLocal
+            .then((db) => db && escribirLocal(db, [almacen], (store) => store.put(valor, clave)))
+            .catch((error) => console.warn(`No se pudo guardar en '${almacen}':`, error));
+    }
+
+    /** Escapa un texto para insertarlo en una plantilla HTML. */
+    function escaparHtml(texto) {
+        return String(texto).replace(/[&<>"']/g, (c) => (
+            { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]
+        ));
+    }
+
+    /**
+     * Lista con scroll virtual. De una lista de miles de elementos solo
+     * mantiene en el DOM las filas que caen en la ventana (más un margen por
+     * arriba y por abajo) y ocupa el alto de las demás con padding, así la
+     * barra de scroll de la página se comporta como con la lista completa.
+     * Las filas se pintan con una plantilla HTML de una vez; los clics se
+     * atienden con un único listener en el contenedor (delegación).
+     * Las filas deben tener todas el mismo alto. Si el contenedor es un grid,
+     * se reparten en las columnas que defina su CSS. El contenedor no debe
+     * tener padding propio (la lista lo usa).
+     */
+    class ListaVirtual {
+        /**
+         * @param {HTMLElement} contenedor Elemento donde se pintan las filas.
+         * @param {function(Object): string} plantilla HTML de un elemento.
+         * @param {function(Object): number} clave Identificador único de un elemento.
+         */
+        constructor(contenedor, plantilla, clave) {
+            this.contenedor = contenedor;
+            this.plantilla = plantilla;
+            this.clave = clave;
+            this.items = [];
+            this.posiciones = new Map(); // clave -> índice en items
+            this.altoFila = 0; // Alto de una fila más su separación (0: sin medir)
+            this.columnas = 1;
+            this.rango = null; // [inicio, fin) de los elementos pintados
+            let programado = false;
+            const programar = () => {
+                if (programado) return;
+                programado = true;
+                requestAnimationFrame(() => { programado = false; this.renderizar(); });
+            };
+            window.addEventListener('scroll', programar, { passive: true });
+            window.addEventListener('resize', () => { this.altoFila = 0; this.rango = null; programar(); });
+        }
+
+        /** Olvida los elementos y deja el contenedor libre para mostrar un mensaje. */
+        vaciar() {
+            this.items = [];
+            this.posiciones = new Map();
+            this.rango = null;
+            this.contenedor.style.paddingTop = '';
+            this.contenedor.style.paddingBottom = '';
+        }
+
+        /** Sustituye todos los elementos. */
+        establecer(items) {
+            this.vaciar();
+            this.anadir(items);
+        }
+
+        /** Añade elementos al final (p. ej. la siguiente página de la API). */
+        anadir(items) {
+            for (const item of items) {
+                this.posiciones.set(this.clave(item), this.items.length);
+                this.items.push(item);
+            }
+            this.renderizar();
+        }
+
+        obtener(clave) {
+            const indice = this.posiciones.get(clave);
+            return indice === undefined ? undefined : this.items[indice];
+        }
+
+        /**
+         * Aplica un lote de cambios. Los elementos modificados que no cambian
+         * de posición según 'orden' se reemplazan repintando solo su fila; si
+         * hay altas, bajas o cambios de posición, se reordena la lista.
+         */
+        aplicarCambios(actualizados, eliminados, orden) {
+            let reordenar = eliminados.length > 0;
+            for (const item of actualizados) {
+                const anterior = this.obtener(this.clave(item));
+                if (anterior && orden(anterior, item) === 0) this.actualizar(item);
+                else reordenar = true;
+            }
+            if (!reordenar) return;
+            const items = new Map(this.items.map((item) => [this.clave(item), item]));
+            eliminados.forEach((clave) => items.delete(clave));
+            actualizados.forEach((item) => items.set(this.clave(item), item));
+            this.items = [...items.values()].sort(orden);
+            this.posiciones = new Map(this.items.map((item, i) => [this.clave(item), i]));
+            this.renderizar(true);
+        }
+
+        /** Reemplaza un elemento; si está pintado, repinta solo su fila. */
+        actualizar(item) {
+            const indice = this.posiciones.get(this.clave(item));
+            if (indice === undefined) return;
+            this.items[indice] = item;
+            if (this.rango && indice >= this.rango[0] && indice < this.rango[1]) {
+                this.contenedor.children[indice - this.rango[0]].outerHTML = this.plantilla(item);
+            }
+        }
+
+        quitar(clave) {
+            const indice = this.posiciones.get(clave);
+            if (indice === undefined) return;
+            this.items.splice(indice, 1);
+            this.posiciones = new Map(this.items.map((item, i) => [this.clave(item), i]));
+            this.renderizar(true);
+        }
+
+        /**
+         * Mide el alto de fila y las columnas con las primeras filas pintadas.
+         * Retorna false si no se puede (contenedor oculto).
+         */
+        medir() {
+            this.contenedor.style.paddingTop = '';
+            this.contenedor.style.paddingBottom = '';
+            this.contenedor.innerHTML = this.items.slice(0, 50).map(this.plantilla).join('');
+            const filas = this.contenedor.children;
+            if (filas.length === 0 || filas[0].offsetHeight === 0) {
+                this.rango = [0, filas.length];
+                return false;
+            }
+            const estilo = getComputedStyle(this.contenedor);
+            // En un grid 'auto-fill' las columnas resueltas aparecen aunque estén vacías
+            this.columnas = estilo.display === 'grid'
+                ? estilo.gridTemplateColumns.split(' ').length
+                : 1;
+            if (this.columnas < filas.length) {
+                this.altoFila = filas[this.columnas].offsetTop - filas[0].offsetTop;
+            } else {
+                const fila = getComputedStyle(filas[0]);
+                this.altoFila = filas[0].offsetHeight + (parseFloat(estilo.rowGap) || 0)
+                    + parseFloat(fila.marginTop) + parseFloat(fila.marginBottom);
+            }
+            this.rango = null;
+            return true;
+        }
+
+        /** Pinta las filas visibles (solo toca el DOM si cambian, salvo con 'forzar'). */
+        renderizar(forzar = false) {
+            const total = this.items.length;
+            if (!this.contenedor.isConnected || total === 0) return;
+            if (!this.altoFila && !this.medir()) return;
+            const MARGEN_FILAS = 4;
+            const totalFilas = Math.ceil(total / this.columnas);
+            // Filas de la lista que ya quedaron por encima de la ventana
+            const desplazadas = Math.floor(-this.contenedor.getBoundingClientRect().top / this.altoFila);
+            const primeraFila = Math.min(totalFilas, Math.max(0, desplazadas - MARGEN_FILAS));
+            const ultimaFila = Math.min(
+                totalFilas, primeraFila + Math.ceil(window.innerHeight / this.altoFila) + 2 * MARGEN_FILAS
+            );
+            const inicio = primeraFila * this.columnas;
+            const fin = Math.min(total, ultimaFila * this.columnas);
+            this.contenedor.style.paddingTop = `${primeraFila * this.altoFila}px`;
+            this.contenedor.style.paddingBottom = `${(totalFilas - ultimaFila) * this.altoFila}px`;
+            if (!forzar && this.rango && this.rango[0] === inicio && this.rango[1] === fin) return;
+            this.contenedor.innerHTML = this.items.slice(inicio, fin).map(this.plantilla).join('');
+            this.rango = [inicio, fin];
+        }
+    }
+
     // --- Funciones de Carga y Renderizado ---
 
-    /** Carga y muestra la lista de productos (Corregido listener). */
-    async function cargarProductos() {
-        if (!listaDeProductos) return;
-        listaDeProductos.innerHTML = '<p>Cargando productos...</p>';
+    /** HTML de la tarjeta de un producto del catálogo. */
+    function plantillaProducto(producto) {
+        return `
+            <div class="producto-item" data-id="${producto.id_producto}">
+                <h3>${escaparHtml(producto.nombre)}</h3>
+                <p>${escaparHtml(producto.descripcion || 'Sin descripción')}</p>
+                <p class="precio">$${Number(producto.precio).toFixed(2)}</p>
+                <p class="stock">Stock: ${producto.cantidad_stock}</p>
+                <button class="btn-accion btn-add-carrito" data-id="${producto.id_producto}">Añadir al Carrito</button>
+            </div>`;
+    }
+
+    /** Catálogo con scroll virtual: solo están en el DOM las tarjetas visibles. */
+    const catalogo = listaDeProductos
+        ? new ListaVirtual(listaDeProductos, plantillaProducto, (producto) => producto.id_producto)
+        : null;
+    /** Carga del catálogo en curso; una recarga deja obsoleta la anterior. */
+    let cargaProductos = 0;
+    let productosCompletos = false;
+
+    /**
+     * Carga el catálogo página a página: la primera se muestra en cuanto
+     * llega y las siguientes se van añadiendo a la lista mientras tanto.
+     * Con 'desde' (cursor de /api/bootstrap) sigue tras las páginas ya mostradas.
+     */
+    async function cargarProductos(desde = null) {
+        if (!catalogo) return;
+        const carga = ++cargaProductos;
+        productosCompletos = false;
+        // En una recarga se sigue mostrando el catálogo anterior hasta la primera página
+        if (catalogo.items.length === 0) listaDeProductos.innerHTML = '<p>Cargando productos...</p>';
         try {
-            const productos = await fetchData(`${API_URL}/api/productos`);
-            listaDeProductos.innerHTML = ''; 
-            if (!productos || productos.length === 0) {
-                listaDeProductos.innerHTML = '<p>No hay productos disponibles.</p>'; return;
+            let cursor = desde;
+            do {
+                const pagina = await fetchPagina(`${API_URL}/api/productos`, cursor);
+                if (carga !== cargaProductos) return;
+                if (cursor === null) catalogo.establecer(pagina.datos); else catalogo.anadir(pagina.datos);
+                cursor = pagina.siguiente;
+            } while (cursor);
+            productosCompletos = true;
+            if (catalogo.items.length === 0) {
+                listaDeProductos.innerHTML = '<p>No hay productos disponibles.</p>';
             }
-            productos.forEach(producto => {
-                const item = document.createElement('div'); 
-                item.className = 'producto-item';
-                item.innerHTML = `
-                    <h3>${producto.nombre}</h3>
-                    <p>${producto.descripcion || 'Sin descripción'}</p>
-                    <p class="precio">$${producto.precio.toFixed(2)}</p>
-                    <button class="btn-accion btn-add-carrito" data-id="${producto.id_producto}" data-nombre="${producto.nombre}" data-precio="${producto.precio}">Añadir al Carrito</button>
-                `;
-                const addButton = item.querySelector('.btn-add-carrito'); 
-                if (addButton) {
-                    addButton.addEventListener('click', handleAddCarritoClick); 
-                } else {
-                    console.error(`Error: Botón 'Añadir al Carrito' no encontrado para producto ID: ${producto.id_producto}`);
-                }
-                listaDeProductos.appendChild(item);
-            });
         } catch (error) {
+            if (carga !== cargaProductos || catalogo.items.length > 0) return;
             listaDeProductos.innerHTML = `<p style="color: red;">Error al cargar productos: ${error.message}</p>`;
         }
     }
 
-    /** Carga y muestra la lista de clientes y puebla el selector. */
-    async function cargarClientes() {
+    /** 
+     * Escucha los cambios de stock y precio que publica la API (Server-Sent Events)
+     * y actualiza solo la tarjeta del producto afectado, sin recargar el catálogo.
+     */
+    function suscribirCambiosStock() {
+        if (!window.EventSource || !catalogo) return;
+        const fuente = new EventSource(`${API_URL}/api/eventos/stock`);
+        let conectadoAntes = false;
+
+        fuente.addEventListener('open', () => {
+            // Tras una reconexión pudieron perderse cambios: se recarga el catálogo.
+            if (conectadoAntes) refrescar(cargarProductos);
+            conectadoAntes = true;
+        });
+        fuente.addEventListener('stock', (event) => {
+            const cambio = JSON.parse(event.data);
+            const producto = catalogo.obtener(cambio.id_producto);
+            if (!producto) {
+                // Producto nuevo. Mientras se carga el catálogo llegará con su página.
+                if (!cambio.eliminado && productosCompletos) refrescar(cargarProductos);
+                return;
+            }
+            if (cambio.eliminado) { catalogo.quitar(cambio.id_producto); mostrarCatalogo(); return; }
+            const actualizado = { ...producto, precio: Number(cambio.precio), cantidad_stock: cambio.cantidad_stock };
+            catalogo.actualizar(actualizado);
+            guardarLocal('productos', actualizado);
+        });
+        // El servidor pide una recarga completa si este cliente se quedó atrás.
+        fuente.addEventListener('resync', () => refrescar(cargarProductos));
+    }
+
+    /** HTML de la fila de un cliente. */
+    function plantillaCliente(cliente) {
+        const nombre = escaparHtml(cliente.nombre);
+        return `
+            <li>
+                <div class="item-info">
+                    <span>${nombre}</span> 
+                    <span>${escaparHtml(cliente.telefono || 'Sin teléfono')}</span>
+                </div>
+                <div class="item-acciones">
+                    <button class="btn-accion btn-ver-direcciones" data-id="${cliente.id_cliente}" data-nombre="${nombre}">Direcciones</button>
+                    <button class="btn-accion btn-editar-cliente" data-id="${cliente.id_cliente}" data-nombre="${nombre}" data-telefono="${escaparHtml(cliente.telefono || '')}">Editar</button>
+                    <button class="btn-accion btn-eliminar-cliente" data-id="${cliente.id_cliente}" data-nombre="${nombre}">Eliminar</button>
+                </div>
+            </li>`;
+    }
+
+    /** Lista de clientes con scroll virtual (dentro de su contenedor, que muestra también los mensajes). */
+    const ulClientes = document.createElement('ul');
+    const clientes = new ListaVirtual(ulClientes, plantillaCliente, (cliente) => cliente.id_cliente);
+    let cargaClientes = 0;
+
+    /**
+     * Carga los clientes página a página, en la lista y en el selector de compra.
+     * Con 'desde' (cursor de /api/bootstrap) sigue tras las páginas ya mostradas.
+     */
+    async function cargarClientes(desde = null) {
         if (!listaDeClientesContenedor || !selectorCliente) return;
-        listaDeClientesContenedor.innerHTML = '<p>Cargando clientes...</p>';
-        selectorCliente.innerHTML = '<option value="">Seleccione un cliente...</option>'; 
+        const carga = ++cargaClientes;
+        if (desde === null) {
+            listaDeClientesContenedor.innerHTML = '<p>Cargando clientes...</p>';
+            selectorCliente.innerHTML = '<option value="">Seleccione un cliente...</option>'; 
+            clientes.vaciar();
+        }
         try {
-            const clientes = await fetchData(`${API_URL}/api/clientes`);
-            listaDeClientesContenedor.innerHTML = ''; 
-            if (!clientes || clientes.length === 0) { listaDeClientesContenedor.innerHTML = '<p>No hay clientes registrados.</p>'; return; }
-            
-            const ul = document.createElement('ul');
-            clientes.forEach(cliente => {
-                const li = document.createElement('li'); 
-                li.innerHTML = `
-                    <div class="item-info">
-                        <span>${cliente.nombre}</span> 
-                        <span>${cliente.telefono || 'Sin teléfono'}</span>
-                    </div>
-                    <div class="item-acciones">
-                        <button class="btn-accion btn-ver-direcciones" data-id="${cliente.id_cliente}" data-nombre="${cliente.nombre}">Direcciones</button>
-                        <button class="btn-accion btn-editar-cliente" data-id="${cliente.id_cliente}" data-nombre="${cliente.nombre}" data-telefono="${cliente.telefono || ''}">Editar</button>
-                        <button class="btn-accion btn-eliminar-cliente" data-id="${cliente.id_cliente}" data-nombre="${cliente.nombre}">Eliminar</button>
-                    </div>
-                `;
-                // Asignación de Listeners de Clientes
-                li.querySelector('.btn-ver-direcciones').addEventListener('click', handleVerDireccionesClick);
-                li.querySelector('.btn-editar-cliente').addEventListener('click', handleEditarClienteClick);
-                li.querySelector('.btn-eliminar-cliente').addEventListener('click', handleDeleteClienteClick);
-                ul.appendChild(li);
-
-                // Añadir al selector
-                const option = document.createElement('option'); option.value = cliente.id_cliente; option.textContent = cliente.nombre;
-                selectorCliente.appendChild(option);
-            });
-            listaDeClientesContenedor.appendChild(ul); 
+            let cursor = desde;
+            do {
+                const pagina = await fetchPagina(`${API_URL}/api/clientes`, cursor);
+                if (carga !== cargaClientes) return;
+                if (cursor === null) {
+                    listaDeClientesContenedor.replaceChildren(ulClientes);
+                    clientes.establecer(pagina.datos);
+                } else {
+                    clientes.anadir(pagina.datos);
+                }
+                // Las opciones del selector se añaden de una vez por página
+                const opciones = document.createDocumentFragment();
+                pagina.datos.forEach(cliente => {
+                    const option = document.createElement('option'); option.value = cliente.id_cliente; option.textContent = cliente.nombre;
+                    opciones.appendChild(option);
+                });
+                selectorCliente.appendChild(opciones);
+                cursor = pagina.siguiente;
+            } while (cursor);
+            if (clientes.items.length === 0) { listaDeClientesContenedor.innerHTML = '<p>No hay clientes registrados.</p>'; }
         } catch (error) {
+            if (carga !== cargaClientes) return;
+            clientes.vaciar();
             listaDeClientesContenedor.innerHTML = `<p style="color: red;">Error al cargar clientes: ${error.message}</p>`;
         }
     }
@@ -159,40 +501,240 @@ document.addEventListener("DOMContentLoaded", () => {
         if (!listaDeProveedores) return; 
         listaDeProveedores.innerHTML = '<p>Cargando proveedores...</p>';
         try {
-            const proveedores = await fetchData(`${API_URL}/api/proveedores`);
-            listaDeProveedores.innerHTML = ''; 
-            if (!proveedores || proveedores.length === 0) { listaDeProveedores.innerHTML = '<p>No hay proveedores registrados.</p>'; return; }
-            const ul = document.createElement('ul');
-            proveedores.forEach(proveedor => {
-                const li = document.createElement('li');
-                li.innerHTML = `
-                    <div class="item-info">
-                        <span>${proveedor.nombre}</span> 
-                        <span>${proveedor.telefono || 'Sin teléfono'}</span>
-                    </div>
-                    <div class="item-acciones">
-                         <button class="btn-accion btn-editar-proveedor" data-id="${proveedor.id_proveedor}" data-nombre="${proveedor.nombre}" data-telefono="${proveedor.telefono || ''}">Editar</button>
-                         <button class="btn-accion btn-eliminar-proveedor" data-id="${proveedor.id_proveedor}" data-nombre="${proveedor.nombre}">Eliminar</button>
-                    </div>
-                `;
-                // --- ASIGNACIÓN DE LISTENERS DE PROVEEDORES (CORRECCIÓN) ---
-                li.querySelector('.btn-editar-proveedor').addEventListener('click', handleEditarProveedorClick);
-                li.querySelector('.btn-eliminar-proveedor').addEventListener('click', handleDeleteProveedorClick);
-                
-                ul.appendChild(li);
-            });
-            listaDeProveedores.appendChild(ul);
+            pintarProveedores(await fetchData(`${API_URL}/api/proveedores`));
         } catch (error) {
             listaDeProveedores.innerHTML = `<p style="color: red;">Error al cargar proveedores: ${error.message}</p>`;
         }
     }
 
-    /** Carga y muestra las direcciones de un cliente específico. */
+    /** Muestra la lista de proveedores. */
+    function pintarProveedores(proveedores) {
+        if (!listaDeProveedores) return;
+        listaDeProveedores.innerHTML = ''; 
+        if (!proveedores || proveedores.length === 0) { listaDeProveedores.innerHTML = '<p>No hay proveedores registrados.</p>'; return; }
+        const ul = document.createElement('ul');
+        proveedores.forEach(proveedor => {
+            const li = document.createElement('li');
+            li.innerHTML = `
+                <div class="item-info">
+                    <span>${proveedor.nombre}</span> 
+                    <span>${proveedor.telefono || 'Sin teléfono'}</span>
+                </div>
+                <div class="item-acciones">
+                     <button class="btn-accion btn-editar-proveedor" data-id="${proveedor.id_proveedor}" data-nombre="${proveedor.nombre}" data-telefono="${proveedor.telefono || ''}">Editar</button>
+                     <button class="btn-accion btn-eliminar-proveedor" data-id="${proveedor.id_proveedor}" data-nombre="${proveedor.nombre}">Eliminar</button>
+                </div>
+            `;
+            // --- ASIGNACIÓN DE LISTENERS DE PROVEEDORES (CORRECCIÓN) ---
+            li.querySelector('.btn-editar-proveedor').addEventListener('click', handleEditarProveedorClick);
+            li.querySelector('.btn-eliminar-proveedor').addEventListener('click', handleDeleteProveedorClick);
+            
+            ul.appendChild(li);
+        });
+        listaDeProveedores.appendChild(ul);
+    }
+
+    /**
+     * Primera carga en una sola petición (/api/bootstrap): la primera página
+     * del catálogo y de los clientes y los proveedores. Retorna los cursores
+     * para seguir cargando ({ productos, clientes }, null si ya está todo), o
+     * null si la petición falló y hay que cargar cada listado por separado.
+     */
+    async function cargarArranque() {
+        const cargaP = ++cargaProductos;
+        const cargaC = ++cargaClientes;
+        let arranque;
+        try {
+            arranque = await fetchData(`${API_URL}/api/bootstrap?limite=${TAMANO_PAGINA}`);
+        } catch (error) {
+            return null;
+        }
+        if (catalogo && cargaP === cargaProductos) {
+            catalogo.establecer(arranque.productos.datos);
+            productosCompletos = !arranque.productos.siguiente;
+            mostrarCatalogo();
+        }
+        if (cargaC === cargaClientes) {
+            clientes.establecer(arranque.clientes.datos);
+            mostrarClientes();
+        }
+        pintarProveedores(arranque.proveedores.datos);
+        return { productos: arranque.productos.siguiente, clientes: arranque.clientes.siguiente };
+    }
+
+    // --- Sincronización de la Copia Local ---
+
+    /** Tablas de /api/sync que usa la interfaz (los subtipos dan el tipo de cada producto). */
+    const TABLAS_SINCRONIZADAS = ['producto', 'ropa', 'calzado', 'accesorios', 'cliente', 'proveedor'];
+    const SUBTIPOS_PRODUCTO = ['ropa', 'calzado', 'accesorios'];
+
+    /** Orden de los listados: por nombre y, a igual nombre, por ID. */
+    const colacion = new Intl.Collator('es');
+    const ordenPorNombre = (clave) => (a, b) => colacion.compare(a.nombre, b.nombre) || clave(a) - clave(b);
+    const ordenProductos = ordenPorNombre((producto) => producto.id_producto);
+    const ordenClientes = ordenPorNombre((cliente) => cliente.id_cliente);
+
+    /** Muestra el catálogo de la lista virtual, o un aviso si está vacío. */
+    function mostrarCatalogo() {
+        if (!catalogo || catalogo.items.length > 0) return;
+        catalogo.vaciar();
+        listaDeProductos.innerHTML = '<p>No hay productos disponibles.</p>';
+    }
+
+    /** Muestra los clientes de la lista virtual (o un aviso si no hay) y rehace el selector de compra. */
+    function mostrarClientes() {
+        if (!listaDeClientesContenedor || !selectorCliente) return;
+        if (clientes.items.length === 0) {
+            clientes.vaciar();
+            listaDeClientesContenedor.innerHTML = '<p>No hay clientes registrados.</p>';
+        } else if (!ulClientes.isConnected) {
+            listaDeClientesContenedor.replaceChildren(ulClientes);
+            clientes.renderizar(true);
+        }
+        const seleccionado = selectorCliente.value;
+        const opciones = document.createDocumentFragment();
+        const vacia = document.createElement('option'); vacia.value = ''; vacia.textContent = 'Seleccione un cliente...';
+        opciones.appendChild(vacia);
+        clientes.items.forEach(cliente => {
+            const option = document.createElement('option'); option.value = cliente.id_cliente; option.textContent = cliente.nombre;
+            opciones.appendChild(option);
+        });
+        selectorCliente.replaceChildren(opciones);
+        selectorCliente.value = seleccionado;
+    }
+
+    /** Muestra al instante la copia local guardada. Retorna false si aún no hay copia. */
+    async function mostrarCopiaLocal(db) {
+        if (!(await leerLocal(db, 'estado', 'token'))) return false;
+        const [productos, listaClientes, proveedores] = await Promise.all(
+            ['productos', 'clientes', 'proveedores'].map((almacen) => leerLocal(db, almacen))
+        );
+        if (catalogo) { catalogo.establecer(productos.sort(ordenProductos)); mostrarCatalogo(); }
+        clientes.establecer(listaClientes.sort(ordenClientes));
+        mostrarClientes();
+        pintarProveedores(proveedores.sort(ordenPorNombre((proveedor) => proveedor.id_proveedor)));
+        return true;
+    }
+
+    /**
+     * Pone al día la copia local y la interfaz con /api/sync. Con token pide
+     * solo los cambios desde la sincronización anterior, como petición
+     * condicional (If-None-Match): si no hay ninguno la API responde 304 sin
+     * cuerpo. Sin token (primera visita, o token caducado: 410) pide la copia
+     * completa. Solo se escriben y repintan las filas que cambiaron.
+     */
+    async function sincronizarAhora(db) {
+        let token = await leerLocal(db, 'estado', 'token');
+        const params = new URLSearchParams({ tablas: TABLAS_SINCRONIZADAS.join(',') });
+        const headers = {};
+        if (token) { params.set('since', token); headers['If-None-Match'] = `"${token}"`; }
+        let response;
+        try {
+            response = await peticion(`${API_URL}/api/sync?${params}`, { headers });
+        } catch (error) {
+            if (error.status !== 410) throw error;
+            await escribirLocal(db, ['estado'], (estado) => estado.delete('token'));
+            return sincronizarAhora(db);
+        }
+        if (response.status === 304) return;
+        const { token: nuevoToken, completo, cambios } = await response.json();
+
+        // Tipo de cada producto según el subtipo con fila. Si sus subtipos no
+        // cambiaron, el producto conserva el tipo que ya tenía.
+        const tipos = new Map();
+        SUBTIPOS_PRODUCTO.forEach((tipo) => cambios[tipo].actualizados.forEach((fila) => tipos.set(fila.id_producto, tipo)));
+        const productos = new Map(cambios.producto.actualizados.map((fila) => [fila.id_producto, fila]));
+        tipos.forEach((_, id) => { if (!productos.has(id) && catalogo && catalogo.obtener(id)) productos.set(id, catalogo.obtener(id)); });
+        const productosActualizados = [...productos.values()].map((producto) => ({
+            ...producto,
+            tipo_producto: tipos.get(producto.id_producto)
+                || (!completo && catalogo && catalogo.obtener(producto.id_producto)?.tipo_producto)
+                || 'desconocido',
+        }));
+
+        await escribirLocal(db, ['productos', 'clientes', 'proveedores', 'estado'], (productosDb, clientesDb, proveedoresDb, estado) => {
+            const tablas = [
+                [productosDb, productosActualizados, cambios.producto.eliminados],
+                [clientesDb, cambios.cliente.actualizados, cambios.cliente.eliminados],
+                [proveedoresDb, cambios.proveedor.actualizados, cambios.proveedor.eliminados],
+            ];
+            for (const [store, actualizados, eliminados] of tablas) {
+                if (completo) store.clear();
+                actualizados.forEach((fila) => store.put(fila));
+                eliminados.forEach((id) => store.delete(id));
+            }
+            estado.put(nuevoToken, 'token');
+        });
+
+        if (catalogo && (completo || productosActualizados.length || cambios.producto.eliminados.length)) {
+            if (completo) catalogo.establecer(productosActualizados.sort(ordenProductos));
+            else catalogo.aplicarCambios(productosActualizados, cambios.producto.eliminados, ordenProductos);
+            mostrarCatalogo();
+        }
+        productosCompletos = true;
+        if (completo || cambios.cliente.actualizados.length || cambios.cliente.eliminados.length) {
+            if (completo) clientes.establecer(cambios.cliente.actualizados.sort(ordenClientes));
+            else clientes.aplicarCambios(cambios.cliente.actualizados, cambios.cliente.eliminados, ordenClientes);
+            mostrarClientes();
+        }
+        if (completo || cambios.proveedor.actualizados.length || cambios.proveedor.eliminados.length) {
+            const proveedores = await leerLocal(db, 'proveedores');
+            pintarProveedores(proveedores.sort(ordenPorNombre((proveedor) => proveedor.id_proveedor)));
+        }
+    }
+
+    /** Sincronizaciones encadenadas: nunca se aplican dos a la vez. */
+    let colaSincronizacion = Promise.resolve();
+
+    /** Encola una sincronización de la copia local. Sin conexión, se sigue mostrando la copia. */
+    function sincronizar() {
+        colaSincronizacion = colaSincronizacion.then(async () => {
+            const db = await almacenLocal;
+            try {
+                await sincronizarAhora(db);
+            } catch (error) {
+                console.warn('No se pudo sincronizar la copia local:', error.message);
+                if (catalogo && catalogo.items.length === 0) {
+                    listaDeProductos.innerHTML = `<p style="color: red;">Error al cargar productos: ${error.message}</p>`;
+                }
+                if (listaDeClientesContenedor && clientes.items.length === 0) {
+                    listaDeClientesContenedor.innerHTML = `<p style="color: red;">Error al cargar clientes: ${error.message}</p>`;
+                }
+                if (listaDeProveedores && !listaDeProveedores.querySelector('ul')) {
+                    listaDeProveedores.innerHTML = `<p style="color: red;">Error al cargar proveedores: ${error.message}</p>`;
+                }
+            }
+        });
+        return colaSincronizacion;
+    }
+
+    /**
+     * Pone al día los listados tras un cambio: con copia local, pidiendo solo
+     * lo modificado; sin ella, recargando entero lo afectado ('cargarCompleto').
+     */
+    async function refrescar(cargarCompleto) {
+        if (await almacenLocal) return sincronizar();
+        return cargarCompleto();
+    }
+
+    /**
+     * Carga y muestra las direcciones de un cliente específico y el resumen de
+     * sus compras, con una sola petición (/api/clientes/{id}/resumen).
+     */
     async function cargarDireccionesCliente(clienteId) {
         if (!listaDireccionesCliente) return;
         listaDireccionesCliente.innerHTML = '<p>Cargando direcciones...</p>';
+        if (comprasCliente) comprasCliente.textContent = '';
         try {
-            const direcciones = await fetchData(`${API_URL}/api/clientes/${clienteId}/direcciones`);
+            const resumen = await fetchData(`${API_URL}/api/clientes/${clienteId}/resumen?ventas=5`);
+            const direcciones = resumen.direcciones;
+            if (comprasCliente) {
+                comprasCliente.textContent = resumen.num_compras === 0
+                    ? 'Sin compras registradas.'
+                    : `${resumen.num_compras} compra(s) por $${Number(resumen.total_gastado).toFixed(2)}. `
+                        + `Última: ${resumen.ultima_compra}. Recientes: `
+                        + resumen.ultimas_ventas.map((venta) => `#${venta.id_venta} ($${Number(venta.monto_total).toFixed(2)})`).join(', ');
+            }
             listaDireccionesCliente.innerHTML = ''; 
             if (!direcciones || direcciones.length === 0) { listaDireccionesCliente.innerHTML = '<p>Este cliente no tiene direcciones registradas.</p>'; return; }
             const ul = document.createElement('ul');
@@ -290,14 +832,66 @@ document.addEventListener("DOMContentLoaded", () => {
             btnFinalizarCompra.disabled = false; 
         }
         carritoTotalSpan.textContent = total.toFixed(2); 
+        renderizarSugerencias();
+        // Sigue ahí si se recarga la página sin conexión (una vez recuperado el de la visita anterior)
+        if (carritoRecuperado) guardarLocal('estado', carrito, 'carrito');
+    }
+
+    // --- Comprados Juntos ---
+
+    /** Sugerencias que se muestran como mucho bajo el carrito. */
+    const MAX_SUGERENCIAS = 4;
+    /** Relacionados ya pedidos por producto: id_producto -> promesa de la lista de la API. */
+    const relacionadosPorProducto = new Map();
+    /** Productos sugeridos ahora mismo (para añadirlos aunque aún no estén en el catálogo cargado). */
+    let sugerenciasMostradas = new Map();
+    /** Número de la última actualización de sugerencias (descarta las respuestas de las anteriores). */
+    let versionSugerencias = 0;
+
+    /** Productos que más se compran con 'idProducto' (se piden una sola vez por producto). */
+    function obtenerRelacionados(idProducto) {
+        if (!relacionadosPorProducto.has(idProducto)) {
+            const relacionados = fetchData(`${API_URL}/api/productos/${idProducto}/relacionados?limite=${MAX_SUGERENCIAS + 1}`)
+                .catch(() => { relacionadosPorProducto.delete(idProducto); return []; }); // Se reintenta en el siguiente cambio
+            relacionadosPorProducto.set(idProducto, relacionados);
+        }
+        return relacionadosPorProducto.get(idProducto);
+    }
+
+    /**
+     * Muestra bajo el carrito los productos que más se compran con los que
+     * tiene: suma para cada uno 1/posición en la lista de cada producto del
+     * carrito y omite los que ya están en él o no tienen stock.
+     */
+    async function renderizarSugerencias() {
+        if (!sugerenciasCarrito || !listaSugerencias) return;
+        const version = ++versionSugerencias;
+        const enCarrito = new Set(carrito.map(item => item.id_producto));
+        const listas = await Promise.all([...enCarrito].map(obtenerRelacionados));
+        if (version !== versionSugerencias) return;
+
+        const puntos = new Map();
+        listas.forEach(lista => lista.forEach((relacionado, posicion) => {
+            const producto = (catalogo && catalogo.obtener(relacionado.id_producto)) || relacionado;
+            if (enCarrito.has(producto.id_producto) || producto.cantidad_stock <= 0) return;
+            const previo = puntos.get(producto.id_producto);
+            puntos.set(producto.id_producto, { producto, puntos: (previo ? previo.puntos : 0) + 1 / (posicion + 1) });
+        }));
+        const sugerencias = [...puntos.values()].sort((a, b) => b.puntos - a.puntos).slice(0, MAX_SUGERENCIAS);
+        sugerenciasMostradas = new Map(sugerencias.map(({ producto }) => [producto.id_producto, producto]));
+        listaSugerencias.innerHTML = sugerencias.map(({ producto }) => `
+            <div class="sugerencia"><span class="item-nombre">${escaparHtml(producto.nombre)}</span><span class="item-precio">$${Number(producto.precio).toFixed(2)}</span><button class="btn-add-carrito" data-id="${producto.id_producto}">Añadir</button></div>`).join('');
+        sugerenciasCarrito.hidden = sugerencias.length === 0;
     }
 
     /** Maneja el clic en "Añadir al Carrito" (funciona como un Toggle/Añadir). */
     function handleAddCarritoClick(event) {
-        const button = event.target;
+        const button = event.target.closest('.btn-add-carrito');
         const idProducto = parseInt(button.dataset.id); 
-        const nombre = button.dataset.nombre;
-        const precio = parseFloat(button.dataset.precio); 
+        const producto = (catalogo && catalogo.obtener(idProducto)) || sugerenciasMostradas.get(idProducto);
+        if (!producto) return;
+        const nombre = producto.nombre;
+        const precio = Number(producto.precio); 
         // console.log("Añadiendo al carrito:", { idProducto, nombre, precio }); 
 
         const itemExistente = carrito.find(item => item.id_producto === idProducto);
@@ -321,7 +915,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     /** Maneja el clic en "Ver/Añadir Direcciones". */
     function handleVerDireccionesClick(event) {
-        const button = event.target;
+        const button = event.target.closest('.btn-ver-direcciones');
         const clienteId = parseInt(button.dataset.id);
         const nombreCliente = button.dataset.nombre;
         mostrarSeccionDirecciones(clienteId, nombreCliente);
@@ -329,7 +923,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     /** Maneja el clic en "Editar Cliente". */
     function handleEditarClienteClick(event) {
-        const button = event.target;
+        const button = event.target.closest('.btn-editar-cliente');
         const clienteId = parseInt(button.dataset.id);
         const nombre = button.dataset.nombre;
         const telefono = button.dataset.telefono; 
@@ -347,7 +941,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     /** Maneja el clic en "Eliminar Cliente". */
     async function handleDeleteClienteClick(event) {
-        const button = event.target;
+        const button = event.target.closest('.btn-eliminar-cliente');
         const clienteId = parseInt(button.dataset.id);
         const nombreCliente = button.dataset.nombre;
 
@@ -360,7 +954,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 method: 'DELETE',
             });
             mostrarMensaje(clienteMensaje, `Cliente "${nombreCliente}" eliminado con éxito.`, true);
-            cargarClientes(); 
+            refrescar(cargarClientes); 
             if (clienteSeleccionadoId === clienteId && direccionesClienteDiv) {
                 direccionesClienteDiv.style.display = 'none';
                 clienteSeleccionadoId = null;
@@ -387,9 +981,8 @@ document.addEventListener("DOMContentLoaded", () => {
             });
             // Éxito (status 204)
             mostrarMensaje(proveedorMensaje, `Proveedor "${nombreProveedor}" eliminado con éxito.`, true);
-            cargarProveedores(); // Recarga la lista de proveedores
-            // Opcional: Recargar productos ya que los productos de ese proveedor podrían haberse quedado huérfanos
-            cargarProductos(); 
+            // Recarga los proveedores y los productos, que podrían haberse quedado huérfanos
+            refrescar(() => { cargarProveedores(); cargarProductos(); });
         } catch (error) {
             // Muestra el mensaje de error DETALLADO que viene de la API (ej. 409 Conflict)
             mostrarMensaje(proveedorMensaje, `Error al eliminar proveedor: ${error.message}`, false); 
@@ -441,10 +1034,10 @@ async function handleEditarSubmit(event) {
         // Lógica de UI según la entidad editada
         if (entityType === 'cliente') {
             mostrarMensaje(clienteMensaje, `Cliente "${actualizado.nombre}" actualizado!`, true);
-            cargarClientes();
+            refrescar(cargarClientes);
         } else if (entityType === 'proveedor') {
              mostrarMensaje(proveedorMensaje, `Proveedor "${actualizado.nombre}" actualizado!`, true);
-             cargarProveedores();
+             refrescar(cargarProveedores);
         }
         
         ocultarModalEditarCliente(); 
@@ -464,7 +1057,7 @@ async function handleEditarSubmit(event) {
         const submitButton = formNuevoCliente.querySelector('button[type="submit"]'); submitButton.disabled = true; submitButton.textContent = 'Registrando...';
         try {
             const nuevoCliente = await fetchData(`${API_URL}/api/clientes`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ nombre, telefono }), });
-            mostrarMensaje(clienteMensaje, `Cliente "${nuevoCliente.nombre}" registrado!`, true); formNuevoCliente.reset(); cargarClientes(); 
+            mostrarMensaje(clienteMensaje, `Cliente "${nuevoCliente.nombre}" registrado!`, true); formNuevoCliente.reset(); refrescar(cargarClientes); 
         } catch (error) { mostrarMensaje(clienteMensaje, `Error: ${error.message}`, false); } 
         finally { submitButton.disabled = false; submitButton.textContent = 'Registrar Cliente'; }
     }
@@ -476,7 +1069,7 @@ async function handleEditarSubmit(event) {
         const submitButton = formNuevoProveedor.querySelector('button[type="submit"]'); submitButton.disabled = true; submitButton.textContent = 'Registrando...';
         try {
             const nuevoProveedor = await fetchData(`${API_URL}/api/proveedores`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ nombre, telefono }), });
-            mostrarMensaje(proveedorMensaje, `Proveedor "${nuevoProveedor.nombre}" registrado!`, true); formNuevoProveedor.reset(); cargarProveedores(); 
+            mostrarMensaje(proveedorMensaje, `Proveedor "${nuevoProveedor.nombre}" registrado!`, true); formNuevoProveedor.reset(); refrescar(cargarProveedores); 
         } catch (error) { mostrarMensaje(proveedorMensaje, `Error: ${error.message}`, false); } 
         finally { submitButton.disabled = false; submitButton.textContent = 'Registrar Proveedor'; }
     }
@@ -493,6 +1086,76 @@ async function handleEditarSubmit(event) {
         finally { submitButton.disabled = false; submitButton.textContent = 'Añadir Dirección'; }
     }
 
+    // --- Ventas sin Conexión ---
+
+    /**
+     * Clave única de una venta (cabecera Idempotency-Key): si la venta se
+     * reenvía con la misma clave, la API no la registra dos veces.
+     */
+    function nuevaClaveVenta() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    /** Envía una venta a la API y retorna la venta registrada. */
+    function enviarVenta(ventaData, clave) {
+        return fetchData(`${API_URL}/api/ventas`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Idempotency-Key': clave },
+            body: JSON.stringify(ventaData),
+        });
+    }
+
+    /** Guarda una venta en la cola de pendientes. Retorna false si no hay copia local donde guardarla. */
+    async function encolarVenta(ventaData, clave) {
+        const db = await almacenLocal;
+        if (!db) return false;
+        await escribirLocal(db, ['ventasPendientes'], (cola) => cola.add({ clave, venta: ventaData, creada: new Date().toISOString() }));
+        actualizarEstadoConexion();
+        return true;
+    }
+
+    let enviandoVentas = false;
+
+    /**
+     * Reenvía en orden las ventas que quedaron en cola sin conexión, cada una
+     * con su clave. Si la API no responde (o está saturada) se deja para más
+     * tarde; si la rechaza (p. ej. 409: sin stock o con el precio cambiado)
+     * se avisa y se descarta.
+     */
+    async function enviarVentasPendientes() {
+        const db = await almacenLocal;
+        if (!db || enviandoVentas) return;
+        enviandoVentas = true;
+        try {
+            for (const pendiente of await leerLocal(db, 'ventasPendientes')) {
+                try {
+                    const venta = await enviarVenta(pendiente.venta, pendiente.clave);
+                    mostrarMensaje(compraMensaje, `Venta pendiente #${venta.id_venta} registrada. Total: $${venta.monto_total.toFixed(2)}`, true);
+                } catch (error) {
+                    if (error.status === undefined || error.status === 429 || error.status >= 500) break;
+                    mostrarMensaje(compraMensaje, `Venta pendiente del ${new Date(pendiente.creada).toLocaleString()} rechazada: ${error.message}`, false);
+                }
+                await escribirLocal(db, ['ventasPendientes'], (cola) => cola.delete(pendiente.orden));
+            }
+        } finally {
+            enviandoVentas = false;
+            actualizarEstadoConexion();
+        }
+    }
+
+    /** Avisa si no hay conexión y de cuántas ventas quedan por enviar. */
+    async function actualizarEstadoConexion() {
+        if (!estadoConexion) return;
+        const db = await almacenLocal;
+        const pendientes = db ? (await leerLocal(db, 'ventasPendientes')).length : 0;
+        const avisos = [];
+        if (!navigator.onLine) avisos.push('Sin conexión: se muestran los datos guardados en este dispositivo.');
+        if (pendientes > 0) avisos.push(`${pendientes} venta(s) pendiente(s) de enviar.`);
+        estadoConexion.textContent = avisos.join(' ');
+        estadoConexion.hidden = avisos.length === 0;
+    }
+
     /** Maneja el clic en "Finalizar Compra". */
     async function handleFinalizarCompraClick() { 
         if (!selectorCliente || !btnFinalizarCompra || !compraMensaje) return;
@@ -500,20 +1163,87 @@ async function handleEditarSubmit(event) {
         if (!idClienteSeleccionado) { mostrarMensaje(compraMensaje, "Seleccione un cliente.", false); return; }
         if (carrito.length === 0) { mostrarMensaje(compraMensaje, "El carrito está vacío.", false); return; }
         const ventaData = { id_cliente: parseInt(idClienteSeleccionado), detalles: carrito.map(item => ({ id_producto: item.id_producto, cantidad: item.cantidad, precio_unitario: item.precio })) };
+        const clave = nuevaClaveVenta();
         btnFinalizarCompra.disabled = true; btnFinalizarCompra.textContent = 'Procesando...';
         try {
-            const ventaCreada = await fetchData(`${API_URL}/api/ventas`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(ventaData), });
+            const ventaCreada = await enviarVenta(ventaData, clave);
             mostrarMensaje(compraMensaje, `Venta #${ventaCreada.id_venta} registrada! Total: $${ventaCreada.monto_total.toFixed(2)}`, true); carrito = []; renderizarCarrito(); selectorCliente.value = ""; 
-        } catch (error) { mostrarMensaje(compraMensaje, `Error: ${error.message}`, false); } 
+        } catch (error) {
+            // Sin respuesta de la API (sin conexión): la venta queda en cola con su clave
+            if (error.status === undefined && await encolarVenta(ventaData, clave)) {
+                mostrarMensaje(compraMensaje, 'Sin conexión: la venta se enviará al recuperar la conexión.', true); carrito = []; renderizarCarrito(); selectorCliente.value = "";
+            } else {
+                mostrarMensaje(compraMensaje, `Error: ${error.message}`, false);
+            }
+        } 
         finally { btnFinalizarCompra.textContent = 'Finalizar Compra'; renderizarCarrito(); }
     }
 
     // --- Inicialización y Asignación de Eventos ---
 
-    // Carga inicial de datos.
-    cargarProductos();
-    cargarClientes(); 
-    cargarProveedores(); 
+    // La interfaz (HTML, JS y CSS) queda guardada por el service worker: abre sin conexión.
+    if ('serviceWorker' in navigator && location.protocol.startsWith('http')) {
+        navigator.serviceWorker.register('sw.js').catch((error) => console.warn('Service worker no registrado:', error));
+    }
+
+    // Carga inicial de datos: la copia local al instante y después solo los
+    // cambios. Si aún no hay copia, primero lo imprescindible para empezar a
+    // vender en una sola petición (/api/bootstrap); sin copia local posible,
+    // el resto de los listados página a página.
+    almacenLocal.then(async (db) => {
+        if (!db) {
+            const arranque = await cargarArranque();
+            if (!arranque) { cargarProductos(); cargarClientes(); cargarProveedores(); return; }
+            if (arranque.productos) cargarProductos(arranque.productos);
+            if (arranque.clientes) cargarClientes(arranque.clientes);
+            return;
+        }
+        let hayCopia = false;
+        try {
+            // El carrito que quedó sin comprar en la visita anterior
+            if (carrito.length === 0) carrito = (await leerLocal(db, 'estado', 'carrito')) || [];
+            carritoRecuperado = true;
+            renderizarCarrito();
+            hayCopia = await mostrarCopiaLocal(db);
+        } catch (error) {
+            console.warn('No se pudo leer la copia local:', error);
+        }
+        if (!hayCopia) await cargarArranque();
+        await sincronizar();
+        enviarVentasPendientes();
+    });
+
+    // Al recuperar la conexión se envían las ventas pendientes y se pone al día la copia.
+    window.addEventListener('online', async () => {
+        actualizarEstadoConexion();
+        await enviarVentasPendientes();
+        if (await almacenLocal) sincronizar();
+    });
+    window.addEventListener('offline', actualizarEstadoConexion);
+    actualizarEstadoConexion();
+
+    // Actualizaciones en vivo de stock y precio.
+    suscribirCambiosStock();
+
+    // Un solo listener por lista para los botones de todas sus filas (delegación):
+    // las filas se crean y destruyen al hacer scroll.
+    if (listaDeProductos) {
+        listaDeProductos.addEventListener('click', (event) => {
+            if (event.target.closest('.btn-add-carrito')) handleAddCarritoClick(event);
+        });
+    }
+    if (listaSugerencias) {
+        listaSugerencias.addEventListener('click', (event) => {
+            if (event.target.closest('.btn-add-carrito')) handleAddCarritoClick(event);
+        });
+    }
+    if (listaDeClientesContenedor) {
+        listaDeClientesContenedor.addEventListener('click', (event) => {
+            if (event.target.closest('.btn-ver-direcciones')) handleVerDireccionesClick(event);
+            else if (event.target.closest('.btn-editar-cliente')) handleEditarClienteClick(event);
+            else if (event.target.closest('.btn-eliminar-cliente')) handleDeleteClienteClick(event);
+        });
+    }
 
     // Asigna manejadores de eventos a formularios y botones estáticos.
     if (formNuevoCliente) formNuevoCliente.addEventListener('submit', handleNuevoClienteSubmit);
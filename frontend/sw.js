@@ -0,0 +1,47 @@
+/**
+ * @file sw.js
+ * @description Service worker del Bazar de Ropa. Guarda la interfaz (HTML,
+ * JS y CSS) para que la página abra al instante y también sin conexión.
+ * Los datos no pasan por aquí: app.js los guarda en IndexedDB y los pone al
+ * día con /api/sync.
+ */
+
+/** Cambiar la versión al publicar cambios que deban verse en la siguiente carga. */
+const CACHE = 'bazar-interfaz-v1';
+const RECURSOS = ['./', 'index.html', 'app.js', 'style.css'];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then((cache) => cache.addAll(RECURSOS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    // Borra las copias de versiones anteriores de la interfaz
+    event.waitUntil(
+        caches.keys()
+            .then((nombres) => Promise.all(nombres.filter((nombre) => nombre !== CACHE).map((nombre) => caches.delete(nombre))))
+            .then(() => self.clients.claim())
+    );
+});
+
+/**
+ * Interfaz: se sirve la copia guardada al instante y se actualiza desde la red
+ * en segundo plano para la próxima carga. La API (otro origen) no se toca.
+ */
+self.addEventListener('fetch', (event) => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin) return;
+    event.respondWith(caches.open(CACHE).then(async (cache) => {
+        const guardada = await cache.match(event.request, { ignoreSearch: true });
+        const desdeRed = fetch(event.request).then((respuesta) => {
+            if (respuesta.ok) cache.put(event.request, respuesta.clone());
+            return respuesta;
+        });
+        if (!guardada) return desdeRed;
+        event.waitUntil(desdeRed.catch(() => {}));
+        return guardada;
+    }));
+});